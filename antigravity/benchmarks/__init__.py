@@ -0,0 +1 @@
+# Benchmarks and accuracy-drift harnesses for Antigravity models.
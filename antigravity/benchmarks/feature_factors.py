@@ -0,0 +1,193 @@
+"""
+特徴量ファクターの NumPy 実装 / pandas 実装の速度・一致比較
+
+antigravity.forecasting.features の各ファクター（GK, CCI, ADX, MACD, VWAPGap,
+TechnicalIndicators, WindowNormalizer）について、NumPy 版（calculate / compute）と
+従来の pandas 実装（REFERENCE。rolling().apply やフレームのコピーを含む）を
+同じバー系列で計算し、以下をバー数ごとに報告する。
+- 計算時間（pandas / NumPy）と速度比
+- 出力の最大相対誤差（NaN の位置が一致しない場合は mismatch）
+
+Usage:
+    python -m antigravity.benchmarks.feature_factors --sizes 10000,100000,1000000
+
+--csv を指定した場合は OHLCV CSV の先頭から各バー数を切り出す（不足分は合成バー）。
+"""
+
+import argparse
+import time
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from antigravity.forecasting.features import (
+    ADX, CCI, MACD, GarmanKlassVolatility, TechnicalIndicators, VWAPGap, WindowNormalizer,
+)
+
+
+# =============================================================================
+# 従来の pandas 実装（一致確認の基準）
+# =============================================================================
+
+def reference_technical(data: pd.DataFrame) -> pd.DataFrame:
+    df = data.copy()
+    df['SMA_20'] = df['Close'].rolling(window=20).mean()
+    delta = df['Close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    rs = gain / loss
+    df['RSI_14'] = 100 - (100 / (1 + rs))
+    df['BB_Mid'] = df['Close'].rolling(window=20).mean()
+    df['BB_Std'] = df['Close'].rolling(window=20).std()
+    df['BB_Upper'] = df['BB_Mid'] + (df['BB_Std'] * 2)
+    df['BB_Lower'] = df['BB_Mid'] - (df['BB_Std'] * 2)
+    return df[['SMA_20', 'RSI_14', 'BB_Upper', 'BB_Lower']]
+
+
+def reference_garman_klass(data: pd.DataFrame, window: int = 20) -> pd.Series:
+    log_hl = np.log(data['High'] / data['Low'])
+    log_co = np.log(data['Close'] / data['Open'])
+    gk_var = 0.5 * (log_hl ** 2) - (2 * np.log(2) - 1) * (log_co ** 2)
+    return gk_var.rolling(window=window).mean().apply(lambda x: np.sqrt(x) if x > 0 else 0)
+
+
+def reference_vwap_gap(data: pd.DataFrame, window: int = 20) -> pd.Series:
+    typical_price = (data['High'] + data['Low'] + data['Close']) / 3
+    cumulative_tp_vol = (typical_price * data['Volume']).rolling(window=window).sum()
+    cumulative_vol = data['Volume'].rolling(window=window).sum()
+    return (cumulative_tp_vol / cumulative_vol / data['Close'].shift(1)) - 1
+
+
+def reference_macd(data: pd.DataFrame, fast: int = 12, slow: int = 26, signal: int = 9) -> pd.DataFrame:
+    close = data['Close']
+    macd_line = close.ewm(span=fast, adjust=False).mean() - close.ewm(span=slow, adjust=False).mean()
+    signal_line = macd_line.ewm(span=signal, adjust=False).mean()
+    return pd.DataFrame({'MACD': macd_line, 'MACD_Signal': signal_line, 'MACD_Hist': macd_line - signal_line})
+
+
+def reference_cci(data: pd.DataFrame, period: int = 20) -> pd.Series:
+    tp = (data['High'] + data['Low'] + data['Close']) / 3
+    sma_tp = tp.rolling(window=period).mean()
+    mad = tp.rolling(window=period).apply(lambda x: np.abs(x - x.mean()).mean(), raw=True)
+    return (tp - sma_tp) / (0.015 * mad)
+
+
+def reference_adx(data: pd.DataFrame, period: int = 14) -> pd.DataFrame:
+    high, low, close = data['High'], data['Low'], data['Close']
+    tr = pd.concat([high - low, abs(high - close.shift(1)), abs(low - close.shift(1))], axis=1).max(axis=1)
+    up_move = high - high.shift(1)
+    down_move = low.shift(1) - low
+    plus_dm = pd.Series(np.where((up_move > down_move) & (up_move > 0), up_move, 0), index=data.index)
+    minus_dm = pd.Series(np.where((down_move > up_move) & (down_move > 0), down_move, 0), index=data.index)
+    atr = tr.ewm(alpha=1/period, adjust=False).mean()
+    plus_di = 100 * plus_dm.ewm(alpha=1/period, adjust=False).mean() / atr
+    minus_di = 100 * minus_dm.ewm(alpha=1/period, adjust=False).mean() / atr
+    dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di + 1e-10)
+    adx = dx.ewm(alpha=1/period, adjust=False).mean()
+    return pd.DataFrame({'ADX': adx, 'Plus_DI': plus_di, 'Minus_DI': minus_di})
+
+
+def reference_normalize_df(df: pd.DataFrame, window: int = 60) -> pd.DataFrame:
+    def normalize(series):
+        rolling_std = series.rolling(window=window).std()
+        return (series - series.rolling(window=window).mean()) / rolling_std.replace(0, 1)
+    return df.apply(normalize)
+
+
+# (名前, pandas 実装, NumPy 実装)
+FACTORS: List[Tuple[str, Callable, Callable]] = [
+    ('TechnicalIndicators', reference_technical, TechnicalIndicators().calculate),
+    ('GarmanKlass', reference_garman_klass, GarmanKlassVolatility(window=20).calculate),
+    ('VWAPGap', reference_vwap_gap, VWAPGap(window=20).calculate),
+    ('MACD', reference_macd, MACD().calculate),
+    ('CCI', reference_cci, CCI(period=20).calculate),
+    ('ADX', reference_adx, ADX(period=14).calculate),
+    (
+        'WindowNormalizer',
+        lambda d: reference_normalize_df(d[['Open', 'High', 'Low', 'Close']]),
+        lambda d: WindowNormalizer(window=60).normalize_df(d[['Open', 'High', 'Low', 'Close']]),
+    ),
+]
+
+
+def synthetic_bars(n: int, seed: int = 0) -> pd.DataFrame:
+    """ランダムウォークの M15 OHLCV バー"""
+    rng = np.random.default_rng(seed)
+    close = 150.0 + np.cumsum(rng.normal(0, 0.05, n))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) + rng.uniform(0.01, 0.1, n),
+        'Low': np.minimum(open_, close) - rng.uniform(0.01, 0.1, n),
+        'Close': close,
+        'Volume': rng.integers(100, 5000, n).astype(float),
+    }, index=pd.date_range('2000-01-03', periods=n, freq='15min'))
+
+
+def max_rel_error(expected, actual) -> float:
+    """NaN 位置が一致すれば有限値の最大相対誤差、一致しなければ inf"""
+    e = np.asarray(expected, dtype=float)
+    a = np.asarray(actual, dtype=float)
+    if e.shape != a.shape or not np.array_equal(np.isnan(e), np.isnan(a)):
+        return float('inf')
+    finite = np.isfinite(e)
+    if not np.array_equal(finite, np.isfinite(a)):
+        return float('inf')
+    if not finite.any():
+        return 0.0
+    return float(np.max(np.abs(e[finite] - a[finite]) / np.maximum(np.abs(e[finite]), 1e-12)))
+
+
+def _timed(fn: Callable, data: pd.DataFrame, repeat: int) -> Tuple[float, object]:
+    best = float('inf')
+    out = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(data)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def run(data: pd.DataFrame, repeat: int = 3) -> Dict[str, Dict[str, float]]:
+    """各ファクターの pandas / NumPy 時間と最大相対誤差"""
+    results = {}
+    for name, reference, vectorized in FACTORS:
+        t_ref, expected = _timed(reference, data, repeat)
+        t_np, actual = _timed(vectorized, data, repeat)
+        results[name] = {
+            'pandas_s': t_ref,
+            'numpy_s': t_np,
+            'max_rel_err': max_rel_error(expected, actual),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized feature factor benchmark")
+    parser.add_argument('--sizes', default='10000,100000,1000000', help="Comma-separated bar counts")
+    parser.add_argument('--csv', default=None, help="OHLCV CSV (Open/High/Low/Close/Volume)")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    source = None
+    if args.csv:
+        source = pd.read_csv(args.csv)
+        source = source.rename(columns={c: c.capitalize() for c in source.columns})
+
+    for n in [int(s) for s in args.sizes.split(',') if s.strip()]:
+        if source is not None and len(source) >= n:
+            data = source.iloc[:n][['Open', 'High', 'Low', 'Close', 'Volume']].astype(float)
+        else:
+            data = synthetic_bars(n)
+        print(f"\nBars: {n}")
+        print(f"{'factor':>20} {'pandas s':>10} {'numpy s':>10} {'speedup':>8} {'max rel err':>12}")
+        for name, r in run(data, args.repeat).items():
+            print(
+                f"{name:>20} {r['pandas_s']:>10.4f} {r['numpy_s']:>10.4f} "
+                f"{r['pandas_s'] / max(r['numpy_s'], 1e-9):>7.1f}x {r['max_rel_err']:>12.2e}"
+            )
+
+
+if __name__ == '__main__':
+    main()
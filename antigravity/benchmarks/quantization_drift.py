@@ -0,0 +1,174 @@
+"""
+int8 動的量子化の精度ドリフト / レイテンシ / メモリ比較
+
+fp32 モデルと MODEL_PRECISION=int8 相当の量子化モデルを同じホールドアウト
+シーケンスで推論し、以下をモデルごとに報告する。
+- 方向クラス（DOWN/FLAT/UP）の一致率と確率の最大誤差
+- batch=1 推論レイテンシ（中央値 / p95）
+- 重みのシリアライズサイズ（state_dict）
+
+Usage:
+    python -m antigravity.benchmarks.quantization_drift \\
+        --transformer antigravity/data/transformer_model_USDJPY_15.pt \\
+        --csv data/USDJPY_M15.csv --samples 2000
+
+--csv を省略した場合はランダムウォークの合成バーを使用する。
+"""
+
+import argparse
+import io
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+import torch
+
+from antigravity.forecasting.models import TransformerPredictor, KANForecaster
+from antigravity.forecasting.pipeline import IncrementalFeaturePipeline
+
+
+SEQ_LEN = 20
+
+
+def _synthetic_bars(n: int, seed: int = 0) -> Dict[str, np.ndarray]:
+    """ランダムウォークの OHLCV バーを生成する"""
+    rng = np.random.default_rng(seed)
+    close = 150.0 + np.cumsum(rng.normal(0, 0.05, n))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = rng.uniform(0.01, 0.1, n)
+    return {
+        'Open': open_,
+        'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread,
+        'Close': close,
+        'Volume': rng.integers(100, 5000, n).astype(float),
+    }
+
+
+def _csv_bars(path: str) -> Dict[str, np.ndarray]:
+    """OHLCV CSV（Open/High/Low/Close/Volume 列、大文字小文字不問）を読み込む"""
+    import pandas as pd
+    df = pd.read_csv(path)
+    cols = {c.lower(): c for c in df.columns}
+    volume_col = cols.get('volume') or cols.get('tickvol') or cols.get('vol')
+    bars = {name: df[cols[name.lower()]].to_numpy(dtype=float) for name in ('Open', 'High', 'Low', 'Close')}
+    bars['Volume'] = df[volume_col].to_numpy(dtype=float) if volume_col else np.ones(len(df))
+    return bars
+
+
+def build_sequences(bars: Dict[str, np.ndarray], samples: int) -> np.ndarray:
+    """本番と同じ特徴量パイプラインでモデル入力 [samples, seq_len, 5] を作る"""
+    pipeline = IncrementalFeaturePipeline(seq_len=SEQ_LEN)
+    n = len(bars['Close'])
+    out = []
+    for i in range(n):
+        pipeline.update({k: bars[k][i] for k in bars})
+        seq = pipeline.sequence()
+        if seq is not None:
+            out.append(seq[0])
+    X = np.asarray(out, dtype=np.float32)
+    return X[-samples:]
+
+
+def _state_dict_bytes(model: torch.nn.Module) -> int:
+    buf = io.BytesIO()
+    torch.save(model.state_dict(), buf)
+    return buf.tell()
+
+
+def _latency_ms(predictor: Any, X: np.ndarray, iterations: int) -> Dict[str, float]:
+    """batch=1 推論のレイテンシ（ミリ秒）"""
+    for i in range(min(10, len(X))):
+        predictor.predict(X[i:i + 1])
+    times = []
+    for i in range(iterations):
+        x = X[i % len(X)][np.newaxis]
+        t0 = time.perf_counter()
+        predictor.predict(x)
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return {'p50': float(np.percentile(times, 50)), 'p95': float(np.percentile(times, 95))}
+
+
+def compare(factory, X: np.ndarray, iterations: int) -> Dict[str, Any]:
+    """
+    fp32 と int8 のモデルを比較する。
+
+    Parameters:
+    -----------
+    factory : Callable
+        学習済み重みを読み込んだ fp32 の予測モデルを返す関数
+    X : np.ndarray
+        ホールドアウトシーケンス [n, seq_len, 5]
+    iterations : int
+        レイテンシ計測の反復回数
+    """
+    fp32 = factory()
+    int8 = factory()
+    int8.quantize()
+
+    _, probs_fp32 = fp32.predict(X)
+    _, probs_int8 = int8.predict(X)
+
+    return {
+        'agreement': float(np.mean(probs_fp32.argmax(axis=1) == probs_int8.argmax(axis=1))),
+        'max_prob_diff': float(np.abs(probs_fp32 - probs_int8).max()),
+        'latency_fp32': _latency_ms(fp32, X, iterations),
+        'latency_int8': _latency_ms(int8, X, iterations),
+        'bytes_fp32': _state_dict_bytes(fp32.model),
+        'bytes_int8': _state_dict_bytes(int8.model),
+    }
+
+
+def _print_report(name: str, r: Dict[str, Any]):
+    speedup = r['latency_fp32']['p50'] / max(r['latency_int8']['p50'], 1e-9)
+    shrink = r['bytes_fp32'] / max(r['bytes_int8'], 1)
+    print(f"[{name}]")
+    print(f"  class agreement : {r['agreement']:.2%} (max |dp| = {r['max_prob_diff']:.4f})")
+    print(f"  latency p50     : fp32 {r['latency_fp32']['p50']:.3f} ms -> int8 {r['latency_int8']['p50']:.3f} ms (x{speedup:.2f})")
+    print(f"  latency p95     : fp32 {r['latency_fp32']['p95']:.3f} ms -> int8 {r['latency_int8']['p95']:.3f} ms")
+    print(f"  weights         : fp32 {r['bytes_fp32'] / 1024:.1f} KiB -> int8 {r['bytes_int8'] / 1024:.1f} KiB (x{shrink:.2f})")
+
+
+def _load_or_none(model: Any, path: Optional[str]) -> Any:
+    if path:
+        model.load(path)
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="int8 dynamic quantization drift/latency report")
+    parser.add_argument('--transformer', default=None, help="Transformer checkpoint (.pt)")
+    parser.add_argument('--kan', default=None, help="KAN checkpoint (.pt)")
+    parser.add_argument('--csv', default=None, help="OHLCV CSV for held-out sequences")
+    parser.add_argument('--samples', type=int, default=1000, help="Number of held-out sequences")
+    parser.add_argument('--iterations', type=int, default=300, help="Latency iterations (batch=1)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    bars = _csv_bars(args.csv) if args.csv else _synthetic_bars(args.samples + 200, seed=args.seed)
+    X = build_sequences(bars, args.samples)
+    print(f"Held-out sequences: {len(X)} (seq_len={SEQ_LEN}, threads={torch.get_num_threads()})")
+
+    # 未学習モデルの場合も同じ初期重みで比較できるよう、重みを一度だけ生成して複製する
+    transformer_state = TransformerPredictor(input_dim=5, device='cpu')
+    _load_or_none(transformer_state, args.transformer)
+    kan_state = KANForecaster(input_dim=5, seq_len=SEQ_LEN, device='cpu')
+    _load_or_none(kan_state, args.kan)
+
+    def make_transformer():
+        m = TransformerPredictor(input_dim=5, device='cpu')
+        m.model.load_state_dict(transformer_state.model.state_dict())
+        return m
+
+    def make_kan():
+        m = KANForecaster(input_dim=5, seq_len=SEQ_LEN, device='cpu')
+        m.model.load_state_dict(kan_state.model.state_dict())
+        return m
+
+    _print_report('transformer', compare(make_transformer, X, args.iterations))
+    _print_report('kan', compare(make_kan, X, args.iterations))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,10 @@
 import pandas as pd
 import numpy as np
 import os
-from typing import Dict, Any, List, Optional, Literal
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, Any, List, Optional, Literal
 
 from antigravity.forecasting.features import (
     TechnicalIndicators, 
@@ -11,15 +14,85 @@ from antigravity.forecasting.features import (
     WindowNormalizer,
     GARCHVolatilityFeature
 )
-from antigravity.forecasting.models import TransformerPredictor, KANForecaster
+from antigravity.forecasting.batching import ModelRegistry
+from antigravity.forecasting.pipeline import IncrementalFeaturePipeline
+from antigravity.core.ring_buffer import BarRingBuffer, to_epoch_seconds
+from antigravity.core.sampled_log import SampledLogger
 from antigravity.sentiment.analyzer import SentimentAnalyzer
 from antigravity.risk.vpin import VPINCalculator
 from antigravity.control.agents import EnsembleSelector, RewardCalculator
 
+if TYPE_CHECKING:
+    # torch はモデル生成時に初めて読み込む（import 時のコールドスタートを軽くする）
+    from antigravity.forecasting.models import TransformerPredictor, KANForecaster
+
 
 # モデルタイプの型定義
 ModelType = Literal['transformer', 'kan', 'ensemble']
 
+# バー履歴の保持本数
+HISTORY_CAPACITY = 200
+
+DIRECTION_NAMES = ('DOWN', 'FLAT', 'UP')
+
+_log = SampledLogger(logging.getLogger(__name__))
+
+# アンサンブルで KAN を Transformer と並行実行するための共有エグゼキューター
+# （torch の演算中は GIL が解放されるため、スレッドで実際に並行実行される）
+_ensemble_executor: Optional[ThreadPoolExecutor] = None
+_ensemble_executor_lock = threading.Lock()
+
+
+# torch を初めて読み込んだ直後に1回だけ呼ぶコールバック（スレッド数の設定など）
+_torch_hooks: List[Callable[[Any], None]] = []
+_torch_loaded = False
+_torch_lock = threading.Lock()
+
+
+def on_torch_loaded(callback: Callable[[Any], None]) -> None:
+    """
+    Orchestrator が torch を読み込んだ直後に callback(torch) を呼ぶ。
+
+    torch はモデル生成時まで読み込まないため、スレッド数などの torch の設定はここで行う。
+    すでに読み込み済みなら即座に呼ぶ。
+    """
+    with _torch_lock:
+        if not _torch_loaded:
+            _torch_hooks.append(callback)
+            return
+    import torch
+    callback(torch)
+
+
+def _import_torch():
+    """torch を import し、初回のみ on_torch_loaded のコールバックを呼ぶ"""
+    global _torch_loaded
+    import torch
+    with _torch_lock:
+        if _torch_loaded:
+            return torch
+        _torch_loaded = True
+        hooks = list(_torch_hooks)
+        _torch_hooks.clear()
+    for hook in hooks:
+        try:
+            hook(torch)
+        except Exception as e:
+            _log.warning("torch_loaded_hook_error", error=str(e))
+    return torch
+
+
+def _get_ensemble_executor() -> ThreadPoolExecutor:
+    global _ensemble_executor
+    if _ensemble_executor is None:
+        with _ensemble_executor_lock:
+            if _ensemble_executor is None:
+                _ensemble_executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("AG_ENSEMBLE_WORKERS", "4")),
+                    thread_name_prefix="ag-ensemble",
+                )
+    return _ensemble_executor
+
 
 class AntigravityOrchestrator:
     """
@@ -44,7 +117,9 @@ class AntigravityOrchestrator:
         kan_model_path: Optional[str] = None,
         daily_data_path: Optional[str] = None,
         model_type: ModelType = 'transformer',
-        ensemble_weights: tuple = (0.6, 0.4)  # (transformer_weight, kan_weight)
+        ensemble_weights: tuple = (0.6, 0.4),  # (transformer_weight, kan_weight)
+        model_registry: Optional[ModelRegistry] = None,
+        precision: str = 'fp32'
     ):
         """
         Parameters:
@@ -67,12 +142,22 @@ class AntigravityOrchestrator:
             'transformer', 'kan', または 'ensemble'
         ensemble_weights : tuple
             アンサンブル時の重み (transformer_weight, kan_weight)
+        model_registry : ModelRegistry, optional
+            複数Orchestrator間でモデルを共有し、同時推論をマイクロバッチ化するレジストリ
+        precision : str
+            推論精度。'int8' で Linear/KAN 層を動的 int8 量子化する（CPU推論）
         """
         self.run_mode = run_mode
         self.vpin_safety_threshold = vpin_safety_threshold
         self.max_position = max_position
         self.model_type = model_type
         self.ensemble_weights = ensemble_weights
+        self.model_registry = model_registry
+        from antigravity.forecasting.models import PRECISIONS
+        if precision not in PRECISIONS:
+            print(f"[WARNING] Unknown precision '{precision}', falling back to fp32")
+            precision = 'fp32'
+        self.precision = precision
         
         # 特徴量計算モジュール
         self.tech_indicators = TechnicalIndicators()
@@ -82,8 +167,11 @@ class AntigravityOrchestrator:
         self.normalizer = WindowNormalizer(window=feature_window)
         
         # 予測モデル初期化
-        self.transformer_model: Optional[TransformerPredictor] = None
-        self.kan_model: Optional[KANForecaster] = None
+        self.transformer_model: Optional['TransformerPredictor'] = None
+        self.kan_model: Optional['KANForecaster'] = None
+        # 推論実行体（MicroBatcher 経由の場合あり。未使用時はモデル自身）
+        self._transformer_runner: Any = None
+        self._kan_runner: Any = None
         
         self._init_models(model_path, kan_model_path)
         
@@ -101,14 +189,36 @@ class AntigravityOrchestrator:
         )
         
         # GARCHボラティリティ予測（マルチタイムフレーム）
-        self.garch_feature = GARCHVolatilityFeature(rolling_window=180)
+        # fit 結果は日足のコンテンツハッシュでキャッシュし、同じ日足を使う Orchestrator 間で共有する
+        garch_cache_dir = os.getenv('AG_GARCH_CACHE_DIR') or (
+            os.path.join(os.path.dirname(os.path.abspath(daily_data_path)), 'garch_cache')
+            if daily_data_path else None
+        )
+        self.garch_feature = GARCHVolatilityFeature(
+            rolling_window=180,
+            cache_dir=garch_cache_dir,
+            max_workers=int(os.getenv('AG_GARCH_WORKERS', '4')),
+            engine=os.getenv('AG_GARCH_ENGINE', 'refit'),
+            refit_every=int(os.getenv('AG_GARCH_REFIT_EVERY', '20')),
+        )
         self.garch_signal: int = 0  # キャッシュした日次シグナル
         
         if daily_data_path and os.path.exists(daily_data_path):
             self._load_daily_data(daily_data_path)
         
-        # 内部状態
-        self.bar_history: List[Dict[str, float]] = []
+        # 内部状態（バー取り込み・状態更新はこのロックで直列化する）
+        self.lock = threading.RLock()
+        self.bar_history = BarRingBuffer(capacity=HISTORY_CAPACITY)
+        self._bars_appended: int = 0  # 追加バー数
+        self._forming_bar: bool = False  # 最新バーが形成中（時刻付きで取り込み、置き換えられうる）か
+        self._history_seeded: bool = False
+        self._prediction_cache_key: Optional[int] = None  # 予測に使った確定済み最新バーの番号
+        # バーごとに O(1) で更新する特徴量パイプライン（モデル入力の構築に使用）
+        self.feature_pipeline = IncrementalFeaturePipeline(
+            seq_len=self.seq_len,
+            gk_window=self.gk_volatility.window,
+            alpha_window=self.formulaic_alpha.sma_window,
+        )
         self.current_inventory: float = 0.0  # 現在のポジション
         self.last_price: Optional[float] = None
         self.current_volatility: float = 0.01
@@ -117,29 +227,27 @@ class AntigravityOrchestrator:
     def _init_models(self, model_path: Optional[str], kan_model_path: Optional[str]):
         """予測モデルを初期化"""
         # デバイス設定（CUDA優先）
-        import torch
-        device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        print(f"[INFO] Using device: {device}")
+        torch = _import_torch()
+        # 量子化モデルは CPU 専用
+        if self.precision == 'int8':
+            device = 'cpu'
+        else:
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        print(f"[INFO] Using device: {device} (precision={self.precision})")
         
         # Transformer
         if self.model_type in ('transformer', 'ensemble'):
-            self.transformer_model = TransformerPredictor(input_dim=5, device=device)
-            if model_path and os.path.exists(model_path):
-                try:
-                    self.transformer_model.load(model_path)
-                    print(f"[INFO] Loaded Transformer model from: {model_path}")
-                except Exception as e:
-                    print(f"[WARNING] Failed to load Transformer model: {e}")
+            self.transformer_model, self._transformer_runner = self._acquire_model(
+                'transformer', model_path, device,
+                lambda: self._create_transformer(model_path, device)
+            )
         
         # KAN
         if self.model_type in ('kan', 'ensemble'):
-            self.kan_model = KANForecaster(input_dim=5, seq_len=20, device=device)
-            if kan_model_path and os.path.exists(kan_model_path):
-                try:
-                    self.kan_model.load(kan_model_path)
-                    print(f"[INFO] Loaded KAN model from: {kan_model_path}")
-                except Exception as e:
-                    print(f"[WARNING] Failed to load KAN model: {e}")
+            self.kan_model, self._kan_runner = self._acquire_model(
+                'kan', kan_model_path, device,
+                lambda: self._create_kan(kan_model_path, device)
+            )
         
         # 後方互換性のため self.model を設定
         if self.model_type == 'transformer':
@@ -157,6 +265,46 @@ class AntigravityOrchestrator:
         # Transformerのシーケンス長
         self.seq_len: int = 20
         self.transformer_prediction: int = 1  # 0=DOWN, 1=FLAT, 2=UP
+        self.direction_probs: Optional[np.ndarray] = None  # 直近予測の確率 [DOWN, FLAT, UP]
+        
+    def _acquire_model(self, kind: str, path: Optional[str], device: str, factory):
+        """
+        モデルと推論実行体を取得する。
+        
+        model_registry がある場合は同一パスのモデルを共有し、MicroBatcher 経由で推論する。
+        """
+        if self.model_registry is not None:
+            return self.model_registry.get(kind, path, device, factory, precision=self.precision)
+        model = factory()
+        return model, model
+    
+    def _create_transformer(self, model_path: Optional[str], device: str) -> 'TransformerPredictor':
+        """Transformerを生成し、学習済み重みがあれば読み込む"""
+        from antigravity.forecasting.models import TransformerPredictor
+        model = TransformerPredictor(input_dim=5, device=device)
+        if model_path and os.path.exists(model_path):
+            try:
+                model.load(model_path)
+                print(f"[INFO] Loaded Transformer model from: {model_path}")
+            except Exception as e:
+                print(f"[WARNING] Failed to load Transformer model: {e}")
+        if self.precision == 'int8':
+            model.quantize()
+        return model
+    
+    def _create_kan(self, kan_model_path: Optional[str], device: str) -> 'KANForecaster':
+        """KANを生成し、学習済み重みがあれば読み込む"""
+        from antigravity.forecasting.models import KANForecaster
+        model = KANForecaster(input_dim=5, seq_len=20, device=device)
+        if kan_model_path and os.path.exists(kan_model_path):
+            try:
+                model.load(kan_model_path)
+                print(f"[INFO] Loaded KAN model from: {kan_model_path}")
+            except Exception as e:
+                print(f"[WARNING] Failed to load KAN model: {e}")
+        if self.precision == 'int8':
+            model.quantize()
+        return model
         
     def _load_daily_data(self, daily_data_path: str):
         """
@@ -206,12 +354,87 @@ class AntigravityOrchestrator:
         except Exception as e:
             print(f"[WARNING] Failed to load daily data: {e}")
         
-    def _update_bar_history(self, bar_data: Dict[str, float]):
-        """バー履歴を更新"""
+    def _update_bar_history(self, bar_data: Dict[str, float], forming: bool = False):
+        """バー履歴を更新（リングバッファのため直近 HISTORY_CAPACITY 本のみ保持）"""
         self.bar_history.append(bar_data)
-        # メモリ管理: 直近200本のみ保持
-        if len(self.bar_history) > 200:
-            self.bar_history = self.bar_history[-200:]
+        self.feature_pipeline.update(bar_data)
+        self._bars_appended += 1
+        self._forming_bar = forming
+    
+    @property
+    def _closed_bar_key(self) -> int:
+        """確定済みの最新バーの番号（形成中バーがあればその1本前）。予測キャッシュのキー"""
+        return self._bars_appended - 1 if self._forming_bar else self._bars_appended
+    
+    def ingest_bar(self, bar_data: Dict[str, float], bar_time: Any = None) -> str:
+        """
+        バー開始時刻をキーにバーを取り込む（冪等）。
+        
+        同じバーを何度ポーリングしても履歴は1本のまま保たれる。
+        - 最新バーと同時刻: 形成中バーとしてその場で置き換える
+        - 最新バーより新しい時刻: 新しいバーとして追加する
+        - 最新バーより古い時刻: 無視する
+        bar_time が None の場合は従来どおり常に追加する。
+        
+        Parameters:
+        -----------
+        bar_data : Dict
+            'Open', 'High', 'Low', 'Close', 'Volume' を含む辞書
+        bar_time : Any
+            バー開始時刻（エポック秒 / datetime / 文字列）
+            
+        Returns:
+        --------
+        str: 'append', 'replace', 'stale' のいずれか
+        """
+        with self.lock:
+            if bar_time is None:
+                self._update_bar_history(bar_data)
+                return 'append'
+        
+            t = to_epoch_seconds(bar_time)
+            bar = dict(bar_data)
+            bar['Time'] = t
+            last_t = self.bar_history.last_time
+            if last_t is not None:
+                if t == last_t:
+                    self.bar_history.replace_last(bar)
+                    self.feature_pipeline.update(bar, replace=True)
+                    self._forming_bar = True
+                    return 'replace'
+                if t < last_t:
+                    return 'stale'
+            self._update_bar_history(bar, forming=True)
+            return 'append'
+    
+    def seed_history(self, bars: List[Dict[str, float]], bar_times: Optional[List[Any]] = None) -> int:
+        """
+        過去バーで履歴を初期化する（オーケストレーターごとに1回のみ）。
+        
+        bar_times を渡した場合は ingest_bar と同じく時刻で重複を除外する。
+        
+        Returns:
+        --------
+        int: 追加されたバー数（既に初期化済みの場合は0）
+        """
+        with self.lock:
+            if self._history_seeded:
+                return 0
+            self._history_seeded = True
+        
+            added = 0
+            for i, bar in enumerate(bars):
+                t = bar_times[i] if bar_times is not None else None
+                if self.ingest_bar(bar, t) == 'append':
+                    added += 1
+            # 過去バーはすべて確定済み
+            self._forming_bar = False
+            return added
+    
+    @property
+    def history_seeded(self) -> bool:
+        """seed_history による初期化が済んでいるか"""
+        return self._history_seeded
     
     def _compute_features(self, sentiment_score: float = 0.0) -> np.ndarray:
         """
@@ -223,19 +446,12 @@ class AntigravityOrchestrator:
             # 履歴が不足している場合はダミーを返す
             return np.zeros(5)
         
-        # DataFrameに変換
-        df = pd.DataFrame(self.bar_history)
-        
-        # 各種特徴量を計算
+        # 各種特徴量（パイプラインがバーごとに更新した最新値）
         try:
-            log_ret = self.log_return.calculate(df)
-            gk_vol = self.gk_volatility.calculate(df)
-            alpha = self.formulaic_alpha.calculate(df)
-            
-            # 最新の値を取得
-            latest_log_ret = log_ret.iloc[-1] if not log_ret.isna().all() else 0.0
-            latest_gk_vol = gk_vol.iloc[-1] if not gk_vol.isna().all() else 0.01
-            latest_alpha = alpha.iloc[-1] if not alpha.isna().all() else 0.0
+            latest = self.feature_pipeline.latest
+            latest_log_ret = latest['log_return']
+            latest_gk_vol = latest['gk_vol']
+            latest_alpha = latest['alpha']
             
             # ボラティリティを更新
             self.current_volatility = latest_gk_vol if latest_gk_vol > 0 else 0.01
@@ -260,50 +476,20 @@ class AntigravityOrchestrator:
     
     def _build_sequence(self) -> Optional[np.ndarray]:
         """
-        バー履歴からTransformer入力用のシーケンスを構築する。
+        Transformer入力用のシーケンスを返す（IncrementalFeaturePipeline がバーごとに更新）。
+        
+        最新バーが形成中の場合は、確定済みのバーまでのシーケンスを返す。
         
         Returns:
             np.ndarray: [1, seq_len, 5] の形式のシーケンス
             または履歴不足の場合はNone
         """
-        if len(self.bar_history) < self.seq_len:
-            return None
-        
-        # 直近seq_len本のバーを取得
-        recent_bars = self.bar_history[-self.seq_len:]
-        df = pd.DataFrame(recent_bars)
-        
         try:
-            # 各バーの特徴量を計算
-            log_returns = self.log_return.calculate(df).fillna(0).values
-            gk_vols = self.gk_volatility.calculate(df).fillna(0.01).values
-            alphas = self.formulaic_alpha.calculate(df).fillna(0).values
-            
-            # シーケンスを構築 [seq_len, 5]
-            # 特徴量: [log_return, gk_vol, alpha, price_normalized, volume_normalized]
-            prices = df['Close'].values
-            volumes = df['Volume'].values
-            
-            # 正規化
-            price_norm = (prices - prices.mean()) / (prices.std() + 1e-8)
-            vol_norm = (volumes - volumes.mean()) / (volumes.std() + 1e-8)
-            
-            sequence = np.stack([
-                log_returns,
-                gk_vols,
-                alphas,
-                price_norm,
-                vol_norm
-            ], axis=1)  # [seq_len, 5]
-            
-            # NaNを置換
-            sequence = np.nan_to_num(sequence, nan=0.0, posinf=0.0, neginf=0.0)
-            
-            # バッチ次元を追加 [1, seq_len, 5]
-            return sequence[np.newaxis, :, :].astype(np.float32)
-            
+            if self._forming_bar:
+                return self.feature_pipeline.closed_sequence()
+            return self.feature_pipeline.sequence()
         except Exception as e:
-            print(f"[WARNING] Sequence build error: {e}")
+            _log.warning("sequence_build_error", error=str(e))
             return None
     
     def _get_transformer_prediction(self) -> int:
@@ -319,77 +505,137 @@ class AntigravityOrchestrator:
         """
         設定されたモデル（Transformer/KAN/Ensemble）から方向予測を取得する。
         
+        入力は確定済みのバーまで（形成中バーは含めない）で、予測は確定済みの
+        最新バーをキーにキャッシュする。同一バーへの繰り返しポーリング（形成中バーの
+        置き換え）では再計算せず、形成中バーの途中の値で予測が固定されることもない。
+        
+        ロックは入力の準備と結果の反映の間だけ保持し、モデル推論自体は
+        ロックの外で（状態を変更せずに）実行する。これにより別銘柄の
+        Orchestrator は並行して推論でき、同一銘柄のバー更新も妨げない。
+        
         Returns:
             0 = DOWN, 1 = FLAT, 2 = UP
         """
-        sequence = self._build_sequence()
+        # 1. 入力の準備（ロック内。sequence は内部状態と共有しない新しい配列）
+        with self.lock:
+            bar_key = self._closed_bar_key
+            if self._prediction_cache_key == bar_key:
+                return self.transformer_prediction
+            sequence = self._build_sequence()
         
         if sequence is None:
             return 1  # データ不足の場合はFLAT
         
+        # 2. 推論（ロック外・読み取り専用）
         try:
-            if self.model_type == 'transformer':
-                direction = self._predict_transformer(sequence)
-            elif self.model_type == 'kan':
-                direction = self._predict_kan(sequence)
-            elif self.model_type == 'ensemble':
-                direction = self._predict_ensemble(sequence)
-            else:
-                direction = 1  # 不明な場合はFLAT
-            
-            self.transformer_prediction = direction
-            return direction
+            direction, probs = self._run_models(sequence)
         except Exception as e:
-            print(f"[WARNING] Model prediction error: {e}")
+            _log.warning("model_prediction_error", model_type=self.model_type, error=str(e))
             return 1  # エラー時はFLAT
+        
+        # 3. 結果の反映（推論中にバーが確定した場合はキャッシュしない）
+        with self.lock:
+            if bar_key == self._closed_bar_key:
+                self.transformer_prediction = direction
+                self.direction_probs = probs
+                self._prediction_cache_key = bar_key
+        return direction
+    
+    def _run_models(self, sequence: np.ndarray):
+        """
+        モデル推論を実行する（Orchestrator の状態は変更しない）。
+        
+        Returns:
+            Tuple[int, Optional[np.ndarray]]: (方向, 方向確率 [DOWN, FLAT, UP])
+        """
+        if self.model_type == 'transformer':
+            runner = self._transformer_runner
+        elif self.model_type == 'kan':
+            runner = self._kan_runner
+        elif self.model_type == 'ensemble':
+            probs = self._predict_ensemble_proba(sequence)
+            return (1, None) if probs is None else (int(np.argmax(probs)), probs)
+        else:
+            return 1, None  # 不明な場合はFLAT
+        
+        if runner is None:
+            return 1, None
+        probs = runner.predict_proba(sequence)[0]
+        return int(np.argmax(probs)), probs
     
     def _predict_transformer(self, sequence: np.ndarray) -> int:
         """Transformer単体の予測"""
-        if self.transformer_model is None:
+        if self._transformer_runner is None:
             return 1
-        return self.transformer_model.predict_direction(sequence)
+        return self._transformer_runner.predict_direction(sequence)
     
     def _predict_kan(self, sequence: np.ndarray) -> int:
         """KAN単体の予測"""
-        if self.kan_model is None:
+        if self._kan_runner is None:
             return 1
-        return self.kan_model.predict_direction(sequence)
+        return self._kan_runner.predict_direction(sequence)
     
     def _predict_ensemble(self, sequence: np.ndarray) -> int:
         """
         Transformer + KAN のアンサンブル予測
         
-        方法: 加重投票 (Weighted Voting)
-        - 各モデルの予測クラスに重みを掛けて合算
-        - 最も高いスコアのクラスを選択
+        方法: 確率の加重平均 (Soft Voting)
+        - 両モデルの方向確率を重み付き平均して融合
+        - 融合確率が最も高いクラスを選択
         """
+        probs = self._predict_ensemble_proba(sequence)
+        if probs is None:
+            return 1  # 両モデルとも失敗した場合はFLAT
+        return int(np.argmax(probs))
+    
+    def _predict_ensemble_proba(self, sequence: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Transformer と KAN を並行実行し、融合した方向確率 [DOWN, FLAT, UP] を返す。
+        
+        入力テンソルは1つだけ作成して両モデルで共有する。KAN は共有エグゼキューターで、
+        Transformer は呼び出し元スレッドで実行するため、レイテンシは max(T, K) になる。
+        """
+        import torch
+        
         trans_weight, kan_weight = self.ensemble_weights
+        x = torch.from_numpy(np.ascontiguousarray(sequence, dtype=np.float32))
+        
+        kan_future = None
+        if self._kan_runner is not None:
+            kan_future = _get_ensemble_executor().submit(self._kan_runner.predict_proba, x)
         
-        # 各モデルの確率分布を取得
-        scores = np.zeros(3)  # [DOWN, FLAT, UP]
+        fused = np.zeros(3)  # [DOWN, FLAT, UP]
+        total_weight = 0.0
+        trans_probs = kan_probs = None
         
-        if self.transformer_model is not None:
+        if self._transformer_runner is not None:
             try:
-                trans_dir = self.transformer_model.predict_direction(sequence)
-                scores[trans_dir] += trans_weight
+                trans_probs = self._transformer_runner.predict_proba(x)[0]
+                fused += trans_weight * trans_probs
+                total_weight += trans_weight
             except Exception as e:
-                print(f"[WARNING] Transformer ensemble error: {e}")
+                _log.warning("ensemble_model_error", model="transformer", error=str(e))
         
-        if self.kan_model is not None:
+        if kan_future is not None:
             try:
-                kan_dir = self.kan_model.predict_direction(sequence)
-                scores[kan_dir] += kan_weight
+                kan_probs = kan_future.result()[0]
+                fused += kan_weight * kan_probs
+                total_weight += kan_weight
             except Exception as e:
-                print(f"[WARNING] KAN ensemble error: {e}")
+                _log.warning("ensemble_model_error", model="kan", error=str(e))
         
-        # 最高スコアのクラスを返す
-        final_direction = int(np.argmax(scores))
-        
-        # デバッグ出力
-        dir_names = ['DOWN', 'FLAT', 'UP']
-        print(f"  [Ensemble] scores={scores}, result={dir_names[final_direction]}")
+        if total_weight <= 0:
+            return None
         
-        return final_direction
+        fused /= total_weight
+        _log.sample(
+            "ensemble_prediction",
+            result=DIRECTION_NAMES[int(np.argmax(fused))],
+            fused=np.round(fused, 4).tolist(),
+            transformer=None if trans_probs is None else np.round(trans_probs, 4).tolist(),
+            kan=None if kan_probs is None else np.round(kan_probs, 4).tolist(),
+        )
+        return fused
     
     def _determine_regime(
         self, 
@@ -490,33 +736,56 @@ class AntigravityOrchestrator:
         Returns:
         --------
         Dict: トレード判断結果
+        
+        バー履歴・特徴量・ポジションなどの状態の変更は self.lock の中で行う。
+        センチメント分析とモデル推論は状態を変更しないため、ロックの外で実行する
+        （推論中も ingest_bar はブロックされない）。
         """
         current_price = bar_data['Close']
         
-        # 1. バー履歴を更新
-        self._update_bar_history(bar_data)
-        print(f"[{self.run_mode}] Processing bar: Close={current_price:.4f}")
-        
-        # 2. センチメント分析
+        # 1. センチメント分析（ロック外）
         sentiment_score = 0.0
         if news:
             sentiment_score = self.sentiment.analyze_news(news)
-            print(f"  Sentiment: {sentiment_score:.3f}")
-
-        # 3. VPIN（毒性フロー）を更新・計算
-        self.vpin_calc.update(current_price, bar_data['Volume'])
-        vpin_val = self.vpin_calc.calculate_vpin()
-        toxicity_signal = self.vpin_calc.get_toxicity_signal(self.vpin_safety_threshold)
-        print(f"  VPIN: {vpin_val:.4f} ({toxicity_signal})")
         
-        # 4. 特徴量を計算
-        state = self._compute_features(sentiment_score)
+        with self.lock:
+            # 2. バー履歴を更新
+            self._update_bar_history(bar_data)
+            print(f"[{self.run_mode}] Processing bar: Close={current_price:.4f}")
+            if news:
+                print(f"  Sentiment: {sentiment_score:.3f}")
+            
+            # 3. VPIN（毒性フロー）を更新・計算
+            self.vpin_calc.update(current_price, bar_data['Volume'])
+            vpin_val = self.vpin_calc.calculate_vpin()
+            toxicity_signal = self.vpin_calc.get_toxicity_signal(self.vpin_safety_threshold)
+            print(f"  VPIN: {vpin_val:.4f} ({toxicity_signal})")
+            
+            # 4. 特徴量を計算
+            state = self._compute_features(sentiment_score)
         
-        # 5. Transformer予測を取得
+        # 5. Transformer予測を取得（入力の準備と結果の反映だけロックを取る）
         transformer_dir = self._get_transformer_prediction()
         dir_map = {0: 'DOWN', 1: 'FLAT', 2: 'UP'}
         print(f"  Transformer: {dir_map[transformer_dir]}")
         
+        with self.lock:
+            return self._decide(bar_data, current_price, sentiment_score, vpin_val, toxicity_signal,
+                                state, transformer_dir)
+    
+    def _decide(
+        self,
+        bar_data: Dict[str, float],
+        current_price: float,
+        sentiment_score: float,
+        vpin_val: float,
+        toxicity_signal: str,
+        state: np.ndarray,
+        transformer_dir: int,
+    ) -> Dict[str, Any]:
+        """process_bar の後半（レジーム判定〜ポジション・損益の更新）。self.lock を保持して呼ぶ"""
+        dir_map = {0: 'DOWN', 1: 'FLAT', 2: 'UP'}
+        
         # 6. 状態ベクトルにTransformer予測を追加 (正規化: -1, 0, 1)
         transformer_signal = (transformer_dir - 1)  # 0=DOWN->-1, 1=FLAT->0, 2=UP->1
         state_with_prediction = np.append(state, transformer_signal)
@@ -532,7 +801,7 @@ class AntigravityOrchestrator:
         # 9. エージェントからアクションを取得（Transformer予測を加味）
         selected_agent = self.agent_selector.get_selected_agent_name(regime, vpin_val)
         
-        # 9a. GARCHシグナルを取得（日付ベース）
+        # 9a. GARCHシグナルを取得（日付ベース。日足のない日は直近の日次シグナル）
         if 'Time' in bar_data:
             current_date = pd.to_datetime(bar_data['Time']).date()
         else:
@@ -540,16 +809,15 @@ class AntigravityOrchestrator:
         
         garch_sig = 0
         if current_date:
-            garch_sig = self.garch_feature.get_signal_for_date(current_date)
+            garch_sig = self.garch_feature.get_signal_for_date(current_date, as_of=True)
         
         # 9b. RSI/Bollinger による日中シグナル判定
         intraday_signal = 0  # 0=Neutral, 1=Overbought, -1=Oversold
         if len(self.bar_history) >= 25:
-            df = pd.DataFrame(self.bar_history)
-            tech = self.tech_indicators.calculate(df)
-            latest_rsi = tech['RSI_14'].iloc[-1]
-            latest_bb_upper = tech['BB_Upper'].iloc[-1]
-            latest_bb_lower = tech['BB_Lower'].iloc[-1]
+            tech = self.tech_indicators.compute(self.bar_history.column('Close'))
+            latest_rsi = tech['RSI_14'][-1]
+            latest_bb_upper = tech['BB_Upper'][-1]
+            latest_bb_lower = tech['BB_Lower'][-1]
             
             if not pd.isna(latest_rsi) and not pd.isna(latest_bb_upper):
                 if latest_rsi > 70 and current_price > latest_bb_upper:
@@ -622,15 +890,77 @@ class AntigravityOrchestrator:
             'transformer_direction': dir_map[transformer_dir]
         }
     
+    def get_state(self) -> Dict[str, Any]:
+        """
+        バー履歴以外の内部状態を配列/スカラーの辞書として返す（スナップショット保存用）。
+        バー履歴は self.bar_history.view() で取得する。
+        """
+        with self.lock:
+            state: Dict[str, Any] = {
+                'n_bars': len(self.bar_history),
+                'bars_appended': self._bars_appended,
+                'forming_bar': self._forming_bar,
+                'history_seeded': self._history_seeded,
+                'current_inventory': self.current_inventory,
+                'last_price': np.nan if self.last_price is None else float(self.last_price),
+                'current_volatility': self.current_volatility,
+                'cumulative_pnl': self.cumulative_pnl,
+                'transformer_prediction': self.transformer_prediction,
+            }
+            for k, v in self.vpin_calc.get_state().items():
+                state[f'vpin_{k}'] = v
+            return state
+    
+    def restore_state(self, bars: np.ndarray, state: Dict[str, Any]):
+        """
+        スナップショットからバー履歴と内部状態を復元する。
+        
+        特徴量パイプラインはバー履歴を再生して再構築する（最大 HISTORY_CAPACITY 本）。
+        
+        Parameters:
+        -----------
+        bars : np.ndarray
+            BAR_DTYPE の構造化配列（古い順）
+        state : Dict
+            get_state() の戻り値
+        """
+        with self.lock:
+            self.bar_history.clear()
+            self.feature_pipeline.reset()
+            fields = bars.dtype.names
+            for rec in bars[-self.bar_history.capacity:]:
+                bar = {name: float(rec[name]) for name in fields}
+                self.bar_history.append(bar)
+                self.feature_pipeline.update(bar)
+        
+            self._bars_appended = int(state['bars_appended'])
+            self._forming_bar = bool(state.get('forming_bar', False))
+            self._history_seeded = bool(state['history_seeded'])
+            self._prediction_cache_key = None
+            self.current_inventory = float(state['current_inventory'])
+            last_price = float(state['last_price'])
+            self.last_price = None if np.isnan(last_price) else last_price
+            self.current_volatility = float(state['current_volatility'])
+            self.cumulative_pnl = float(state['cumulative_pnl'])
+            self.transformer_prediction = int(state['transformer_prediction'])
+            self.vpin_calc.set_state({
+                k[len('vpin_'):]: v for k, v in state.items() if k.startswith('vpin_')
+            })
+    
     def reset(self):
         """
         オーケストレーターの状態をリセットする。
         """
-        self.bar_history = []
-        self.current_inventory = 0.0
-        self.last_price = None
-        self.current_volatility = 0.01
-        self.cumulative_pnl = 0.0
-        self.vpin_calc.reset()
-        print("[INFO] Orchestrator reset complete.")
+        with self.lock:
+            self.bar_history.clear()
+            self.feature_pipeline.reset()
+            self._forming_bar = False
+            self._history_seeded = False
+            self._prediction_cache_key = None
+            self.current_inventory = 0.0
+            self.last_price = None
+            self.current_volatility = 0.01
+            self.cumulative_pnl = 0.0
+            self.vpin_calc.reset()
+            print("[INFO] Orchestrator reset complete.")
 
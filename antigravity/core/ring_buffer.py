@@ -0,0 +1,147 @@
+"""
+固定長バー履歴リングバッファ
+
+OHLCV + 時刻を構造化 NumPy 配列で保持する固定容量のリングバッファ。
+内部配列を容量の2倍確保し、各バーを2箇所（i と i + capacity）に書き込む
+ミラー方式により、直近 n 本を常に連続領域として参照できる（ゼロコピー）。
+"""
+
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+# バー1本分のレコード型（Time はエポック秒、不明な場合は NaN）
+BAR_DTYPE = np.dtype([
+    ('Time', 'f8'),
+    ('Open', 'f8'),
+    ('High', 'f8'),
+    ('Low', 'f8'),
+    ('Close', 'f8'),
+    ('Volume', 'f8'),
+])
+
+BAR_FIELDS = BAR_DTYPE.names
+
+
+def to_epoch_seconds(value: Any) -> float:
+    """
+    バー時刻をエポック秒（float）に変換する。
+    数値はそのまま、文字列/datetime は pandas で解釈する。
+    """
+    if value is None:
+        return float('nan')
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    import pandas as pd
+    return float(pd.Timestamp(value).timestamp())
+
+
+class BarRingBuffer:
+    """
+    OHLCV バー履歴の固定容量リングバッファ
+
+    - append / replace_last は O(1)
+    - view() は直近 n 本を古い順に並べた構造化配列のゼロコピービューを返す
+    - column() は1列分のゼロコピービュー（ストライド付き）を返す
+
+    NOTE: ビューは内部配列を直接参照するため、次の append 以降は内容が変わり得る。
+    呼び出し元は同一バー処理内でのみビューを使用すること。
+    """
+
+    def __init__(self, capacity: int = 200):
+        """
+        Parameters:
+        -----------
+        capacity : int
+            保持する最大バー数
+        """
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self._data = np.zeros(2 * self.capacity, dtype=BAR_DTYPE)
+        self._start = 0  # 最古バーの位置（0 <= _start < capacity）
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _write(self, pos: int, bar: Dict[str, Any]):
+        """位置 pos とミラー位置の両方にバーを書き込む"""
+        record = (
+            to_epoch_seconds(bar.get('Time')),
+            float(bar.get('Open', np.nan)),
+            float(bar.get('High', np.nan)),
+            float(bar.get('Low', np.nan)),
+            float(bar.get('Close', np.nan)),
+            float(bar.get('Volume', np.nan)),
+        )
+        self._data[pos] = record
+        self._data[pos + self.capacity] = record
+
+    def append(self, bar: Dict[str, Any]):
+        """
+        バーを末尾に追加する。容量超過時は最古のバーを上書きする。
+
+        Parameters:
+        -----------
+        bar : Dict
+            'Open', 'High', 'Low', 'Close', 'Volume'（任意で 'Time'）を含む辞書
+        """
+        if self._size < self.capacity:
+            pos = (self._start + self._size) % self.capacity
+            self._size += 1
+        else:
+            pos = self._start
+            self._start = (self._start + 1) % self.capacity
+        self._write(pos, bar)
+
+    def replace_last(self, bar: Dict[str, Any]):
+        """最新バーをその場で置き換える（形成中バーの更新用）"""
+        if self._size == 0:
+            self.append(bar)
+            return
+        pos = (self._start + self._size - 1) % self.capacity
+        self._write(pos, bar)
+
+    def view(self, n: Optional[int] = None) -> np.ndarray:
+        """
+        直近 n 本（省略時は全件）を古い順に並べたゼロコピービューを返す。
+
+        Returns:
+        --------
+        np.ndarray: BAR_DTYPE の構造化配列ビュー
+        """
+        if n is None or n > self._size:
+            n = self._size
+        end = self._start + self._size
+        return self._data[end - n:end]
+
+    def column(self, name: str, n: Optional[int] = None) -> np.ndarray:
+        """直近 n 本の指定列（'Open', 'Close' など）のゼロコピービューを返す"""
+        return self.view(n)[name]
+
+    def last(self) -> Optional[np.void]:
+        """最新バーのレコードを返す（空の場合は None）"""
+        if self._size == 0:
+            return None
+        return self._data[self._start + self._size - 1]
+
+    @property
+    def last_time(self) -> Optional[float]:
+        """最新バーの時刻（エポック秒）。空または時刻不明の場合は None"""
+        rec = self.last()
+        if rec is None:
+            return None
+        t = float(rec['Time'])
+        return None if np.isnan(t) else t
+
+    def clear(self):
+        """全バーを破棄する"""
+        self._start = 0
+        self._size = 0
+
+    def to_frame(self):
+        """pandas DataFrame に変換する（コピー。バックテスト/デバッグ用）"""
+        import pandas as pd
+        return pd.DataFrame(self.view().copy())
@@ -0,0 +1,56 @@
+"""
+サンプリング付き構造化ログ
+
+推論ホットパスで毎回 print すると標準出力の書き込み（とロック）が
+レイテンシに乗るため、イベントごとに N 回に1回だけ
+"event | {json}" 形式で logging に出力する。
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict
+
+
+# 既定のサンプリング間隔（AG_LOG_SAMPLE_EVERY で上書き。1 で毎回出力）
+DEFAULT_SAMPLE_EVERY = int(os.getenv("AG_LOG_SAMPLE_EVERY", "100"))
+
+
+class SampledLogger:
+    """
+    イベント名ごとに N 回に1回だけ出力するロガー
+
+    Usage:
+        log = SampledLogger(logging.getLogger(__name__))
+        log.sample("ensemble_prediction", symbol="USDJPY", probs=[0.2, 0.3, 0.5])
+        log.warning("model_error", model="kan", error=str(e))  # 警告は常に出力
+    """
+
+    def __init__(self, logger: logging.Logger, every: int = DEFAULT_SAMPLE_EVERY):
+        self.logger = logger
+        self.every = max(1, int(every))
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _format(event: str, fields: Dict[str, Any]) -> str:
+        if not fields:
+            return event
+        return f"{event} | {json.dumps(fields, ensure_ascii=False, default=str)}"
+
+    def sample(self, event: str, level: int = logging.INFO, **fields: Any):
+        """イベントを記録する（every 回に1回だけ出力）"""
+        if not self.logger.isEnabledFor(level):
+            return
+        with self._lock:
+            n = self._counts.get(event, 0)
+            self._counts[event] = n + 1
+        if n % self.every != 0:
+            return
+        fields['sample_every'] = self.every
+        self.logger.log(level, self._format(event, fields))
+
+    def warning(self, event: str, **fields: Any):
+        """警告を記録する（サンプリングしない）"""
+        self.logger.warning(self._format(event, fields))
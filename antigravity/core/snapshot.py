@@ -0,0 +1,111 @@
+"""
+Orchestrator 状態スナップショット
+
+symbol|timeframe ごとに以下の2ファイルを保存し、再起動時に復元する。
+- {key}.bars.npy  : バー履歴（BAR_DTYPE の構造化配列。mmap_mode で読み込み可能）
+- {key}.state.npz : インベントリ/ボラティリティ/VPIN バケット等の内部状態
+
+書き込みは一時ファイル + os.replace によるアトミック置換で行い、
+書き込み途中でプロセスが落ちても壊れたスナップショットを読まないようにする。
+"""
+
+import os
+import re
+import tempfile
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from antigravity.core.ring_buffer import BAR_DTYPE
+
+
+def _atomic_write(path: str, writer) -> None:
+    """同一ディレクトリの一時ファイルに書き出してからアトミックに置換する"""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snap_", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            writer(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class SnapshotStore:
+    """
+    Orchestrator 状態のスナップショット保存先
+
+    Usage:
+        store = SnapshotStore("antigravity/data/snapshots")
+        store.save("USDJPY|M15", orchestrator)
+        store.load("USDJPY|M15", orchestrator)  # -> True (復元成功)
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _safe_key(key: str) -> str:
+        return re.sub(r"[^A-Za-z0-9_.-]", "_", key)
+
+    def paths(self, key: str) -> Tuple[str, str]:
+        """(bars_path, state_path) を返す"""
+        base = os.path.join(self.directory, self._safe_key(key))
+        return f"{base}.bars.npy", f"{base}.state.npz"
+
+    def save(self, key: str, orchestrator: Any) -> None:
+        """
+        Orchestrator の状態を保存する。
+
+        バー履歴を先に、状態を後に書き込む。状態側の n_bars と
+        バー数が一致しない組み合わせは load() で破棄される。
+        バー履歴と状態はロック内でコピーし、ファイル書き込みはロック外で行う。
+        """
+        bars_path, state_path = self.paths(key)
+        with orchestrator.lock:
+            bars = orchestrator.bar_history.view().copy()
+            state = orchestrator.get_state()
+
+        _atomic_write(bars_path, lambda f: np.save(f, bars, allow_pickle=False))
+        _atomic_write(state_path, lambda f: np.savez(f, **state))
+
+    def read(self, key: str) -> Optional[Tuple[np.ndarray, Dict[str, Any]]]:
+        """
+        スナップショットを読み込む（存在しない/不整合の場合は None）。
+
+        バー履歴はメモリマップ（読み取り専用）で返す。
+        """
+        bars_path, state_path = self.paths(key)
+        if not (os.path.exists(bars_path) and os.path.exists(state_path)):
+            return None
+
+        bars = np.load(bars_path, mmap_mode="r", allow_pickle=False)
+        if bars.dtype != BAR_DTYPE:
+            return None
+        with np.load(state_path, allow_pickle=False) as npz:
+            state = {k: npz[k] for k in npz.files}
+        if int(state.get("n_bars", -1)) != len(bars):
+            return None
+        return bars, state
+
+    def load(self, key: str, orchestrator: Any) -> bool:
+        """
+        スナップショットから Orchestrator を復元する。
+
+        Returns:
+        --------
+        bool: 復元できた場合 True
+        """
+        snapshot = self.read(key)
+        if snapshot is None:
+            return False
+        bars, state = snapshot
+        orchestrator.restore_state(bars, state)
+        return True
@@ -0,0 +1,252 @@
+"""
+Antigravity Micro-Batching
+
+同一モデルへの同時推論リクエストを短時間だけ集約し、
+1回のバッチ forward pass で処理してから各呼び出し元へ結果を返す。
+
+バー確定直後は複数銘柄/時間足のリクエストが数ミリ秒以内に集中するため、
+batch=1 の forward を N 回実行するよりも、まとめて1回実行した方が
+呼び出しオーバーヘッドが償却され、CPUキャッシュ/SIMDの利用効率も上がる。
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class _PendingRequest:
+    """バッチ待ち行列の1要素（呼び出し元スレッドごとに1つ）"""
+
+    __slots__ = ('X', 'event', 'reg', 'probs', 'error')
+
+    def __init__(self, X: np.ndarray):
+        self.X = X
+        self.event = threading.Event()
+        self.reg: Optional[np.ndarray] = None
+        self.probs: Optional[np.ndarray] = None
+        self.error: Optional[BaseException] = None
+
+
+class MicroBatcher:
+    """
+    PredictionModel の前段に置くマイクロバッチャー
+
+    最初に到着した呼び出し元が「リーダー」となり、最大 max_wait_ms だけ
+    後続リクエストを待つ（max_batch_size 行に達した時点で即実行）。
+    リーダーが集約したシーケンスを1回の predict() で推論し、結果を
+    各呼び出し元へ振り分ける。後続の呼び出し元は結果が届くまで待機する。
+
+    max_wait_ms <= 0 の場合はバッチングせず、モデルを直接呼び出す。
+    """
+
+    def __init__(self, model: Any, max_batch_size: int = 16, max_wait_ms: float = 2.0):
+        """
+        Parameters:
+        -----------
+        model : PredictionModel
+            predict(X) -> (regression [batch, 1], direction_probs [batch, 3]) を持つモデル
+        max_batch_size : int
+            1回の forward pass にまとめる最大行数
+        max_wait_ms : float
+            リーダーが後続リクエストを待つ最大時間（ミリ秒）
+        """
+        self.model = model
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = float(max_wait_ms)
+
+        self._cond = threading.Condition()
+        self._pending: List[_PendingRequest] = []
+        self._pending_rows = 0
+        self._leader_active = False
+
+        # 統計
+        self.batches_run = 0
+        self.rows_processed = 0
+        self.max_batch_seen = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_wait_ms > 0 and self.max_batch_size > 1
+
+    def predict(self, X: Any) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        予測を行う（PredictionModel.predict 互換）。
+
+        Args:
+            X: 入力シーケンス [batch, seq, features]
+
+        Returns:
+            regression_pred: [batch, 1]
+            direction_pred: [batch, 3]
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if not self.enabled:
+            return self.model.predict(X)
+
+        req = _PendingRequest(X)
+        with self._cond:
+            self._pending.append(req)
+            self._pending_rows += X.shape[0]
+            is_leader = not self._leader_active
+            if is_leader:
+                self._leader_active = True
+            elif self._pending_rows >= self.max_batch_size:
+                # バッチが埋まったのでリーダーを起こす
+                self._cond.notify_all()
+
+        if is_leader:
+            batch = self._collect_batch()
+            self._run_batch(batch)
+
+        req.event.wait()
+        if req.error is not None:
+            raise req.error
+        return req.reg, req.probs
+
+    def predict_proba(self, X: Any) -> np.ndarray:
+        """方向の確率分布 [batch, 3] を返す"""
+        _, direction_probs = self.predict(X)
+        return direction_probs
+    
+    def predict_direction(self, X: Any) -> int:
+        """
+        方向のみを予測（簡易API）。
+
+        Returns:
+            0 = DOWN, 1 = FLAT, 2 = UP
+        """
+        _, direction_probs = self.predict(X)
+        return int(np.argmax(direction_probs[0]))
+
+    def _collect_batch(self) -> List[_PendingRequest]:
+        """リーダーが締め切りまで待ってから待ち行列を取り出す"""
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        with self._cond:
+            while self._pending_rows < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = self._pending
+            self._pending = []
+            self._pending_rows = 0
+            # 次に到着したリクエストが新しいリーダーになる
+            self._leader_active = False
+        return batch
+
+    def _run_batch(self, batch: List[_PendingRequest]):
+        """入力形状ごとに結合して推論し、結果を振り分ける"""
+        groups: Dict[Tuple[int, ...], List[_PendingRequest]] = {}
+        for req in batch:
+            groups.setdefault(req.X.shape[1:], []).append(req)
+
+        for reqs in groups.values():
+            try:
+                X = reqs[0].X if len(reqs) == 1 else np.concatenate([r.X for r in reqs], axis=0)
+                reg, probs = self.model.predict(X)
+
+                offset = 0
+                for r in reqs:
+                    n = r.X.shape[0]
+                    r.reg = reg[offset:offset + n]
+                    r.probs = probs[offset:offset + n]
+                    offset += n
+
+                self.batches_run += 1
+                self.rows_processed += X.shape[0]
+                self.max_batch_seen = max(self.max_batch_seen, X.shape[0])
+            except BaseException as e:
+                for r in reqs:
+                    r.error = e
+            finally:
+                for r in reqs:
+                    r.event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """バッチング統計を返す"""
+        avg = self.rows_processed / self.batches_run if self.batches_run else 0.0
+        return {
+            'batches_run': self.batches_run,
+            'rows_processed': self.rows_processed,
+            'avg_batch_size': avg,
+            'max_batch_seen': self.max_batch_seen,
+        }
+
+
+class ModelRegistry:
+    """
+    ロード済みモデルの共有レジストリ
+
+    同じモデルファイルを参照する Orchestrator 間でモデルインスタンスを共有し、
+    モデルごとに1つの MicroBatcher を割り当てる。
+    これにより、同一モデルへの同時リクエストが1回の forward pass にまとめられる。
+    """
+
+    def __init__(self, max_batch_size: int = 16, max_wait_ms: float = 0.0):
+        """
+        Parameters:
+        -----------
+        max_batch_size : int
+            MicroBatcher の最大バッチ行数
+        max_wait_ms : float
+            MicroBatcher の最大待ち時間（0 でバッチング無効、モデル共有のみ）
+        """
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str, str, str], Tuple[Any, MicroBatcher]] = {}
+
+    def get(
+        self,
+        kind: str,
+        path: Optional[str],
+        device: str,
+        factory: Callable[[], Any],
+        precision: str = 'fp32'
+    ) -> Tuple[Any, MicroBatcher]:
+        """
+        モデルと対応する MicroBatcher を取得する（未ロードなら factory で生成）。
+
+        Parameters:
+        -----------
+        kind : str
+            'transformer' または 'kan'
+        path : str, optional
+            モデルファイルのパス。存在しない場合は共有せず毎回 factory で生成する
+        device : str
+            推論デバイス
+        factory : Callable
+            モデルを生成・ロードする関数
+        precision : str
+            推論精度（'fp32' / 'int8'）。精度が異なるモデルは共有しない
+
+        Returns:
+        --------
+        Tuple[model, MicroBatcher]
+        """
+        if not path or not os.path.exists(path):
+            # 学習済み重みがないモデルは共有しない（従来どおり個別に初期化）
+            model = factory()
+            return model, MicroBatcher(model, self.max_batch_size, self.max_wait_ms)
+
+        key = (kind, os.path.abspath(path), str(device), precision)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                model = factory()
+                entry = (model, MicroBatcher(model, self.max_batch_size, self.max_wait_ms))
+                self._entries[key] = entry
+            return entry
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """モデルごとのバッチング統計を返す"""
+        with self._lock:
+            entries = dict(self._entries)
+        return {
+            f"{kind}:{os.path.basename(path)}:{precision}": batcher.stats()
+            for (kind, path, _device, precision), (_model, batcher) in entries.items()
+        }
@@ -1,9 +1,232 @@
 import pandas as pd
 import numpy as np
-from scipy import stats
+from typing import Any, Dict, Optional
+from numpy.lib.stride_tricks import sliding_window_view
 from antigravity.core.interfaces import AlphaFactor
 
 
+# =============================================================================
+# 配列ベースのローリング演算
+# pandas の rolling(window).mean()/std() と同じく、先頭 window-1 本は NaN、
+# NaN を含むウィンドウも NaN。2次元配列は列ごと（axis=0）に計算する。
+# =============================================================================
+
+# 累積和を取り直す区間の長さ（区間ごとに中心化して桁落ち・誤差の蓄積を抑える）
+_BLOCK_ROWS = 8192
+
+# |平均| がバー間の揺らぎ（隣接差分から推定した標準偏差）のこの倍数以下なら中心化を省く。
+# 偏差平方和の桁落ちは (平均/標準偏差)^2 + 1 倍程度（ここでは 17 倍）に収まる
+_CENTER_RATIO = 4.0
+
+# 中心化の要否を判定するサンプル数（配列全体を走査しない）
+_CONDITION_SAMPLES = 4096
+
+# sliding_window_view で評価する場合のチャンクあたりの一時配列の要素数（float64 で 8MB）
+_CHUNK_ELEMENTS = 1 << 20
+
+
+def _needs_centering(rows: np.ndarray) -> np.ndarray:
+    """
+    行ごとに中心化が必要かを返す。
+
+    等間隔に抜き出した隣接ペアの差分から局所的な標準偏差を見積もり、
+    |平均| がその _CENTER_RATIO 倍を超える（価格系列のように水準が大きい）行を True とする。
+    ランダムウォークでは差分の分散はウィンドウ内分散より小さいため、判定は中心化寄りになる。
+    """
+    n = rows.shape[1]
+    if n < 2:
+        return np.ones(rows.shape[0], dtype=bool)
+    idx = np.arange(0, n - 1, max(1, (n - 1) // _CONDITION_SAMPLES))
+    a, b = rows[:, idx], rows[:, idx + 1]
+    level = np.abs(a.mean(axis=1))
+    noise = np.sqrt(0.5 * np.mean((b - a) ** 2, axis=1))
+    # NaN を含む行は判定できないので中心化する
+    return ~(level <= _CENTER_RATIO * noise)
+
+
+def _constant_windows(rows: np.ndarray, window: int) -> Optional[np.ndarray]:
+    """
+    直近 window 本がすべて同じ値の位置（pandas と同じくその値 / 偏差平方和 0 を返す）。
+    該当がなければ None。
+
+    同値の隣接ペアの位置だけから window-1 個連続する区間を探す（全長の累積和は取らない）。
+    """
+    if window <= 1:
+        return ~np.isnan(rows)
+    run = window - 1
+    const = None
+    for r in range(rows.shape[0]):
+        row = rows[r]
+        same = np.flatnonzero(row[1:] == row[:-1])
+        if same.shape[0] < run:
+            continue
+        # same[j - run + 1 .. j] が連番 → 位置 same[j] + 1 で終わるウィンドウは定数
+        ends = same[run - 1:][(same[run - 1:] - same[:same.shape[0] - run + 1]) == run - 1] + 1
+        if ends.shape[0]:
+            if const is None:
+                const = np.zeros(rows.shape, dtype=bool)
+            const[r, ends] = True
+    return const
+
+
+def _rolling_moments_rows(rows: np.ndarray, window: int, second: bool):
+    """
+    _rolling_moments の本体。rows は (系列数, 長さ) の連続配列で、最後の軸に沿って計算する。
+
+    区間（_BLOCK_ROWS 行）ごとに累積和の差分を取る。偏差平方和を求める場合は、
+    水準の大きい行だけ区間平均で中心化する。
+    """
+    k, n = rows.shape
+    mean = np.full((k, n), np.nan)
+    m2 = np.full((k, n), np.nan) if second else None
+    if window < 1 or n < window:
+        return mean, m2
+    nan = np.isnan(rows)
+    any_nan = bool(nan.any())
+    # 偏差平方和の桁落ちが問題にならない行は中心化を省く。平均だけなら常に中心化する
+    # （累積和の大きさが小さいほどウィンドウ和の絶対誤差が小さく、VWAP / Close - 1 のような差に効く）
+    center_rows = _needs_centering(rows) if second and not any_nan else np.ones(k, dtype=bool)
+    centering = bool(center_rows.any())
+    # 先頭に 0 を置いた累積和のバッファ（区間ごとに使い回す）
+    csum = np.zeros((k, min(n, _BLOCK_ROWS + window - 1) + 1))
+    for start in range(window - 1, n, _BLOCK_ROWS):
+        end = min(n, start + _BLOCK_ROWS)
+        lo = start - window + 1
+        seg = rows[:, lo:end]
+        c = csum[:, :end - lo + 1]
+        if any_nan:
+            seg_nan = nan[:, lo:end]
+            d = np.where(seg_nan, 0.0, seg)
+            count = (end - lo) - np.count_nonzero(seg_nan, axis=1)
+            center = d.sum(axis=1) / np.maximum(count, 1)
+            d -= center[:, None]
+            d[seg_nan] = 0.0
+        elif centering:
+            center = seg.mean(axis=1)
+            if second:
+                center[~center_rows] = 0.0
+            d = seg - center[:, None]
+        else:
+            center = None
+            d = seg
+        np.cumsum(d, axis=1, out=c[:, 1:])
+        s1 = c[:, window:] - c[:, :-window]
+        out = mean[:, start:end]
+        np.divide(s1, window, out=out)
+        if center is not None:
+            out += center[:, None]
+        if second:
+            np.cumsum(np.multiply(d, d, out=d) if d is not seg else d * d, axis=1, out=c[:, 1:])
+            s2 = c[:, window:] - c[:, :-window]
+            s1 *= s1
+            s1 /= window
+            s2 -= s1
+            np.maximum(s2, 0.0, out=m2[:, start:end])
+        if any_nan:
+            np.cumsum(seg_nan, axis=1, out=c[:, 1:])
+            has_nan = (c[:, window:] - c[:, :-window]) > 0
+            out[has_nan] = np.nan
+            if second:
+                m2[:, start:end][has_nan] = np.nan
+
+    const = _constant_windows(rows, window)
+    if const is not None:
+        mean[const] = rows[const]
+        if second:
+            m2[const] = 0.0
+    return mean, m2
+
+
+def _rolling_moments(x: np.ndarray, window: int, second: bool = True):
+    """
+    ウィンドウごとの (平均, 偏差平方和) を O(n) で返す（second=False なら偏差平方和は None）。
+    2次元配列は列ごとに計算する。
+
+    区間（_BLOCK_ROWS 行）ごとに区間平均で中心化してから累積和の差分を取る。偏差平方和も
+    求める場合、出来高・リターンのように |平均| がバー間の揺らぎと同程度の列は中心化を省く。
+    直近 window 本がすべて同じ値のウィンドウは、pandas と同じく丸め誤差なしで
+    その値 / 偏差平方和 0 を返す。
+    """
+    x = np.asarray(x, dtype=float)
+    if x.ndim == 1:
+        mean, m2 = _rolling_moments_rows(x[None, :], window, second)
+        return mean[0], (m2[0] if second else None)
+    # 列を行に並べ替えて全列をまとめて計算する（axis=0 の累積和はストライドアクセスで遅い）
+    rows = np.ascontiguousarray(x.reshape(x.shape[0], -1).T)
+    mean, m2 = _rolling_moments_rows(rows, window, second)
+    return mean.T.reshape(x.shape), (m2.T.reshape(x.shape) if second else None)
+
+
+def _rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    return _rolling_moments(x, window, second=False)[0]
+
+
+def _rolling_sum(x: np.ndarray, window: int) -> np.ndarray:
+    return _rolling_moments(x, window, second=False)[0] * window
+
+
+def _rolling_mean_std(x: np.ndarray, window: int, ddof: int = 1):
+    """(rolling mean, rolling std) を1パスで返す"""
+    mean, m2 = _rolling_moments(x, window)
+    if window <= ddof:
+        return mean, np.full(mean.shape, np.nan)
+    return mean, np.sqrt(m2 / (window - ddof))
+
+
+def _rolling_std(x: np.ndarray, window: int, ddof: int = 1) -> np.ndarray:
+    return _rolling_mean_std(x, window, ddof)[1]
+
+
+def _rolling_mad(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    平均絶対偏差 mean(|x - mean(x)|)
+
+    ウィンドウ平均は _rolling_mean の値を使い、偏差は sliding_window_view 上で
+    チャンクごとに計算する（一時配列を _CHUNK_ELEMENTS 程度に抑える）。
+    """
+    x = np.asarray(x, dtype=float)
+    out = np.full(x.shape, np.nan)
+    if window < 1 or x.shape[0] < window:
+        return out
+    centers = _rolling_mean(x, window)[window - 1:]
+    windows = sliding_window_view(x, window, axis=0)
+    step = max(1, _CHUNK_ELEMENTS // (window * max(1, x[0].size)))
+    for s in range(0, windows.shape[0], step):
+        deviation = windows[s:s + step] - centers[s:s + step, ..., None]
+        out[window - 1 + s:window - 1 + s + step] = np.abs(deviation).mean(axis=-1)
+    return out
+
+
+def _shift1(x: np.ndarray) -> np.ndarray:
+    """pandas の shift(1) 相当（先頭は NaN）"""
+    out = np.empty(x.shape)
+    out[:1] = np.nan
+    out[1:] = x[:-1]
+    return out
+
+
+def _ewm(x: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    pandas の ewm(alpha=alpha, adjust=False).mean() 相当
+    y[0] = x[0], y[t] = (1 - alpha) * y[t-1] + alpha * x[t]
+
+    1次 IIR フィルタとして scipy.signal.lfilter で計算する。
+    NaN を含む場合（pandas は NaN をまたいで重みを調整する）や scipy がない場合は pandas で計算する。
+    """
+    x = np.asarray(x, dtype=float)
+    if x.shape[0] == 0:
+        return x.copy()
+    if not np.isnan(x).any():
+        try:
+            from scipy.signal import lfilter
+        except ImportError:
+            lfilter = None
+        if lfilter is not None:
+            y, _ = lfilter([alpha], [1.0, alpha - 1.0], x, zi=[(1.0 - alpha) * x[0]])
+            return y
+    return pd.Series(x).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+
 class TechnicalIndicators(AlphaFactor):
     """基本的なテクニカル指標を計算するクラス"""
     
@@ -11,26 +234,39 @@ class TechnicalIndicators(AlphaFactor):
         """
         Calculates basic technical indicators.
         Expects data to have columns: 'Close', 'High', 'Low'
-        """
-        df = data.copy()
-        
-        # SMA
-        df['SMA_20'] = df['Close'].rolling(window=20).mean()
         
-        # RSI
-        delta = df['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['RSI_14'] = 100 - (100 / (1 + rs))
-        
-        # Bollinger Bands
-        df['BB_Mid'] = df['Close'].rolling(window=20).mean()
-        df['BB_Std'] = df['Close'].rolling(window=20).std()
-        df['BB_Upper'] = df['BB_Mid'] + (df['BB_Std'] * 2)
-        df['BB_Lower'] = df['BB_Mid'] - (df['BB_Std'] * 2)
-        
-        return df[['SMA_20', 'RSI_14', 'BB_Upper', 'BB_Lower']]
+        - SMA_20: 終値の20本単純移動平均
+        - RSI_14: 14本の平均上昇幅 / 平均下落幅による RSI
+        - BB_Upper / BB_Lower: SMA_20 ± 2 × 20本標準偏差
+        """
+        # 入力 DataFrame はコピーせず、終値配列から計算する
+        return pd.DataFrame(self.compute(data['Close'].to_numpy(dtype=float)), index=data.index)
+    
+    def compute(self, close: np.ndarray) -> dict:
+        """
+        calculate() の配列版。終値配列から各指標の配列を返す。
+        Returns: {'SMA_20', 'RSI_14', 'BB_Upper', 'BB_Lower'} -> np.ndarray
+        """
+        close = np.asarray(close, dtype=float)
+        
+        sma, bb_std = _rolling_mean_std(close, 20)
+        
+        # RSI（先頭の差分は NaN だが pandas の where と同様に 0 扱い）
+        delta = np.empty_like(close)
+        delta[:1] = np.nan
+        delta[1:] = np.diff(close)
+        gain = _rolling_mean(np.where(delta > 0, delta, 0.0), 14)
+        loss = _rolling_mean(np.where(delta < 0, -delta, 0.0), 14)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = gain / loss
+            rsi = 100 - (100 / (1 + rs))
+        
+        return {
+            'SMA_20': sma,
+            'RSI_14': rsi,
+            'BB_Upper': sma + bb_std * 2,
+            'BB_Lower': sma - bb_std * 2,
+        }
 
 
 class LogReturn(AlphaFactor):
@@ -38,6 +274,14 @@ class LogReturn(AlphaFactor):
     
     def calculate(self, data: pd.DataFrame) -> pd.Series:
         return np.log(data['Close'] / data['Close'].shift(1))
+    
+    def compute(self, close: np.ndarray) -> np.ndarray:
+        """calculate() の配列版（先頭は NaN）"""
+        close = np.asarray(close, dtype=float)
+        out = np.full(close.shape[0], np.nan)
+        if close.shape[0] > 1:
+            out[1:] = np.log(close[1:] / close[:-1])
+        return out
 
 
 class GarmanKlassVolatility(AlphaFactor):
@@ -57,18 +301,34 @@ class GarmanKlassVolatility(AlphaFactor):
         Expects data to have columns: 'Open', 'High', 'Low', 'Close'
         Returns: pd.Series of Garman-Klass volatility
         """
-        log_hl = np.log(data['High'] / data['Low'])
-        log_co = np.log(data['Close'] / data['Open'])
-        
+        gk_volatility = self.compute(
+            data['Open'].to_numpy(dtype=float),
+            data['High'].to_numpy(dtype=float),
+            data['Low'].to_numpy(dtype=float),
+            data['Close'].to_numpy(dtype=float),
+        )
+        return pd.Series(gk_volatility, index=data.index)
+    
+    def compute(
+        self,
+        open_: np.ndarray,
+        high: np.ndarray,
+        low: np.ndarray,
+        close: np.ndarray
+    ) -> np.ndarray:
+        """
+        calculate() の配列版。
+        単期の分散推定をローリングウィンドウで平均し、その平方根を返す。
+        ウィンドウ不足（NaN）や非正の分散は 0 を返す。
+        """
         # Garman-Klass単期の分散推定
+        log_hl = np.log(np.asarray(high, dtype=float) / np.asarray(low, dtype=float))
+        log_co = np.log(np.asarray(close, dtype=float) / np.asarray(open_, dtype=float))
         gk_var = 0.5 * (log_hl ** 2) - (2 * np.log(2) - 1) * (log_co ** 2)
         
-        # ローリングウィンドウで平均して平滑化
-        gk_volatility = gk_var.rolling(window=self.window).mean().apply(
-            lambda x: np.sqrt(x) if x > 0 else 0
-        )
-        
-        return gk_volatility
+        mean_var = _rolling_mean(gk_var, self.window)
+        positive = mean_var > 0  # NaN は False
+        return np.sqrt(np.where(positive, mean_var, 0.0))
 
 
 class VWAPGap(AlphaFactor):
@@ -87,19 +347,36 @@ class VWAPGap(AlphaFactor):
         Expects data to have columns: 'Close', 'Volume', 'High', 'Low'
         Returns: pd.Series of VWAP Gap
         """
+        vwap_gap = self.compute(
+            data['High'].to_numpy(dtype=float),
+            data['Low'].to_numpy(dtype=float),
+            data['Close'].to_numpy(dtype=float),
+            data['Volume'].to_numpy(dtype=float),
+        )
+        return pd.Series(vwap_gap, index=data.index)
+    
+    def compute(
+        self,
+        high: np.ndarray,
+        low: np.ndarray,
+        close: np.ndarray,
+        volume: np.ndarray
+    ) -> np.ndarray:
+        """calculate() の配列版"""
+        close = np.asarray(close, dtype=float)
+        volume = np.asarray(volume, dtype=float)
+        
         # Typical Price = (High + Low + Close) / 3
-        typical_price = (data['High'] + data['Low'] + data['Close']) / 3
+        typical_price = (np.asarray(high, dtype=float) + np.asarray(low, dtype=float) + close) / 3
         
         # VWAP = Σ(TP * Volume) / Σ(Volume)
-        cumulative_tp_vol = (typical_price * data['Volume']).rolling(window=self.window).sum()
-        cumulative_vol = data['Volume'].rolling(window=self.window).sum()
-        
-        vwap = cumulative_tp_vol / cumulative_vol
-        
-        # VWAP Gap = (VWAP / Previous Close) - 1
-        vwap_gap = (vwap / data['Close'].shift(1)) - 1
-        
-        return vwap_gap
+        # 2系列をまとめて1回のローリング計算にする（ウィンドウ平均の比 = 和の比）
+        sums, _ = _rolling_moments_rows(np.stack([typical_price * volume, volume]), self.window, second=False)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vwap = sums[0] / sums[1]
+            
+            # VWAP Gap = (VWAP / Previous Close) - 1
+            return (vwap / _shift1(close)) - 1
 
 
 class FormulaicAlpha(AlphaFactor):
@@ -134,6 +411,17 @@ class FormulaicAlpha(AlphaFactor):
             alpha = price_deviation
         
         return alpha
+    
+    def compute(self, close: np.ndarray, sentiment: np.ndarray = None) -> np.ndarray:
+        """calculate() の配列版"""
+        close = np.asarray(close, dtype=float)
+        sma = _rolling_mean(close, self.sma_window)
+        price_deviation = (close - sma) / sma
+        
+        if sentiment is not None:
+            sentiment = np.asarray(sentiment, dtype=float)
+            return price_deviation * (np.sign(sentiment) * np.log1p(np.abs(sentiment)))
+        return price_deviation
 
 
 class WindowNormalizer:
@@ -151,20 +439,234 @@ class WindowNormalizer:
         """
         Apply rolling Z-score normalization.
         """
-        rolling_mean = series.rolling(window=self.window).mean()
-        rolling_std = series.rolling(window=self.window).std()
-        
-        # ゼロ除算を回避
-        z_score = (series - rolling_mean) / rolling_std.replace(0, 1)
-        
-        return z_score
+        return pd.Series(
+            self.normalize_array(series.to_numpy(dtype=float)), index=series.index, name=series.name
+        )
     
     def normalize_df(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Apply rolling Z-score normalization to all columns of a DataFrame.
         """
-        normalized = df.apply(self.normalize)
-        return normalized
+        return pd.DataFrame(
+            self.normalize_array(df.to_numpy(dtype=float)), index=df.index, columns=df.columns
+        )
+    
+    def normalize_array(self, values: np.ndarray) -> np.ndarray:
+        """
+        normalize() の配列版。2次元配列は列ごとに正規化する。
+        """
+        values = np.asarray(values, dtype=float)
+        if self.window <= 1:
+            # 不偏標準偏差が定義できない（pandas の rolling().std() も NaN）
+            return np.full(values.shape, np.nan)
+        rolling_mean, m2 = _rolling_moments(values, self.window)
+        
+        # 偏差平方和から標準偏差を求め、同じ配列の上で正規化する（一時配列を作らない）
+        rolling_std = m2
+        rolling_std /= self.window - 1
+        np.sqrt(rolling_std, out=rolling_std)
+        rolling_std[rolling_std == 0] = 1.0  # ゼロ除算を回避
+        out = np.subtract(values, rolling_mean, out=rolling_mean)
+        out /= rolling_std
+        return out
+
+
+# =============================================================================
+# インクリメンタル（ストリーミング）版
+# 新しいバーごとに O(1) で最新値を更新する。各 update() は対応する
+# バッチ版（calculate / normalize）の最終要素と同じ値を返す。
+# replace=True は最新バー（形成中バー）の値を置き換える。
+# =============================================================================
+
+class RollingWindowStats:
+    """
+    固定長ウィンドウのローリング和・二乗和（O(1) 更新）
+
+    - 桁落ちを抑えるため、基準値 shift からの偏差で和を保持する
+    - 浮動小数点誤差の蓄積を防ぐため、resync_interval 回ごとに厳密に再計算する
+    - NaN を含むウィンドウでは pandas の rolling と同じく mean/std は NaN
+    """
+
+    def __init__(self, window: int, resync_interval: int = 1000):
+        if window <= 0:
+            raise ValueError("window must be positive")
+        self.window = int(window)
+        self.resync_interval = int(resync_interval)
+        self._values = np.zeros(self.window)
+        self.reset()
+
+    def reset(self):
+        self._values.fill(0.0)
+        self._pos = 0  # 次に書き込む位置
+        self._count = 0
+        self._nan_count = 0
+        self._shift = 0.0
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._updates = 0
+
+    @property
+    def full(self) -> bool:
+        return self._count >= self.window
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def _add(self, x: float, sign: float):
+        if np.isnan(x):
+            self._nan_count += int(sign)
+            return
+        d = x - self._shift
+        self._sum += sign * d
+        self._sumsq += sign * d * d
+
+    def push(self, x: float):
+        """新しい値を追加する（ウィンドウが満杯なら最古の値を除外）"""
+        x = float(x)
+        if self._count == 0 and not np.isnan(x):
+            self._shift = x
+        if self._count >= self.window:
+            self._add(self._values[self._pos], -1.0)
+        else:
+            self._count += 1
+        self._values[self._pos] = x
+        self._add(x, 1.0)
+        self._pos = (self._pos + 1) % self.window
+        self._tick()
+
+    def replace_last(self, x: float):
+        """最新の値を置き換える"""
+        if self._count == 0:
+            self.push(x)
+            return
+        last = (self._pos - 1) % self.window
+        self._add(self._values[last], -1.0)
+        self._values[last] = float(x)
+        self._add(float(x), 1.0)
+        self._tick()
+
+    def _tick(self):
+        self._updates += 1
+        if self._updates >= self.resync_interval:
+            self._resync()
+
+    def _resync(self):
+        """保持している値から和を厳密に再計算する"""
+        self._updates = 0
+        vals = self._values if self.full else self._values[:self._count]
+        valid = vals[~np.isnan(vals)]
+        self._nan_count = int(vals.shape[0] - valid.shape[0])
+        self._shift = float(valid.mean()) if valid.shape[0] else 0.0
+        d = valid - self._shift
+        self._sum = float(d.sum())
+        self._sumsq = float((d * d).sum())
+
+    def mean(self) -> float:
+        """ウィンドウ平均（ウィンドウ不足または NaN を含む場合は NaN）"""
+        if not self.full or self._nan_count:
+            return np.nan
+        return self._shift + self._sum / self.window
+
+    def std(self, ddof: int = 1) -> float:
+        """ウィンドウ標準偏差（ウィンドウ不足または NaN を含む場合は NaN）"""
+        n = self.window
+        if not self.full or self._nan_count or n <= ddof:
+            return np.nan
+        var = (self._sumsq - self._sum * self._sum / n) / (n - ddof)
+        return float(np.sqrt(var)) if var > 0 else 0.0
+
+
+class IncrementalLogReturn:
+    """LogReturn のインクリメンタル版"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._prev_close: Optional[float] = None
+        self._last_close: Optional[float] = None
+
+    def update(self, close: float, replace: bool = False) -> float:
+        """最新バーの対数変化率を返す（最初のバーは NaN）"""
+        if not replace or self._last_close is None:
+            self._prev_close = self._last_close
+        self._last_close = float(close)
+        if self._prev_close is None:
+            return np.nan
+        return float(np.log(self._last_close / self._prev_close))
+
+
+class IncrementalGarmanKlass:
+    """GarmanKlassVolatility のインクリメンタル版（ウィンドウ不足/非正は 0）"""
+
+    def __init__(self, window: int = 20):
+        self.window = window
+        self._stats = RollingWindowStats(window)
+
+    def reset(self):
+        self._stats.reset()
+
+    def update(self, open_: float, high: float, low: float, close: float, replace: bool = False) -> float:
+        log_hl = np.log(high / low)
+        log_co = np.log(close / open_)
+        gk_var = 0.5 * (log_hl ** 2) - (2 * np.log(2) - 1) * (log_co ** 2)
+        if replace:
+            self._stats.replace_last(gk_var)
+        else:
+            self._stats.push(gk_var)
+        mean_var = self._stats.mean()
+        return float(np.sqrt(mean_var)) if mean_var > 0 else 0.0
+
+
+class IncrementalFormulaicAlpha:
+    """FormulaicAlpha のインクリメンタル版"""
+
+    def __init__(self, sma_window: int = 20):
+        self.sma_window = sma_window
+        self._stats = RollingWindowStats(sma_window)
+
+    def reset(self):
+        self._stats.reset()
+
+    def update(self, close: float, sentiment: Optional[float] = None, replace: bool = False) -> float:
+        close = float(close)
+        if replace:
+            self._stats.replace_last(close)
+        else:
+            self._stats.push(close)
+        sma = self._stats.mean()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            price_deviation = (close - sma) / sma
+        if sentiment is not None:
+            return float(price_deviation * (np.sign(sentiment) * np.log1p(np.abs(sentiment))))
+        return float(price_deviation)
+
+
+class IncrementalWindowNormalizer:
+    """WindowNormalizer のインクリメンタル版（ローリングZスコア）"""
+
+    def __init__(self, window: int = 60):
+        self.window = window
+        self._stats = RollingWindowStats(window)
+
+    def reset(self):
+        self._stats.reset()
+
+    @property
+    def stats(self) -> RollingWindowStats:
+        return self._stats
+
+    def update(self, value: float, replace: bool = False) -> float:
+        """最新値のZスコアを返す（ウィンドウ不足時は NaN）"""
+        if replace:
+            self._stats.replace_last(value)
+        else:
+            self._stats.push(value)
+        std = self._stats.std(ddof=1)
+        if std == 0:
+            std = 1.0  # ゼロ除算を回避（normalize() と同じ）
+        return float((value - self._stats.mean()) / std)
 
 
 class MACD(AlphaFactor):
@@ -189,26 +691,33 @@ class MACD(AlphaFactor):
         Expects data to have column: 'Close'
         Returns: DataFrame with MACD, Signal, Histogram
         """
-        close = data['Close']
+        return pd.DataFrame(self.compute(data['Close'].to_numpy(dtype=float)), index=data.index)
+    
+    def compute(self, close: np.ndarray) -> dict:
+        """
+        calculate() の配列版。
+        Returns: {'MACD', 'MACD_Signal', 'MACD_Hist'} -> np.ndarray
+        """
+        close = np.asarray(close, dtype=float)
         
-        # EMA計算
-        ema_fast = close.ewm(span=self.fast, adjust=False).mean()
-        ema_slow = close.ewm(span=self.slow, adjust=False).mean()
+        # EMA計算（span -> alpha = 2 / (span + 1)）
+        ema_fast = _ewm(close, 2.0 / (self.fast + 1))
+        ema_slow = _ewm(close, 2.0 / (self.slow + 1))
         
         # MACD Line
         macd_line = ema_fast - ema_slow
         
         # Signal Line
-        signal_line = macd_line.ewm(span=self.signal, adjust=False).mean()
+        signal_line = _ewm(macd_line, 2.0 / (self.signal + 1))
         
         # Histogram
         histogram = macd_line - signal_line
         
-        return pd.DataFrame({
+        return {
             'MACD': macd_line,
             'MACD_Signal': signal_line,
             'MACD_Hist': histogram
-        })
+        }
 
 
 class CCI(AlphaFactor):
@@ -231,21 +740,27 @@ class CCI(AlphaFactor):
         Expects data to have columns: 'High', 'Low', 'Close'
         Returns: pd.Series of CCI values
         """
+        cci = self.compute(
+            data['High'].to_numpy(dtype=float),
+            data['Low'].to_numpy(dtype=float),
+            data['Close'].to_numpy(dtype=float),
+        )
+        return pd.Series(cci, index=data.index)
+    
+    def compute(self, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+        """calculate() の配列版"""
         # Typical Price
-        tp = (data['High'] + data['Low'] + data['Close']) / 3
+        tp = (np.asarray(high, dtype=float) + np.asarray(low, dtype=float) + np.asarray(close, dtype=float)) / 3
         
         # SMA of Typical Price
-        sma_tp = tp.rolling(window=self.period).mean()
+        sma_tp = _rolling_mean(tp, self.period)
         
-        # Mean Absolute Deviation
-        mad = tp.rolling(window=self.period).apply(
-            lambda x: np.abs(x - x.mean()).mean(), raw=True
-        )
+        # Mean Absolute Deviation（ウィンドウごとの Python 呼び出しなし）
+        mad = _rolling_mad(tp, self.period)
         
         # CCI計算 (0.015は定数)
-        cci = (tp - sma_tp) / (0.015 * mad)
-        
-        return cci
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (tp - sma_tp) / (0.015 * mad)
 
 
 class ADX(AlphaFactor):
@@ -272,42 +787,50 @@ class ADX(AlphaFactor):
         Expects data to have columns: 'High', 'Low', 'Close'
         Returns: DataFrame with ADX, +DI, -DI
         """
-        high = data['High']
-        low = data['Low']
-        close = data['Close']
+        result = self.compute(
+            data['High'].to_numpy(dtype=float),
+            data['Low'].to_numpy(dtype=float),
+            data['Close'].to_numpy(dtype=float),
+        )
+        return pd.DataFrame(result, index=data.index)
+    
+    def compute(self, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> dict:
+        """
+        calculate() の配列版。
+        Returns: {'ADX', 'Plus_DI', 'Minus_DI'} -> np.ndarray
+        """
+        high = np.asarray(high, dtype=float)
+        low = np.asarray(low, dtype=float)
+        prev_close = _shift1(np.asarray(close, dtype=float))
         
-        # True Range
-        tr1 = high - low
-        tr2 = abs(high - close.shift(1))
-        tr3 = abs(low - close.shift(1))
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+        # True Range（先頭バーは前日終値がないため High - Low）
+        tr = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
         
         # +DM, -DM
-        up_move = high - high.shift(1)
-        down_move = low.shift(1) - low
-        
-        plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0)
-        minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0)
+        up_move = high - _shift1(high)
+        down_move = _shift1(low) - low
         
-        plus_dm = pd.Series(plus_dm, index=data.index)
-        minus_dm = pd.Series(minus_dm, index=data.index)
+        plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+        minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
         
         # Smoothed values (Wilder's smoothing)
-        atr = tr.ewm(alpha=1/self.period, adjust=False).mean()
-        plus_di = 100 * plus_dm.ewm(alpha=1/self.period, adjust=False).mean() / atr
-        minus_di = 100 * minus_dm.ewm(alpha=1/self.period, adjust=False).mean() / atr
-        
-        # DX
-        dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di + 1e-10)
+        alpha = 1 / self.period
+        with np.errstate(divide='ignore', invalid='ignore'):
+            atr = _ewm(tr, alpha)
+            plus_di = 100 * _ewm(plus_dm, alpha) / atr
+            minus_di = 100 * _ewm(minus_dm, alpha) / atr
+            
+            # DX
+            dx = 100 * np.abs(plus_di - minus_di) / (plus_di + minus_di + 1e-10)
         
         # ADX (smoothed DX)
-        adx = dx.ewm(alpha=1/self.period, adjust=False).mean()
+        adx = _ewm(dx, alpha)
         
-        return pd.DataFrame({
+        return {
             'ADX': adx,
             'Plus_DI': plus_di,
             'Minus_DI': minus_di
-        })
+        }
 
 
 class GARCHVolatilityFeature(AlphaFactor):
@@ -323,20 +846,43 @@ class GARCHVolatilityFeature(AlphaFactor):
     - 0: Neutral
     """
     
-    def __init__(self, rolling_window: int = 180, sigma_threshold: float = 1.5):
+    def __init__(
+        self,
+        rolling_window: int = 180,
+        sigma_threshold: float = 1.5,
+        cache_dir: Optional[str] = None,
+        max_workers: int = 1,
+        engine: str = 'refit',
+        refit_every: int = 20,
+    ):
         """
         Args:
             rolling_window: GARCHモデルを適用するローリングウィンドウ日数
             sigma_threshold: シグナル判定の標準偏差閾値
+            cache_dir: 日次プレミアムのディスクキャッシュ先（None で無効。プロセス内共有は常に有効）
+            max_workers: 初回構築時に GARCH fit を並列実行するプロセス数
+            engine: 推定エンジン ('refit', 'warm', 'recursive')
+            refit_every: recursive エンジンでパラメータを再推定する間隔（日）
         """
         self.rolling_window = rolling_window
         self.sigma_threshold = sigma_threshold
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.engine = engine
+        self.refit_every = refit_every
         self._daily_signals = None  # キャッシュ用
+        # 日付索引（fit_daily で構築）: 完全一致は dict、as-of は日付序数の二分探索
+        self._signal_by_date: Dict[Any, int] = {}
+        self._signal_days = np.zeros(0, dtype=np.int64)
+        self._signal_values = np.zeros(0, dtype=int)
         
     def fit_daily(self, daily_data: pd.DataFrame) -> pd.DataFrame:
         """
         日足データからGARCHシグナルを計算し、日付-シグナルのDataFrameを返す。
         
+        GARCH fit の結果（日付ごとのプレミアム）はキャッシュされ、
+        前回から追記された日だけを新たに fit する（antigravity.forecasting.garch）。
+        
         Args:
             daily_data: 日足データ (OHLC)。Timestampインデックス必須。
         
@@ -344,80 +890,62 @@ class GARCHVolatilityFeature(AlphaFactor):
             DataFrame with columns: ['Date', 'GARCH_Signal', 'Prediction_Premium']
         """
         try:
-            from arch import arch_model
+            import arch  # noqa: F401
         except ImportError:
             print("[WARNING] arch library not installed. Using fallback volatility.")
             return self._fallback_signal(daily_data)
+        from antigravity.forecasting.garch import GarchPremiumCache
         
         # 対数リターンを計算
         returns = np.log(daily_data['Close'] / daily_data['Close'].shift(1)).dropna() * 100
         
-        signals = []
-        premiums = []
-        dates = []
-        
-        # ローリングウィンドウでGARCHを適用
-        for i in range(self.rolling_window, len(returns)):
-            window_returns = returns.iloc[i - self.rolling_window:i]
-            
-            try:
-                # GARCH(1,3)モデルを適合
-                model = arch_model(window_returns, vol='Garch', p=1, q=3, rescale=False)
-                result = model.fit(disp='off', show_warning=False)
-                
-                # 1日先の分散を予測
-                forecast = result.forecast(horizon=1)
-                predicted_var = forecast.variance.iloc[-1, 0]
-                
-                # 実現分散（次の日の実際のリターン^2）
-                if i < len(returns):
-                    realized_var = returns.iloc[i] ** 2
-                else:
-                    realized_var = predicted_var  # フォールバック
-                
-                # 予測プレミアム
-                if realized_var > 0:
-                    premium = (predicted_var - realized_var) / realized_var
-                else:
-                    premium = 0.0
-                    
-            except Exception as e:
-                # モデルが収束しない場合など
-                premium = 0.0
-            
-            premiums.append(premium)
-            dates.append(returns.index[i])
-        
-        # プレミアムのローリング標準偏差
-        premium_series = pd.Series(premiums)
-        rolling_std = premium_series.rolling(window=126).std()  # 約6ヶ月
-        
-        # シグナル生成
-        for i, premium in enumerate(premiums):
-            if i < 126:  # 標準偏差計算に必要な最低期間
-                signal = 0
-            else:
-                std = rolling_std.iloc[i]
-                if std > 0:
-                    if premium > self.sigma_threshold * std:
-                        signal = 1  # High Vol Premium -> Short signal
-                    elif premium < -self.sigma_threshold * std:
-                        signal = -1  # Low Vol Premium -> Long signal
-                    else:
-                        signal = 0
-                else:
-                    signal = 0
-            signals.append(signal)
+        # ローリングウィンドウでGARCHを適用（キャッシュにない日のみ fit）
+        cache = GarchPremiumCache(
+            self.cache_dir,
+            max_workers=self.max_workers,
+            engine=self.engine,
+            refit_every=self.refit_every,
+        )
+        dates, premiums = cache.premiums(returns, self.rolling_window, params='garch(1,3)')
         
         result_df = pd.DataFrame({
-            'Date': dates,
-            'GARCH_Signal': signals,
+            'Date': pd.to_datetime(dates).date,
+            'GARCH_Signal': self._signals_from_premiums(premiums),
             'Prediction_Premium': premiums
         })
-        result_df['Date'] = pd.to_datetime(result_df['Date']).dt.date
         
         self._daily_signals = result_df
+        self._index_signals(result_df)
         return result_df
+
+    def _index_signals(self, signals_df: pd.DataFrame):
+        """日付 → シグナルの索引を構築する（get_signal_for_date 用）"""
+        days = pd.to_datetime(signals_df['Date']).values.astype('datetime64[D]').view(np.int64)
+        values = signals_df['GARCH_Signal'].to_numpy(dtype=int)
+        order = np.argsort(days, kind='stable')
+        self._signal_days = days[order]
+        self._signal_values = values[order]
+        # 同じ日付が複数ある場合は従来どおり先頭の行を採用する
+        self._signal_by_date = {}
+        for d, v in zip(signals_df['Date'], values.tolist()):
+            self._signal_by_date.setdefault(d, v)
+    
+    def _signals_from_premiums(self, premiums: np.ndarray) -> np.ndarray:
+        """
+        プレミアムをローリング標準偏差（126日 ≒ 6ヶ月）と比較してシグナル化する。
+        
+        - プレミアム > +σ閾値: +1 (High Vol Premium -> Short signal)
+        - プレミアム < -σ閾値: -1 (Low Vol Premium -> Long signal)
+        - 標準偏差計算に必要な最低期間（126日）未満は 0
+        """
+        rolling_std = pd.Series(premiums, dtype=float).rolling(window=126).std().to_numpy()
+        valid = rolling_std > 0
+        valid[:126] = False
+        threshold = self.sigma_threshold * np.where(valid, rolling_std, 0.0)
+        signals = np.zeros(len(premiums), dtype=int)
+        signals[valid & (premiums > threshold)] = 1
+        signals[valid & (premiums < -threshold)] = -1
+        return signals
     
     def _fallback_signal(self, daily_data: pd.DataFrame) -> pd.DataFrame:
         """archがインストールされていない場合のフォールバック"""
@@ -431,10 +959,15 @@ class GARCHVolatilityFeature(AlphaFactor):
             'Prediction_Premium': premiums
         })
     
-    def get_signal_for_date(self, date) -> int:
+    def get_signal_for_date(self, date, as_of: bool = False) -> int:
         """
         指定された日付のGARCHシグナルを返す。
         fit_daily()を事前に呼び出す必要がある。
+
+        Args:
+            date: 日付（date / datetime / Timestamp）
+            as_of: True の場合、その日以前で最新の日次シグナルを返す
+                   （週末や日足未更新の日中バーでも直近の値を使う）
         """
         if self._daily_signals is None:
             return 0
@@ -442,10 +975,14 @@ class GARCHVolatilityFeature(AlphaFactor):
         if hasattr(date, 'date'):
             date = date.date()
         
-        match = self._daily_signals[self._daily_signals['Date'] == date]
-        if not match.empty:
-            return int(match['GARCH_Signal'].iloc[0])
-        return 0
+        signal = self._signal_by_date.get(date)
+        if signal is not None:
+            return signal
+        if not as_of or len(self._signal_days) == 0:
+            return 0
+        day = np.datetime64(date, 'D').view(np.int64)
+        pos = int(np.searchsorted(self._signal_days, day, side='right')) - 1
+        return int(self._signal_values[pos]) if pos >= 0 else 0
     
     def calculate(self, data: pd.DataFrame) -> pd.Series:
         """
@@ -0,0 +1,276 @@
+"""
+GARCH 日次プレミアムの計算とキャッシュ
+
+GARCHVolatilityFeature.fit_daily は 180 日ローリングウィンドウごとに GARCH(1,3) を
+最尤推定する（日数分の fit）。ここではその結果（日付ごとの予測プレミアム）を
+
+- ディスク: 日足リターン系列のコンテンツハッシュをキーに npz で保存
+- プロセス内: 同じ日足データを使う Orchestrator 間（同一銘柄の別時間足など）で共有
+
+し、再起動時や日足が追記された場合は新しい日の分だけ fit する。
+初回構築時はウィンドウをチャンクに分けてプロセスプールで並列に fit する。
+
+推定エンジン（GARCH_ENGINES）:
+- refit     : ウィンドウごとに初期値から推定し直す（従来どおり）
+- warm      : 前のウィンドウの推定値を初期値にして推定する（隣接ウィンドウは1日違い）
+- recursive : refit_every 日ごとにのみ推定し、その間はパラメータを固定して
+              分散の漸化式 σ²_t = ω + α ε²_{t-1} + Σ β_j σ²_{t-j} を閉形式で進める
+"""
+
+import hashlib
+import multiprocessing
+import os
+import threading
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from antigravity.core.snapshot import _atomic_write
+
+
+# この件数以上の fit が必要な場合にプロセスプールを使う
+PARALLEL_MIN_FITS = 64
+
+# キャッシュ形式のバージョン（計算方法を変えた場合に上げる）
+CACHE_VERSION = 1
+
+GARCH_ENGINES = ('refit', 'warm', 'recursive')
+
+# GARCH(1,3): arch の p は ARCH 項、q は GARCH 項の次数
+ARCH_ORDER, GARCH_ORDER = 1, 3
+
+
+def _premium(predicted_var: float, realized_var: float) -> float:
+    return (predicted_var - realized_var) / realized_var if realized_var > 0 else 0.0
+
+
+def fit_premiums(
+    returns: np.ndarray,
+    start: int,
+    end: int,
+    window: int,
+    engine: str = 'refit',
+    refit_every: int = 20,
+) -> np.ndarray:
+    """
+    i in [start, end) について returns[i - window:i] の GARCH(1,3) による
+    1日先予測分散と実現分散 returns[i]**2 の乖離（プレミアム）を返す。
+
+    プロセスプールから呼ばれるためモジュールトップレベルに置く。
+    warm / recursive は区間の先頭で初期値から推定する（チャンク間で状態は引き継がない）。
+    """
+    if engine not in GARCH_ENGINES:
+        raise ValueError(f"engine must be one of {GARCH_ENGINES}, got {engine!r}")
+    from arch import arch_model
+
+    # 初期値が制約境界上にある場合の StartingValueWarning 等は抑制する（fit はデフォルト初期値で続行）
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return _fit_premiums(arch_model, returns, start, end, window, engine, refit_every)
+
+
+def _fit_premiums(arch_model, returns, start, end, window, engine, refit_every) -> np.ndarray:
+    out = np.zeros(end - start)
+    params = None  # 直前の推定値 [mu, omega, alpha, beta1..3]
+    sigma2 = None  # 直近 GARCH_ORDER 日の条件付き分散（古い順）
+    for i in range(start, end):
+        try:
+            refit = (
+                engine != 'recursive' or params is None
+                or (i - window) % max(1, refit_every) == 0
+            )
+            if refit:
+                model = arch_model(returns[i - window:i], vol='Garch', p=ARCH_ORDER, q=GARCH_ORDER, rescale=False)
+                starting_values = params if engine != 'refit' else None
+                result = model.fit(disp='off', show_warning=False, starting_values=starting_values)
+                params = result.params.to_numpy()
+                predicted_var = result.forecast(horizon=1).variance.iloc[-1, 0]
+                sigma2 = list(np.asarray(result.conditional_volatility)[-GARCH_ORDER:] ** 2)
+            else:
+                # パラメータ固定で分散の漸化式を1日進める
+                mu, omega, alpha = params[:3]
+                betas = params[3:]
+                eps = returns[i - 1] - mu
+                predicted_var = omega + alpha * eps ** 2 + float(np.dot(betas, sigma2[::-1]))
+            if engine == 'recursive':
+                sigma2 = sigma2[1:] + [predicted_var]
+            out[i - start] = _premium(predicted_var, returns[i] ** 2)
+        except Exception:
+            # モデルが収束しない場合など
+            out[i - start] = 0.0
+            params = None if engine == 'recursive' else params
+    return out
+
+
+def compute_premiums(
+    returns: np.ndarray,
+    start: int,
+    window: int,
+    max_workers: int = 1,
+    engine: str = 'refit',
+    refit_every: int = 20,
+) -> np.ndarray:
+    """
+    i in [start, len(returns)) のプレミアムを計算する。
+    fit 数が多い場合はチャンクに分けてプロセスプールで並列実行する。
+    """
+    end = len(returns)
+    n = end - start
+    if n <= 0:
+        return np.zeros(0)
+    if max_workers <= 1 or n < PARALLEL_MIN_FITS:
+        return fit_premiums(returns, start, end, window, engine, refit_every)
+
+    # 親プロセスで torch 等のスレッドが動いている場合に備えて spawn で起動する
+    bounds = np.linspace(start, end, min(max_workers * 4, n) + 1).astype(int)
+    ctx = multiprocessing.get_context('spawn')
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx) as ex:
+            parts = ex.map(
+                fit_premiums,
+                [returns] * (len(bounds) - 1),
+                bounds[:-1].tolist(),
+                bounds[1:].tolist(),
+                [window] * (len(bounds) - 1),
+                [engine] * (len(bounds) - 1),
+                [refit_every] * (len(bounds) - 1),
+            )
+            return np.concatenate(list(parts))
+    except (BrokenProcessPool, OSError, RuntimeError) as e:
+        # __main__ ガードのないスクリプトから呼ばれた場合など
+        print(f"[WARNING] GARCH process pool unavailable ({e}); fitting sequentially")
+        return fit_premiums(returns, start, end, window, engine, refit_every)
+
+
+def _series_hash(returns: np.ndarray, days: np.ndarray, n: int, params: str) -> str:
+    h = hashlib.sha1(params.encode())
+    h.update(np.ascontiguousarray(returns[:n], dtype=np.float64).tobytes())
+    h.update(np.ascontiguousarray(days[:n], dtype='datetime64[D]').view(np.int64).tobytes())
+    return h.hexdigest()
+
+
+class GarchPremiumCache:
+    """
+    日付ごとの GARCH プレミアム表のキャッシュ（ディスク + プロセス内共有）
+
+    ディスク上のファイルは系列の先頭 window+1 日分のハッシュで識別し（追記しても変わらない）、
+    保存時のリターン系列全体のハッシュと一致する場合にのみ再利用する。
+    日足が追記されていれば、既存分を再利用して新しい日だけ fit する。
+    """
+
+    _shared: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    _shared_lock = threading.Lock()
+    _key_locks: Dict[str, threading.Lock] = {}
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_workers: int = 1,
+        engine: str = 'refit',
+        refit_every: int = 20,
+    ):
+        """
+        Args:
+            directory: キャッシュディレクトリ（None でディスクキャッシュ無効）
+            max_workers: 初回構築時のプロセス数
+            engine: 推定エンジン（GARCH_ENGINES）
+            refit_every: recursive エンジンで再推定する間隔（日）
+        """
+        if engine not in GARCH_ENGINES:
+            raise ValueError(f"engine must be one of {GARCH_ENGINES}, got {engine!r}")
+        self.directory = directory
+        self.max_workers = max(1, int(max_workers))
+        self.engine = engine
+        self.refit_every = max(1, int(refit_every))
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def clear_shared(cls):
+        """プロセス内共有キャッシュを破棄する（テスト用）"""
+        with cls._shared_lock:
+            cls._shared.clear()
+            cls._key_locks.clear()
+
+    def _path(self, returns: np.ndarray, days: np.ndarray, window: int, params: str) -> str:
+        series_id = _series_hash(returns, days, window + 1, params)[:20]
+        return os.path.join(self.directory, f"garch_{series_id}.npz")
+
+    def _read(self, path: str) -> Optional[Dict[str, np.ndarray]]:
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                data = {k: npz[k] for k in npz.files}
+            if int(data['version']) != CACHE_VERSION:
+                return None
+            return data
+        except Exception:
+            return None
+
+    def premiums(self, returns: pd.Series, window: int, params: str = '') -> Tuple[np.ndarray, np.ndarray]:
+        """
+        日付ごとのプレミアムを返す（キャッシュにない日だけ fit する）。
+
+        Args:
+            returns: 日次対数リターン（%）。DatetimeIndex 必須
+            window: ローリングウィンドウ日数
+            params: 計算条件（モデル/エンジン等）。キャッシュキーに含める
+
+        Returns:
+            (dates [datetime64[D]], premiums) : returns.index[window:] に対応
+        """
+        values = returns.to_numpy(dtype=np.float64)
+        days = pd.DatetimeIndex(returns.index).values.astype('datetime64[D]')
+        engine = f"recursive/{self.refit_every}" if self.engine == 'recursive' else self.engine
+        params = f"w={window};engine={engine};{params}"
+        content_key = _series_hash(values, days, len(values), params)
+
+        with self._shared_lock:
+            hit = self._shared.get(content_key)
+            if hit is not None:
+                return hit
+            key_lock = self._key_locks.setdefault(content_key, threading.Lock())
+
+        # 同じ日足を使う Orchestrator が同時に生成されても計算は1回だけ
+        with key_lock:
+            with self._shared_lock:
+                hit = self._shared.get(content_key)
+            if hit is not None:
+                return hit
+
+            table = self._build(values, days, window, params)
+            with self._shared_lock:
+                self._shared[content_key] = table
+            return table
+
+    def _build(self, values: np.ndarray, days: np.ndarray, window: int, params: str) -> Tuple[np.ndarray, np.ndarray]:
+        n = len(values)
+        cached = None
+        path = None
+        if self.directory and n > window:
+            path = self._path(values, days, window, params)
+            data = self._read(path)
+            if data is not None:
+                n_cached = int(data['n_returns'])
+                # 保存時の系列がそのまま先頭に残っている（追記のみ）場合に再利用
+                if n_cached <= n and str(data['prefix_hash']) == _series_hash(values, days, n_cached, params):
+                    cached = data['premiums'][:max(0, n_cached - window)]
+
+        start = window + (0 if cached is None else len(cached))
+        fresh = compute_premiums(values, start, window, self.max_workers, self.engine, self.refit_every)
+        premiums = fresh if cached is None else np.concatenate([cached, fresh])
+
+        if path is not None and len(fresh) > 0:
+            prefix_hash = _series_hash(values, days, n, params)
+            try:
+                _atomic_write(path, lambda f: np.savez(
+                    f, version=CACHE_VERSION, n_returns=n, prefix_hash=prefix_hash, premiums=premiums,
+                ))
+            except OSError as e:
+                print(f"[WARNING] Failed to write GARCH cache {path}: {e}")
+        return days[window:], premiums
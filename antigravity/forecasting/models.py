@@ -17,6 +17,39 @@ from typing import Any, Optional, Tuple
 from antigravity.core.interfaces import PredictionModel
 
 
+# 推論精度（MODEL_PRECISION）
+PRECISIONS = ('fp32', 'int8')
+
+
+def quantize_dynamic_int8(module: nn.Module) -> nn.Module:
+    """
+    nn.Linear を動的 int8 量子化したモジュールを返す（CPU推論専用）。
+    
+    重みは int8 で保持し、活性化は実行時にスケールを求めて量子化する。
+    GPU のない推論環境で fp32 eager より低レイテンシ・省メモリになる。
+    """
+    module = module.to('cpu').eval()
+    quantized = torch.ao.quantization.quantize_dynamic(module, {nn.Linear}, dtype=torch.qint8)
+    # TransformerEncoderLayer の fast path は fp32 の Linear 重みを前提とするため無効化する
+    # （activation_relu_or_gelu は fast path の判定にのみ使われる）
+    for m in quantized.modules():
+        if isinstance(m, nn.TransformerEncoderLayer):
+            m.activation_relu_or_gelu = 0
+    return quantized
+
+
+def as_input_tensor(X: Any, device: torch.device) -> torch.Tensor:
+    """
+    推論入力を float32 テンソルに変換する。
+    
+    CPU 上の float32 テンソル/配列はコピーせずにそのまま使うため、
+    アンサンブルでは1つの入力テンソルを複数モデルで共有できる。
+    """
+    if isinstance(X, torch.Tensor):
+        return X.to(device=device, dtype=torch.float32)
+    return torch.as_tensor(np.asarray(X, dtype=np.float32), device=device)
+
+
 class Time2Vec(nn.Module):
     """
     Time2Vec: 学習可能な時間表現
@@ -353,6 +386,18 @@ class TransformerPredictor(PredictionModel):
         self.optimizer = torch.optim.AdamW(self.model.parameters(), lr=0.001, weight_decay=0.01)
         
         self.trained = False
+        self.precision = 'fp32'
+    
+    def quantize(self):
+        """
+        推論用に Linear 層を動的 int8 量子化する（CPU専用、以後の学習は不可）。
+        load() の後に呼び出すこと。
+        """
+        if self.precision == 'int8':
+            return
+        self.device = torch.device('cpu')
+        self.model = quantize_dynamic_int8(self.model)
+        self.precision = 'int8'
     
     def train(self, X: Any, y_reg: Any, y_cls: Optional[Any] = None) -> float:
         """
@@ -366,6 +411,8 @@ class TransformerPredictor(PredictionModel):
         Returns:
             loss: 学習損失
         """
+        if self.precision != 'fp32':
+            raise RuntimeError("Quantized model cannot be trained")
         self.model.train()
         
         X_tensor = torch.FloatTensor(X).to(self.device)
@@ -404,10 +451,12 @@ class TransformerPredictor(PredictionModel):
             regression_pred: 価格変化率予測 [batch, 1]
             direction_pred: 方向予測（確率）[batch, 3]
         """
-        self.model.eval()
+        # 推論パスは共有モデルの状態を変更しない（複数スレッドから同時に呼ばれるため）
+        if self.model.training:
+            self.model.eval()
         
         with torch.no_grad():
-            X_tensor = torch.FloatTensor(X).to(self.device)
+            X_tensor = as_input_tensor(X, self.device)
             reg_out, cls_out = self.model(X_tensor)
             
             # Softmax for direction probabilities
@@ -415,6 +464,16 @@ class TransformerPredictor(PredictionModel):
         
         return reg_out.cpu().numpy(), direction_probs.cpu().numpy()
     
+    def predict_proba(self, X: Any) -> np.ndarray:
+        """
+        方向の確率分布のみを返す。
+        
+        Returns:
+            direction_probs: [batch, 3] (DOWN, FLAT, UP)
+        """
+        _, direction_probs = self.predict(X)
+        return direction_probs
+    
     def predict_direction(self, X: Any) -> int:
         """
         方向のみを予測（簡易API）。
@@ -514,6 +573,30 @@ class KANLayer(nn.Module):
         # RBF幅パラメータ
         self.rbf_width = nn.Parameter(torch.ones(1) * 0.5)
         
+        # linearize() 後に使用する nn.Linear 形式（量子化用）
+        self.spline_linear: Optional[nn.Linear] = None
+        self.base_linear: Optional[nn.Linear] = None
+    
+    def linearize(self):
+        """
+        スプライン係数とベース重みを nn.Linear に置き換える（推論専用、元の重みは解放）。
+        
+        スプライン出力 Σ_i Σ_g coeff[o,i,g] * rbf[b,i,g] は、
+        RBF基底を [batch, in*grid] に平坦化した線形変換と等価なため、
+        nn.Linear として動的量子化の対象にできる。
+        """
+        with torch.no_grad():
+            spline = nn.Linear(self.in_features * self.grid_size, self.out_features, bias=False)
+            spline.weight.copy_(self.rbf_coeffs.reshape(self.out_features, -1))
+            base = nn.Linear(self.in_features, self.out_features, bias=False)
+            base.weight.copy_(self.base_weight)
+        self.spline_linear = spline.to(self.rbf_coeffs.device)
+        self.base_linear = base.to(self.base_weight.device)
+        
+        # 推論で参照しなくなった fp32 パラメータを解放する
+        for name in ('rbf_coeffs', 'base_weight', 'spline_coeffs', 'spline_scale'):
+            delattr(self, name)
+
     def compute_rbf_basis(self, x: torch.Tensor) -> torch.Tensor:
         """
         RBF基底関数を計算（B-splineの簡易代替）
@@ -552,10 +635,14 @@ class KANLayer(nn.Module):
         # rbf_coeffs: [out_features, in_features, grid_size]
         # rbf: [batch, in_features, grid_size]
         # 出力: [batch, out_features]
-        spline_output = torch.einsum('oig,big->bo', self.rbf_coeffs, rbf)
-        
-        # ベース活性化関数からの出力（残差接続）
-        base_output = F.linear(self.base_activation(x), self.base_weight)
+        rbf_flat = rbf.flatten(1)  # [batch, in_features * grid_size]
+        if self.spline_linear is not None:
+            spline_output = self.spline_linear(rbf_flat)
+            base_output = self.base_linear(self.base_activation(x))
+        else:
+            spline_output = F.linear(rbf_flat, self.rbf_coeffs.reshape(self.out_features, -1))
+            # ベース活性化関数からの出力（残差接続）
+            base_output = F.linear(self.base_activation(x), self.base_weight)
         
         # 合計
         output = spline_output + base_output
@@ -631,6 +718,21 @@ class KANForecaster(PredictionModel):
         self.model = KAN(layers, grid_size=grid_size).to(self.device)
         self.optimizer = torch.optim.AdamW(self.model.parameters(), lr=learning_rate)
         self.trained = False
+        self.precision = 'fp32'
+    
+    def quantize(self):
+        """
+        推論用に KAN 層を線形化し、動的 int8 量子化する（CPU専用、以後の学習は不可）。
+        load() の後に呼び出すこと。
+        """
+        if self.precision == 'int8':
+            return
+        self.device = torch.device('cpu')
+        self.model = self.model.to('cpu')
+        for layer in self.model.layers:
+            layer.linearize()
+        self.model = quantize_dynamic_int8(self.model)
+        self.precision = 'int8'
     
     def train(self, X: Any, y: Any, epochs: int = 50, batch_size: int = 32) -> dict:
         """
@@ -640,6 +742,8 @@ class KANForecaster(PredictionModel):
             X: [n_samples, seq_len, features]
             y: [n_samples] or [n_samples, 2] (regression, classification)
         """
+        if self.precision != 'fp32':
+            raise RuntimeError("Quantized model cannot be trained")
         self.model.train()
         
         X_tensor = torch.FloatTensor(X).to(self.device)
@@ -689,11 +793,13 @@ class KANForecaster(PredictionModel):
     
     def predict(self, X: Any) -> Tuple[np.ndarray, np.ndarray]:
         """予測"""
-        self.model.eval()
+        # 推論パスは共有モデルの状態を変更しない（複数スレッドから同時に呼ばれるため）
+        if self.model.training:
+            self.model.eval()
         
         with torch.no_grad():
-            X_tensor = torch.FloatTensor(X).to(self.device)
-            X_flat = X_tensor.view(X_tensor.shape[0], -1)
+            X_tensor = as_input_tensor(X, self.device)
+            X_flat = X_tensor.reshape(X_tensor.shape[0], -1)
             
             output = self.model(X_flat)
             
@@ -702,6 +808,11 @@ class KANForecaster(PredictionModel):
         
         return reg_pred.cpu().numpy(), cls_pred.cpu().numpy()
     
+    def predict_proba(self, X: Any) -> np.ndarray:
+        """方向の確率分布 [batch, 3]"""
+        _, cls_probs = self.predict(X)
+        return cls_probs
+    
     def predict_direction(self, X: Any) -> int:
         """方向予測"""
         _, cls_probs = self.predict(X)
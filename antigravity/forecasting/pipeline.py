@@ -0,0 +1,159 @@
+"""
+Antigravity インクリメンタル特徴量パイプライン
+
+バーごとに LogReturn / Garman-Klass / Formulaic Alpha を O(1) で更新し、
+事前確保した [seq_len, 5] 配列を1行シフトしてモデル入力を構築する。
+
+モデル入力は従来の _build_sequence（直近 seq_len 本の DataFrame から
+毎回再計算）と同一になるよう、以下の挙動を再現する:
+- 先頭行の log_return は 0
+- GK / Alpha はスライス内でウィンドウが満たない行を 0
+- 価格・出来高はスライス内の平均/標準偏差（ddof=0）でZスコア化
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+from antigravity.forecasting.features import (
+    IncrementalLogReturn,
+    IncrementalGarmanKlass,
+    IncrementalFormulaicAlpha,
+    RollingWindowStats,
+)
+
+
+# シーケンスの列インデックス
+COL_LOG_RETURN, COL_GK_VOL, COL_ALPHA, COL_PRICE, COL_VOLUME = range(5)
+
+
+class IncrementalFeaturePipeline:
+    """
+    バー単位で状態を更新する特徴量パイプライン
+
+    update() で最新バーを取り込み、latest で最新の特徴量、
+    sequence() でモデル入力 [1, seq_len, 5] を取得する。
+    closed_sequence() は最新バーを除いた（直前に確定したバーまでの）モデル入力を返す。
+    """
+
+    def __init__(self, seq_len: int = 20, gk_window: int = 20, alpha_window: int = 20):
+        """
+        Parameters:
+        -----------
+        seq_len : int
+            モデル入力のシーケンス長
+        gk_window : int
+            Garman-Klass ボラティリティのウィンドウ
+        alpha_window : int
+            Formulaic Alpha の SMA ウィンドウ
+        """
+        self.seq_len = seq_len
+        self.gk_window = gk_window
+        self.alpha_window = alpha_window
+
+        self._log_return = IncrementalLogReturn()
+        self._gk = IncrementalGarmanKlass(window=gk_window)
+        self._alpha = IncrementalFormulaicAlpha(sma_window=alpha_window)
+        self._price_stats = RollingWindowStats(seq_len)
+        self._volume_stats = RollingWindowStats(seq_len)
+
+        # 生の特徴量 [log_return, gk_vol, alpha, price, volume]（古い順、末尾が最新）
+        self._raw = np.zeros((seq_len, 5))
+        self._count = 0
+        # 新しいバーを追加する直前（直前のバーが確定した時点）のモデル入力
+        self._closed: Optional[np.ndarray] = None
+        self.latest: Dict[str, float] = {'log_return': np.nan, 'gk_vol': 0.0, 'alpha': np.nan}
+
+    def reset(self):
+        self._log_return.reset()
+        self._gk.reset()
+        self._alpha.reset()
+        self._price_stats.reset()
+        self._volume_stats.reset()
+        self._raw.fill(0.0)
+        self._count = 0
+        self._closed = None
+        self.latest = {'log_return': np.nan, 'gk_vol': 0.0, 'alpha': np.nan}
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def ready(self) -> bool:
+        """モデル入力を構築できるだけのバーがあるか"""
+        return self._count >= self.seq_len
+
+    def update(self, bar: Dict[str, float], replace: bool = False) -> Dict[str, float]:
+        """
+        バーを取り込み、最新の特徴量を返す。
+
+        Parameters:
+        -----------
+        bar : Dict
+            'Open', 'High', 'Low', 'Close', 'Volume' を含む辞書
+        replace : bool
+            True の場合は最新バー（形成中バー）を置き換える
+        """
+        replace = replace and self._count > 0
+        o, h, l, c = (float(bar['Open']), float(bar['High']), float(bar['Low']), float(bar['Close']))
+        v = float(bar.get('Volume', np.nan))
+
+        log_ret = self._log_return.update(c, replace=replace)
+        gk_vol = self._gk.update(o, h, l, c, replace=replace)
+        alpha = self._alpha.update(c, replace=replace)
+        if replace:
+            self._price_stats.replace_last(c)
+            self._volume_stats.replace_last(v)
+        else:
+            # 置き換え済みの最新バーはここで確定する
+            self._closed = self.sequence()
+            self._price_stats.push(c)
+            self._volume_stats.push(v)
+            # 1行シフトして末尾に新しいバーを書き込む
+            self._raw[:-1] = self._raw[1:]
+            self._count += 1
+
+        self._raw[-1] = (log_ret, gk_vol, alpha, c, v)
+        self.latest = {'log_return': log_ret, 'gk_vol': gk_vol, 'alpha': alpha}
+        return self.latest
+
+    def sequence(self) -> Optional[np.ndarray]:
+        """
+        モデル入力シーケンスを返す。
+
+        Returns:
+            np.ndarray: [1, seq_len, 5] の float32 配列
+            または履歴不足の場合は None
+        """
+        if not self.ready:
+            return None
+
+        seq = np.empty((self.seq_len, 5))
+        seq[:, :3] = self._raw[:, :3]
+        # スライス先頭の差分は存在しない
+        seq[0, COL_LOG_RETURN] = 0.0
+        # スライス内でウィンドウが満たない行は 0（従来の fillna と同じ）
+        seq[:self.gk_window - 1, COL_GK_VOL] = 0.0
+        seq[:self.alpha_window - 1, COL_ALPHA] = 0.0
+
+        price_mean = self._price_stats.mean()
+        price_std = self._price_stats.std(ddof=0)
+        volume_mean = self._volume_stats.mean()
+        volume_std = self._volume_stats.std(ddof=0)
+        seq[:, COL_PRICE] = (self._raw[:, COL_PRICE] - price_mean) / (price_std + 1e-8)
+        seq[:, COL_VOLUME] = (self._raw[:, COL_VOLUME] - volume_mean) / (volume_std + 1e-8)
+
+        seq = np.nan_to_num(seq, nan=0.0, posinf=0.0, neginf=0.0)
+        return seq[np.newaxis, :, :].astype(np.float32)
+
+    def closed_sequence(self) -> Optional[np.ndarray]:
+        """
+        最新バーを除いたモデル入力シーケンスを返す（最新バーが形成中の場合に使う）。
+
+        直前のバーが最後に置き換えられた値で計算され、最新バーの置き換えでは変わらない。
+
+        Returns:
+            np.ndarray: [1, seq_len, 5] の float32 配列
+            または履歴不足の場合は None
+        """
+        return None if self._closed is None else self._closed.copy()
@@ -1,7 +1,24 @@
-import pandas as pd
+import math
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
 import numpy as np
-from scipy import stats
-from typing import List, Tuple
+
+
+# 価格変動の標準偏差: 直近 PRICE_STD_WINDOW 期間（PRICE_STD_MIN_PERIODS 期間以上たまってから更新）
+PRICE_STD_WINDOW = 100
+PRICE_STD_MIN_PERIODS = 10
+DEFAULT_PRICE_STD = 0.01
+
+# 浮動小数点誤差の蓄積を防ぐため、この回数の更新ごとに累積値を厳密に再計算する
+RESYNC_INTERVAL = 1000
+
+_SQRT2 = math.sqrt(2.0)
+
+
+def _norm_cdf(z: float) -> float:
+    """標準正規分布の CDF Φ(z)"""
+    return 0.5 * (1.0 + math.erf(z / _SQRT2))
 
 
 class VPINCalculator:
@@ -13,6 +30,11 @@ class VPINCalculator:
     時間ベースではなく、取引量（ボリューム）ベースでデータをサンプリングし、
     インフォームド・トレーダー（情報優位者）の存在確率を推定する。
     高いVPIN値は「毒性フロー」（逆選択リスク）の存在を示唆する。
+    
+    update / calculate_vpin はいずれも O(1)。
+    - バケットと価格変動は deque で保持し、不均衡量・出来高の合計を逐次更新する
+    - 価格変動の標準偏差は Welford 法（追加/除外）で更新する
+    - 履歴全体の VPIN 系列は compute_vpin_series() で一括計算できる
     """
     
     def __init__(self, bucket_volume: float = 1000.0, n_buckets: int = 50):
@@ -27,16 +49,7 @@ class VPINCalculator:
         self.bucket_volume = bucket_volume
         self.n_buckets = n_buckets
         
-        # 内部状態
-        self.buckets: List[Tuple[float, float]] = []  # (buy_vol, sell_vol)のリスト
-        self.current_bucket_buy = 0.0
-        self.current_bucket_sell = 0.0
-        self.current_bucket_total = 0.0
-        
-        # 価格変動の標準偏差を推定するためのバッファ
-        self.price_changes: List[float] = []
-        self.price_std = 0.01  # 初期値（後で更新される）
-        self.last_price = None
+        self.reset()
     
     def _bulk_volume_classification(self, price_change: float, volume: float) -> Tuple[float, float]:
         """
@@ -66,7 +79,7 @@ class VPINCalculator:
         
         # 標準正規分布のCDFを使用
         z_score = price_change / self.price_std
-        buy_probability = stats.norm.cdf(z_score)
+        buy_probability = _norm_cdf(z_score)
         
         buy_vol = volume * buy_probability
         sell_vol = volume * (1 - buy_probability)
@@ -75,19 +88,67 @@ class VPINCalculator:
     
     def _update_price_std(self, price_change: float):
         """
-        価格変動の標準偏差を更新（ローリングウィンドウ）
+        価格変動の標準偏差を更新（ローリングウィンドウ、母標準偏差）
+        
+        直近 PRICE_STD_WINDOW 期間の変動から Welford 法で O(1) に更新する。
         """
+        if len(self.price_changes) == self.price_changes.maxlen:
+            self._welford_remove(self.price_changes[0])
         self.price_changes.append(price_change)
+        self._welford_add(price_change)
+        self._tick()
         
-        # 直近100期間の変動からσを推定
-        window_size = 100
-        if len(self.price_changes) > window_size:
-            self.price_changes = self.price_changes[-window_size:]
-        
-        if len(self.price_changes) >= 10:
-            self.price_std = np.std(self.price_changes)
+        if len(self.price_changes) >= PRICE_STD_MIN_PERIODS:
+            # ウィンドウ内の変動がすべて 0 なら分散は厳密に 0
+            var = self._change_m2 / len(self.price_changes) if self._nonzero_changes else 0.0
+            self.price_std = math.sqrt(var) if var > 0 else 0.0
             if self.price_std == 0:
-                self.price_std = 0.01  # ゼロ除算回避
+                self.price_std = DEFAULT_PRICE_STD  # ゼロ除算回避
+    
+    def _welford_add(self, x: float):
+        self._nonzero_changes += x != 0
+        n = len(self.price_changes)
+        delta = x - self._change_mean
+        self._change_mean += delta / n
+        self._change_m2 += delta * (x - self._change_mean)
+    
+    def _welford_remove(self, x: float):
+        """price_changes から x を除く前に呼ぶ"""
+        self._nonzero_changes -= x != 0
+        n = len(self.price_changes)
+        if n <= 1:
+            self._change_mean = 0.0
+            self._change_m2 = 0.0
+            return
+        delta = x - self._change_mean
+        self._change_mean -= delta / (n - 1)
+        self._change_m2 = max(0.0, self._change_m2 - delta * (x - self._change_mean))
+    
+    def _push_bucket(self, buy_vol: float, sell_vol: float):
+        """バケットを追加し、ウィンドウから外れたバケットを合計から除く"""
+        if len(self.buckets) == self.n_buckets:
+            old_buy, old_sell = self.buckets[0]
+            self._imbalance_sum -= abs(old_sell - old_buy)
+            self._volume_sum -= old_buy + old_sell
+        self.buckets.append((buy_vol, sell_vol))
+        self._imbalance_sum += abs(sell_vol - buy_vol)
+        self._volume_sum += buy_vol + sell_vol
+        self._tick()
+    
+    def _tick(self):
+        self._updates += 1
+        if self._updates >= RESYNC_INTERVAL:
+            self._resync()
+    
+    def _resync(self):
+        """保持しているバケット・価格変動から累積値を厳密に再計算する"""
+        self._updates = 0
+        self._imbalance_sum = float(sum(abs(s - b) for b, s in self.buckets))
+        self._volume_sum = float(sum(b + s for b, s in self.buckets))
+        changes = np.asarray(self.price_changes, dtype=float)
+        self._nonzero_changes = int(np.count_nonzero(changes))
+        self._change_mean = float(changes.mean()) if changes.size else 0.0
+        self._change_m2 = float(((changes - self._change_mean) ** 2).sum())
     
     def update(self, price: float, volume: float):
         """
@@ -126,11 +187,8 @@ class VPINCalculator:
             finalized_buy = self.current_bucket_buy * ratio
             finalized_sell = self.current_bucket_sell * ratio
             
-            self.buckets.append((finalized_buy, finalized_sell))
-            
-            # ウィンドウサイズを超えた古いバケットを削除
-            if len(self.buckets) > self.n_buckets:
-                self.buckets.pop(0)
+            # ウィンドウサイズを超えた古いバケットは deque から自動的に外れる
+            self._push_bucket(finalized_buy, finalized_sell)
             
             # 次のバケットを開始（オーバーフロー分）
             remaining_ratio = 1 - ratio
@@ -154,17 +212,10 @@ class VPINCalculator:
             # 十分なバケットがない場合は不定
             return 0.0
         
-        order_imbalance_sum = 0.0
-        total_volume = 0.0
-        
-        for buy_vol, sell_vol in self.buckets:
-            order_imbalance_sum += abs(sell_vol - buy_vol)
-            total_volume += (buy_vol + sell_vol)
-        
-        if total_volume == 0:
+        if self._volume_sum <= 0:
             return 0.0
         
-        return order_imbalance_sum / total_volume
+        return self._imbalance_sum / self._volume_sum
     
     def get_toxicity_signal(self, threshold: float = 0.5) -> str:
         """
@@ -188,15 +239,161 @@ class VPINCalculator:
         else:
             return 'LOW'
     
+    def get_state(self) -> Dict[str, Any]:
+        """
+        内部状態を配列/スカラーの辞書として返す（スナップショット保存用）。
+        """
+        return {
+            'buckets': np.asarray(self.buckets, dtype=float).reshape(-1, 2),
+            'current_bucket': np.array([
+                self.current_bucket_buy,
+                self.current_bucket_sell,
+                self.current_bucket_total,
+            ]),
+            'price_changes': np.asarray(self.price_changes, dtype=float),
+            'price_std': float(self.price_std),
+            'last_price': np.nan if self.last_price is None else float(self.last_price),
+        }
+    
+    def set_state(self, state: Dict[str, Any]):
+        """
+        get_state() で取得した内部状態を復元する。
+        """
+        self.buckets = deque(
+            ((float(b), float(s)) for b, s in np.asarray(state['buckets']).reshape(-1, 2)),
+            maxlen=self.n_buckets,
+        )
+        buy, sell, total = (float(x) for x in np.asarray(state['current_bucket']))
+        self.current_bucket_buy = buy
+        self.current_bucket_sell = sell
+        self.current_bucket_total = total
+        self.price_changes = deque(
+            (float(x) for x in np.asarray(state['price_changes'])), maxlen=PRICE_STD_WINDOW
+        )
+        self.price_std = float(state['price_std'])
+        last_price = float(state['last_price'])
+        self.last_price = None if np.isnan(last_price) else last_price
+        self._resync()
+    
     def reset(self):
         """
         内部状態をリセットする。
         """
-        self.buckets = []
+        self.buckets: Deque[Tuple[float, float]] = deque(maxlen=self.n_buckets)  # (buy_vol, sell_vol)
         self.current_bucket_buy = 0.0
         self.current_bucket_sell = 0.0
         self.current_bucket_total = 0.0
-        self.price_changes = []
-        self.price_std = 0.01
+        
+        # 価格変動の標準偏差を推定するためのバッファ
+        self.price_changes: Deque[float] = deque(maxlen=PRICE_STD_WINDOW)
+        self.price_std = DEFAULT_PRICE_STD  # 初期値（後で更新される）
         self.last_price = None
+        
+        # 逐次更新する累積値
+        self._imbalance_sum = 0.0  # Σ|V_sell - V_buy|
+        self._volume_sum = 0.0  # Σ(V_buy + V_sell)
+        self._change_mean = 0.0  # 価格変動の平均（Welford）
+        self._change_m2 = 0.0  # 価格変動の偏差平方和（Welford）
+        self._nonzero_changes = 0
+        self._updates = 0
+
 
+
+def _affine_scan(a: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """
+    y[i] = a[i] * y[i-1] + c[i]（y[-1] = 0）を倍々の prefix scan で一括計算する。
+    0 <= a <= 1 なので合成した係数は単調に小さくなり、桁あふれしない。
+    """
+    a = a.astype(float)
+    y = c.astype(float)
+    n = a.shape[0]
+    shift = 1
+    while shift < n and a[shift:].any():
+        y[shift:] = a[shift:] * y[:-shift] + y[shift:]
+        a[shift:] = a[shift:] * a[:-shift]
+        shift *= 2
+    return y
+
+
+def compute_vpin_series(
+    prices: np.ndarray,
+    volumes: np.ndarray,
+    bucket_volume: float = 1000.0,
+    n_buckets: int = 50,
+) -> np.ndarray:
+    """
+    履歴全体の VPIN 系列を一括計算する（リサーチ・バックテスト用）。
+    
+    新しい VPINCalculator に各バーを update() してから calculate_vpin() した値と
+    （浮動小数点誤差の範囲で）一致する。先頭バーは基準価格としてのみ使われる。
+    
+    - BVC: 価格変動の拡大ウィンドウ→ローリング（PRICE_STD_WINDOW）母標準偏差と正規分布 CDF
+    - バケット: 未確定バケットの買い越し比率 q は、バーごとに
+      q_i = (q_{i-1} * L_{i-1} + (V_buy - V_sell)_i) / (L_{i-1} + V_i)
+      （L は繰り越し出来高）で更新され、バー i で確定するバケットの不均衡量はすべて |q_i| * bucket_volume。
+      この漸化式を prefix scan で解き、確定バケットの累積和から直近 n_buckets 個の平均を取る。
+    
+    Parameters:
+    -----------
+    prices : np.ndarray
+        終値
+    volumes : np.ndarray
+        取引量
+    bucket_volume, n_buckets :
+        VPINCalculator と同じ
+        
+    Returns:
+    --------
+    np.ndarray: 各バー時点の VPIN（バケット不足の間は 0.0）
+    """
+    prices = np.asarray(prices, dtype=float)
+    volumes = np.asarray(volumes, dtype=float)
+    n = prices.shape[0]
+    out = np.zeros(n)
+    if n < 2:
+        return out
+    
+    # 価格変動の標準偏差（バー i の変動を含む直近 PRICE_STD_WINDOW 期間）
+    dp = np.diff(prices)
+    zero = np.zeros(1)
+    c1 = np.concatenate([zero, np.cumsum(dp)])
+    c2 = np.concatenate([zero, np.cumsum(dp * dp)])
+    cz = np.concatenate([zero, np.cumsum(dp != 0)])
+    end = np.arange(1, dp.shape[0] + 1)
+    start = np.maximum(0, end - PRICE_STD_WINDOW)
+    k = end - start
+    mean = (c1[end] - c1[start]) / k
+    var = np.maximum((c2[end] - c2[start]) / k - mean * mean, 0.0)
+    var[(cz[end] - cz[start]) == 0] = 0.0
+    std = np.sqrt(var)
+    std[(k < PRICE_STD_MIN_PERIODS) | (std == 0)] = DEFAULT_PRICE_STD
+    
+    # BVC: V_buy - V_sell = V * (2Φ(z) - 1)
+    z = dp / std
+    try:
+        from scipy.special import ndtr
+        buy_prob = ndtr(z)
+    except ImportError:
+        buy_prob = 0.5 * (1.0 + np.vectorize(math.erf, otypes=[float])(z / _SQRT2))
+    vol = volumes[1:]
+    imbalance = vol * (2.0 * buy_prob - 1.0)
+    
+    # 繰り越し出来高 L と確定バケット数 E（バー i までの累計）
+    cum_vol = np.cumsum(vol)
+    emitted = np.floor(cum_vol / bucket_volume).astype(np.int64)
+    carry = cum_vol - emitted * bucket_volume
+    prev_carry = np.concatenate([zero, carry[:-1]])
+    total = prev_carry + vol
+    safe_total = np.where(total > 0, total, 1.0)
+    a = np.where(total > 0, prev_carry / safe_total, 1.0)
+    c = np.where(total > 0, imbalance / safe_total, 0.0)
+    q = _affine_scan(a, c)
+    
+    # 確定バケットごとの |q| を並べ、直近 n_buckets 個の平均を取る
+    per_bar = np.diff(np.concatenate([[0], emitted]))
+    bucket_imbalance = np.repeat(np.abs(q), per_bar)
+    g = np.concatenate([zero, np.cumsum(bucket_imbalance)])
+    ready = emitted >= n_buckets
+    idx = emitted[ready]
+    out[1:][ready] = (g[idx] - g[idx - n_buckets]) / n_buckets
+    return out
@@ -1,6 +1,7 @@
 import sys
 import os
 import json
+import time
 from pathlib import Path
 
 # Add the python directory to sys.path to allow importing ai_research
@@ -11,22 +12,47 @@ python_dir = repo_root / 'python'
 if str(python_dir) not in sys.path:
     sys.path.append(str(python_dir))
 
-try:
-    from ai_research.lm_client import LMStudioClient
-except ImportError:
-    print("Warning: Could not import ai_research.lm_client. Sentiment functionality will be disabled.")
-    LMStudioClient = None
-
 class SentimentAnalyzer:
     def __init__(self):
-        if LMStudioClient:
-            self.client = LMStudioClient()
-        else:
-            self.client = None
+        # LLM クライアントは最初のニュース分析時に生成する（import/起動時のコストを避ける）
+        self._client = None
+        self._client_loaded = False
+
+    @property
+    def client(self):
+        if not self._client_loaded:
+            self._client_loaded = True
+            try:
+                from ai_research.lm_client import LMStudioClient
+                self._client = LMStudioClient()
+            except ImportError:
+                print("Warning: Could not import ai_research.lm_client. Sentiment functionality will be disabled.")
+        return self._client
+
+    @staticmethod
+    def _response_cache():
+        # 推論サーバーが設定した LLM 応答キャッシュを共有する（未設定なら None）
+        try:
+            from ai_research.llm_cache import default_cache
+        except ImportError:
+            return None
+        return default_cache()
+
+    @staticmethod
+    def _parse_score(response: str):
+        """
+        Naive parsing, expecting just a number. Returns None if the response is not a number.
+        In a real system, we'd use better parsing or struct output.
+        """
+        try:
+            return float(response.strip())
+        except (AttributeError, ValueError):
+            return None
 
     def analyze_news(self, news_text: str) -> float:
         """
         Analyzes news text and returns a sentiment score between -1.0 (Negative) and 1.0 (Positive).
+        Responses are cached by news text hash when an LLM response cache is configured.
         """
         if not self.client:
             return 0.0
@@ -39,10 +65,21 @@ class SentimentAnalyzer:
         """
         
         try:
-            response = self.client.chat(prompt)
-            # Naive parsing, expecting just a number or valid json
-            # In a real system, we'd use better parsing or struct output
-            score = float(response.strip())
+            cache = self._response_cache()
+            score = None
+            if cache is not None:
+                cached = cache.get("sentiment", news_text)
+                if cached is not None:
+                    score = self._parse_score(cached)
+            if score is None:
+                t0 = time.perf_counter()
+                response = self.client.chat(prompt)
+                score = self._parse_score(response)
+                if score is None:
+                    raise ValueError(f"unparsable sentiment response: {response[:80]!r}")
+                # 数値として読めた応答だけをキャッシュする（読めない応答を TTL の間使い回さない）
+                if cache is not None:
+                    cache.put("sentiment", news_text, response, time.perf_counter() - t0)
             return max(-1.0, min(1.0, score))
         except Exception as e:
             print(f"Error analyzing sentiment: {e}")
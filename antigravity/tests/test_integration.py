@@ -1,6 +1,22 @@
+import os
+import sys
+import tempfile
 import unittest
+from pathlib import Path
 from antigravity.core.orchestrator import AntigravityOrchestrator
 
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+PYTHON_DIR = os.path.join(REPO_ROOT, 'python')
+
+
+def use_python_dir():
+    """python/ のサーバー側モジュールを import できるようにする（ログは一時ディレクトリへ）"""
+    if 'common.logger' not in sys.modules:
+        # common.logger は import 時に MT4_FILES_PATH を読む（既定は Windows の実ターミナル）
+        os.environ['MT4_FILES_PATH'] = tempfile.mkdtemp(prefix='mt4_files_')
+    if PYTHON_DIR not in sys.path:
+        sys.path.insert(0, PYTHON_DIR)
+
 class TestIntegration(unittest.TestCase):
     def test_orchestrator(self):
         orch = AntigravityOrchestrator()
@@ -22,5 +38,1290 @@ class TestIntegration(unittest.TestCase):
         self.assertIn('vpin', result)
         self.assertIn('sentiment', result)
 
+    def test_bar_ingestion_is_idempotent(self):
+        orch = AntigravityOrchestrator()
+        
+        def bar(close):
+            return {'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close, 'Volume': 1000}
+        
+        # 過去バーでの初期化は1回のみ
+        seed = [bar(100.0 + i) for i in range(25)]
+        times = [60.0 * i for i in range(25)]
+        self.assertEqual(orch.seed_history(seed, times), 25)
+        self.assertEqual(orch.seed_history(seed, times), 0)
+        
+        # 同じバーの再ポーリングは置き換え、古いバーは無視
+        self.assertEqual(orch.ingest_bar(bar(130.0), 60.0 * 25), 'append')
+        self.assertEqual(orch.ingest_bar(bar(131.0), 60.0 * 25), 'replace')
+        self.assertEqual(orch.ingest_bar(bar(99.0), 60.0 * 3), 'stale')
+        self.assertEqual(len(orch.bar_history), 26)
+        self.assertEqual(orch.bar_history.last()['Close'], 131.0)
+        
+        # 予測は同一バー内ではキャッシュされ、新しいバーで再計算される
+        calls = []
+        original = orch._build_sequence
+        def counting_build():
+            calls.append(1)
+            return original()
+        orch._build_sequence = counting_build
+        orch._get_model_prediction()
+        orch.ingest_bar(bar(132.0), 60.0 * 25)
+        orch._get_model_prediction()
+        self.assertEqual(len(calls), 1)
+        orch.ingest_bar(bar(133.0), 60.0 * 26)
+        orch._get_model_prediction()
+        self.assertEqual(len(calls), 2)
+
+    def test_snapshot_roundtrip(self):
+        import tempfile
+        import numpy as np
+        from antigravity.core.snapshot import SnapshotStore
+        
+        orch = AntigravityOrchestrator()
+        for i in range(40):
+            close = 150.0 + 0.1 * i
+            orch.ingest_bar({'Open': close - 0.05, 'High': close + 0.2, 'Low': close - 0.2,
+                             'Close': close, 'Volume': 800 + i}, 60.0 * i)
+            orch.vpin_calc.update(close, 800 + i)
+        orch.current_inventory = 1.0
+        orch.cumulative_pnl = 0.25
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SnapshotStore(tmp)
+            store.save('USDJPY|M15', orch)
+            
+            restored = AntigravityOrchestrator()
+            self.assertTrue(store.load('USDJPY|M15', restored))
+            self.assertFalse(store.load('EURUSD|M15', AntigravityOrchestrator()))
+            
+            bars, _ = store.read('USDJPY|M15')
+            self.assertIsInstance(bars, np.memmap)
+        
+        np.testing.assert_array_equal(restored.bar_history.view(), orch.bar_history.view())
+        np.testing.assert_allclose(restored._build_sequence(), orch._build_sequence())
+        self.assertEqual(restored.current_inventory, 1.0)
+        self.assertEqual(restored.cumulative_pnl, 0.25)
+        self.assertEqual(restored.vpin_calc.buckets, orch.vpin_calc.buckets)
+        self.assertEqual(restored.vpin_calc.last_price, orch.vpin_calc.last_price)
+        # 復元後も同じバーの再ポーリングは置き換えになる
+        bar = {'Open': 153.8, 'High': 154.1, 'Low': 153.7, 'Close': 154.0, 'Volume': 900}
+        self.assertEqual(restored.ingest_bar(bar, 60.0 * 39), 'replace')
+
+
+    def test_ensemble_runs_models_concurrently(self):
+        import threading
+        import numpy as np
+        
+        # 両モデルが同時に predict_proba に入らないと通過できない（逐次実行ならタイムアウトで失敗する）
+        both_running = threading.Barrier(2, timeout=5)
+        
+        class ConcurrentModel:
+            def __init__(self, probs):
+                self.probs = np.array([probs], dtype=np.float32)
+                self.inputs = []
+            
+            def predict_proba(self, X):
+                self.inputs.append(X)
+                both_running.wait()
+                return self.probs
+        
+        orch = AntigravityOrchestrator(model_type='ensemble', ensemble_weights=(0.6, 0.4))
+        orch._transformer_runner = ConcurrentModel([0.1, 0.2, 0.7])
+        orch._kan_runner = ConcurrentModel([0.6, 0.3, 0.1])
+        sequence = np.zeros((1, 20, 5), dtype=np.float32)
+        
+        probs = orch._predict_ensemble_proba(sequence)
+        
+        # 融合確率 = 0.6 * T + 0.4 * K（どちらかが失敗すると片方だけの確率になる）
+        np.testing.assert_allclose(probs, [0.30, 0.24, 0.46], atol=1e-6)
+        self.assertEqual(int(np.argmax(probs)), 2)
+        # 同じ入力テンソルを共有する
+        self.assertIs(orch._transformer_runner.inputs[0], orch._kan_runner.inputs[0])
+
+    def test_model_call_runs_outside_orchestrator_lock(self):
+        import threading
+        import numpy as np
+        
+        class GatedModel:
+            def __init__(self, barrier=None):
+                self.started = threading.Event()
+                self.release = threading.Event()
+                self.barrier = barrier
+            
+            def predict_proba(self, X):
+                self.started.set()
+                if self.barrier is not None:
+                    self.barrier.wait()
+                else:
+                    self.release.wait(5)
+                return np.array([[0.1, 0.2, 0.7]], dtype=np.float32)
+        
+        def bar(close):
+            return {'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close, 'Volume': 1000}
+        
+        orchs = [AntigravityOrchestrator(model_type='transformer') for _ in range(2)]
+        for orch in orchs:
+            orch._transformer_runner = GatedModel()
+            orch.seed_history([bar(150.0 + i) for i in range(25)], [60.0 * i for i in range(25)])
+        
+        # 推論中も同一銘柄のバー取り込みはブロックされない（推論が止まったままでも戻る）
+        model = orchs[0]._transformer_runner
+        worker = threading.Thread(target=orchs[0]._get_model_prediction)
+        worker.start()
+        self.assertTrue(model.started.wait(5))
+        self.assertEqual(orchs[0].ingest_bar(bar(180.0), 60.0 * 25), 'append')
+        self.assertEqual(orchs[0].ingest_bar(bar(181.0), 60.0 * 26), 'append')
+        self.assertTrue(worker.is_alive())
+        model.release.set()
+        worker.join()
+        # 推論中にバーが確定したため、古い予測はキャッシュされない
+        self.assertIsNone(orchs[0]._prediction_cache_key)
+        
+        # 別銘柄の Orchestrator は並行して推論できる（両方が同時に推論中でないと通過できない）
+        both_running = threading.Barrier(2, timeout=5)
+        for orch in orchs:
+            orch._transformer_runner = GatedModel(both_running)
+        threads = [threading.Thread(target=o._get_model_prediction) for o in orchs]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertFalse(both_running.broken)
+        for orch in orchs:
+            self.assertEqual(orch.transformer_prediction, 2)
+            self.assertEqual(orch._prediction_cache_key, orch._closed_bar_key)
+
+    def test_prediction_uses_closed_bars_only(self):
+        import numpy as np
+        from antigravity.forecasting.pipeline import IncrementalFeaturePipeline
+
+        class RecordingModel:
+            def __init__(self):
+                self.inputs = []
+
+            def predict_proba(self, X):
+                self.inputs.append(np.array(X))
+                return np.array([[0.1, 0.2, 0.7]], dtype=np.float32)
+
+        def bar(close):
+            return {'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close, 'Volume': 1000}
+
+        orch = AntigravityOrchestrator(model_type='transformer')
+        model = orch._transformer_runner = RecordingModel()
+        orch.seed_history([bar(150.0 + i) for i in range(25)], [60.0 * i for i in range(25)])
+
+        # 形成中バーの最初のティックでは、確定済みの 25 本だけで予測する
+        orch.ingest_bar(bar(175.0), 60.0 * 25)
+        orch._get_model_prediction()
+        # 形成中バーの置き換えでは再計算しない
+        orch.ingest_bar(bar(190.0), 60.0 * 25)
+        orch._get_model_prediction()
+        self.assertEqual(len(model.inputs), 1)
+
+        # バーが確定すると、最後に置き換えた値（190）で予測し直す
+        orch.ingest_bar(bar(191.0), 60.0 * 26)
+        orch._get_model_prediction()
+        self.assertEqual(len(model.inputs), 2)
+
+        expected = IncrementalFeaturePipeline(
+            seq_len=orch.seq_len,
+            gk_window=orch.gk_volatility.window,
+            alpha_window=orch.formulaic_alpha.sma_window,
+        )
+        for close in [150.0 + i for i in range(25)]:
+            expected.update(bar(close))
+        np.testing.assert_array_equal(model.inputs[0].reshape(-1), expected.sequence().reshape(-1))
+        expected.update(bar(190.0))
+        np.testing.assert_array_equal(model.inputs[1].reshape(-1), expected.sequence().reshape(-1))
+
+    def test_process_bar_mutates_state_under_lock(self):
+        import threading
+        import numpy as np
+
+        class GatedModel:
+            def __init__(self):
+                self.started = threading.Event()
+                self.release = threading.Event()
+
+            def predict_proba(self, X):
+                self.started.set()
+                self.release.wait(5)
+                return np.array([[0.1, 0.2, 0.7]], dtype=np.float32)
+
+        def bar(close):
+            return {'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close, 'Volume': 1000}
+
+        orch = AntigravityOrchestrator(model_type='transformer')
+        model = orch._transformer_runner = GatedModel()
+        orch.seed_history([bar(150.0 + i) for i in range(25)], [60.0 * i for i in range(25)])
+        appended = orch._bars_appended
+
+        # 別スレッドがロックを持っている間は履歴・VPIN を変更しない
+        worker = threading.Thread(target=orch.process_bar, args=(bar(176.0),))
+        with orch.lock:
+            worker.start()
+            worker.join(0.2)
+            self.assertTrue(worker.is_alive())
+            self.assertEqual(orch._bars_appended, appended)
+
+        # 推論はロックの外（推論中も同一銘柄のバー取り込みは戻る）
+        self.assertTrue(model.started.wait(5))
+        self.assertEqual(orch._bars_appended, appended + 1)
+        self.assertEqual(orch.ingest_bar(bar(180.0), 60.0 * 30), 'append')
+        model.release.set()
+        worker.join(5)
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(orch.last_price, 176.0)
+
+
+class TestColdStart(unittest.TestCase):
+    """import/起動時間の予算（重いバックエンドは有効化されるまで読み込まない）"""
+    
+    # 推論サーバーの import + SevenModuleAnalyzer 生成（Antigravity 無効）の上限（秒）
+    STARTUP_BUDGET_SEC = 2.0
+    HEAVY_MODULES = ('torch', 'scipy', 'antigravity.forecasting.models')
+    
+    def _run(self, code, cwd):
+        # sys.modules を汚さずに import のコストを測るため、このテストだけ別プロセスで実行する
+        import json
+        import subprocess
+        
+        env = dict(os.environ)
+        env['PYTHONPATH'] = REPO_ROOT
+        env['MT4_FILES_PATH'] = tempfile.mkdtemp()
+        probe = (
+            "import json, sys, time\n"
+            "t0 = time.perf_counter()\n"
+            f"{code}\n"
+            "print(json.dumps({'elapsed': time.perf_counter() - t0, "
+            f"'heavy': [m for m in {self.HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+        )
+        out = subprocess.run(
+            [sys.executable, '-c', probe], cwd=os.path.join(REPO_ROOT, cwd),
+            env=env, capture_output=True, text=True, timeout=120,
+        )
+        self.assertEqual(out.returncode, 0, out.stderr[-2000:])
+        return json.loads(out.stdout.strip().splitlines()[-1])
+    
+    def test_orchestrator_import_defers_torch_and_scipy(self):
+        result = self._run("import antigravity.core.orchestrator", cwd='.')
+        self.assertEqual(result['heavy'], [])
+    
+    def test_inference_server_startup_budget(self):
+        result = self._run(
+            "import inference_server_7module as m\n"
+            "m.SevenModuleAnalyzer(use_antigravity=False)",
+            cwd='python',
+        )
+        self.assertEqual(result['heavy'], [])
+        self.assertLess(result['elapsed'], self.STARTUP_BUDGET_SEC)
+
+
+class TestThreadBudget(unittest.TestCase):
+    """スレッド予算の配分（torch intra-op / BLAS / バックエンド判定 / 環境変数）"""
+
+    def setUp(self):
+        use_python_dir()
+        import thread_budget
+        from unittest import mock
+
+        self.tb = thread_budget
+        self.mock = mock
+        # BLAS 環境変数・torch の有無はテストごとに差し替え、終了後に元へ戻す
+        for patcher in (mock.patch.dict(os.environ), mock.patch.dict(sys.modules),
+                        mock.patch.object(thread_budget, 'THREADPOOLCTL_AVAILABLE', False)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for name in thread_budget.BLAS_ENV_VARS + ('MODEL_PRECISION',):
+            os.environ.pop(name, None)
+        sys.modules.pop('torch', None)
+
+    def fake_torch(self, cuda):
+        calls = {}
+        torch = self.mock.Mock()
+        torch.cuda.is_available.return_value = cuda
+        torch.set_num_threads.side_effect = lambda n: calls.__setitem__('num_threads', n)
+        torch.set_num_interop_threads.side_effect = lambda n: calls.__setitem__('interop', n)
+        torch.get_num_threads.side_effect = lambda: calls.get('num_threads', 0)
+        torch.get_num_interop_threads.side_effect = lambda: calls.get('interop', 0)
+        sys.modules['torch'] = torch
+        return calls
+
+    def test_intra_op_threads_split_budget_with_floor(self):
+        ThreadBudget = self.tb.ThreadBudget
+        # intra = budget // (workers * models_per_request)
+        self.assertEqual(ThreadBudget(total=16, workers=2, backend='cpu', models_per_request=2).intra_op_threads(), 4)
+        self.assertEqual(ThreadBudget(total=8, workers=3, backend='cpu').intra_op_threads(), 2)
+        # 予算より同時実行数が多くても 1 未満にはしない
+        self.assertEqual(ThreadBudget(total=3, workers=4, backend='cpu', models_per_request=2).intra_op_threads(), 1)
+        self.assertEqual(ThreadBudget(total=3, workers=4, backend='cpu').blas_threads(), 1)
+        # ensemble（USE_ANTIGRAVITY 有効）は1リクエスト2モデルとして配分する
+        os.environ.update({'AG_THREAD_BUDGET': '8', 'USE_ANTIGRAVITY': 'true', 'MODEL_TYPE': 'ensemble',
+                           'AG_EXEC_BACKEND': 'cpu'})
+        budget = ThreadBudget.from_env(workers=2)
+        self.assertEqual((budget.total, budget.models_per_request, budget.intra_op_threads()), (8, 2, 2))
+
+    def test_cuda_uses_one_torch_thread_and_gives_budget_to_blas(self):
+        calls = self.fake_torch(cuda=True)
+        budget = self.tb.ThreadBudget(total=8, workers=2, backend='cuda', models_per_request=2, interop=1)
+        self.assertEqual((budget.intra_op_threads(), budget.blas_threads()), (1, 4))
+        budget.apply()
+        self.assertEqual(calls, {'num_threads': 1, 'interop': 1})
+
+    def test_auto_backend_resolution(self):
+        budget = self.tb.ThreadBudget(total=8, workers=2, backend='auto')
+        # torch が未読み込みなら import せずに cpu
+        self.assertEqual(budget.resolve_backend(), 'cpu')
+        self.assertNotIn('torch', sys.modules)
+        self.fake_torch(cuda=False)
+        self.assertEqual(budget.resolve_backend(), 'cpu')
+        self.fake_torch(cuda=True)
+        self.assertEqual(budget.resolve_backend(), 'cuda')
+        self.assertEqual(budget.intra_op_threads(), 1)
+        # int8 動的量子化は CPU でのみ実行される
+        os.environ['MODEL_PRECISION'] = 'int8'
+        self.assertEqual(budget.resolve_backend(), 'cpu')
+        self.assertEqual(budget.intra_op_threads(), 4)
+        with self.assertRaises(ValueError):
+            self.tb.ThreadBudget(backend='tpu')
+
+    def test_export_env_keeps_user_blas_settings(self):
+        os.environ['OMP_NUM_THREADS'] = '3'
+        self.tb.ThreadBudget(total=8, workers=2, backend='cpu').export_env()
+        self.assertEqual(os.environ['OMP_NUM_THREADS'], '3')
+        for name in self.tb.BLAS_ENV_VARS[1:]:
+            self.assertEqual(os.environ[name], '4')
+
+    def test_effective_reports_health_keys(self):
+        budget = self.tb.ThreadBudget(total=8, workers=2, backend='cpu', models_per_request=2)
+        info = budget.effective()
+        self.assertEqual(
+            set(info),
+            {'budget', 'workers', 'models_per_request', 'backend', 'applied', 'intra_op_threads', 'blas_threads', 'env'},
+        )
+        self.assertEqual(set(info['env']), set(self.tb.BLAS_ENV_VARS))
+        self.assertEqual((info['budget'], info['backend'], info['intra_op_threads']), (8, 'cpu', 2))
+        self.assertEqual(info['applied'], {'blas': False, 'torch': False})
+        # 適用後は torch の実効値も載せる
+        self.fake_torch(cuda=False)
+        info = budget.apply()
+        self.assertEqual(info['applied'], {'blas': False, 'torch': True})
+        self.assertEqual(info['torch'], {'num_threads': 2, 'num_interop_threads': 1})
+
+
+class TestThreadBudgetTorch(unittest.TestCase):
+    """torch は遅延読み込みのため、最初の Orchestrator 生成時にスレッド数を設定する"""
+
+    def setUp(self):
+        use_python_dir()
+
+    def test_torch_threads_applied_when_first_orchestrator_loads_torch(self):
+        from unittest import mock
+        import torch
+        import antigravity.core.orchestrator as orch_module
+        from thread_budget import ThreadBudget
+
+        self.addCleanup(torch.set_num_threads, torch.get_num_threads())
+        budget = ThreadBudget(total=3, workers=1, backend='cpu')
+        torch.set_num_threads(1)
+        # Orchestrator がまだ torch を読み込んでいない状態（HTTP サーバーの _get_engine 直後）
+        for patcher in (mock.patch.object(orch_module, '_torch_loaded', False),
+                        mock.patch.object(orch_module, '_torch_hooks', [])):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        orch_module.on_torch_loaded(budget.apply_torch)
+        self.assertEqual(torch.get_num_threads(), 1)
+        self.assertFalse(budget.effective()['applied']['torch'])
+
+        AntigravityOrchestrator(model_type='transformer')
+        self.assertEqual(torch.get_num_threads(), budget.intra_op_threads())
+        self.assertEqual(torch.get_num_threads(), 3)
+        self.assertTrue(budget.effective()['applied']['torch'])
+        # 読み込み後に登録したコールバックは即座に呼ぶ
+        torch.set_num_threads(1)
+        orch_module.on_torch_loaded(budget.apply_torch)
+        self.assertEqual(torch.get_num_threads(), 3)
+
+
+class TestRequestWatcher(unittest.TestCase):
+    """ファイルブリッジのリクエスト検出（イベント型 / ポーリング）"""
+
+    def setUp(self):
+        use_python_dir()
+
+    def test_event_backend_reports_only_written_request_files(self):
+        from pathlib import Path
+        import request_watcher as rw
+
+        d = Path(tempfile.mkdtemp())
+        w = rw.create_request_watcher([d], backend='auto', poll_interval=0.05)
+        self.addCleanup(w.close)
+        if w.backend == 'polling':
+            # イベント型が使えない環境では従来どおり毎回全走査
+            self.assertIsNone(w.wait(timeout=0.01))
+            return
+
+        self.assertEqual(w.wait(timeout=0.05), [])
+        (d / 'response_PC1.csv').write_text('x')
+        tmp = d / 'request_PC2.csv.tmp'
+        tmp.write_text('a;b\n1;2\n')
+        os.replace(tmp, d / 'request_PC2.csv')
+        (d / 'request.csv').write_text('a;b\n1;2\n')
+        seen = set()
+        for _ in range(10):
+            seen.update(p.name for p in w.wait(timeout=1.0) or [])
+            if len(seen) >= 2:
+                break
+        # 書き込み完了した request*.csv だけを通知する（response / 一時ファイルは無視）
+        self.assertEqual(sorted(seen), ['request.csv', 'request_PC2.csv'])
+
+    def wait_for_request(self, w, path, rounds=10):
+        for _ in range(rounds):
+            changed = w.wait(timeout=1.0)
+            if changed and path in changed:
+                return True
+        return False
+
+    def test_missing_directory_is_watched_after_it_appears(self):
+        import shutil
+        from pathlib import Path
+        import request_watcher as rw
+
+        if not rw.inotify_available():
+            self.skipTest('inotify not available')
+        base = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, base, True)
+        present, absent = base / 'A', base / 'B'
+        present.mkdir()
+        w = rw.create_request_watcher([present, absent], backend='auto', rescan_interval=3600)
+        self.addCleanup(w.close)
+        # 1つのディレクトリが無くてもイベント型のまま（存在する方は監視される）
+        self.assertEqual(w.backend, 'inotify')
+        self.assertEqual(w.missing, [absent])
+        (present / 'request.csv').write_text('a;b\n1;2\n')
+        self.assertTrue(self.wait_for_request(w, present / 'request.csv'))
+
+        # 後から作られたディレクトリは全走査のタイミングで監視に加わる
+        absent.mkdir()
+        w._next_rescan = 0
+        self.assertIsNone(w.wait(timeout=0.01))
+        self.assertEqual(w.missing, [])
+        (absent / 'request.csv').write_text('a;b\n1;2\n')
+        self.assertTrue(self.wait_for_request(w, absent / 'request.csv'))
+
+    def test_recreated_directory_is_watched_again(self):
+        import shutil
+        from pathlib import Path
+        import request_watcher as rw
+
+        if not rw.inotify_available():
+            self.skipTest('inotify not available')
+        d = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, d, True)
+        w = rw.create_request_watcher([d], backend='inotify', rescan_interval=3600)
+        self.addCleanup(w.close)
+        shutil.rmtree(d)
+        # IN_IGNORED で全走査を要求し、監視は外れる
+        for _ in range(10):
+            if w.wait(timeout=1.0) is None:
+                break
+        self.assertEqual(w.missing, [d])
+
+        d.mkdir()
+        w._next_rescan = 0
+        self.assertIsNone(w.wait(timeout=0.01))
+        self.assertEqual(w.missing, [])
+        (d / 'request.csv').write_text('a;b\n1;2\n')
+        self.assertTrue(self.wait_for_request(w, d / 'request.csv'))
+
+    def test_modified_file_is_reported_once_stable(self):
+        from pathlib import Path
+        import request_watcher as rw
+
+        d = Path(tempfile.mkdtemp())
+        path = d / 'request.csv'
+        path.write_text('a;b\n')
+        tracker = rw._SettleTracker(settle_sec=0.05)
+        tracker.touch(path, now=0.0)
+        # 静止時間が経つまでは通知しない
+        self.assertEqual(tracker.settled(now=0.01), [])
+        # 書き込みが続いている（サイズが変わった）なら計測をやり直す
+        with open(path, 'a') as f:
+            f.write('1;2\n')
+        self.assertEqual(tracker.settled(now=0.1), [])
+        self.assertTrue(tracker)
+        self.assertEqual(tracker.settled(now=0.2), [path])
+        self.assertFalse(tracker)
+        # 処理前に消えたファイルは捨てる
+        tracker.touch(path, now=1.0)
+        path.unlink()
+        self.assertEqual(tracker.settled(now=2.0), [])
+        self.assertFalse(tracker)
+
+    def test_event_watcher_base_is_abstract(self):
+        import request_watcher as rw
+
+        with self.assertRaises(TypeError):
+            rw._EventRequestWatcher([])
+
+
+class TestRequestDispatcher(unittest.TestCase):
+    """ターミナル単位の順序保持 + ターミナル間の並行処理 + 期限 + エラー / 停止時の応答"""
+
+    def setUp(self):
+        use_python_dir()
+        import threading
+        from request_dispatcher import BridgeRequest, TerminalDispatcher
+
+        self.BridgeRequest = BridgeRequest
+        self.TerminalDispatcher = TerminalDispatcher
+        self.gates = {}       # seq -> 処理を止めておく Event
+        self.responses = []   # (key, reason) の応答順
+        self.cond = threading.Condition()
+
+    def process(self, req):
+        gate = self.gates.get(req.data['seq'])
+        if gate is not None:
+            self.assertTrue(gate.wait(10))
+        if req.data['seq'].startswith('err'):
+            raise ValueError('boom')
+        return 1, 0.8, req.data['seq']
+
+    def respond(self, req, signal, confidence, reason):
+        with self.cond:
+            self.responses.append((req.key, reason))
+            self.cond.notify_all()
+
+    def submit(self, dispatcher, key, seq, deadline=None):
+        req = self.BridgeRequest(key, key, {'seq': seq}, Path('.'))
+        if deadline is not None:
+            req.deadline = req.enqueued_at + deadline
+        dispatcher.submit(req)
+        return req
+
+    def wait_for(self, count):
+        with self.cond:
+            self.assertTrue(self.cond.wait_for(lambda: len(self.responses) >= count, timeout=10), self.responses)
+
+    def reasons(self, key):
+        return [r for k, r in self.responses if k == key]
+
+    def test_terminals_run_concurrently_in_order_with_deadline(self):
+        import threading
+
+        d = self.TerminalDispatcher(self.process, self.respond, max_workers=3)
+        self.addCleanup(d.shutdown)
+        self.gates['a1'] = threading.Event()
+        self.gates['c1'] = threading.Event()
+        self.submit(d, 'A', 'a1')
+        self.submit(d, 'A', 'a2')
+        self.submit(d, 'B', 'b1')
+        self.submit(d, 'B', 'b2')
+        self.submit(d, 'C', 'c1', deadline=0.05)
+        # 期限なしで c1 の後ろに積む（c1 の処理中に期限切れにする）
+        expired = self.submit(d, 'C', 'c2')
+        expired.deadline = expired.enqueued_at
+
+        # A の1件目が止まっていても B は進む。処理中の c1 は期限時点で WAIT を返す
+        self.wait_for(3)
+        self.assertEqual(self.reasons('A'), [])
+        self.assertEqual(self.reasons('B'), ['b1', 'b2'])
+        self.assertTrue(self.reasons('C')[0].startswith('deadline exceeded'))
+
+        self.gates['a1'].set()
+        self.gates['c1'].set()
+        self.wait_for(6)
+        d.shutdown()
+        # 同一ターミナルは到着順。遅れて出た c1 の結果は破棄、開始前に期限切れの c2 は処理しない
+        self.assertEqual(self.reasons('A'), ['a1', 'a2'])
+        self.assertEqual(len(self.reasons('C')), 2)
+        self.assertTrue(self.reasons('C')[1].startswith('deadline exceeded (queued'))
+
+        metrics = d.metrics()
+        self.assertEqual(metrics['A']['completed'], 2)
+        self.assertEqual(metrics['B']['completed'], 2)
+        self.assertEqual((metrics['C']['completed'], metrics['C']['late'], metrics['C']['expired']), (0, 1, 1))
+        self.assertEqual(d.pending(), 0)
+
+    def test_process_error_answers_wait_and_keeps_draining(self):
+        d = self.TerminalDispatcher(self.process, self.respond, max_workers=2)
+        self.addCleanup(d.shutdown)
+        self.submit(d, 'A', 'err1')
+        self.submit(d, 'A', 'a2')
+        self.wait_for(2)
+
+        self.assertEqual(self.reasons('A'), ['error: boom', 'a2'])
+        metrics = d.metrics()['A']
+        self.assertEqual((metrics['errors'], metrics['completed']), (1, 1))
+        self.assertEqual(d.pending(), 0)
+
+    def test_shutdown_answers_queued_requests_with_wait(self):
+        import threading
+
+        d = self.TerminalDispatcher(self.process, self.respond, max_workers=2)
+        self.gates['a1'] = threading.Event()
+        self.submit(d, 'A', 'a1')
+        self.submit(d, 'A', 'a2')
+        self.submit(d, 'A', 'a3')
+
+        # 受け付けを止めてから処理中の a1 を完了させる
+        d.shutdown(wait=False)
+        self.submit(d, 'B', 'b1')
+        self.gates['a1'].set()
+        d.shutdown()
+
+        self.assertEqual(self.reasons('B'), ['server shutting down'])
+        self.assertEqual(self.reasons('A'), ['a1', 'server shutting down', 'server shutting down'])
+        self.assertEqual(d.pending(), 0)
+
+
+class TestConcurrentSymbols(unittest.TestCase):
+    """別銘柄のリクエストを並行処理しても、銘柄別の設定が混ざらない"""
+
+    def setUp(self):
+        use_python_dir()
+
+    def test_each_request_uses_its_own_atr_threshold(self):
+        import threading
+        from modules.volatility_module import VolatilityModule
+        import inference_server_7module as srv
+
+        analyzer = srv.SevenModuleAnalyzer(
+            symbol_atr_thresholds={'USDJPY': 8.0, 'EURUSD': 12.5},
+            enabled_modules={'pullback': True, 'volatility': True},
+            use_antigravity=False,
+        )
+
+        breakdowns = {}
+
+        class _History:
+            def get_win_rate(self, *args):
+                return 0.5, 0
+
+            def add_signal(self, symbol, timeframe, signal, confidence, reason, features, breakdown):
+                # process_request が履歴に記録するブレークダウンを銘柄ごとに保持する
+                breakdowns[symbol] = breakdown
+
+        server = srv.SevenModuleInferenceServer.__new__(srv.SevenModuleInferenceServer)
+        server.module_analyzer = analyzer
+        server.trade_history = _History()
+        server.use_llm = False
+
+        # 両方のリクエストが閾値を決めた後で ATR 判定に入るようにする
+        both_analyzing = threading.Barrier(2, timeout=10)
+        original = VolatilityModule.analyze
+
+        def analyze(module, *args, **kwargs):
+            both_analyzing.wait()
+            return original(module, *args, **kwargs)
+
+        prices = ','.join(f"{150 + (i % 7) * 0.05:.3f}" for i in range(60))
+
+        def run(symbol):
+            data = {'symbol': symbol, 'timeframe': 'M15', 'prices': prices,
+                    'ema12': '150.1', 'ema25': '150.0', 'atr': '0.1'}
+            server.process_request(symbol, data)
+
+        VolatilityModule.analyze = analyze
+        try:
+            threads = [threading.Thread(target=run, args=(s,)) for s in ('USDJPY', 'EURUSD')]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join(30)
+        finally:
+            VolatilityModule.analyze = original
+
+        self.assertIn('閾値8.0pips', breakdowns['USDJPY']['volatility']['reason'])
+        self.assertIn('閾値12.5pips', breakdowns['EURUSD']['volatility']['reason'])
+        # 共有モジュールの既定値は書き換えない
+        self.assertEqual(analyzer.volatility_fx.threshold_pips, analyzer.atr_threshold_fx)
+        self.assertEqual(analyzer.pullback.pip_size, 0.01)
+        self.assertEqual(analyzer._module_for('pullback', pip_size=0.0001, is_index=False).pip_size, 0.0001)
+
+    def test_orchestrator_build_does_not_block_other_symbols(self):
+        import threading
+        from unittest import mock
+        import inference_server_7module as srv
+
+        analyzer = srv.SevenModuleAnalyzer(use_antigravity=True)
+        gate = threading.Event()
+        building = threading.Event()
+        built = []
+
+        class SlowOrchestrator:
+            """USDJPY の構築（GARCH の初回 fit 相当）を gate が開くまで止める"""
+            def __init__(self, **kwargs):
+                built.append(self)
+                if len(built) == 1:
+                    building.set()
+                    gate.wait(10)
+
+        results = {}
+
+        def get(symbol):
+            results.setdefault(symbol, []).append(analyzer._get_orchestrator(symbol, 'M15'))
+
+        with mock.patch.object(srv, 'AntigravityOrchestrator', SlowOrchestrator):
+            first = [threading.Thread(target=get, args=('USDJPY',)) for _ in range(2)]
+            first[0].start()
+            self.assertTrue(building.wait(10))
+            first[1].start()
+            # 構築中でも別銘柄の Orchestrator は取得できる
+            get('EURUSD')
+            self.assertIsInstance(results['EURUSD'][0], SlowOrchestrator)
+            gate.set()
+            for t in first:
+                t.join(10)
+
+        # 同じキーの同時要求は1回の構築を共有する（USDJPY と EURUSD の2回だけ）
+        self.assertEqual(len(built), 2)
+        self.assertIs(results['USDJPY'][0], built[0])
+        self.assertIs(results['USDJPY'][1], built[0])
+
+
+class TestTradeHistory(unittest.TestCase):
+    """追記型トレード履歴（移行・期間読み込み・コンパクション）"""
+
+    def setUp(self):
+        use_python_dir()
+
+    def test_append_log_migrates_loads_window_and_compacts(self):
+        import json
+        from datetime import datetime, timedelta
+        from trade_history import TradeHistory
+
+        d = Path(tempfile.mkdtemp())
+        path = d / 'trade_history.jsonl'
+
+        def ts(days):
+            return (datetime.now() - timedelta(days=days)).isoformat()
+
+        def trade(days, result):
+            return {'timestamp': ts(days), 'symbol': 'USDJPY', 'timeframe': 'M15', 'signal': 1,
+                    'market_data': {'ema12': 2, 'ema25': 1}, 'result': result, 'pips': None}
+
+        legacy = [trade(200, 'win'), trade(40, 'win'), trade(1, 'loss')]
+        (d / 'trade_history.json').write_text(json.dumps(legacy))
+        # 書き込みはテストから flush() で行う（バックグラウンドの周期には依存しない）
+        h = TradeHistory(path, flush_interval=3600)
+        self.addCleanup(h.close)
+
+        # 移行は retention（90日）内のみ、メモリには lookback（30日）分だけ
+        self.assertTrue((d / 'trade_history.json.migrated').exists())
+        file_lines = len(path.read_text().splitlines())
+        self.assertEqual(file_lines, 2)
+        self.assertEqual(len(h.trades), 1)
+
+        ids = [h.add_signal('USDJPY', 'M15', 1, 0.8, 'x', {'ema12': 2, 'ema25': 1}) for _ in range(3)]
+        self.assertEqual([h.update_result(ids[0], 'win', 5.0), h.update_result(12345, 'win', 1.0)], [True, False])
+        # 追記はメモリに積むだけで、flush でまとめて書かれる（signal 3行 + result 1行）
+        self.assertEqual(len(path.read_text().splitlines()), file_lines)
+        h.flush()
+        self.assertEqual(len(path.read_text().splitlines()) - file_lines, 4)
+        self.assertEqual(h.get_win_rate('USDJPY', 1, True), (0.5, 2))
+        h.close()
+
+        # 再起動後も結果が復元され、ID は重複しない
+        h2 = TradeHistory(path)
+        self.assertEqual(len(h2.trades), 4)
+        self.assertEqual(h2.get_win_rate('USDJPY', 1, True), (0.5, 2))
+        self.assertGreater(h2.add_signal('USDJPY', 'M15', 0, 0.5, 'y', {}), max(ids))
+        h2.close()
+
+        old = json.dumps({'type': 'signal', 'id': 1, 'timestamp': ts(120), 'symbol': 'EURUSD'})
+        path.write_text(old + '\n' + path.read_text())
+        TradeHistory(path, retention_days=90).close()
+        self.assertNotIn('EURUSD', path.read_text())
+
+    def test_win_rate_aggregates_match_full_scan(self):
+        import json
+        import random
+        from datetime import datetime, timedelta
+        from trade_history import TradeHistory
+
+        rng = random.Random(0)
+        now = datetime.now()
+        events = []
+        for i in range(1, 3001):
+            ts = (now - timedelta(days=rng.uniform(0, 40))).isoformat()
+            md = {'ema12': str(rng.uniform(0, 2)), 'ema25': str(rng.uniform(0, 2))}
+            events.append({'type': 'signal', 'id': i, 'timestamp': ts, 'symbol': rng.choice(['USDJPY', 'EURUSD']),
+                           'signal': rng.choice([1, -1]), 'market_data': md, 'result': None})
+        events.sort(key=lambda e: e['timestamp'])
+        for e in list(events):
+            if rng.random() < 0.7:
+                events.append({'type': 'result', 'id': e['id'], 'timestamp': now.isoformat(),
+                               'result': rng.choice(['win', 'loss']), 'pips': 1.0})
+        d = Path(tempfile.mkdtemp())
+        (d / 'trade_history.jsonl').write_text(''.join(json.dumps(e) + '\n' for e in events))
+        h = TradeHistory(d / 'trade_history.jsonl', lookback_days=35)
+        self.addCleanup(h.close)
+        self.assertGreater(len(h.trades), 2000)
+        for trade_id in rng.sample([t['id'] for t in h.trades], 200):
+            h.update_result(trade_id, rng.choice(['win', 'loss']), 0.0)
+
+        def scan(symbol, signal, bullish, days):
+            cutoff = datetime.now() - timedelta(days=days)
+            wins = total = 0
+            for t in h.trades:
+                if datetime.fromisoformat(t['timestamp']) < cutoff:
+                    continue
+                md = t['market_data']
+                if (t['symbol'] == symbol and t['signal'] == signal and t.get('result') is not None
+                        and (float(md['ema12']) > float(md['ema25'])) == bullish):
+                    total += 1
+                    wins += t['result'] == 'win'
+            return (wins / total if total else 0.5, total)
+
+        # 日次集計 + 境界日の絞り込みは、全件走査と同じ結果になる
+        for symbol in ['USDJPY', 'EURUSD', 'GBPUSD']:
+            for signal in [1, -1]:
+                for bullish in [True, False]:
+                    for days in [0.5, 1, 7, 29.3, 30, 35]:
+                        with self.subTest(symbol=symbol, signal=signal, bullish=bullish, days=days):
+                            self.assertEqual(
+                                tuple(h.get_win_rate(symbol, signal, bullish, lookback_days=days)),
+                                scan(symbol, signal, bullish, days),
+                            )
+        # 読み込んだ期間より長い参照は黙って切り詰めずに拒否する
+        with self.assertRaises(ValueError):
+            h.get_win_rate('USDJPY', 1, True, lookback_days=36)
+
+    def test_closed_history_is_released(self):
+        import gc
+        import weakref
+        from trade_history import TradeHistory
+
+        h = TradeHistory(Path(tempfile.mkdtemp()) / 'trade_history.jsonl', flush_interval=3600)
+        h.close()
+        ref = weakref.ref(h)
+        del h
+        gc.collect()
+        # close() 後は atexit にも参照が残らない
+        self.assertIsNone(ref())
+
+
+class TestLMStudioClient(unittest.TestCase):
+    """LM Studio クライアント（モデルIDキャッシュ・接続の再利用・非同期版のキャンセル）"""
+
+    def setUp(self):
+        use_python_dir()
+
+    def test_pooled_and_async_clients_against_stub(self):
+        import asyncio
+        from ai_research.lm_client import AsyncLMStudioClient, LMStudioClient, parse_timeout
+        from lm_client_benchmark import StubLMServer
+
+        self.assertEqual(parse_timeout(30), (3.0, 30.0))
+        self.assertEqual(parse_timeout({'connect': 1, 'read': 5}), (1.0, 5.0))
+
+        with StubLMServer() as stub:
+            client = LMStudioClient(stub.url)
+            replies = [client.chat(f'p{i}') for i in range(5)]
+            # モデルIDは1回だけ取得し、5回の chat は1本の keep-alive 接続で送る
+            self.assertTrue(replies[0].startswith('BUY'))
+            self.assertEqual((stub.counts['models'], stub.counts['chat'], stub.counts['connections']), (1, 5, 1))
+            # モデルが入れ替わると 404 → 再取得して再送
+            stub.model_id = 'reloaded-model'
+            self.assertTrue(client.chat('p').startswith('BUY'))
+            self.assertEqual(stub.counts['models'], 2)
+            client.close()
+            stub.reset_counts()
+
+            async def main():
+                c = AsyncLMStudioClient(stub.url, timeout={'connect': 1, 'read': 0.2})
+                out = {'replies': await asyncio.gather(*(c.chat(f'p{i}') for i in range(4)))}
+                stub.delay = 1.0
+                out['timeout'] = await c.chat('slow')
+                c.timeout = (1.0, 10.0)
+                try:
+                    await asyncio.wait_for(c.chat('slow'), 0.05)
+                    out['cancelled'] = False
+                except asyncio.TimeoutError:
+                    out['cancelled'] = True
+                # キャンセルしたスレッド側の呼び出しは close() が待つ
+                out['inflight'] = len(c._inflight)
+                await c.close()
+                out['inflight_after_close'] = len(c._inflight)
+                return out
+
+            out = asyncio.run(main())
+
+        # 非同期版: 同時の初回呼び出しでも /v1/models は1回。read タイムアウトはエラー文字列、
+        # キャンセルは応答を待たずに戻る
+        self.assertTrue(all(x.startswith('BUY') for x in out['replies']))
+        self.assertEqual(stub.counts['models'], 1)
+        self.assertTrue(out['timeout'].startswith('エラー: timeout'), out['timeout'])
+        self.assertTrue(out['cancelled'])
+        self.assertEqual((out['inflight'], out['inflight_after_close']), (1, 0))
+
+
+class TestLLMAdvisor(unittest.TestCase):
+    """LLM 判断の非同期実行（待ち時間の予算・同じバーでのレイトバインディング・古いバーの取り消し）"""
+
+    def setUp(self):
+        use_python_dir()
+
+    def test_budgeted_wait_late_binding_and_cancellation(self):
+        import threading
+        from llm_advisor import LLMAdvisor
+
+        calls = []
+        gates = {'bar1': threading.Event(), 'busy': threading.Event()}
+        started = {tag: threading.Event() for tag in gates}
+
+        def advise(data, breakdown):
+            calls.append(data['tag'])
+            if data['tag'] in gates:
+                started[data['tag']].set()
+                self.assertTrue(gates[data['tag']].wait(10))
+            return 1, 0.8, data['tag']
+
+        # 予算 0: 完了していなければ待たない / 予算 10 秒: 完了を待つ（実時間には依存しない）
+        a = LLMAdvisor(advise, wait_budget_sec=0.0)
+        self.addCleanup(a.shutdown)
+
+        # 予算内に間に合わなければ LLM なしで即座に返す
+        (signal, conf, _), outcome = a.advise(('USDJPY', 'M15', 1), {'tag': 'bar1'}, {})
+        self.assertEqual((signal, conf, outcome), (0, 0.0, 'missed'))
+        # 同じバーの次のリクエストは、最初のリクエストで開始した結果を使う（LLM は1回だけ）
+        gates['bar1'].set()
+        a.wait_budget_sec = 10.0
+        self.assertEqual(a.advise(('USDJPY', 'M15', 1), {'tag': 'bar1-again'}, {}), ((1, 0.8, 'bar1'), 'late_bound'))
+        self.assertEqual(a.advise(('USDJPY', 'M15', 2), {'tag': 'bar2'}, {}), ((1, 0.8, 'bar2'), 'in_time'))
+
+        # ワーカーが埋まっている間に積まれた古いバー（bar3）は、新しいバーが来たら取り消す
+        a.wait_budget_sec = 0.0
+        a.advise(('EURUSD', 'M15', 1), {'tag': 'busy'}, {})
+        self.assertTrue(started['busy'].wait(10))
+        a.advise(('USDJPY', 'M15', 3), {'tag': 'bar3'}, {})
+        a.advise(('USDJPY', 'M15', 4), {'tag': 'bar4'}, {})
+        gates['busy'].set()
+        a.wait_budget_sec = 10.0
+        self.assertEqual(a.advise(('USDJPY', 'M15', 4), {'tag': 'bar4'}, {}), ((1, 0.8, 'bar4'), 'late_bound'))
+
+        self.assertEqual(calls, ['bar1', 'bar2', 'busy', 'bar4'])
+        m = a.metrics()
+        self.assertEqual((m['in_time'], m['late_bound'], m['missed'], m['cancelled']), (1, 2, 4, 1))
+        self.assertAlmostEqual(m['hit_rate'], 3 / 7)
+
+    def test_failed_opinion_is_retried(self):
+        from llm_advisor import LLMAdvisor
+
+        calls = []
+
+        def advise(data, breakdown):
+            calls.append(data['tag'])
+            if len(calls) == 1:
+                raise ConnectionError('LM Studio down')
+            return 1, 0.8, data['tag']
+
+        a = LLMAdvisor(advise, wait_budget_sec=10.0)
+        self.addCleanup(a.shutdown)
+        key = ('USDJPY', 'M15', 'antigravity', 1)
+        self.assertEqual(a.advise(key, {'tag': 'first'}, {})[1], 'errors')
+        # 失敗は保持しないので、同じバーの次のリクエストで再実行する
+        self.assertEqual(a.advise(key, {'tag': 'retry'}, {}), ((1, 0.8, 'retry'), 'in_time'))
+        self.assertEqual(calls, ['first', 'retry'])
+
+    def test_presets_do_not_share_an_opinion(self):
+        import inference_server_7module as srv
+
+        keys = []
+
+        class _Advisor:
+            def advise(self, key, data, breakdown):
+                keys.append(key)
+                return (0, 0.0, 'x'), 'missed'
+
+        class _History:
+            def get_win_rate(self, *args):
+                return 0.5, 0
+
+            def add_signal(self, *args, **kwargs):
+                pass
+
+        server = srv.SevenModuleInferenceServer.__new__(srv.SevenModuleInferenceServer)
+        server.module_analyzer = srv.SevenModuleAnalyzer(use_antigravity=False)
+        server.trade_history = _History()
+        server.use_llm = True
+        server.llm_advisor = _Advisor()
+
+        other = next(p for p in srv.STRATEGY_PRESETS if p != server.module_analyzer.preset_name)
+        prices = ','.join(f"{150 + (i % 7) * 0.05:.3f}" for i in range(60))
+        for preset in ('', other, 'no-such-preset'):
+            server.process_request('PC1', {'symbol': 'USDJPY', 'timeframe': 'M15', 'prices': prices,
+                                           'bar_time': '1700000000', 'preset': preset})
+
+        default = server.module_analyzer.preset_name
+        self.assertEqual([k[2] for k in keys], [default, other, default])
+        self.assertEqual(len({k[:2] + k[3:] for k in keys}), 1)
+
+
+class TestLLMResponseCache(unittest.TestCase):
+    """LLM 応答の永続キャッシュ（丸めた市場状態で再利用・TTL・再起動後の再利用・センチメントとの共有）"""
+
+    def setUp(self):
+        use_python_dir()
+
+    def test_rounded_state_hits_and_cache_is_shared(self):
+        import time
+        from ai_research.llm_cache import LLMResponseCache, MarketStateRounding, configure_default_cache
+        from inference_server_7module import SevenModuleInferenceServer
+        from antigravity.sentiment.analyzer import SentimentAnalyzer
+
+        class FakeLM:
+            def __init__(self):
+                self.prompts = []
+
+            def chat(self, prompt, **kw):
+                self.prompts.append(prompt)
+                time.sleep(0.01)
+                return 'エラー: timeout' if 'ERR' in prompt else '判定: BUY 確信度: 0.7 理由: test'
+
+        class FakeSentimentLM:
+            def __init__(self):
+                self.n = 0
+
+            def chat(self, prompt):
+                self.n += 1
+                return 'Bullish, about 0.5' if 'garbled' in prompt else '0.5'
+
+        path = os.path.join(tempfile.mkdtemp(), 'llm_cache.sqlite')
+        srv = SevenModuleInferenceServer.__new__(SevenModuleInferenceServer)
+        srv.lm_client = FakeLM()
+        # プロセス共有のキャッシュは他のテストに残さない
+        self.addCleanup(configure_default_cache, None)
+        srv.llm_cache = configure_default_cache(path, 900)
+        srv.llm_cache_rounding = MarketStateRounding.from_config({'price_sig_digits': 5, 'atr_sig_digits': 2})
+        mods = {'trend': {'signal': 1, 'confidence': 0.81}, 'noise': {'signal': -1, 'confidence': 0.1}}
+        base = {'symbol': 'USDJPY', 'timeframe': 'M15', 'ema12': '150.2341', 'ema25': '150.1012', 'atr': '0.1234'}
+
+        # 丸めると同じ状態（EMA / ATR / 確信度の微差）は LLM を呼ばずに同じ判断を返す
+        first = srv.analyze_with_llm(base, mods)
+        self.assertEqual(first[:2], (1, 0.7))
+        near = dict(base, ema12='150.2338', atr='0.1229')
+        self.assertEqual(srv.analyze_with_llm(near, {'trend': {'signal': 1, 'confidence': 0.79}}), first)
+        self.assertEqual(srv.analyze_with_llm(dict(base, ema12='150.31'), mods)[:2], (1, 0.7))
+        # LLM に送るのは丸める前のプロンプト。エラー応答は保存しないので毎回呼ぶ
+        srv.analyze_with_llm(dict(base, symbol='ERR'), mods)
+        srv.analyze_with_llm(dict(base, symbol='ERR'), mods)
+        self.assertIn('EMA12: 150.2341', srv.lm_client.prompts[0])
+        self.assertEqual(len(srv.lm_client.prompts), 4)
+
+        # センチメントは同じキャッシュをニュース本文（空白は正規化）のハッシュで共有する
+        sa = SentimentAnalyzer()
+        sa._client_loaded, sa._client = True, FakeSentimentLM()
+        self.assertEqual([sa.analyze_news('BoJ  holds rates'), sa.analyze_news('BoJ holds rates ')], [0.5, 0.5])
+        self.assertEqual(sa._client.n, 1)
+        # 数値として読めない応答は 0.0 を返し、キャッシュしない（次も LLM に問い合わせる）
+        self.assertEqual([sa.analyze_news('garbled news'), sa.analyze_news('garbled news')], [0.0, 0.0])
+        self.assertEqual(sa._client.n, 3)
+        self.assertIsNone(srv.llm_cache.get('sentiment', 'garbled news'))
+
+        metrics = srv.llm_cache.metrics()
+        trade, sentiment = metrics['trade'], metrics['sentiment']
+        self.assertEqual((trade['hits'], trade['misses']), (1, 4))
+        self.assertAlmostEqual(trade['hit_ratio'], 0.2)
+        # 省いた時間は、ヒットした応答を作ったときの LLM 呼び出し時間（FakeLM は 10ms 以上かかる）
+        self.assertGreaterEqual(trade['saved_latency_sec'], 0.01)
+        self.assertEqual((sentiment['hits'], sentiment['misses']), (1, 4))
+
+        # 再起動後も再利用でき、TTL を過ぎたものは使わない
+        reopened = LLMResponseCache(path, ttl_sec=900)
+        self.addCleanup(reopened.close)
+        text = srv._llm_cache_text(base, mods)
+        self.assertIsNotNone(reopened.get('trade', text))
+        self.assertIsNone(reopened.get('trade', text, ttl_sec=0.0))
+
+
+class TestBrainPlanIndex(unittest.TestCase):
+    """Brain プランの銘柄別索引（変更がなければファイルに触れない・mtime で作り直す）"""
+
+    def setUp(self):
+        use_python_dir()
+
+    def test_per_symbol_index_and_invalidation(self):
+        import builtins
+        import json
+        import threading
+        from datetime import datetime
+        from unittest import mock
+        from inference_server_7module import BrainAdapter
+
+        data_dir = tempfile.mkdtemp()
+        plans = os.path.join(data_dir, 'plans')
+        os.makedirs(plans)
+        today = datetime.now().strftime('%Y-%m-%d')
+
+        def write(asset, bias, status='active', day=today):
+            tmp = os.path.join(plans, 'tmp.json')
+            with open(tmp, 'w') as f:
+                json.dump({'asset': asset, 'bias': bias, 'status': status}, f)
+            os.replace(tmp, os.path.join(plans, f'plan_{day}_{asset}.json'))
+
+        def bias(plan):
+            return plan and plan['bias']
+
+        write('USDJPY', 'BULLISH')
+        write('EURUSD', 'BEARISH')
+        write('GBPUSD', 'BULLISH', status='closed')
+        write('XAUUSD', 'BULLISH', day='2000-01-01')
+        write('US100.cash', 'BEARISH')
+
+        b = BrainAdapter(data_dir, check_interval=60.0)
+        # 当日のアクティブなプランのみ。ファイル名に銘柄を含むもの（US100.cash）も引ける
+        self.assertEqual([bias(b.get_plan(s)) for s in ('USDJPY', 'EURUSD', 'GBPUSD', 'XAUUSD', 'US100')],
+                         ['BULLISH', 'BEARISH', None, None, 'BEARISH'])
+
+        # このスレッドからのファイルシステム呼び出しだけを数える
+        fs_calls = [0]
+        me = threading.get_ident()
+
+        def counted(fn):
+            def wrapper(*args, **kwargs):
+                if threading.get_ident() == me:
+                    fs_calls[0] += 1
+                return fn(*args, **kwargs)
+            return wrapper
+
+        with mock.patch('os.stat', counted(os.stat)), mock.patch('os.scandir', counted(os.scandir)), \
+                mock.patch.object(builtins, 'open', counted(builtins.open)):
+            # 銘柄が入れ替わってもファイルシステムには触れない（索引は1回だけ作る）
+            for _ in range(1000):
+                for s in ('USDJPY', 'EURUSD', 'AUDUSD', 'US100'):
+                    b.get_plan(s)
+            self.assertEqual(fs_calls[0], 0)
+            self.assertEqual(b.rebuilds, 1)
+
+            # check_interval=0 でも、変更の確認は1回の参照につきディレクトリの stat 1回だけ
+            live = BrainAdapter(data_dir, check_interval=0.0)
+            live.get_plan('USDJPY')
+            fs_calls[0] = 0
+            live.get_plan('USDJPY')
+            live.get_plan('EURUSD')
+            self.assertEqual(fs_calls[0], 2)
+
+        write('USDJPY', 'BEARISH')
+        os.remove(os.path.join(plans, f'plan_{today}_EURUSD.json'))
+        # mtime の分解能に依存しないよう、ディレクトリの mtime を明示的に進める
+        st = os.stat(plans)
+        os.utime(plans, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        self.assertEqual([bias(live.get_plan('USDJPY')), bias(live.get_plan('EURUSD'))], ['BEARISH', None])
+        # check_interval 内は作り直さない。invalidate() で即座に作り直す
+        self.assertEqual(bias(b.get_plan('USDJPY')), 'BULLISH')
+        b.invalidate()
+        self.assertEqual(bias(b.get_plan('USDJPY')), 'BEARISH')
+
+
+class TestSymbolProfiles(unittest.TestCase):
+    """銘柄プロファイルの事前計算（別名・pip サイズ・ATR 閾値・モデルパス・未知銘柄のメモ化）"""
+
+    def setUp(self):
+        use_python_dir()
+
+    def test_profiles_match_per_request_resolution(self):
+        from symbol_profiles import SymbolProfileTable, select_model_path
+        from inference_server_7module import SevenModuleAnalyzer
+
+        paths = {'USDJPY_M15': 'tf.pt', 'USDJPY_60': 'h1.pt', 'NQ100': 'nq.pt', 'default': 'def.pt'}
+        t = SymbolProfileTable({'usdjpy': 8.5, 'GOLD': 20}, transformer_model_paths=paths,
+                               kan_model_paths={}, kan_default_path='kan.pt')
+
+        def view(s):
+            p = t.get(s)
+            return (p.symbol, p.is_index, p.pip_size, p.atr_threshold, p.atr_source)
+
+        self.assertEqual(view('USDJPY'), ('USDJPY', False, 0.01, 8.5, 'config_exact:USDJPY'))
+        self.assertEqual(view('usdjpy.m '), ('USDJPY', False, 0.01, 8.5, 'config_exact:USDJPY'))
+        # 別名（US100 / NAS100 → NQ100）は指数として扱う
+        self.assertEqual(view('US100.cash'), ('NQ100', True, 1.0, 50.0, 'preset_get_atr_threshold'))
+        self.assertEqual(view('NAS100'), view('US100.cash'))
+        self.assertEqual(view('EURUSD'), ('EURUSD', False, 0.0001, 6.0, 'preset_get_atr_threshold'))
+        self.assertEqual(view('XAUUSD.GOLD')[3:], (7.0, 'preset_get_atr_threshold'))
+        self.assertEqual(view('JP225.mt4')[:3], ('JP225', True, 1.0))
+
+        # モデルパスは時間足の表記ゆれを含めて、リクエストごとの探索と同じ結果になる
+        for s in ['USDJPY', 'USDJPY.m', 'US100', 'nq100', 'EURUSD', '']:
+            for tf in ['M15', '15', 'H1', '60', 'M60', 'm15', '']:
+                with self.subTest(symbol=s, timeframe=tf):
+                    self.assertEqual(t.get(s).transformer_path(tf), select_model_path(paths, s, tf, None))
+                    self.assertEqual(t.get(s).kan_path(tf), 'kan.pt')
+        self.assertEqual([t.get('USDJPY').transformer_path(tf) for tf in ('m15', '60', 'H4')],
+                         ['tf.pt', 'h1.pt', 'def.pt'])
+
+        # 未知の銘柄は初回だけ作ってメモ化する（生の表記と正規化後の両方）
+        n = len(t)
+        self.assertIs(t.get('ZARJPY'), t.get('ZARJPY'))
+        self.assertIs(t.get(' zarjpy'), t.get('ZARJPY'))
+        self.assertEqual(len(t) - n, 2)
+
+        # 設定の再読み込みでテーブルを丸ごと差し替える
+        a = SevenModuleAnalyzer(use_antigravity=False, symbol_atr_thresholds={'EURUSD': 4.0})
+        before = a.symbol_profiles
+        self.assertEqual((before.get('EURUSD').atr_threshold, before.get('US100').symbol), (4.0, 'NQ100'))
+        a.rebuild_symbol_profiles({'EURUSD': 5.0})
+        self.assertIsNot(a.symbol_profiles, before)
+        self.assertEqual(a.symbol_profiles.get('EURUSD').atr_threshold, 5.0)
+        self.assertEqual(before.get('EURUSD').atr_threshold, 4.0)
+
+
+class TestStatusHeartbeat(unittest.TestCase):
+    """server_status.txt のハートビート（変更時のみ・アトミック置換・失敗したディレクトリのバックオフ）"""
+
+    def setUp(self):
+        use_python_dir()
+
+    def test_change_only_writes_and_backoff(self):
+        from status_heartbeat import StatusHeartbeat
+
+        root = Path(tempfile.mkdtemp())
+        dirs = [root / 'PC1', root / 'PC2']
+        for d in dirs:
+            d.mkdir()
+        (root / 'not_a_dir').write_text('x')
+        files = [d / 'server_status.txt' for d in dirs]
+        files += [dirs[0] / 'server_status.txt', root / 'not_a_dir' / 'server_status.txt']
+
+        # flush の時刻は now で与える（keepalive / バックオフの判定を実時間に依存させない）
+        hb = StatusHeartbeat(files, keepalive_sec=0, backoff_sec=30.0)
+        hb.update('running', 0)
+        # 重複パスは1回、内容が同じなら書かない
+        self.assertEqual((hb.flush(now=1000.0), hb.flush(now=1001.0)), (2, 0))
+        self.assertEqual(hb.failures, 1)
+
+        # 200 回の更新でもファイルには触れず、次のハートビートで最新の状態を1回だけ書く
+        for i in range(1, 201):
+            hb.update('running', i)
+        self.assertEqual(hb.writes, 2)
+        self.assertEqual(hb.flush(now=1002.0), 2)
+        content = (dirs[1] / 'server_status.txt').read_text().split('|')
+        self.assertEqual((content[0], content[2]), ('running', '200'))
+        # 変化がなければ書かない（keepalive=0）
+        self.assertEqual(hb.flush(now=1003.0), 0)
+        # 書けないディレクトリはバックオフ中はスキップし、期限後にもう一度試す
+        self.assertEqual(hb.failures, 1)
+        hb.flush(now=1031.0)
+        self.assertEqual(hb.failures, 2)
+
+        # 停止時はバックオフ中のディレクトリも含めて書き出す（スレッドは待たずに止まる）
+        hb.start(interval_sec=3600)
+        hb.update('stopped', 200)
+        hb.stop()
+        self.assertFalse(hb.running)
+        self.assertEqual([(d / 'server_status.txt').read_text().split('|')[0] for d in dirs],
+                         ['stopped', 'stopped'])
+        self.assertEqual(hb.failures, 3)
+        # 一時ファイルを残さない
+        self.assertEqual(sorted(p.name for d in dirs for p in d.iterdir()),
+                         ['server_status.txt', 'server_status.txt'])
+
+        # keepalive ごとに時刻だけ更新する
+        ka = StatusHeartbeat([dirs[0] / 'ka.txt'], keepalive_sec=10.0)
+        ka.update('running', 1)
+        self.assertEqual([ka.flush(now=t) for t in (100.0, 105.0, 110.0, 119.0, 120.0)], [1, 0, 1, 0, 1])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -46,6 +46,41 @@ class TestVPIN(unittest.TestCase):
         self.assertIn(signal, ['LOW', 'MEDIUM', 'HIGH'])
         print(f"Toxicity Signal: {signal}")
 
+    def test_streaming_matches_batch_and_direct_sums(self):
+        """逐次更新の VPIN / σ が一括計算・全バケットの再集計と一致する"""
+        from antigravity.risk.vpin import compute_vpin_series
+
+        rng = np.random.default_rng(11)
+        n = 3000
+        prices = 150 + np.cumsum(rng.normal(0, 0.05, n))
+        prices[500:700] = prices[499]  # 値動きのない区間
+        volumes = rng.integers(100, 2000, n).astype(float)
+        volumes[40:50] = 0.0
+
+        vpin = VPINCalculator(bucket_volume=1000.0, n_buckets=20)
+        streamed = []
+        for i, (p, v) in enumerate(zip(prices, volumes)):
+            vpin.update(p, v)
+            streamed.append(vpin.calculate_vpin())
+            if i in (600, 2999):
+                changes = np.asarray(vpin.price_changes)
+                expected_std = np.std(changes) or 0.01
+                self.assertAlmostEqual(vpin.price_std, expected_std, places=12)
+                buckets = np.asarray(vpin.buckets)
+                direct = np.abs(buckets[:, 1] - buckets[:, 0]).sum() / buckets.sum()
+                self.assertAlmostEqual(streamed[-1], direct, places=12)
+
+        batch = compute_vpin_series(prices, volumes, bucket_volume=1000.0, n_buckets=20)
+        np.testing.assert_allclose(batch, streamed, rtol=1e-9, atol=1e-12)
+        self.assertGreater(np.count_nonzero(batch), n // 2)
+
+        # 状態の保存/復元後も同じ値を返す
+        restored = VPINCalculator(bucket_volume=1000.0, n_buckets=20)
+        restored.set_state(vpin.get_state())
+        vpin.update(prices[-1] + 0.1, 700.0)
+        restored.update(prices[-1] + 0.1, 700.0)
+        self.assertAlmostEqual(restored.calculate_vpin(), vpin.calculate_vpin(), places=12)
+
 
 class TestFeatures(unittest.TestCase):
     """特徴量モジュールのテスト"""
@@ -125,6 +160,129 @@ class TestFeatures(unittest.TestCase):
         # 正規化後の値の範囲を確認（極端に大きくならないこと）
         valid = normalized.dropna()
         self.assertTrue((valid.abs() < 10).all())  # Zスコアなので極端に大きくならない
+    
+    def test_array_compute_matches_calculate(self):
+        """NumPy 版 compute() が pandas 版 calculate() と一致する"""
+        from antigravity.forecasting.features import LogReturn
+        o, h, l, c = (self.df[k].to_numpy(dtype=float) for k in ('Open', 'High', 'Low', 'Close'))
+        
+        tech_df = TechnicalIndicators().calculate(self.df)
+        tech_np = TechnicalIndicators().compute(c)
+        for col in ('SMA_20', 'RSI_14', 'BB_Upper', 'BB_Lower'):
+            np.testing.assert_allclose(tech_np[col], tech_df[col].to_numpy(), rtol=1e-10, equal_nan=True)
+        
+        np.testing.assert_allclose(
+            LogReturn().compute(c), LogReturn().calculate(self.df).to_numpy(), equal_nan=True)
+        gk = GarmanKlassVolatility(window=10)
+        np.testing.assert_allclose(
+            gk.compute(o, h, l, c), gk.calculate(self.df).to_numpy(), rtol=1e-10, equal_nan=True)
+        alpha = FormulaicAlpha(sma_window=10)
+        np.testing.assert_allclose(
+            alpha.compute(c), alpha.calculate(self.df).to_numpy(), rtol=1e-10, equal_nan=True)
+
+    def test_vectorized_factors_match_pandas_reference(self):
+        """
+        NumPy 版ファクターが従来の pandas 実装と一致する（定数区間・NaN を含む）
+
+        累積和の区間（_BLOCK_ROWS）をまたぐ長さで比較する。atol は 0 付近の Zスコアに残る
+        pandas 側のオンライン更新の誤差（1e-8 程度）を吸収する分。
+        """
+        from antigravity.benchmarks import feature_factors as ref
+
+        df = ref.synthetic_bars(100_000, seed=1)
+        df.iloc[1000:1100, :4] = 150.0  # 値が動かない区間（週末・閑散時間帯）
+        df.iloc[50_000:50_040, df.columns.get_loc('Volume')] = 1000.0
+        df.iloc[2000, df.columns.get_loc('Close')] = np.nan
+
+        for name, reference, vectorized in ref.FACTORS:
+            expected = np.asarray(reference(df), dtype=float)
+            actual = np.asarray(vectorized(df), dtype=float)
+            np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected), err_msg=name)
+            np.testing.assert_allclose(actual, expected, rtol=1e-8, atol=1e-7, equal_nan=True, err_msg=name)
+
+        # 出来高のように条件のよい列は中心化を省く経路を通る
+        volume = df['Volume']
+        expected = ((volume - volume.rolling(60).mean()) / volume.rolling(60).std().replace(0, 1)).to_numpy()
+        actual = WindowNormalizer(window=60).normalize_array(volume.to_numpy(dtype=float))
+        np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+        np.testing.assert_allclose(actual, expected, rtol=1e-8, atol=1e-7, equal_nan=True)
+
+
+
+class TestIncrementalFeatures(unittest.TestCase):
+    """インクリメンタル特徴量が pandas 版と一致することのテスト"""
+    
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        n = 300
+        close = 150 + np.cumsum(rng.normal(0, 0.05, n))
+        open_ = np.roll(close, 1)
+        open_[0] = close[0]
+        self.df = pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) + rng.uniform(0.01, 0.1, n),
+            'Low': np.minimum(open_, close) - rng.uniform(0.01, 0.1, n),
+            'Close': close,
+            'Volume': rng.integers(100, 5000, n).astype(float),
+        })
+    
+    def _bars(self):
+        return self.df.to_dict('records')
+    
+    def test_factors_match_pandas(self):
+        """各インクリメンタル版の update() が pandas 版の系列と一致する"""
+        from antigravity.forecasting.features import (
+            LogReturn, IncrementalLogReturn, IncrementalGarmanKlass,
+            IncrementalFormulaicAlpha, IncrementalWindowNormalizer
+        )
+        expected_lr = LogReturn().calculate(self.df).to_numpy()
+        expected_gk = GarmanKlassVolatility(window=20).calculate(self.df).to_numpy()
+        expected_alpha = FormulaicAlpha(sma_window=20).calculate(self.df).to_numpy()
+        expected_z = WindowNormalizer(window=60).normalize(self.df['Close']).to_numpy()
+        
+        lr, gk = IncrementalLogReturn(), IncrementalGarmanKlass(window=20)
+        alpha, norm = IncrementalFormulaicAlpha(sma_window=20), IncrementalWindowNormalizer(window=60)
+        got = np.array([
+            (lr.update(b['Close']),
+             gk.update(b['Open'], b['High'], b['Low'], b['Close']),
+             alpha.update(b['Close']),
+             norm.update(b['Close']))
+            for b in self._bars()
+        ])
+        
+        np.testing.assert_allclose(got[:, 0], expected_lr, rtol=1e-9, equal_nan=True)
+        np.testing.assert_allclose(got[:, 1], expected_gk, rtol=1e-7, atol=1e-12, equal_nan=True)
+        np.testing.assert_allclose(got[:, 2], expected_alpha, rtol=1e-7, atol=1e-12, equal_nan=True)
+        np.testing.assert_allclose(got[:, 3], expected_z, rtol=1e-6, atol=1e-9, equal_nan=True)
+    
+    def test_pipeline_sequence_matches_legacy(self):
+        """シフト構築したモデル入力が、直近 seq_len 本から再計算した従来の入力と一致する"""
+        from antigravity.forecasting.features import LogReturn
+        from antigravity.forecasting.pipeline import IncrementalFeaturePipeline
+        
+        seq_len = 20
+        pipeline = IncrementalFeaturePipeline(seq_len=seq_len)
+        gk, alpha, lr = GarmanKlassVolatility(window=20), FormulaicAlpha(sma_window=20), LogReturn()
+        
+        for i, bar in enumerate(self._bars()):
+            # 形成中バーの更新（置き換え）を挟んでも結果が変わらないこと
+            pipeline.update(dict(bar, Close=bar['Close'] + 0.3))
+            pipeline.update(bar, replace=True)
+            seq = pipeline.sequence()
+            if i + 1 < seq_len:
+                self.assertIsNone(seq)
+                continue
+            
+            df = self.df.iloc[i + 1 - seq_len:i + 1].reset_index(drop=True)
+            prices, volumes = df['Close'].values, df['Volume'].values
+            legacy = np.stack([
+                lr.calculate(df).fillna(0).values,
+                gk.calculate(df).fillna(0.01).values,
+                alpha.calculate(df).fillna(0).values,
+                (prices - prices.mean()) / (prices.std() + 1e-8),
+                (volumes - volumes.mean()) / (volumes.std() + 1e-8),
+            ], axis=1).astype(np.float32)
+            np.testing.assert_allclose(seq[0], legacy, rtol=1e-4, atol=1e-5)
 
 
 class TestAgents(unittest.TestCase):
@@ -258,6 +416,330 @@ class TestTransformer(unittest.TestCase):
         print(f"Training loss: {loss:.4f}")
 
 
+
+class TestQuantization(unittest.TestCase):
+    """int8 動的量子化のテスト"""
+    
+    def setUp(self):
+        import torch
+        torch.manual_seed(0)
+        self.X = np.random.default_rng(0).normal(size=(64, 20, 5)).astype(np.float32)
+    
+    def test_kan_linearize_is_exact(self):
+        """KAN 層の nn.Linear 形式は元の計算と一致する"""
+        import torch
+        from antigravity.forecasting.models import KANForecaster
+        
+        kan = KANForecaster(input_dim=5, seq_len=20, device='cpu')
+        reg, probs = kan.predict(self.X)
+        for layer in kan.model.layers:
+            layer.linearize()
+        reg_lin, probs_lin = kan.predict(self.X)
+        np.testing.assert_allclose(reg_lin, reg, rtol=1e-5, atol=1e-6)
+        np.testing.assert_allclose(probs_lin, probs, rtol=1e-5, atol=1e-6)
+    
+    def test_quantized_models_agree_with_fp32(self):
+        """量子化後も方向クラスがほぼ一致し、学習は拒否される"""
+        import copy
+        from antigravity.forecasting.models import TransformerPredictor, KANForecaster
+        
+        for model in (TransformerPredictor(input_dim=5, device='cpu'),
+                      KANForecaster(input_dim=5, seq_len=20, device='cpu')):
+            _, probs = model.predict(self.X)
+            quantized = copy.deepcopy(model)
+            quantized.quantize()
+            _, probs_q = quantized.predict(self.X)
+            
+            self.assertEqual(quantized.precision, 'int8')
+            agreement = np.mean(probs.argmax(axis=1) == probs_q.argmax(axis=1))
+            self.assertGreaterEqual(agreement, 0.9)
+            with self.assertRaises(RuntimeError):
+                quantized.train(self.X, np.zeros((64, 1), dtype=np.float32))
+
+class _CountingModel:
+    """呼び出し回数とバッチサイズを記録するダミーモデル"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def predict(self, X):
+        X = np.asarray(X)
+        self.calls.append(X.shape[0])
+        # 入力の先頭値をそのまま回帰出力に返し、振り分けを検証できるようにする
+        reg = X[:, 0, :1].copy()
+        probs = np.tile(np.array([0.1, 0.2, 0.7], dtype=np.float32), (X.shape[0], 1))
+        return reg, probs
+
+
+class TestMicroBatcher(unittest.TestCase):
+    """マイクロバッチャーのテスト"""
+    
+    def test_disabled_calls_model_directly(self):
+        """max_wait_ms=0 ではモデルを直接呼び出す"""
+        from antigravity.forecasting.batching import MicroBatcher
+        
+        model = _CountingModel()
+        batcher = MicroBatcher(model, max_batch_size=8, max_wait_ms=0)
+        X = np.full((1, 20, 5), 3.0, dtype=np.float32)
+        
+        reg, probs = batcher.predict(X)
+        self.assertEqual(model.calls, [1])
+        self.assertEqual(reg[0, 0], 3.0)
+        self.assertEqual(batcher.predict_direction(X), 2)
+    
+    def test_concurrent_requests_are_batched(self):
+        """同時リクエストが1回の forward pass にまとめられ、結果が正しく振り分けられる"""
+        import threading
+        from antigravity.forecasting.batching import MicroBatcher
+        
+        model = _CountingModel()
+        n_threads = 8
+        batcher = MicroBatcher(model, max_batch_size=n_threads, max_wait_ms=500)
+        results = {}
+        barrier = threading.Barrier(n_threads)
+        
+        def worker(i):
+            X = np.full((1, 20, 5), float(i), dtype=np.float32)
+            barrier.wait()
+            reg, _ = batcher.predict(X)
+            results[i] = float(reg[0, 0])
+        
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=5)
+        
+        print(f"Batch calls: {model.calls}, stats={batcher.stats()}")
+        self.assertEqual(results, {i: float(i) for i in range(n_threads)})
+        self.assertEqual(sum(model.calls), n_threads)
+        self.assertLess(len(model.calls), n_threads)
+    
+    def test_errors_propagate_to_callers(self):
+        """モデル例外は全呼び出し元に伝播する"""
+        from antigravity.forecasting.batching import MicroBatcher
+        
+        class _FailingModel:
+            def predict(self, X):
+                raise RuntimeError("boom")
+        
+        batcher = MicroBatcher(_FailingModel(), max_batch_size=4, max_wait_ms=1)
+        with self.assertRaises(RuntimeError):
+            batcher.predict(np.zeros((1, 20, 5), dtype=np.float32))
+    
+    def test_registry_shares_models_by_path(self):
+        """同一パスのモデルはレジストリで共有される"""
+        import tempfile
+        import os
+        from antigravity.forecasting.batching import ModelRegistry
+        
+        registry = ModelRegistry(max_batch_size=4, max_wait_ms=1)
+        created = []
+        
+        def factory():
+            created.append(1)
+            return _CountingModel()
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'model.pt')
+            open(path, 'wb').close()
+            m1, b1 = registry.get('transformer', path, 'cpu', factory)
+            m2, b2 = registry.get('transformer', path, 'cpu', factory)
+            self.assertIs(m1, m2)
+            self.assertIs(b1, b2)
+        
+        # パスがないモデルは共有しない
+        m3, _ = registry.get('transformer', None, 'cpu', factory)
+        m4, _ = registry.get('transformer', None, 'cpu', factory)
+        self.assertIsNot(m3, m4)
+        self.assertEqual(len(created), 3)
+
+
+class TestBarRingBuffer(unittest.TestCase):
+    """バー履歴リングバッファのテスト"""
+    
+    @staticmethod
+    def _bar(i):
+        return {'Open': i, 'High': i + 1, 'Low': i - 1, 'Close': i + 0.5, 'Volume': 10 * i, 'Time': 60.0 * i}
+    
+    def test_order_and_wraparound(self):
+        """容量超過後も直近 capacity 本が古い順に並ぶ"""
+        from antigravity.core.ring_buffer import BarRingBuffer
+        
+        buf = BarRingBuffer(capacity=5)
+        for i in range(12):
+            buf.append(self._bar(i))
+        
+        self.assertEqual(len(buf), 5)
+        np.testing.assert_array_equal(buf.column('Open'), [7, 8, 9, 10, 11])
+        np.testing.assert_array_equal(buf.column('Close', 3), [9.5, 10.5, 11.5])
+        self.assertEqual(buf.last_time, 660.0)
+    
+    def test_view_is_zero_copy(self):
+        """view() は内部配列を共有する連続ビューを返す"""
+        from antigravity.core.ring_buffer import BarRingBuffer
+        
+        buf = BarRingBuffer(capacity=4)
+        for i in range(7):
+            buf.append(self._bar(i))
+        view = buf.view()
+        self.assertTrue(np.shares_memory(view, buf._data))
+        self.assertTrue(view.flags['C_CONTIGUOUS'])
+    
+    def test_replace_last_and_clear(self):
+        """replace_last() は件数を変えずに最新バーを置き換える"""
+        from antigravity.core.ring_buffer import BarRingBuffer
+        
+        buf = BarRingBuffer(capacity=3)
+        for i in range(4):
+            buf.append(self._bar(i))
+        buf.replace_last(self._bar(99))
+        self.assertEqual(len(buf), 3)
+        np.testing.assert_array_equal(buf.column('Open'), [1, 2, 99])
+        
+        buf.clear()
+        self.assertEqual(len(buf), 0)
+        self.assertIsNone(buf.last())
+
+
+
+class TestGarchPremiumCache(unittest.TestCase):
+    """GARCH プレミアムのキャッシュ（ディスク/プロセス内共有/追記分のみ fit）のテスト"""
+    
+    WINDOW = 10
+    
+    def setUp(self):
+        import tempfile
+        from antigravity.forecasting import garch
+        
+        self.garch = garch
+        self.fitted = []
+        self._orig_fit = garch.fit_premiums
+        
+        def fake_fit(returns, start, end, window, *args):
+            # 実際の GARCH fit の代わりに、ウィンドウに依存する決定的な値を返す
+            self.fitted.extend(range(start, end))
+            return np.array([returns[i - window:i].var() - returns[i] ** 2 for i in range(start, end)])
+        
+        garch.fit_premiums = fake_fit
+        garch.GarchPremiumCache.clear_shared()
+        self.dir = tempfile.mkdtemp()
+        rng = np.random.default_rng(3)
+        self.returns = pd.Series(rng.normal(0, 1, 40), index=pd.date_range('2024-01-01', periods=40, freq='D'))
+    
+    def tearDown(self):
+        self.garch.fit_premiums = self._orig_fit
+        self.garch.GarchPremiumCache.clear_shared()
+    
+    def test_cold_build_then_disk_hit(self):
+        cache = self.garch.GarchPremiumCache(self.dir)
+        dates, premiums = cache.premiums(self.returns, self.WINDOW)
+        self.assertEqual(self.fitted, list(range(self.WINDOW, 40)))
+        self.assertEqual(len(dates), 30)
+        
+        # プロセス内共有: 同じ日足は再計算しない
+        self.assertIs(cache.premiums(self.returns, self.WINDOW)[1], premiums)
+        
+        # 再起動相当: ディスクから読み込み、fit しない
+        self.garch.GarchPremiumCache.clear_shared()
+        self.fitted.clear()
+        _, reloaded = self.garch.GarchPremiumCache(self.dir).premiums(self.returns, self.WINDOW)
+        self.assertEqual(self.fitted, [])
+        np.testing.assert_array_equal(reloaded, premiums)
+    
+    def test_only_appended_days_are_fitted(self):
+        cache = self.garch.GarchPremiumCache(self.dir)
+        _, premiums = cache.premiums(self.returns.iloc[:35], self.WINDOW)
+        
+        self.garch.GarchPremiumCache.clear_shared()
+        self.fitted.clear()
+        _, extended = cache.premiums(self.returns, self.WINDOW)
+        self.assertEqual(self.fitted, list(range(35, 40)))
+        np.testing.assert_array_equal(extended[:len(premiums)], premiums)
+        
+        # 過去データが書き換わった場合は全体を再計算する
+        self.garch.GarchPremiumCache.clear_shared()
+        self.fitted.clear()
+        changed = self.returns.copy()
+        changed.iloc[20] += 1.0
+        cache.premiums(changed, self.WINDOW)
+        self.assertEqual(self.fitted, list(range(self.WINDOW, 40)))
+
+    def test_signal_lookup_exact_and_as_of(self):
+        """日付索引による完全一致 / as-of 参照が DataFrame の走査と一致する"""
+        import sys
+        from datetime import date, timedelta
+        from antigravity.forecasting.features import GARCHVolatilityFeature
+
+        try:
+            import arch  # noqa: F401
+        except ImportError:
+            sys.modules['arch'] = type(sys)('arch')  # fit_daily の import チェック用（fit は fake）
+            self.addCleanup(sys.modules.pop, 'arch')
+        feature = GARCHVolatilityFeature(rolling_window=self.WINDOW)
+        feature._signals_from_premiums = lambda p: np.sign(p).astype(int)
+        daily = pd.DataFrame(
+            {'Close': 100 * np.exp(np.cumsum(self.returns.to_numpy()) / 100)},
+            index=self.returns.index,
+        )
+        daily = daily[daily.index.dayofweek < 5]  # 週末を除く
+        table = feature.fit_daily(daily)
+
+        for d, sig in zip(table['Date'], table['GARCH_Signal']):
+            self.assertEqual(feature.get_signal_for_date(d), sig)
+            self.assertEqual(feature.get_signal_for_date(pd.Timestamp(d) + pd.Timedelta(hours=13)), sig)
+
+        # 週末: 完全一致では 0、as-of では直前の金曜のシグナル
+        last = table['Date'].iloc[-1]
+        saturday = next(d for d in table['Date'] if d.weekday() == 4) + timedelta(days=1)
+        friday_sig = int(table.loc[table['Date'] == saturday - timedelta(days=1), 'GARCH_Signal'].iloc[0])
+        self.assertEqual(feature.get_signal_for_date(saturday), 0)
+        self.assertEqual(feature.get_signal_for_date(saturday, as_of=True), friday_sig)
+        self.assertEqual(
+            feature.get_signal_for_date(last + timedelta(days=30), as_of=True),
+            int(table['GARCH_Signal'].iloc[-1]),
+        )
+        self.assertEqual(feature.get_signal_for_date(date(2000, 1, 1), as_of=True), 0)
+
+
+
+class TestGarchEngines(unittest.TestCase):
+    """GARCH 推定エンジン（warm / recursive）のテスト"""
+    
+    def setUp(self):
+        try:
+            import arch  # noqa: F401
+        except ImportError:
+            self.skipTest("arch not installed")
+        rng = np.random.default_rng(5)
+        self.returns = rng.standard_t(5, 130)
+    
+    def test_recursive_matches_fixed_parameter_filter(self):
+        """再推定しない日は、同じパラメータで arch のフィルタを回した1日先予測と一致する"""
+        from arch import arch_model
+        from antigravity.forecasting.garch import fit_premiums
+        
+        window = 100
+        r = self.returns
+        premiums = fit_premiums(r, window, window + 5, window, engine='recursive', refit_every=1000)
+        params = arch_model(r[:window], vol='Garch', p=1, q=3, rescale=False).fit(disp='off').params
+        for k in range(1, 5):
+            i = window + k
+            fixed = arch_model(r[:i], vol='Garch', p=1, q=3, rescale=False).fix(params)
+            expected_var = fixed.forecast(horizon=1).variance.iloc[-1, 0]
+            expected = (expected_var - r[i] ** 2) / r[i] ** 2
+            self.assertLess(abs(premiums[k] - expected), 1e-4 * max(1.0, abs(expected)))
+    
+    def test_warm_start_tracks_refit(self):
+        """warm は区間先頭では refit と同一で、以降も同じ傾向のプレミアムを返す"""
+        from antigravity.forecasting.garch import fit_premiums
+        
+        refit = fit_premiums(self.returns, 100, 110, 100, engine='refit')
+        warm = fit_premiums(self.returns, 100, 110, 100, engine='warm')
+        self.assertEqual(warm[0], refit[0])
+        self.assertGreater(np.corrcoef(warm, refit)[0, 1], 0.95)
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
 
@@ -0,0 +1,201 @@
+# LLM Response Cache
+# LLM 応答の永続キャッシュ（SQLite / WAL）
+#
+# 同じバー内のポーリングでは analyze_with_llm のプロンプトが同一（または丸めれば同一）に
+# なることが多い。正規化したプロンプトのハッシュをキーに応答を TTL 付きで保存し、
+# 再起動後も含めて同じ問い合わせを LM Studio に送らない。
+#
+# - キー: namespace（"trade" / "sentiment" など）+ 正規化テキストの SHA-256
+# - 丸め: MarketStateRounding（価格・ATR は有効桁数、確信度は刻み幅）で近い状態を同じキーにする
+# - エラー応答（"エラー:" で始まる）は保存しない
+# - metrics(): namespace ごとのヒット率と、ヒットで省いた LLM 呼び出し時間の合計
+#
+# プロセス内の共有インスタンスは configure_default_cache() で設定し、
+# default_cache() で取得する（SentimentAnalyzer もこれを使う）。
+
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+
+DEFAULT_TTL_SEC = 900.0
+# put() この回数ごとに期限切れの行を削除する
+PURGE_EVERY = 200
+ERROR_PREFIX = "エラー:"
+
+
+def round_sig(value: float, digits: int) -> float:
+    """有効桁数 digits に丸める（0 / 非有限値はそのまま）"""
+    if not value or not math.isfinite(value) or digits <= 0:
+        return value
+    return round(value, digits - 1 - int(math.floor(math.log10(abs(value)))))
+
+
+def normalize_text(text: str) -> str:
+    """空白の違いを無視する（前後の空白を除き、連続する空白を1つにまとめる）"""
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+@dataclass(frozen=True)
+class MarketStateRounding:
+    """キャッシュキー用の丸め規則（config.yaml の lm_studio.cache.rounding）"""
+
+    price_sig_digits: int = 6      # EMA などの価格（150.234 / 1.08345）
+    atr_sig_digits: int = 2        # ATR
+    confidence_step: float = 0.05  # モジュール確信度
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> "MarketStateRounding":
+        config = config or {}
+        defaults = cls()
+        return cls(
+            price_sig_digits=int(config.get("price_sig_digits", defaults.price_sig_digits)),
+            atr_sig_digits=int(config.get("atr_sig_digits", defaults.atr_sig_digits)),
+            confidence_step=float(config.get("confidence_step", defaults.confidence_step)),
+        )
+
+    def price(self, value) -> float:
+        return round_sig(_to_float(value), self.price_sig_digits)
+
+    def atr(self, value) -> float:
+        return round_sig(_to_float(value), self.atr_sig_digits)
+
+    def confidence(self, value) -> float:
+        step = self.confidence_step
+        value = _to_float(value)
+        return round(round(value / step) * step, 6) if step > 0 else value
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class LLMResponseCache:
+    """LLM 応答の TTL 付き永続キャッシュ（スレッドセーフ）"""
+
+    def __init__(self, path, ttl_sec: float = DEFAULT_TTL_SEC):
+        self.path = Path(path)
+        self.ttl_sec = float(ttl_sec)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, namespace TEXT NOT NULL, response TEXT NOT NULL,"
+            " created REAL NOT NULL, latency REAL NOT NULL)"
+        )
+        self._puts = 0
+        # namespace -> [hits, misses, saved_latency_sec]
+        self._stats: Dict[str, list] = {}
+
+    @staticmethod
+    def make_key(namespace: str, text: str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{namespace}:{digest}"
+
+    def _stat(self, namespace: str) -> list:
+        return self._stats.setdefault(namespace, [0, 0, 0.0])
+
+    def get(self, namespace: str, text: str, ttl_sec: Optional[float] = None) -> Optional[str]:
+        """TTL 内の応答を返す（なければ None）"""
+        ttl = self.ttl_sec if ttl_sec is None else ttl_sec
+        key = self.make_key(namespace, text)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created, latency FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            stat = self._stat(namespace)
+            if row is None or row[1] + ttl < time.time():
+                stat[1] += 1
+                return None
+            stat[0] += 1
+            stat[2] += row[2]
+            return row[0]
+
+    def put(self, namespace: str, text: str, response: str, latency_sec: float = 0.0) -> bool:
+        """応答を保存する（エラー応答は保存しない）。保存した場合 True"""
+        if not response or response.startswith(ERROR_PREFIX):
+            return False
+        key = self.make_key(namespace, text)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, namespace, response, created, latency) VALUES (?, ?, ?, ?, ?)",
+                (key, namespace, response, time.time(), float(latency_sec)),
+            )
+            self._puts += 1
+            if self._puts % PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl_sec,))
+        return True
+
+    def get_or_call(
+        self,
+        namespace: str,
+        text: str,
+        call: Callable[[], str],
+        ttl_sec: Optional[float] = None,
+    ) -> Tuple[str, bool]:
+        """キャッシュにあればそれを、なければ call() の結果を保存して返す。(応答, ヒットしたか)"""
+        cached = self.get(namespace, text, ttl_sec)
+        if cached is not None:
+            return cached, True
+        t0 = time.perf_counter()
+        response = call()
+        self.put(namespace, text, response, time.perf_counter() - t0)
+        return response, False
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            stats = {ns: list(v) for ns, v in self._stats.items()}
+        result = {}
+        for ns, (hits, misses, saved) in stats.items():
+            total = hits + misses
+            result[ns] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": hits / total if total else 0.0,
+                "saved_latency_sec": saved,
+            }
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache: Optional[LLMResponseCache] = None
+_default_lock = threading.Lock()
+
+
+def configure_default_cache(path, ttl_sec: float = DEFAULT_TTL_SEC) -> Optional[LLMResponseCache]:
+    """プロセス共有のキャッシュを設定する（path が空なら無効化）"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is not None and (not path or Path(path) != _default_cache.path):
+            _default_cache.close()
+            _default_cache = None
+        if path and _default_cache is None:
+            _default_cache = LLMResponseCache(path, ttl_sec)
+        elif _default_cache is not None:
+            _default_cache.ttl_sec = float(ttl_sec)
+        return _default_cache
+
+
+def default_cache() -> Optional[LLMResponseCache]:
+    """プロセス共有のキャッシュ（未設定時は環境変数 LLM_CACHE_PATH があればそれを使う）"""
+    if _default_cache is None and os.environ.get("LLM_CACHE_PATH"):
+        return configure_default_cache(
+            os.environ["LLM_CACHE_PATH"], float(os.environ.get("LLM_CACHE_TTL_SEC", DEFAULT_TTL_SEC))
+        )
+    return _default_cache
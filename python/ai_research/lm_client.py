@@ -1,16 +1,133 @@
 # LM Studio Client
 # ローカルLLMとの連携クライアント
+#
+# - モデルIDは TTL 付きでキャッシュし、接続エラー / モデル不一致（400, 404）で再取得する
+# - 同期版は keep-alive の requests.Session（コネクションプール）を共有する
+# - AsyncLMStudioClient は同期版の chat() を asyncio.to_thread で呼ぶ非同期版（接続プールを共有）。
+#   タスクをキャンセルすると待機を即座にやめる（実行中の HTTP 呼び出しは close() で待つ）
+# - timeout は config.yaml の lm_studio.timeout（秒 or {connect, read}）で指定する
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
 import requests
-from typing import Optional
+from requests.adapters import HTTPAdapter
+
+
+DEFAULT_CONNECT_TIMEOUT = 3.0
+DEFAULT_READ_TIMEOUT = 30.0
+MODEL_ID_TTL_SEC = 300.0
+FALLBACK_MODEL_ID = "local-model"
+
+TimeoutConfig = Union[None, float, int, Dict[str, Any], Tuple[float, float]]
+
+
+def parse_timeout(value: TimeoutConfig) -> Tuple[float, float]:
+    """
+    lm_studio.timeout を (connect, read) 秒に変換する。
+
+    - 数値: read タイムアウト（connect は DEFAULT_CONNECT_TIMEOUT と read の小さい方）
+    - {connect: 3, read: 30} / (3, 30): それぞれ指定
+    """
+    if value is None:
+        return DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+    if isinstance(value, dict):
+        read = float(value.get("read", DEFAULT_READ_TIMEOUT))
+        return float(value.get("connect", min(DEFAULT_CONNECT_TIMEOUT, read))), read
+    if isinstance(value, (tuple, list)):
+        return float(value[0]), float(value[1])
+    read = float(value)
+    return min(DEFAULT_CONNECT_TIMEOUT, read), read
+
+
+def _pick_model_id(models_data: Dict) -> str:
+    """/v1/models の応答から埋め込み以外の最初のモデルを選ぶ"""
+    for model in models_data.get("data", []):
+        m_id = model.get("id", "")
+        if "embed" not in str(m_id).lower():
+            return m_id
+    return FALLBACK_MODEL_ID
+
+
+def _build_messages(prompt: str, system_prompt: Optional[str]) -> List[Dict[str, str]]:
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
+class _ModelIdCache:
+    """TTL 付きのモデルIDキャッシュ（スレッドセーフ）"""
+
+    def __init__(self, ttl: float = MODEL_ID_TTL_SEC):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._model_id: Optional[str] = None
+        self._expires = 0.0
+
+    def get(self) -> Optional[str]:
+        with self._lock:
+            if self._model_id is not None and time.monotonic() < self._expires:
+                return self._model_id
+            return None
+
+    def set(self, model_id: str) -> None:
+        with self._lock:
+            self._model_id = model_id
+            self._expires = time.monotonic() + self.ttl
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._model_id = None
+            self._expires = 0.0
 
 
 class LMStudioClient:
     """LM Studio APIクライアント"""
 
-    def __init__(self, base_url: str = "http://localhost:1234"):
-        self.base_url = base_url
-        self.api_url = f"{base_url}/v1/chat/completions"
+    def __init__(
+        self,
+        base_url: str = "http://localhost:1234",
+        timeout: TimeoutConfig = None,
+        model_id_ttl: float = MODEL_ID_TTL_SEC,
+        pool_size: int = 8,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_url = f"{self.base_url}/v1/chat/completions"
+        self.models_url = f"{self.base_url}/v1/models"
+        self.timeout = parse_timeout(timeout)
+        self._model_cache = _ModelIdCache(model_id_ttl)
+        self._refresh_lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get_model_id(self, refresh: bool = False) -> str:
+        """モデルIDを取得（TTL 内はキャッシュ。取得失敗時はキャッシュしない）"""
+        if not refresh:
+            cached = self._model_cache.get()
+            if cached is not None:
+                return cached
+        # 同時にキャッシュが切れたスレッドのうち1つだけが /v1/models を呼ぶ
+        with self._refresh_lock:
+            if not refresh:
+                cached = self._model_cache.get()
+                if cached is not None:
+                    return cached
+            try:
+                models_response = self.session.get(self.models_url, timeout=self.timeout)
+                if models_response.status_code == 200:
+                    model_id = _pick_model_id(models_response.json())
+                    self._model_cache.set(model_id)
+                    return model_id
+            except Exception:
+                pass
+            self._model_cache.invalidate()
+            return FALLBACK_MODEL_ID
 
     def chat(
         self,
@@ -21,46 +138,37 @@ class LMStudioClient:
     ) -> str:
         """LLMにプロンプトを送信してレスポンスを取得"""
 
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        messages.append({"role": "user", "content": prompt})
-
-        # モデルIDを動的に取得
-        try:
-            models_response = requests.get(f"{self.base_url}/v1/models", timeout=10)
-            if models_response.status_code == 200:
-                models_data = models_response.json()
-                model_id = "local-model"
-                for model in models_data.get("data", []):
-                    m_id = model.get("id", "")
-                    if "embed" not in str(m_id).lower():
-                        model_id = m_id
-                        break
-            else:
-                model_id = "local-model"
-        except Exception:
-            model_id = "local-model"
-
         payload = {
-            "model": model_id,
-            "messages": messages,
+            "model": self.get_model_id(),
+            "messages": _build_messages(prompt, system_prompt),
             "temperature": temperature,
             "max_tokens": max_tokens,
         }
 
         try:
-            response = requests.post(self.api_url, json=payload, timeout=30)
+            response = self.session.post(self.api_url, json=payload, timeout=self.timeout)
+            if response.status_code in (400, 404):
+                # モデルの入れ替え等でキャッシュが古い可能性: 取り直して1回だけ再送
+                model_id = self.get_model_id(refresh=True)
+                if model_id != payload["model"]:
+                    payload["model"] = model_id
+                    response = self.session.post(self.api_url, json=payload, timeout=self.timeout)
             if response.status_code != 200:
                 return f"エラー: {response.status_code} - {response.text}"
 
             result = response.json()
             return result["choices"][0]["message"]["content"]
         except requests.exceptions.ConnectionError:
+            self._model_cache.invalidate()
             return "エラー: LM Studioが起動していません。localhost:1234 を確認してください。"
+        except requests.exceptions.Timeout:
+            return f"エラー: timeout ({self.timeout[1]:g}s)"
         except Exception as e:
             return f"エラー: {str(e)}"
 
+    def close(self) -> None:
+        self.session.close()
+
     def analyze_market(self, event_data: str) -> str:
         system_prompt = """あなたはFX市場の専門アナリストです。
 経済イベントが為替市場に与える影響を分析し、以下の形式で回答してください：
@@ -80,3 +188,59 @@ class LMStudioClient:
 - リスク管理の改善点"""
 
         return self.chat(trade_data, system_prompt, temperature=0.5)
+
+
+class AsyncLMStudioClient:
+    """
+    LM Studio APIの非同期クライアント（LMStudioClient をワーカースレッドで呼ぶ）
+
+    モデルIDキャッシュと keep-alive の接続プールは内部の LMStudioClient のものを使う。
+    chat() を実行中のタスクがキャンセルされると、応答を待たずに CancelledError を送出する。
+    スレッド側の HTTP 呼び出しは止められないため（read タイムアウトまでには終わる）、
+    結果は捨て、close() はそれらの完了を待ってからセッションを閉じる。
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:1234",
+        timeout: TimeoutConfig = None,
+        model_id_ttl: float = MODEL_ID_TTL_SEC,
+        pool_size: int = 8,
+    ):
+        self._client = LMStudioClient(base_url, timeout, model_id_ttl, pool_size)
+        self.base_url = self._client.base_url
+        self._inflight: Set[asyncio.Future] = set()
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return self._client.timeout
+
+    @timeout.setter
+    def timeout(self, value: TimeoutConfig) -> None:
+        self._client.timeout = parse_timeout(value)
+
+    async def _call(self, func, *args):
+        call = asyncio.ensure_future(asyncio.to_thread(func, *args))
+        self._inflight.add(call)
+        call.add_done_callback(self._inflight.discard)
+        # キャンセルされても call 自体は止めない（スレッドが使っている接続を close() で閉じないため）
+        return await asyncio.shield(call)
+
+    async def get_model_id(self, refresh: bool = False) -> str:
+        return await self._call(self._client.get_model_id, refresh)
+
+    async def chat(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+    ) -> str:
+        """LLMにプロンプトを送信してレスポンスを取得（非同期）"""
+        return await self._call(self._client.chat, prompt, system_prompt, temperature, max_tokens)
+
+    async def close(self) -> None:
+        """実行中の呼び出し（キャンセル済みを含む）の完了を待ってからセッションを閉じる"""
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        self._client.close()
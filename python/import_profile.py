@@ -0,0 +1,90 @@
+"""
+import 時間プロファイル
+
+`python -X importtime` で対象モジュールを新しいプロセスに import し、
+累積時間の大きいモジュールとトップレベルパッケージ別の内訳を表示する。
+コールドスタートで何が読み込まれているか（torch/scipy 等）の確認用。
+
+Usage:
+    python import_profile.py                               # inference_server_7module
+    python import_profile.py antigravity.core.orchestrator --top 30
+    python import_profile.py inference_server_7module --init   # SevenModuleAnalyzer 生成まで計測
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+
+PYTHON_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(PYTHON_DIR)
+
+
+def _child_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (REPO_ROOT, env.get("PYTHONPATH", "")) if p)
+    # 統一ロガーの出力先（既定は Windows パス）を一時ディレクトリに逃がす
+    env.setdefault("MT4_FILES_PATH", os.path.join(tempfile.gettempdir(), "import_profile_logs"))
+    return env
+
+
+def profile(code: str) -> Tuple[float, List[Tuple[str, int, int]]]:
+    """
+    新しいプロセスで code を実行し、(wall 秒, [(module, self_us, cumulative_us), ...]) を返す。
+    """
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PYTHON_DIR, env=_child_env(), capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cum_us)))
+    return wall, rows
+
+
+def by_package(rows: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    """トップレベルパッケージ別の self 時間合計（マイクロ秒）"""
+    totals: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in rows:
+        totals[name.split(".", 1)[0]] += self_us
+    return dict(totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile (-X importtime)")
+    parser.add_argument("target", nargs="?", default="inference_server_7module")
+    parser.add_argument("--top", type=int, default=20, help="Number of modules/packages to show")
+    parser.add_argument("--init", action="store_true", help="Also construct SevenModuleAnalyzer (default preset)")
+    args = parser.parse_args()
+
+    code = f"import {args.target}"
+    if args.init:
+        code += "; import inference_server_7module as m; m.SevenModuleAnalyzer()"
+    wall, rows = profile(code)
+    total_us = sum(r[1] for r in rows)
+
+    print(f"target={args.target} wall={wall:.3f}s import_total={total_us / 1e6:.3f}s modules={len(rows)}")
+    print(f"\nTop {args.top} by cumulative time:")
+    for name, self_us, cum_us in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"  {cum_us / 1000:>9.1f} ms  (self {self_us / 1000:>7.1f} ms)  {name}")
+
+    print(f"\nTop {args.top} packages by self time:")
+    for pkg, us in sorted(by_package(rows).items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {us / 1000:>9.1f} ms  {pkg}")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,7 @@ MT4 7-Module Inference Server
 - antigravity (20%): VPIN/GK-Vol/VWAP-Gap ★NEW
 """
 
+import copy
 import os
 import sys
 import time
@@ -27,7 +28,7 @@ import tempfile
 import re
 import numpy as np
 import threading
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
 from typing import Tuple, Dict, List, Optional, Any
 
@@ -37,35 +38,29 @@ sys.path.insert(0, str(Path(__file__).parent))
 # 統一ロガーをインポート
 from common.logger import get_inference_logger
 from ai_research.lm_client import LMStudioClient
+from ai_research.llm_cache import (
+    DEFAULT_TTL_SEC as DEFAULT_LLM_CACHE_TTL_SEC,
+    MarketStateRounding,
+    configure_default_cache,
+)
+from request_dispatcher import BridgeRequest, TerminalDispatcher
+from trade_history import TradeHistory
+from llm_advisor import LLMAdvisor, MODES as LLM_ADVISORY_MODES
+from status_heartbeat import StatusHeartbeat
 
-# 9モジュールをインポート（7コアモジュール + PullbackModule + VolatilityModule）
 from signal_engine.signal_aggregator import SignalAggregator, ModuleScore
 from signal_engine.extended_aggregator import ExtendedSignalAggregator, AntigravityAdapter
-from modules import (
-    CandlePatternsModule,
-    ChartPatternsModule,
-    FalseBreakoutModule,
-    WaveStructureModule,
-    StructuralModule,
-    TechnicalModule,
-    TrendModule,
-    VolatilityModule,
-    PullbackModule,
-    PullbackEMAReference,
-    # ★NEW: 金融工学モジュール
-    MomentumModule,
-    MeanReversionModule,
-    VolatilityBreakoutModule,
-)
+# 9モジュール（7コアモジュール + PullbackModule + VolatilityModule）+ 金融工学モジュール
+# 各モジュールはプリセットで有効なものだけを初回アクセス時に import/生成する
+import modules
 
 # ★NEW: 戦略プリセット
 from strategy_presets import (
     get_preset, 
-    get_atr_threshold, 
     get_enabled_modules,
-    is_index_symbol,
     STRATEGY_PRESETS
 )
+from symbol_profiles import SymbolProfileTable
 
 # ★NEW: Antigravity Orchestrator（Transformer/KAN/VPIN/GARCH統合）
 def _extend_sys_path_for_antigravity() -> None:
@@ -107,150 +102,145 @@ def _extend_sys_path_for_antigravity() -> None:
 
 
 _extend_sys_path_for_antigravity()
-try:
-    from antigravity.core.orchestrator import AntigravityOrchestrator
-    ANTIGRAVITY_AVAILABLE = True
-except ImportError as e:
-    ANTIGRAVITY_AVAILABLE = False
-    print(f"[WARNING] Antigravity not available: {e}")
+
+# Antigravity スタック（torch/pandas 等）は use_antigravity=True のときに初めて読み込む
+# None = 未確認
+ANTIGRAVITY_AVAILABLE: Optional[bool] = None
+
+
+def _load_antigravity() -> bool:
+    """Antigravity を import する（初回のみ）。利用可能なら True"""
+    global ANTIGRAVITY_AVAILABLE, AntigravityOrchestrator, ModelRegistry, SnapshotStore
+    if ANTIGRAVITY_AVAILABLE is None:
+        try:
+            from antigravity.core.orchestrator import AntigravityOrchestrator
+            from antigravity.forecasting.batching import ModelRegistry
+            from antigravity.core.snapshot import SnapshotStore
+            ANTIGRAVITY_AVAILABLE = True
+        except ImportError as e:
+            ANTIGRAVITY_AVAILABLE = False
+            print(f"[WARNING] Antigravity not available: {e}")
+    return ANTIGRAVITY_AVAILABLE
+
 
 logger = get_inference_logger()
 
 
+class _LazyModule:
+    """
+    分析モジュールを初回アクセス時に factory(analyzer) で生成し、インスタンスにキャッシュする。
+    2回目以降はインスタンス属性が直接参照される（オーバーヘッドなし）。
+    """
+    
+    def __init__(self, factory):
+        self.factory = factory
+    
+    def __set_name__(self, owner, name):
+        self.name = name
+    
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = self.factory(obj)
+        obj.__dict__[self.name] = value
+        return value
+
+
 class BrainAdapter:
-    """Brain (AI Market Dashboard) との連携アダプター"""
+    """Brain (AI Market Dashboard) との連携アダプター
+
+    plans ディレクトリを1回走査して当日のアクティブなプランを銘柄ごとに索引化し、
+    リクエスト経路では dict を引くだけにする。索引はディレクトリの mtime（check_interval 秒ごとに
+    確認）・日付の変更・cache_ttl 経過（上書き保存で mtime が変わらない場合の保険）で作り直す。
+    """
     
-    def __init__(self, data_dir: str, enabled: bool = True, veto_mode: bool = True):
+    def __init__(self, data_dir: str, enabled: bool = True, veto_mode: bool = True,
+                 plans_dir: str = None, check_interval: float = 1.0):
         self.enabled = enabled
         self.veto_mode = veto_mode
-        self.plans_dir = Path(data_dir) / "plans"
-        self.cached_plan = None
-        self.cache_time = 0
-        self.cache_ttl = 60  # 1分キャッシュ
+        self.plans_dir = Path(plans_dir) if plans_dir else Path(data_dir) / "plans"
+        self.cache_ttl = 60  # 変更が検知できなくても1分で作り直す
+        self.check_interval = check_interval
+        # 索引（作り直すときは丸ごと差し替える）
+        self._plans: Dict[str, Dict] = {}      # ファイル名の銘柄部分 -> プラン
+        self._lookup: Dict[str, Optional[Dict]] = {}  # 問い合わせシンボル -> プラン（ミスも記録）
+        self._index_key = None                 # (ディレクトリ mtime, 日付)
+        self._index_expires = 0.0
+        self._next_check = 0.0
+        self._refresh_lock = threading.Lock()
+        self.rebuilds = 0
         
         if self.enabled:
             logger.info(f"★ Brain Integration ENABLED (dir={self.plans_dir}, veto={veto_mode})")
         else:
             logger.info("Brain Integration DISABLED")
 
-    def get_plan(self, symbol: str) -> Optional[Dict]:
-        """指定されたシンボルの最新のアクティブなプランを取得"""
-        if not self.enabled:
-            return None
-            
-        current_time = time.time()
-        # キャッシュ有効期限切れ、またはシンボル切り替え時（簡易実装のため毎回チェック推奨だが負荷軽減）
-        # ファイルアクセスはそこまで重くないので、TTL内ならメモリキャッシュを返す
-        if self.cached_plan and (current_time - self.cache_time < self.cache_ttl):
-            if self.cached_plan.get('asset') == symbol:
-                return self.cached_plan
+    def invalidate(self) -> None:
+        """次の get_plan で索引を作り直す（ファイル監視のイベントから呼ぶ）"""
+        self._index_key = None
+        self._next_check = 0.0
 
-        try:
-            if not self.plans_dir.exists():
-                return None
-                
-            # 今日の日付のプランを探す (e.g., plan_2025-12-16_USDJPY.json)
+    def _refresh(self, now: float) -> None:
+        with self._refresh_lock:
+            if now < self._next_check:
+                return
             today_str = datetime.now().strftime('%Y-%m-%d')
-            # ファイル名パターン検索
-            # symbolが "USDJPY" の場合、"USDJPY" を含むファイルを探す
-            candidates = list(self.plans_dir.glob(f"plan_{today_str}_*.json"))
-            
-            target_plan = None
-            for p in candidates:
-                if symbol in p.name:
-                    with open(p, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        # status check (activeかどうか)
-                        if data.get('status') == 'active' or data.get('status') is None:
-                            target_plan = data
-                            break
-            
-            if target_plan:
-                self.cached_plan = target_plan
-                self.cache_time = current_time
-                return target_plan
-                
-        except Exception as e:
-            logger.error(f"Brain plan load error: {e}")
-            
-        return None
-
-
-class TradeHistory:
-    """トレード履歴管理（ログ学習用）"""
-    
-    def __init__(self, history_file: Path):
-        self.history_file = history_file
-        self.trades: List[Dict] = []
-        self._load_history()
-    
-    def _load_history(self):
-        """履歴ファイルを読み込み"""
-        if self.history_file.exists():
             try:
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    self.trades = json.load(f)
-                logger.info(f"Loaded {len(self.trades)} trades from history")
-            except Exception as e:
-                logger.error(f"Failed to load history: {e}")
-                self.trades = []
-    
-    def _save_history(self):
-        """履歴ファイルに保存"""
+                mtime = os.stat(self.plans_dir).st_mtime_ns
+            except OSError:
+                mtime = None
+            key = (mtime, today_str)
+            if key != self._index_key or now >= self._index_expires:
+                self._plans = self._scan(today_str) if mtime is not None else {}
+                self._lookup = {}
+                self._index_key = key
+                self._index_expires = now + self.cache_ttl
+                self.rebuilds += 1
+            self._next_check = now + self.check_interval
+
+    def _scan(self, today_str: str) -> Dict[str, Dict]:
+        """今日の日付のアクティブなプランを読み込む (e.g., plan_2025-12-16_USDJPY.json)"""
+        prefix = f"plan_{today_str}_"
+        plans = {}
         try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.trades, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            logger.error(f"Failed to save history: {e}")
-    
-    def add_signal(self, symbol: str, timeframe: str, signal: int, 
-                   confidence: float, reason: str, market_data: Dict,
-                   module_breakdown: Dict = None):
-        """シグナル発生を記録"""
-        trade = {
-            'timestamp': datetime.now().isoformat(),
-            'symbol': symbol,
-            'timeframe': timeframe,
-            'signal': signal,
-            'signal_name': {1: 'BUY', -1: 'SELL', 0: 'WAIT'}[signal],
-            'confidence': confidence,
-            'reason': reason,
-            'market_data': market_data,
-            'module_breakdown': module_breakdown,
-            'result': None,
-            'pips': None
-        }
-        self.trades.append(trade)
-        self._save_history()
-        return len(self.trades) - 1
-    
-    def get_win_rate(self, symbol: str, signal: int, 
-                     ema_bullish: bool, lookback_days: int = 30) -> Tuple[float, int]:
-        """勝率を計算"""
-        cutoff = datetime.now() - timedelta(days=lookback_days)
-        wins = 0
-        total = 0
-        
-        for trade in self.trades:
+            names = sorted(
+                entry.name for entry in os.scandir(self.plans_dir)
+                if entry.name.startswith(prefix) and entry.name.endswith(".json")
+            )
+        except OSError as e:
+            logger.error(f"Brain plan load error: {e}")
+            return plans
+        for name in names:
             try:
-                trade_time = datetime.fromisoformat(trade['timestamp'])
-                if trade_time < cutoff:
-                    continue
-            except:
+                with open(self.plans_dir / name, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                logger.error(f"Brain plan load error: {name}: {e}")
                 continue
-            
-            if (trade['symbol'] == symbol and 
-                trade['signal'] == signal and
-                trade.get('result') is not None):
-                md = trade.get('market_data', {})
-                trade_ema_bullish = float(md.get('ema12', 0)) > float(md.get('ema25', 0))
-                if trade_ema_bullish == ema_bullish:
-                    total += 1
-                    if trade['result'] == 'win':
-                        wins += 1
+            # status check (activeかどうか)
+            if data.get('status') == 'active' or data.get('status') is None:
+                plans[name[len(prefix):-len(".json")]] = data
+        return plans
+
+    def get_plan(self, symbol: str) -> Optional[Dict]:
+        """指定されたシンボルの最新のアクティブなプランを取得"""
+        if not self.enabled:
+            return None
         
-        win_rate = wins / total if total > 0 else 0.5
-        return win_rate, total
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._refresh(now)
+        
+        lookup = self._lookup
+        if symbol in lookup:
+            return lookup[symbol]
+        plans = self._plans
+        plan = plans.get(symbol)
+        if plan is None and symbol:
+            # ファイル名に symbol を含むプラン（ブローカー接尾辞付きのファイル名など）
+            plan = next((p for asset, p in plans.items() if symbol in asset), None)
+        lookup[symbol] = plan
+        return plan
 
 
 class SevenModuleAnalyzer:
@@ -268,6 +258,76 @@ class SevenModuleAnalyzer:
     - full: 全モジュール有効
     """
     
+    # 7コアモジュール
+    candle_patterns = _LazyModule(lambda self: modules.CandlePatternsModule(min_confidence=0.5))
+    chart_patterns = _LazyModule(lambda self: modules.ChartPatternsModule())
+    false_breakout = _LazyModule(lambda self: modules.FalseBreakoutModule())
+    technical = _LazyModule(lambda self: modules.TechnicalModule())
+    trend = _LazyModule(lambda self: modules.TrendModule())
+    wave_structure = _LazyModule(lambda self: modules.WaveStructureModule())
+    structural = _LazyModule(lambda self: modules.StructuralModule())
+    
+    # ★NEW: PullbackModule（EA_PullbackEntryロジック移植）
+    pullback = _LazyModule(lambda self: modules.PullbackModule(
+        ema_short=12,
+        ema_mid=25,
+        ema_long=100,
+        require_perfect_order=True,
+        pullback_lookback=5,
+        pullback_ema=modules.PullbackEMAReference.EMA_25,
+        use_touch=True,
+        use_cross=True,
+        use_break=False,
+        use_roundnumber=False,  # デフォルトはOFF
+        use_adx_filter=False,
+        pip_size=0.01,  # 後で銘柄に応じて調整
+        is_index=False
+    ))
+    
+    # ボラティリティモジュール（補助フィルター）
+    volatility_fx = _LazyModule(lambda self: modules.VolatilityModule(
+        atr_period=14,
+        threshold_pips=self.atr_threshold_fx,
+        is_index=False
+    ))
+    volatility_index = _LazyModule(lambda self: modules.VolatilityModule(
+        atr_period=14,
+        threshold_pips=self.atr_threshold_index,
+        is_index=True
+    ))
+    
+    # ★NEW: 金融工学モジュール（クオンツ戦略）
+    momentum = _LazyModule(lambda self: modules.MomentumModule(
+        short_period=5,
+        medium_period=20,
+        long_period=60,
+        threshold=0.005
+    ))
+    mean_reversion = _LazyModule(lambda self: modules.MeanReversionModule(
+        lookback=20,
+        entry_threshold=2.0
+    ))
+    volatility_breakout = _LazyModule(lambda self: modules.VolatilityBreakoutModule(
+        atr_period=14,
+        k_factor=0.5
+    ))
+    
+    # enabled_modules のキー -> 分析モジュール属性
+    MODULE_ATTRS = {
+        'candle_patterns': ('candle_patterns',),
+        'chart_patterns': ('chart_patterns',),
+        'false_breakout': ('false_breakout',),
+        'technical': ('technical',),
+        'trend': ('trend',),
+        'wave_structure': ('wave_structure',),
+        'structural': ('structural',),
+        'pullback': ('pullback',),
+        'volatility': ('volatility_fx', 'volatility_index'),
+        'momentum': ('momentum',),
+        'mean_reversion': ('mean_reversion',),
+        'volatility_breakout': ('volatility_breakout',),
+    }
+    
     def __init__(self, 
                  atr_threshold_fx: float = 7.0,
                  atr_threshold_index: float = 70.0,
@@ -283,6 +343,11 @@ class SevenModuleAnalyzer:
                  kan_model_paths: dict = None,
                  daily_data_path: str = None,
                  max_position: int = 2,
+                 batch_max_size: int = 16,
+                 batch_max_wait_ms: float = 0.0,
+                 model_precision: str = 'fp32',
+                 snapshot_dir: str = None,
+                 snapshot_interval_sec: float = 60.0,
                  hedge_mode: bool = False,
                  hedge_skip_trend: bool = True,
                  hedge_prioritize_mr: bool = True,
@@ -303,6 +368,11 @@ class SevenModuleAnalyzer:
             transformer_model_path: Transformerモデルのパス
             kan_model_path: KANモデルのパス
             daily_data_path: GARCH用日足データのパス
+            batch_max_size: モデル推論マイクロバッチの最大行数
+            batch_max_wait_ms: マイクロバッチの最大待ち時間（0でバッチング無効）
+            model_precision: 推論精度 ('fp32', 'int8'=動的int8量子化・CPU推論)
+            snapshot_dir: Orchestrator状態スナップショットの保存先（未指定で無効）
+            snapshot_interval_sec: スナップショットの保存間隔（秒）
             hedge_mode: ヘッジモード有効化（PullbackEntry補完）
             hedge_skip_trend: トレンド相場でエントリースキップ
             hedge_prioritize_mr: Mean Reversionシグナル優先
@@ -327,108 +397,61 @@ class SevenModuleAnalyzer:
             logger.info(f"★ Hedge Mode ENABLED (skip_trend={hedge_skip_trend}, mr_priority={hedge_prioritize_mr}, min_conf={hedge_min_confidence})")
             
         # Brain初期化
-        self.brain = BrainAdapter(data_dir=data_dir, enabled=brain_enabled, veto_mode=brain_veto_mode)
-        
-        # 7コアモジュール初期化
-        self.candle_patterns = CandlePatternsModule(min_confidence=0.5)
-        self.chart_patterns = ChartPatternsModule()
-        self.false_breakout = FalseBreakoutModule()
-        self.technical = TechnicalModule()
-        self.trend = TrendModule()
-        self.wave_structure = WaveStructureModule()
-        self.structural = StructuralModule()
-        
-        # ★NEW: PullbackModule（EA_PullbackEntryロジック移植）
-        self.pullback = PullbackModule(
-            ema_short=12,
-            ema_mid=25,
-            ema_long=100,
-            require_perfect_order=True,
-            pullback_lookback=5,
-            pullback_ema=PullbackEMAReference.EMA_25,
-            use_touch=True,
-            use_cross=True,
-            use_break=False,
-            use_roundnumber=False,  # デフォルトはOFF
-            use_adx_filter=False,
-            pip_size=0.01,  # 後で銘柄に応じて調整
-            is_index=False
-        )
+        self.brain = BrainAdapter(data_dir=data_dir, enabled=brain_enabled, veto_mode=brain_veto_mode,
+                                  plans_dir=brain_plan_dir)
         
         # ボラティリティモジュール（補助フィルター）
         # ATR閾値（デフォルト + 銘柄別上書き）
         self.atr_threshold_fx = float(atr_threshold_fx)
         self.atr_threshold_index = float(atr_threshold_index)
         self.symbol_atr_thresholds = symbol_atr_thresholds or {}
-        self._symbol_atr_thresholds_norm: Dict[str, float] = {}
-        if isinstance(self.symbol_atr_thresholds, dict):
-            for k, v in self.symbol_atr_thresholds.items():
-                if k is None:
-                    continue
-                kk = str(k).strip().upper()
-                if not kk:
-                    continue
-                try:
-                    vv = float(v)
-                except Exception:
-                    continue
-                self._symbol_atr_thresholds_norm[kk] = vv
-
-        self.volatility_fx = VolatilityModule(
-            atr_period=14,
-            threshold_pips=self.atr_threshold_fx,
-            is_index=False
-        )
-        self.volatility_index = VolatilityModule(
-            atr_period=14,
-            threshold_pips=self.atr_threshold_index,
-            is_index=True
-        )
-        
-        # ★NEW: 金融工学モジュール（クオンツ戦略）
-        self.momentum = MomentumModule(
-            short_period=5,
-            medium_period=20,
-            long_period=60,
-            threshold=0.005
-        )
-        self.mean_reversion = MeanReversionModule(
-            lookback=20,
-            entry_threshold=2.0
-        )
-        self.volatility_breakout = VolatilityBreakoutModule(
-            atr_period=14,
-            k_factor=0.5
-        )
 
-        if self._symbol_atr_thresholds_norm:
-            keys = sorted(self._symbol_atr_thresholds_norm.keys())
-            suffix = "..." if len(keys) > 10 else ""
-            logger.info(f"ATR symbol overrides loaded: {keys[:10]}{suffix}")
+        # プリセットで有効なモジュールだけを起動時に生成する（無効なモジュールは import もしない）
+        self._warm_enabled_modules()
+        # 銘柄ごとの設定（pip サイズ・ATR 閾値）を反映したモジュールのコピー（作成後は書き換えない）
+        self._module_variants: Dict[tuple, Any] = {}
 
         # ★NEW: 拡張シグナルアグリゲーター（戦略パターン対応）
         self.strategy = strategy
         self.aggregator = ExtendedSignalAggregator(strategy=strategy)
 
         # ★NEW: Antigravity Orchestrator（Transformer/KAN/VPIN/GARCH）
-        self.use_antigravity = use_antigravity and ANTIGRAVITY_AVAILABLE
+        self.use_antigravity = use_antigravity and _load_antigravity()
         self._ag_model_type = model_type
         self._ag_daily_data_path = daily_data_path
         self._ag_max_position = max_position
+        self._ag_precision = model_precision
         self._ag_transformer_default_path = transformer_model_path
         self._ag_kan_default_path = kan_model_path
         self._ag_transformer_model_paths = transformer_model_paths if isinstance(transformer_model_paths, dict) else {}
         self._ag_kan_model_paths = kan_model_paths if isinstance(kan_model_paths, dict) else {}
-        self._ag_orchestrators: Dict[str, AntigravityOrchestrator] = {}
+        self._ag_orchestrators: Dict[str, 'AntigravityOrchestrator'] = {}
         self._ag_orchestrator_specs: Dict[str, Dict[str, Any]] = {}
         self._ag_lock = threading.Lock()
+        # 構築中の Orchestrator ごとのロック（GARCH の初回 fit 等を _ag_lock の外で行う）
+        self._ag_build_locks: Dict[str, threading.Lock] = {}
+        # 同一モデルファイルを共有し、同時推論をマイクロバッチ化する
+        self._ag_model_registry = (
+            ModelRegistry(max_batch_size=batch_max_size, max_wait_ms=batch_max_wait_ms)
+            if self.use_antigravity else None
+        )
+        # 再起動時に bar 履歴/VPIN/インベントリを復元するためのスナップショット
+        self._ag_snapshots = (
+            SnapshotStore(snapshot_dir) if self.use_antigravity and snapshot_dir else None
+        )
+        self._ag_snapshot_interval = float(snapshot_interval_sec)
+        self._ag_snapshot_times: Dict[str, float] = {}
+
+        # 銘柄ごとの正規化・pip サイズ・ATR 閾値・モデルパス（リクエスト経路では dict を引くだけ）
+        self.rebuild_symbol_profiles()
 
         if self.use_antigravity:
             # NOTE: 複数銘柄を同一プロセスで回す場合、Orchestrator の内部状態（bar_history 等）は銘柄ごとに分離が必須。
             # 遅延初期化 + (symbol,timeframe) キャッシュで対応。
             logger.info(
                 "Antigravity Orchestrator enabled: per-symbol/timeframe cache mode "
-                f"(model_type={self._ag_model_type})"
+                f"(model_type={self._ag_model_type}, precision={model_precision}, batch_max_size={batch_max_size}, "
+                f"batch_max_wait_ms={batch_max_wait_ms})"
             )
 
         modules_count = "9+Antigravity" if self.use_antigravity else "9"
@@ -438,127 +461,105 @@ class SevenModuleAnalyzer:
             f"SymbolOverrides={len(self.symbol_atr_thresholds)})"
         )
 
-    @staticmethod
-    def _normalize_symbol_candidates(symbol: str) -> List[str]:
-        raw = (symbol or "").strip().upper()
-        candidates: List[str] = []
-        if raw:
-            candidates.append(raw)
-
-        # 'JP225.mt4' のようなケースに対応
-        if raw and '.' in raw:
-            base = raw.split('.', 1)[0].strip()
-            if base and base not in candidates:
-                candidates.append(base)
-
-        # よくある別名（最低限）
-        aliases = {
-            "US100": "NQ100",
-            "NAS100": "NQ100",
-        }
-        for c in list(candidates):
-            if c in aliases:
-                a = aliases[c]
-                if a not in candidates:
-                    candidates.append(a)
-        return candidates
+    def _warm_enabled_modules(self) -> None:
+        """有効なモジュールを生成しておく（初回リクエストで import/生成コストを払わないため）"""
+        for key, enabled in self.enabled_modules.items():
+            if enabled:
+                for attr in self.MODULE_ATTRS.get(key, ()):
+                    getattr(self, attr)
 
-    @staticmethod
-    def _normalize_symbol_for_logic(symbol: str) -> str:
-        """銘柄判定・閾値参照など“ロジック側”で使う正規化。
+    def _module_for(self, attr: str, **overrides) -> Any:
+        """attr のモジュールに overrides を設定したコピーを返す（設定の組ごとにキャッシュ）
 
-        - MT4の 'JP225.mt4' のような接尾辞を落とす
-        - MT5の 'US100' を内部基準の 'NQ100' に寄せる
+        共有インスタンスの属性をリクエストごとに書き換えると、並行して処理している
+        別銘柄のリクエストが他銘柄の閾値で分析されてしまうため、コピーを使い分ける。
         """
-        s = (symbol or "").strip().upper()
-        if '.' in s:
-            s = s.split('.', 1)[0].strip()
-        if s in ("US100", "NAS100"):
-            return "NQ100"
-        return s
+        key = (attr,) + tuple(sorted(overrides.items()))
+        module = self._module_variants.get(key)
+        if module is None:
+            module = copy.copy(getattr(self, attr))
+            for name, value in overrides.items():
+                setattr(module, name, value)
+            module = self._module_variants.setdefault(key, module)
+        return module
 
     @staticmethod
-    def _timeframe_variants(timeframe: str) -> List[str]:
+    def _timeframe_seconds(timeframe: str) -> int:
+        """時間足文字列（M5/H1/D1/'15' 等）を秒数に変換する。不明な場合は M5 扱い。"""
         tf = (timeframe or "").strip().upper()
-        if not tf:
-            return []
-        variants = [tf]
-
-        # M15 <-> 15 の相互運用
-        if tf.startswith('M') and tf[1:].isdigit():
-            n = tf[1:]
-            if n not in variants:
-                variants.append(n)
-        elif tf.isdigit():
-            m = f"M{tf}"
-            if m not in variants:
-                variants.append(m)
-
-        return variants
+        units = {'M': 60, 'H': 3600, 'D': 86400, 'W': 604800}
+        seconds = 0
+        if tf.isdigit():
+            seconds = int(tf) * 60
+        elif tf == 'MN1':
+            seconds = 30 * 86400
+        elif len(tf) >= 2 and tf[0] in units and tf[1:].isdigit():
+            seconds = int(tf[1:]) * units[tf[0]]
+        return seconds if seconds > 0 else 300
 
     @staticmethod
-    def _select_model_path(mapping: Dict[str, Any], symbol: str, timeframe: str, default_path: Optional[str]) -> Optional[str]:
-        if not isinstance(mapping, dict):
-            return default_path
-
-        symbol_candidates = SevenModuleAnalyzer._normalize_symbol_candidates(symbol)
-        tf_candidates = SevenModuleAnalyzer._timeframe_variants(timeframe)
-
-        # 1) SYMBOL_TF
-        for sym in symbol_candidates:
-            for tf in tf_candidates:
-                key = f"{sym}_{tf}"
-                val = mapping.get(key)
-                if isinstance(val, str) and val.strip():
-                    return val.strip()
-
-        # 2) SYMBOL
-        for sym in symbol_candidates:
-            val = mapping.get(sym)
-            if isinstance(val, str) and val.strip():
-                return val.strip()
-
-        # 3) default
-        for k in ("default", "*", "DEFAULT"):
-            val = mapping.get(k)
-            if isinstance(val, str) and val.strip():
-                return val.strip()
-
-        return default_path
-
-    def _get_orchestrator(self, symbol: str, timeframe: str) -> Optional[AntigravityOrchestrator]:
-        if not self.use_antigravity:
-            return None
+    def _resolve_bar_time(raw: Any, timeframe: str, now: Optional[float] = None) -> float:
+        """バー開始時刻（エポック秒）を決定する。
+
+        - リクエストに bar_time があればそれを使う（エポック秒 / ISO / 'YYYY.MM.DD HH:MM'）
+        - なければ現在時刻を時間足の境界に切り捨てる
+        """
+        if raw is not None and raw != "":
+            try:
+                return float(raw)
+            except (TypeError, ValueError):
+                pass
+            text = str(raw).strip()
+            if re.match(r'^\d{4}\.\d{2}\.\d{2}', text):
+                # MT4/MT5 の 'YYYY.MM.DD HH:MM' 形式
+                text = text.replace('.', '-', 2)
+            try:
+                return datetime.fromisoformat(text).timestamp()
+            except ValueError:
+                logger.debug(f"Unparseable bar_time '{raw}', falling back to clock")
+
+        period = SevenModuleAnalyzer._timeframe_seconds(timeframe)
+        t = time.time() if now is None else float(now)
+        return t - (t % period)
 
+    @staticmethod
+    def _orchestrator_key(symbol: str, timeframe: str) -> str:
         sym = (symbol or "").strip().upper() or "UNKNOWN"
         tf = (timeframe or "").strip().upper() or "M?"
-        cache_key = f"{sym}|{tf}"
+        return f"{sym}|{tf}"
 
-        transformer_path = self._select_model_path(
-            self._ag_transformer_model_paths,
-            symbol=sym,
-            timeframe=tf,
-            default_path=self._ag_transformer_default_path,
-        )
-        kan_path = self._select_model_path(
-            self._ag_kan_model_paths,
-            symbol=sym,
-            timeframe=tf,
-            default_path=self._ag_kan_default_path,
-        )
+    def _get_orchestrator(self, symbol: str, timeframe: str) -> Optional['AntigravityOrchestrator']:
+        if not self.use_antigravity:
+            return None
+
+        cache_key = self._orchestrator_key(symbol, timeframe)
+        sym, tf = cache_key.split("|", 1)
+
+        profile = self.symbol_profiles.get(sym)
+        transformer_path = profile.transformer_path(tf)
+        kan_path = profile.kan_path(tf)
         spec = {
             "model_type": self._ag_model_type,
             "transformer_path": transformer_path,
             "kan_path": kan_path,
             "daily_data_path": self._ag_daily_data_path,
             "max_position": self._ag_max_position,
+            "precision": self._ag_precision,
         }
 
         with self._ag_lock:
             existing = self._ag_orchestrators.get(cache_key)
-            existing_spec = self._ag_orchestrator_specs.get(cache_key)
-            if existing is not None and existing_spec == spec:
+            if existing is not None and self._ag_orchestrator_specs.get(cache_key) == spec:
                 return existing
+            build_lock = self._ag_build_locks.setdefault(cache_key, threading.Lock())
+
+        # 構築（モデル読み込み・GARCH の初回 fit・スナップショット復元）は _ag_lock の外で行い、
+        # 他の銘柄のリクエストを止めない。同じキーの構築はキーごとのロックで1回にまとめる
+        with build_lock:
+            with self._ag_lock:
+                existing = self._ag_orchestrators.get(cache_key)
+                if existing is not None and self._ag_orchestrator_specs.get(cache_key) == spec:
+                    return existing
 
             try:
                 orch = AntigravityOrchestrator(
@@ -568,57 +569,89 @@ class SevenModuleAnalyzer:
                     kan_model_path=kan_path,
                     daily_data_path=self._ag_daily_data_path,
                     max_position=self._ag_max_position,
+                    model_registry=self._ag_model_registry,
+                    precision=self._ag_precision,
                 )
-                self._ag_orchestrators[cache_key] = orch
-                self._ag_orchestrator_specs[cache_key] = spec
-                logger.info(
-                    f"Antigravity Orchestrator ready: {cache_key} "
-                    f"(type={self._ag_model_type}, transformer={transformer_path}, kan={kan_path})"
-                )
-                return orch
+                self._restore_snapshot(cache_key, orch)
             except Exception as e:
                 logger.warning(f"Failed to initialize Antigravity for {cache_key}: {e}")
                 return None
 
-    def _resolve_atr_threshold(self, symbol: str, is_index: bool) -> Tuple[float, str]:
-        sym = (symbol or "").strip().upper()
-        if not sym:
-            return (self.atr_threshold_index if is_index else self.atr_threshold_fx), "default(no_symbol)"
-
-        # 1) configの銘柄別上書き（最優先）
-        if sym in self._symbol_atr_thresholds_norm:
-            return self._symbol_atr_thresholds_norm[sym], f"config_exact:{sym}"
-
-        best_key = None
-        best_val = None
-        best_kind = None
-        for key, val in self._symbol_atr_thresholds_norm.items():
-            if sym.startswith(key):
-                kind = "config_prefix"
-            elif key in sym:
-                kind = "config_contains"
-            else:
-                continue
+            with self._ag_lock:
+                self._ag_orchestrators[cache_key] = orch
+                self._ag_orchestrator_specs[cache_key] = spec
+        logger.info(
+            f"Antigravity Orchestrator ready: {cache_key} "
+            f"(type={self._ag_model_type}, transformer={transformer_path}, kan={kan_path})"
+        )
+        return orch
 
-            if best_key is None or len(key) > len(best_key):
-                best_key = key
-                best_val = val
-                best_kind = kind
+    def _restore_snapshot(self, cache_key: str, orchestrator: 'AntigravityOrchestrator') -> None:
+        if self._ag_snapshots is None:
+            return
+        try:
+            if self._ag_snapshots.load(cache_key, orchestrator):
+                self._ag_snapshot_times[cache_key] = time.time()
+                logger.info(
+                    f"Antigravity state restored: {cache_key} "
+                    f"(bars={len(orchestrator.bar_history)}, inventory={orchestrator.current_inventory:.0f})"
+                )
+        except Exception as e:
+            logger.warning(f"Failed to restore Antigravity snapshot for {cache_key}: {e}")
+
+    def _maybe_snapshot(self, cache_key: str, orchestrator: 'AntigravityOrchestrator', force: bool = False) -> None:
+        """前回保存から snapshot_interval_sec 以上経過していれば状態を保存する"""
+        if self._ag_snapshots is None:
+            return
+        now = time.time()
+        if not force and now - self._ag_snapshot_times.get(cache_key, 0.0) < self._ag_snapshot_interval:
+            return
+        self._ag_snapshot_times[cache_key] = now
+        try:
+            self._ag_snapshots.save(cache_key, orchestrator)
+        except Exception as e:
+            logger.warning(f"Failed to write Antigravity snapshot for {cache_key}: {e}")
 
-        if best_key is not None:
-            return float(best_val), f"{best_kind}:{best_key}"
+    def snapshot_orchestrators(self) -> int:
+        """全 Orchestrator の状態を保存する（シャットダウン時用）。保存件数を返す。"""
+        if self._ag_snapshots is None:
+            return 0
+        with self._ag_lock:
+            items = list(self._ag_orchestrators.items())
+        for cache_key, orch in items:
+            self._maybe_snapshot(cache_key, orch, force=True)
+        return len(items)
 
-        # 2) 既存プリセット（strategy_presets）フォールバック
-        try:
-            return float(get_atr_threshold(sym)), "preset_get_atr_threshold"
-        except Exception:
-            pass
+    def rebuild_symbol_profiles(self, symbol_atr_thresholds: dict = None) -> SymbolProfileTable:
+        """銘柄プロファイルを作り直して差し替える（起動時・設定の再読み込み時）
 
-        # 3) 最終フォールバック（引数デフォルト）
-        return (self.atr_threshold_index if is_index else self.atr_threshold_fx), "default(param)"
+        Args:
+            symbol_atr_thresholds: 銘柄別 ATR 閾値（None なら現在の設定のまま）
+        """
+        if symbol_atr_thresholds is not None:
+            self.symbol_atr_thresholds = symbol_atr_thresholds
+        table = SymbolProfileTable(
+            symbol_atr_thresholds=self.symbol_atr_thresholds,
+            atr_threshold_fx=self.atr_threshold_fx,
+            atr_threshold_index=self.atr_threshold_index,
+            transformer_model_paths=self._ag_transformer_model_paths,
+            kan_model_paths=self._ag_kan_model_paths,
+            transformer_default_path=self._ag_transformer_default_path,
+            kan_default_path=self._ag_kan_default_path,
+        )
+        self.symbol_profiles = table
+        if table.atr_overrides:
+            keys = sorted(table.atr_overrides.keys())
+            suffix = "..." if len(keys) > 10 else ""
+            logger.info(f"ATR symbol overrides loaded: {keys[:10]}{suffix}")
+        logger.info(f"Symbol profiles: {len(table)} prebuilt")
+        return table
 
     def set_preset(self, preset_name: str) -> bool:
-        """プリセットを動的に切り替える（単一スレッド想定）。
+        """既定のプリセットを動的に切り替える。
+
+        並行リクエストで別プリセットを使う場合は analyze(data, preset_name) で
+        リクエストごとに指定する（enabled_modules の差し替えは参照の代入のみ）。
 
         Args:
             preset_name: STRATEGY_PRESETS のキー
@@ -637,18 +670,36 @@ class SevenModuleAnalyzer:
 
         self.preset_name = name
         self.enabled_modules = get_enabled_modules(name)
+        self._warm_enabled_modules()
         logger.info(
             f"★ Preset switched: {name} (enabled: {sum(1 for v in self.enabled_modules.values() if v)} modules)"
         )
         return True
     
-    def analyze(self, data: Dict) -> Tuple[int, float, str, Dict]:
+    def resolve_preset(self, preset_name: Optional[str]) -> str:
+        """リクエストで使うプリセット名（未指定・不明な名前は既定のプリセット）"""
+        name = (preset_name or "").strip()
+        return name if name in STRATEGY_PRESETS else self.preset_name
+
+    def _modules_for_preset(self, preset_name: Optional[str]) -> Dict[str, bool]:
+        """リクエストで使う enabled_modules（未指定・不明な名前は既定を使う）"""
+        name = self.resolve_preset(preset_name)
+        if name != self.preset_name:
+            return get_enabled_modules(name)
+        return self.enabled_modules
+
+    def analyze(self, data: Dict, preset_name: Optional[str] = None) -> Tuple[int, float, str, Dict]:
         """
         7モジュールで分析
         
+        preset_name: リクエスト単位のプリセット（未指定で既定の enabled_modules）。
+            既定のプリセット（self.enabled_modules）は変更しない。
+        
         Returns: (signal, confidence, reason, breakdown)
         """
         try:
+            enabled_modules = self._modules_for_preset(preset_name)
+            
             # データ抽出 - prices は最新から古い順
             prices_str = data.get('prices', '')
             prices = [float(p) for p in prices_str.split(',') if p] if prices_str else []
@@ -735,7 +786,7 @@ class SevenModuleAnalyzer:
             module_scores = {}
             
             # 1. ローソク足パターン
-            if self.enabled_modules.get('candle_patterns', False):
+            if enabled_modules.get('candle_patterns', False):
                 try:
                     candle_result = self.candle_patterns.analyze(
                         opens=opens, highs=highs, lows=lows, closes=closes,
@@ -748,7 +799,7 @@ class SevenModuleAnalyzer:
                     module_scores['candle_patterns'] = ModuleScore(0, 0.0, f"Error: {e}")
             
             # 2. チャートパターン
-            if self.enabled_modules.get('chart_patterns', False):
+            if enabled_modules.get('chart_patterns', False):
                 try:
                     chart_result = self.chart_patterns.analyze(
                         opens=opens, highs=highs, lows=lows, closes=closes
@@ -760,7 +811,7 @@ class SevenModuleAnalyzer:
                     module_scores['chart_patterns'] = ModuleScore(0, 0.0, f"Error: {e}")
             
             # 3. False Breakout
-            if self.enabled_modules.get('false_breakout', False):
+            if enabled_modules.get('false_breakout', False):
                 try:
                     fb_result = self.false_breakout.analyze(
                         opens=opens,
@@ -775,7 +826,7 @@ class SevenModuleAnalyzer:
                     module_scores['false_breakout'] = ModuleScore(0, 0.0, f"Error: {e}")
             
             # 4. テクニカル
-            if self.enabled_modules.get('technical', False):
+            if enabled_modules.get('technical', False):
                 try:
                     tech_result = self.technical.analyze(
                         closes=closes,
@@ -790,7 +841,7 @@ class SevenModuleAnalyzer:
                     module_scores['technical'] = ModuleScore(0, 0.0, f"Error: {e}")
             
             # 5. トレンド
-            if self.enabled_modules.get('trend', False):
+            if enabled_modules.get('trend', False):
                 try:
                     # データ十分な場合は計算済みのEMA配列を使用
                     if len(closes) >= 26 and len(ema12_arr) == len(closes):
@@ -819,7 +870,7 @@ class SevenModuleAnalyzer:
                     module_scores['trend'] = ModuleScore(0, 0.0, f"Error: {e}")
             
             # 6. 波動構造
-            if self.enabled_modules.get('wave_structure', False):
+            if enabled_modules.get('wave_structure', False):
                 try:
                     wave_result = self.wave_structure.analyze(
                         open_prices=opens,
@@ -834,7 +885,7 @@ class SevenModuleAnalyzer:
                     module_scores['wave_structure'] = ModuleScore(0, 0.0, f"Error: {e}")
             
             # 7. 構造的サポレジ
-            if self.enabled_modules.get('structural', False):
+            if enabled_modules.get('structural', False):
                 try:
                     struct_result = self.structural.analyze(
                         open_prices=opens,
@@ -850,28 +901,21 @@ class SevenModuleAnalyzer:
             
             # ★NEW: 8. PullbackModule（EA_PullbackEntryロジック）
             # 銘柄タイプをあらかじめ判定
-            symbol_raw = (data.get('symbol', '') or '').upper()
-            symbol = self._normalize_symbol_for_logic(symbol_raw)
-            is_index = is_index_symbol(symbol)
-            
-            # pip_sizeを銘柄に応じて設定
-            if is_index:
-                pip_size = 1.0
-            elif 'JPY' in symbol:
-                pip_size = 0.01
-            else:
-                pip_size = 0.0001
+            profile = self.symbol_profiles.get(data.get('symbol', '') or '')
+            symbol = profile.symbol
+            is_index = profile.is_index
+            pip_size = profile.pip_size
             
-            if self.enabled_modules.get('pullback', False):
+            pullback_result = None
+            if enabled_modules.get('pullback', False):
                 try:
-                    # PullbackModuleのpip_sizeを動的に更新
-                    self.pullback.pip_size = pip_size
-                    self.pullback.is_index = is_index
+                    # 銘柄の pip_size / is_index を設定した PullbackModule
+                    pullback = self._module_for('pullback', pip_size=pip_size, is_index=is_index)
                     
                     # ADX配列を計算（簡易版）
                     adx_arr = None
                     
-                    pullback_result = self.pullback.analyze(
+                    pullback_result = pullback.analyze(
                         closes=closes,
                         highs=highs,
                         lows=lows,
@@ -893,7 +937,7 @@ class SevenModuleAnalyzer:
             gk_vol_value = 0.0
             
             # GK-Volatility（gk_volatility）
-            if self.enabled_modules.get('gk_volatility', False):
+            if enabled_modules.get('gk_volatility', False):
                 try:
                     # Antigravity GK-Volatilityアダプター（簡易版）
                     if len(closes) >= 2:
@@ -906,13 +950,14 @@ class SevenModuleAnalyzer:
                     logger.debug(f"GK-Volatility module error: {e}")
             
             # ATRベースのボラティリティ（volatility）
-            if self.enabled_modules.get('volatility', False):
+            if enabled_modules.get('volatility', False):
                 try:
-                    effective_thr, thr_source = self._resolve_atr_threshold(symbol, is_index)
-                    # 適切なモジュールを選択
-                    vol_module = self.volatility_index if is_index else self.volatility_fx
-                    # リクエストごとに閾値を差し替え（銘柄別対応）
-                    vol_module.threshold_pips = float(effective_thr)
+                    effective_thr, thr_source = profile.atr_threshold, profile.atr_source
+                    # 適切なモジュールを選択（銘柄別の閾値を設定したコピー）
+                    vol_module = self._module_for(
+                        'volatility_index' if is_index else 'volatility_fx',
+                        threshold_pips=float(effective_thr),
+                    )
                     pip_value = pip_size
 
                     logger.info(
@@ -934,7 +979,7 @@ class SevenModuleAnalyzer:
             
             # ★NEW: 10-12. 金融工学モジュール
             # 10. Momentum
-            if self.enabled_modules.get('momentum', False):
+            if enabled_modules.get('momentum', False):
                 try:
                     momentum_result = self.momentum.analyze(closes)
                     module_scores['momentum'] = momentum_result
@@ -944,7 +989,7 @@ class SevenModuleAnalyzer:
                     module_scores['momentum'] = ModuleScore(0, 0.0, f"Error: {e}")
             
             # 11. Mean Reversion
-            if self.enabled_modules.get('mean_reversion', False):
+            if enabled_modules.get('mean_reversion', False):
                 try:
                     mr_result = self.mean_reversion.analyze(closes)
                     module_scores['mean_reversion'] = mr_result
@@ -954,7 +999,7 @@ class SevenModuleAnalyzer:
                     module_scores['mean_reversion'] = ModuleScore(0, 0.0, f"Error: {e}")
             
             # 12. Volatility Breakout
-            if self.enabled_modules.get('volatility_breakout', False):
+            if enabled_modules.get('volatility_breakout', False):
                 try:
                     vb_result = self.volatility_breakout.analyze(opens, highs, lows, closes)
                     module_scores['volatility_breakout'] = vb_result
@@ -977,7 +1022,7 @@ class SevenModuleAnalyzer:
             confidence = aggregated.confidence
             
             # ★ボラティリティによるシグナルフィルター（volatilityモジュールが有効な場合のみ）
-            if self.enabled_modules.get('volatility', False) and volatility_result:
+            if enabled_modules.get('volatility', False) and volatility_result:
                 if volatility_result.signal == -1:
                     confidence = confidence * 0.7
                     logger.warning(f"Extreme volatility detected, confidence reduced: {volatility_result.reason}")
@@ -1024,33 +1069,48 @@ class SevenModuleAnalyzer:
             orchestrator = self._get_orchestrator(symbol=symbol_for_ag, timeframe=timeframe_for_ag)
             if self.use_antigravity and orchestrator is not None:
                 try:
-                    # 履歴が不足している場合、過去データから初期化を試みる
-                    if len(orchestrator.bar_history) < 20 and len(closes) >= 20:
-                        logger.info(f"Initializing Antigravity history with {len(closes)} past bars")
-                        # 最新の足は後で追加するので、それ以前のデータを追加
-                        # opens, highs, lows, closes は全て古い順に並んでいる
-                        for i in range(len(closes) - 1):
-                            b_data = {
-                                'Open': float(opens[i]),
-                                'High': float(highs[i]),
-                                'Low': float(lows[i]),
-                                'Close': float(closes[i]),
-                                'Volume': float(volumes[i]) if i < len(volumes) else 1000.0
-                            }
-                            orchestrator._update_bar_history(b_data)
-
-                    # 最新のバーデータをOrchestratorに投入
-                    bar_data = {
-                        'Open': opens[-1] if len(opens) > 0 else closes[-1],
-                        'High': highs[-1] if len(highs) > 0 else closes[-1],
-                        'Low': lows[-1] if len(lows) > 0 else closes[-1],
-                        'Close': closes[-1],
-                        'Volume': float(data.get('volume', 1000))
-                    }
-                    orchestrator._update_bar_history(bar_data)
+                    # バー開始時刻をキーに取り込む（同一バーの再ポーリングは置き換え、新しいバーのみ追加）
+                    bar_time = self._resolve_bar_time(data.get('bar_time'), timeframe_for_ag)
+                    bar_period = self._timeframe_seconds(timeframe_for_ag)
+
+                    # 同一銘柄のバー更新はOrchestratorのロックで直列化する
+                    # （モデル推論はロック外で行うため、別銘柄の推論は並行して進む）
+                    with orchestrator.lock:
+                        # 初回のみ過去データで履歴を初期化する
+                        if not orchestrator.history_seeded and len(orchestrator.bar_history) < 20 and len(closes) >= 20:
+                            logger.info(f"Initializing Antigravity history with {len(closes)} past bars")
+                            # 最新の足は後で追加するので、それ以前のデータを追加
+                            # opens, highs, lows, closes は全て古い順に並んでいる
+                            n_past = len(closes) - 1
+                            seed_bars = [
+                                {
+                                    'Open': float(opens[i]),
+                                    'High': float(highs[i]),
+                                    'Low': float(lows[i]),
+                                    'Close': float(closes[i]),
+                                    'Volume': float(volumes[i]) if i < len(volumes) else 1000.0
+                                }
+                                for i in range(n_past)
+                            ]
+                            seed_times = [bar_time - (n_past - i) * bar_period for i in range(n_past)]
+                            orchestrator.seed_history(seed_bars, seed_times)
+
+                        # 最新のバーデータをOrchestratorに投入
+                        bar_data = {
+                            'Open': opens[-1] if len(opens) > 0 else closes[-1],
+                            'High': highs[-1] if len(highs) > 0 else closes[-1],
+                            'Low': lows[-1] if len(lows) > 0 else closes[-1],
+                            'Close': closes[-1],
+                            'Volume': float(data.get('volume', 1000))
+                        }
+                        orchestrator.ingest_bar(bar_data, bar_time)
+                        history_ready = len(orchestrator.bar_history) >= 20
+                    self._maybe_snapshot(
+                        self._orchestrator_key(symbol_for_ag, timeframe_for_ag), orchestrator
+                    )
                     
                     # モデル予測を取得（Transformer/KAN/Ensemble）
-                    if len(orchestrator.bar_history) >= 20:
+                    if history_ready:
                         model_pred = orchestrator._get_model_prediction()
                         dir_names = ['DOWN', 'FLAT', 'UP']
                         
@@ -1257,6 +1317,12 @@ Antigravity予測を重視しつつ、Sub-Modulesによるフィルタリング
 
     def __init__(self, data_dirs: list = None, data_dir: str = None, 
                  lm_studio_url: str = "http://localhost:1234",
+                 lm_timeout=None,
+                 llm_mode: str = 'sync',
+                 llm_wait_budget_ms: float = 50.0,
+                 llm_cache_path: str = None,
+                 llm_cache_ttl_sec: float = DEFAULT_LLM_CACHE_TTL_SEC,
+                 llm_cache_rounding: dict = None,
                  strategy: str = 'antigravity',
                  preset_name: str = 'antigravity_pullback',  # ★NEW
                  atr_threshold_fx: float = 7.0,
@@ -1270,6 +1336,11 @@ Antigravity予測を重視しつつ、Sub-Modulesによるフィルタリング
                  kan_model_paths: dict = None,
                  daily_data_path: str = None,
                  max_position: int = 2,
+                 batch_max_size: int = 16,
+                 batch_max_wait_ms: float = 0.0,
+                 model_precision: str = 'fp32',
+                 snapshot_dir: str = None,
+                 snapshot_interval_sec: float = 60.0,
                  hedge_mode: bool = False,
                  hedge_skip_trend: bool = True,
                  hedge_prioritize_mr: bool = True,
@@ -1282,6 +1353,13 @@ Antigravity予測を重視しつつ、Sub-Modulesによるフィルタリング
             data_dirs: 複数MT4のデータディレクトリリスト [{"id": "PC1", "data_dir": "..."}, ...]
             data_dir: 単一ディレクトリ（後方互換性のため）
             lm_studio_url: LM StudioのURL
+            lm_timeout: LM Studio の timeout（秒、または {connect, read}。config.yaml の lm_studio.timeout）
+            llm_mode: 'sync'（LLM の応答を待って統合）/ 'async'（バックグラウンドで実行し、
+                llm_wait_budget_ms だけ待つ。間に合わなければ同じバーの次のリクエストで使う）
+            llm_wait_budget_ms: async モードで LLM の結果を待つ上限（ミリ秒）
+            llm_cache_path: LLM 応答キャッシュ（SQLite）のパス。相対パスは data_dir 基準、未指定で無効
+            llm_cache_ttl_sec: キャッシュの有効期間（秒）
+            llm_cache_rounding: キャッシュキーの丸め規則（price_sig_digits / atr_sig_digits / confidence_step）
             strategy: 戦略パターン ('conservative', 'momentum', 'contrarian', 'full')
             preset_name: 戦略プリセット名 (★NEW)
             atr_threshold_fx: FX用ATR閾値（pips）
@@ -1291,6 +1369,11 @@ Antigravity予測を重視しつつ、Sub-Modulesによるフィルタリング
             transformer_model_path: Transformerモデルのパス
             kan_model_path: KANモデルのパス
             daily_data_path: GARCH用日足データのパス
+            batch_max_size: モデル推論マイクロバッチの最大行数
+            batch_max_wait_ms: マイクロバッチの最大待ち時間（0でバッチング無効）
+            model_precision: 推論精度 ('fp32', 'int8'=動的int8量子化・CPU推論)
+            snapshot_dir: Orchestrator状態スナップショットの保存先（未指定で無効）
+            snapshot_interval_sec: スナップショットの保存間隔（秒）
             hedge_mode: ヘッジモード有効化（PullbackEntry補完）
             hedge_skip_trend: トレンド相場でエントリースキップ
             hedge_prioritize_mr: Mean Reversionシグナル優先
@@ -1334,7 +1417,8 @@ Antigravity予測を重視しつつ、Sub-Modulesによるフィルタリング
 
         # ステータスは全ディレクトリに書き出す（各MT4が自分のFiles配下を読むため）
         self.status_files = [Path(d['data_dir']) / "server_status.txt" for d in self.data_dirs]
-        self.history_file = self.data_dir / "trade_history.json"
+        self.status_heartbeat = StatusHeartbeat(self.status_files)
+        self.history_file = self.data_dir / "trade_history.jsonl"
         
         # 複数EAのリクエストを追跡（MT4_ID -> last_mtime）
         self.request_mtimes: Dict[str, float] = {}
@@ -1342,7 +1426,7 @@ Antigravity予測を重視しつつ、Sub-Modulesによるフィルタリング
         
         # コンポーネント初期化
         self.trade_history = TradeHistory(self.history_file)
-        self.lm_client = LMStudioClient(base_url=lm_studio_url)
+        self.lm_client = LMStudioClient(base_url=lm_studio_url, timeout=lm_timeout)
         self.module_analyzer = SevenModuleAnalyzer(
             atr_threshold_fx=atr_threshold_fx,
             atr_threshold_index=atr_threshold_index,
@@ -1357,6 +1441,11 @@ Antigravity予測を重視しつつ、Sub-Modulesによるフィルタリング
             kan_model_paths=kan_model_paths,
             daily_data_path=daily_data_path,
             max_position=max_position,
+            batch_max_size=batch_max_size,
+            batch_max_wait_ms=batch_max_wait_ms,
+            model_precision=model_precision,
+            snapshot_dir=snapshot_dir,
+            snapshot_interval_sec=snapshot_interval_sec,
             hedge_mode=hedge_mode,
             hedge_skip_trend=hedge_skip_trend,
             hedge_prioritize_mr=hedge_prioritize_mr,
@@ -1368,12 +1457,33 @@ Antigravity予測を重視しつつ、Sub-Modulesによるフィルタリング
         
         # LLM使用フラグ
         self.use_llm = True
+        llm_mode = (llm_mode or 'sync').strip().lower()
+        if llm_mode not in LLM_ADVISORY_MODES:
+            raise ValueError(f"llm_mode must be one of {LLM_ADVISORY_MODES}, got {llm_mode!r}")
+        self.llm_advisor = (
+            LLMAdvisor(self.analyze_with_llm, wait_budget_sec=llm_wait_budget_ms / 1000.0)
+            if llm_mode == 'async' else None
+        )
+        # LLM 応答キャッシュ（SentimentAnalyzer とプロセス内で共有する）
+        self.llm_cache_rounding = MarketStateRounding.from_config(llm_cache_rounding)
+        self.llm_cache = None
+        if llm_cache_path:
+            cache_path = Path(llm_cache_path)
+            if not cache_path.is_absolute():
+                cache_path = self.data_dir / cache_path
+            self.llm_cache = configure_default_cache(cache_path, llm_cache_ttl_sec)
         
         logger.info("=" * 60)
         logger.info("MT4 9-Module Inference Server")
         logger.info("=" * 60)
         logger.info(f"Data Directory: {self.data_dir.absolute()}")
         logger.info(f"LM Studio URL: {lm_studio_url}")
+        logger.info(
+            f"LLM Advisory: {llm_mode}"
+            + (f" (wait budget={llm_wait_budget_ms:g}ms)" if self.llm_advisor is not None else "")
+        )
+        if self.llm_cache is not None:
+            logger.info(f"LLM Cache: {self.llm_cache.path} (ttl={llm_cache_ttl_sec:g}s, {self.llm_cache_rounding})")
         logger.info(f"Strategy: {strategy}")
         logger.info(f"Trade History: {len(self.trade_history.trades)} trades loaded")
         logger.info("=" * 60)
@@ -1396,14 +1506,18 @@ Antigravity予測を重視しつつ、Sub-Modulesによるフィルタリング
             logger.warning(f"LM Studio connection failed: {e}")
             self.use_llm = False
     
+    def _status_heartbeat(self) -> StatusHeartbeat:
+        heartbeat = getattr(self, 'status_heartbeat', None)
+        if heartbeat is None:
+            heartbeat = self.status_heartbeat = StatusHeartbeat(getattr(self, 'status_files', []))
+        return heartbeat
+    
     def update_status(self, status="running"):
-        payload = f"{status}|{datetime.now().isoformat()}|{self.request_count}"
-        for status_file in getattr(self, 'status_files', []):
-            try:
-                with open(status_file, 'w') as f:
-                    f.write(payload)
-            except Exception as e:
-                logger.warning(f"Failed to write status file {status_file}: {e}")
+        """状態を更新する（run() 中はハートビートが変更時のみ書き込む。それ以外は即座に書き込む）"""
+        heartbeat = self._status_heartbeat()
+        heartbeat.update(status, self.request_count)
+        if not heartbeat.running:
+            heartbeat.flush()
     
     def parse_request(self, file_path: Path) -> Optional[Dict]:
         """横型CSV（ヘッダー行+データ行）または縦型CSV（key,value形式）をパース
@@ -1444,6 +1558,37 @@ Antigravity予測を重視しつつ、Sub-Modulesによるフィルタリング
             logger.error(f"Request parse error: {e}")
             return None
     
+    @staticmethod
+    def _build_llm_prompt(symbol, timeframe, ema12, ema25, atr, module_summary: str) -> str:
+        return f"""
+通貨ペア: {symbol}
+時間足: {timeframe}
+EMA12: {ema12}
+EMA25: {ema25}
+ATR: {atr}
+
+【7モジュール分析結果】
+{module_summary if module_summary else "特筆すべきシグナルなし"}
+
+この状況でトレード判断をしてください。
+"""
+
+    def _llm_cache_text(self, data: Dict, module_result: Dict) -> str:
+        """キャッシュキー用のプロンプト（EMA / ATR / 確信度を丸め規則で離散化したもの）"""
+        rounding = self.llm_cache_rounding
+        module_summary = "\n".join([
+            f"- {name}: signal={info['signal']:+d}, confidence={rounding.confidence(info['confidence']):.2f}"
+            for name, info in module_result.items()
+            if info['confidence'] > 0.2
+        ])
+        prompt = self._build_llm_prompt(
+            data.get('symbol', 'UNKNOWN'), data.get('timeframe', 'M5'),
+            rounding.price(data.get('ema12', 0)), rounding.price(data.get('ema25', 0)),
+            rounding.atr(data.get('atr', 0)), module_summary,
+        )
+        # 応答はシステムプロンプトと生成パラメータにも依存する
+        return f"{self.TRADE_ANALYST_PROMPT}\n{prompt}\ntemperature=0.2 max_tokens=200"
+
     def analyze_with_llm(self, data: Dict, module_result: Dict) -> Tuple[int, float, str]:
         """LLMで分析（7モジュール結果を含む）"""
         symbol = data.get('symbol', 'UNKNOWN')
@@ -1459,26 +1604,25 @@ Antigravity予測を重視しつつ、Sub-Modulesによるフィルタリング
             if info['confidence'] > 0.2
         ])
         
-        prompt = f"""
-通貨ペア: {symbol}
-時間足: {timeframe}
-EMA12: {ema12}
-EMA25: {ema25}
-ATR: {atr}
-
-【7モジュール分析結果】
-{module_summary if module_summary else "特筆すべきシグナルなし"}
-
-この状況でトレード判断をしてください。
-"""
+        prompt = self._build_llm_prompt(symbol, timeframe, ema12, ema25, atr, module_summary)
         
-        try:
-            response = self.lm_client.chat(
+        def call_llm() -> str:
+            return self.lm_client.chat(
                 prompt=prompt,
                 system_prompt=self.TRADE_ANALYST_PROMPT,
                 temperature=0.2,
                 max_tokens=200
             )
+        
+        try:
+            cache = getattr(self, 'llm_cache', None)
+            if cache is not None:
+                # 丸めた市場状態が同じなら、前回の応答を再利用する（エラー応答は保存されない）
+                response, hit = cache.get_or_call("trade", self._llm_cache_text(data, module_result), call_llm)
+                if hit:
+                    logger.debug(f"LLM cache hit: {symbol} {timeframe}")
+            else:
+                response = call_llm()
             
             # エラーレスポンスチェック
             if response.startswith("エラー:"):
@@ -1492,6 +1636,16 @@ ATR: {atr}
             logger.warning(f"LLM exception - falling back to 7-module only: {e}")
             return 0, 0.0, f"LLM error: {str(e)}"
     
+    def _log_llm_cache_metrics(self) -> None:
+        cache = getattr(self, 'llm_cache', None)
+        if cache is None:
+            return
+        for namespace, m in cache.metrics().items():
+            logger.info(
+                f"[LLM_CACHE] {namespace}: hit_ratio={m['hit_ratio']:.0%} hits={m['hits']} "
+                f"misses={m['misses']} saved={m['saved_latency_sec']:.1f}s"
+            )
+    
     def _parse_llm_response(self, response: str) -> Tuple[int, float, str]:
         """LLMレスポンスをパース"""
         signal = 0
@@ -1636,14 +1790,15 @@ ATR: {atr}
         timeframe = data.get('timeframe', 'M5')
 
         # リクエスト単位のプリセット指定（EAから preset 列で渡す）
+        # 既定のプリセットは切り替えず、このリクエストの分析にだけ使う
         req_preset = (data.get('preset') or '').strip()
-        if req_preset:
-            self.module_analyzer.set_preset(req_preset)
         
         logger.info(f"[REQUEST:{mt4_id}] {symbol} {timeframe}")
         
-        # 1. 7モジュール分析
-        module_signal, module_conf, module_reason, breakdown = self.module_analyzer.analyze(data)
+        # 1. 7モジュール分析（プリセット・銘柄別の閾値はリクエスト単位で、共有モジュールは書き換えない）
+        module_signal, module_conf, module_reason, breakdown = self.module_analyzer.analyze(
+            data, preset_name=req_preset or None
+        )
         logger.info(f"[7MODULE] signal={module_signal}, conf={module_conf:.2f}")
         
         # アクティブなモジュールをログ
@@ -1659,7 +1814,16 @@ ATR: {atr}
         logger.info(f"[HISTORY] {trade_count} similar trades, win_rate={win_rate:.0%}")
         
         # 3. LLM分析（利用可能な場合）
-        if self.use_llm:
+        if self.use_llm and self.llm_advisor is not None:
+            # async: 同じバーの LLM 判断はバックグラウンドで1回だけ実行し、待つのは予算分だけ
+            # （判断はモジュールのブレークダウンに依存するため、プリセットが違えば別の判断）
+            bar_time = SevenModuleAnalyzer._resolve_bar_time(data.get('bar_time'), str(timeframe).strip().upper())
+            preset = self.module_analyzer.resolve_preset(req_preset)
+            (llm_signal, llm_conf, llm_reason), outcome = self.llm_advisor.advise(
+                (symbol, timeframe, preset, bar_time), data, breakdown
+            )
+            logger.info(f"[LLM:{outcome}] signal={llm_signal}, conf={llm_conf:.2f}")
+        elif self.use_llm:
             llm_signal, llm_conf, llm_reason = self.analyze_with_llm(data, breakdown)
             logger.info(f"[LLM] signal={llm_signal}, conf={llm_conf:.2f}")
         else:
@@ -1692,61 +1856,139 @@ ATR: {atr}
         match = re.match(r'request_(.+)\.csv', filename)
         return match.group(1) if match else "UNKNOWN"
     
-    def run(self, poll_interval: float = 0.5):
-        """メインループ - 複数MT4ディレクトリ対応"""
+    def _handle_request_file(self, dir_info: Dict, data_path: Path, request_file: Path):
+        """リクエストファイルが前回処理時より新しければ処理してレスポンスを書く"""
+        mt4_id = self._get_mt4_id_from_filename(request_file.name)
+        # ディレクトリIDとMT4_IDを組み合わせてユニークキー作成
+        # NOTE: config の id はラベル用途のため、同一パスが複数定義されても二重処理しないよう
+        #       "実際の data_dir" をユニークキーに含める
+        dir_key = dir_info.get('_dir_key')
+        if not dir_key:
+            try:
+                dir_key = str(data_path.resolve()).lower()
+            except Exception:
+                dir_key = str(data_path).lower()
+        unique_key = f"{dir_key}__{mt4_id}"
+        
+        try:
+            current_mtime = request_file.stat().st_mtime
+        except FileNotFoundError:
+            return  # 通知後に EA 側で削除/置換された
+        last_mtime = self.request_mtimes.get(unique_key, 0)
+        
+        if current_mtime > last_mtime:
+            self.request_mtimes[unique_key] = current_mtime
+            self.request_count += 1
+
+            logger.info(
+                f"[REQUEST_FILE] dir_id={dir_info.get('id')} dir_key={dir_key} "
+                f"mt4_id={mt4_id} file={request_file.name}"
+            )
+            
+            # EA が次のリクエストで上書きする前に、検出時点でパースしておく
+            data = self.parse_request(request_file)
+            
+            if data:
+                dispatcher = getattr(self, '_dispatcher', None)
+                if dispatcher is not None:
+                    dispatcher.submit(BridgeRequest(unique_key, mt4_id, data, data_path))
+                else:
+                    signal, confidence, reason = self.process_request(mt4_id, data)
+                    self.write_response(mt4_id, signal, confidence, reason, data_path)
+            
+            self.update_status("running")
+    
+    def _scan_all(self):
+        """全てのdataディレクトリの request*.csv を処理する（ポーリング / 定期全走査）"""
+        for dir_info in self.data_dirs:
+            data_path = Path(dir_info['data_dir'])
+            if not data_path.exists():
+                continue
+            
+            # request*.csv パターンで全リクエストファイルをスキャン
+            for request_file in list(data_path.glob("request*.csv")):
+                self._handle_request_file(dir_info, data_path, request_file)
+    
+    def run(
+        self,
+        poll_interval: float = 0.5,
+        watch_backend: str = "auto",
+        rescan_interval: float = 30.0,
+        max_workers: int = 4,
+        request_deadline_sec: float = 0.0,
+        metrics_interval: float = 60.0,
+        status_interval: float = 5.0,
+        status_keepalive: float = 60.0,
+    ):
+        """メインループ - 複数MT4ディレクトリ対応
+        
+        watch_backend: リクエスト検出方式（request_watcher.BACKENDS）
+            auto/inotify/watchdog はファイルの書き込み完了イベントで即座に処理し、
+            rescan_interval 秒ごとに全走査する。polling は poll_interval ごとに全走査する。
+        max_workers: 並行処理するターミナル数の上限（同一ターミナルは到着順に1件ずつ）
+        request_deadline_sec: 検出からの応答期限（秒）。超過時は WAIT を返す。0 で期限なし
+        metrics_interval: ターミナル別のキュー待ち・処理時間をログ出力する間隔（秒）
+        status_interval: server_status.txt を確認・書き込む間隔（秒。内容が変わったときだけ書く）
+        status_keepalive: 内容が変わらなくても時刻を更新する間隔（秒。0 で無効）
+        """
+        from request_watcher import create_request_watcher
+        
         logger.info("Waiting for requests from MT4 (multi-terminal mode)...")
         logger.info(f"Monitoring {len(self.data_dirs)} data directories:")
         for d in self.data_dirs:
             dir_key = d.get('_dir_key')
             logger.info(f"  - id={d['id']} dir={d['data_dir']} dir_key={dir_key}")
+        
+        # 同じパスが複数定義されていても監視は1回（処理の重複は request_mtimes で抑止）
+        dir_infos: Dict[str, Dict] = {}
+        for d in self.data_dirs:
+            dir_infos.setdefault(str(Path(d['data_dir'])), d)
+        watcher = create_request_watcher(
+            [Path(p) for p in dir_infos],
+            backend=watch_backend,
+            poll_interval=poll_interval,
+            rescan_interval=rescan_interval,
+        )
+        logger.info(f"Request watcher: {watcher.backend}")
+        def respond(req, signal, conf, reason):
+            self.write_response(req.mt4_id, signal, conf, reason, req.data_path)
+            # ハートビート用の状態を更新するだけ（ファイルには触れない）
+            self.update_status("running")
+
+        self._dispatcher = TerminalDispatcher(
+            process=lambda req: self.process_request(req.mt4_id, req.data),
+            respond=respond,
+            max_workers=max_workers,
+            deadline_sec=request_deadline_sec,
+        )
+        logger.info(f"Request dispatcher: max_workers={max_workers} deadline={request_deadline_sec:g}s")
+        heartbeat = self._status_heartbeat()
         self.update_status("running")
+        heartbeat.start(interval_sec=status_interval, keepalive_sec=status_keepalive)
+        logger.info(f"Status heartbeat: interval={status_interval:g}s keepalive={status_keepalive:g}s")
+        next_metrics = time.monotonic() + metrics_interval
+        advisor = getattr(self, 'llm_advisor', None)
         
         try:
+            # 起動前に置かれていたリクエストを処理
+            self._scan_all()
             while True:
                 try:
-                    # 全てのdataディレクトリをスキャン
-                    for dir_info in self.data_dirs:
-                        data_path = Path(dir_info['data_dir'])
-                        if not data_path.exists():
-                            continue
-                        
-                        # request*.csv パターンで全リクエストファイルをスキャン
-                        request_files = list(data_path.glob("request*.csv"))
-                        
-                        for request_file in request_files:
-                            mt4_id = self._get_mt4_id_from_filename(request_file.name)
-                            # ディレクトリIDとMT4_IDを組み合わせてユニークキー作成
-                            # NOTE: config の id はラベル用途のため、同一パスが複数定義されても二重処理しないよう
-                            #       "実際の data_dir" をユニークキーに含める
-                            dir_key = dir_info.get('_dir_key')
-                            if not dir_key:
-                                try:
-                                    dir_key = str(data_path.resolve()).lower()
-                                except Exception:
-                                    dir_key = str(data_path).lower()
-                            unique_key = f"{dir_key}__{mt4_id}"
-                            
-                            current_mtime = request_file.stat().st_mtime
-                            last_mtime = self.request_mtimes.get(unique_key, 0)
-                            
-                            if current_mtime > last_mtime:
-                                self.request_mtimes[unique_key] = current_mtime
-                                self.request_count += 1
-
-                                logger.info(
-                                    f"[REQUEST_FILE] dir_id={dir_info.get('id')} dir_key={dir_key} "
-                                    f"mt4_id={mt4_id} file={request_file.name}"
-                                )
-                                
-                                data = self.parse_request(request_file)
-                                
-                                if data:
-                                    signal, confidence, reason = self.process_request(mt4_id, data)
-                                    self.write_response(mt4_id, signal, confidence, reason, data_path)
-                                
-                                self.update_status("running")
+                    changed = watcher.wait()
+                    if changed is None:
+                        self._scan_all()
+                    else:
+                        for request_file in changed:
+                            dir_info = dir_infos.get(str(request_file.parent))
+                            if dir_info is not None:
+                                self._handle_request_file(dir_info, request_file.parent, request_file)
                     
-                    time.sleep(poll_interval)
+                    if metrics_interval > 0 and time.monotonic() >= next_metrics:
+                        next_metrics = time.monotonic() + metrics_interval
+                        self._dispatcher.log_metrics()
+                        if advisor is not None:
+                            advisor.log_metrics()
+                        self._log_llm_cache_metrics()
                     
                 except Exception as e:
                     logger.error(f"Loop error (continuing): {e}")
@@ -1758,7 +2000,21 @@ ATR: {atr}
             logger.info(f"Total requests: {self.request_count}")
             logger.info(f"Active MT4 IDs: {list(self.request_mtimes.keys())}")
             logger.info("=" * 60)
+            # 処理中のリクエストを書き終えてから状態を保存する
+            self._dispatcher.shutdown(wait=True)
+            self._dispatcher.log_metrics()
+            if advisor is not None:
+                advisor.log_metrics()
+                advisor.shutdown()
+            self._log_llm_cache_metrics()
+            self.trade_history.close()
+            self.module_analyzer.snapshot_orchestrators()
             self.update_status("stopped")
+        finally:
+            watcher.close()
+            heartbeat.stop()
+            self._dispatcher.shutdown(wait=False)
+            self._dispatcher = None
 
 
 def load_config():
@@ -1801,8 +2057,15 @@ def auto_detect_mt4_terminals():
 
 
 if __name__ == "__main__":
+    config = None
     data_dirs = []
     lm_url = "http://localhost:1234"
+    lm_timeout = None
+    llm_mode = 'sync'
+    llm_wait_budget_ms = 50.0
+    llm_cache_path = None
+    llm_cache_ttl_sec = DEFAULT_LLM_CACHE_TTL_SEC
+    llm_cache_rounding = None
     
     # 1. コマンドライン引数を優先（単一ディレクトリ）
     if len(sys.argv) > 1:
@@ -1814,6 +2077,14 @@ if __name__ == "__main__":
         
         if config:
             lm_url = config.get('lm_studio', {}).get('url', lm_url)
+            lm_timeout = config.get('lm_studio', {}).get('timeout', lm_timeout)
+            llm_mode = str(config.get('lm_studio', {}).get('advisory_mode', llm_mode))
+            llm_wait_budget_ms = float(config.get('lm_studio', {}).get('advisory_wait_ms', llm_wait_budget_ms))
+            llm_cache_config = config.get('lm_studio', {}).get('cache') or {}
+            if llm_cache_config.get('enabled', True):
+                llm_cache_path = llm_cache_config.get('path', llm_cache_path)
+            llm_cache_ttl_sec = float(llm_cache_config.get('ttl_sec', llm_cache_ttl_sec))
+            llm_cache_rounding = llm_cache_config.get('rounding')
             
             # 自動検出フラグをチェック
             if config.get('auto_detect', False):
@@ -1867,6 +2138,11 @@ if __name__ == "__main__":
     kan_model_path = antigravity_config.get('kan_model_path', antigravity_config.get('kan_path', ''))
     daily_data_path = antigravity_config.get('daily_data_path', '')
     max_position = int(antigravity_config.get('max_position', 2))
+    batch_max_size = int(antigravity_config.get('batch_max_size', 16))
+    batch_max_wait_ms = float(antigravity_config.get('batch_max_wait_ms', 0.0))
+    model_precision = str(antigravity_config.get('model_precision', 'fp32')).lower()
+    snapshot_dir = antigravity_config.get('snapshot_dir') or None
+    snapshot_interval_sec = float(antigravity_config.get('snapshot_interval_sec', 60.0))
     
     # ★ヘッジモード設定を取得★
     hedge_config = config.get('hedge_mode', {}) if config else {}
@@ -1899,6 +2175,9 @@ if __name__ == "__main__":
         logger.info(f"  Transformer: {transformer_model_path}")
         logger.info(f"  KAN: {kan_model_path}")
         logger.info(f"  Max Position: {max_position}")
+        logger.info(f"  Micro-batch: max_size={batch_max_size}, max_wait_ms={batch_max_wait_ms}")
+        logger.info(f"  Precision: {model_precision}")
+        logger.info(f"  Snapshots: {snapshot_dir or 'disabled'} (interval={snapshot_interval_sec}s)")
     else:
         logger.info("Antigravity Orchestrator: DISABLED")
     
@@ -1915,6 +2194,12 @@ if __name__ == "__main__":
     server = SevenModuleInferenceServer(
         data_dirs=data_dirs, 
         lm_studio_url=lm_url,
+        lm_timeout=lm_timeout,
+        llm_mode=llm_mode,
+        llm_wait_budget_ms=llm_wait_budget_ms,
+        llm_cache_path=llm_cache_path,
+        llm_cache_ttl_sec=llm_cache_ttl_sec,
+        llm_cache_rounding=llm_cache_rounding,
         strategy=strategy_pattern,
         preset_name=preset_name,  # ★NEW
         atr_threshold_fx=atr_threshold_fx,
@@ -1926,6 +2211,11 @@ if __name__ == "__main__":
         kan_model_path=kan_model_path,
         daily_data_path=daily_data_path,
         max_position=max_position,
+        batch_max_size=batch_max_size,
+        batch_max_wait_ms=batch_max_wait_ms,
+        model_precision=model_precision,
+        snapshot_dir=snapshot_dir,
+        snapshot_interval_sec=snapshot_interval_sec,
         hedge_mode=hedge_mode,
         hedge_skip_trend=hedge_skip_trend,
         hedge_prioritize_mr=hedge_prioritize_mr,
@@ -1934,4 +2224,14 @@ if __name__ == "__main__":
         brain_veto_mode=brain_veto_mode,
         brain_plan_dir=brain_plan_dir
     )
-    server.run(poll_interval=0.5)
\ No newline at end of file
+    server_config = (config.get('server') if config else None) or {}
+    server.run(
+        poll_interval=float(server_config.get('poll_interval', 0.5)),
+        watch_backend=str(server_config.get('watch_backend', 'auto')),
+        rescan_interval=float(server_config.get('rescan_interval', 30.0)),
+        max_workers=int(server_config.get('max_workers', 4)),
+        request_deadline_sec=float(server_config.get('request_deadline_sec', 0.0)),
+        metrics_interval=float(server_config.get('metrics_interval', 60.0)),
+        status_interval=float(server_config.get('status_interval', 5.0)),
+        status_keepalive=float(server_config.get('status_keepalive', 60.0)),
+    )
\ No newline at end of file
@@ -25,17 +25,27 @@ MT5 から WebRequest(HTTP/HTTPS) で推論を呼び出す用途。
 互換のため、以下も受理:
 - prices: [150.10, 150.09, ...] (配列)
 - indicators: {"ema12":..., "ema25":..., "ema100":..., "atr":...}
+- bar_time: 最新バーの開始時刻（エポック秒 / ISO / "YYYY.MM.DD HH:MM"。ohlcv.time 配列も可）
+  省略時はサーバー時刻を時間足の境界に切り捨てて使用する
 """
 
 from __future__ import annotations
 
 import os
 import json
+import atexit
 import threading
 from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
 
+from thread_budget import ThreadBudget
+
+# リクエストスレッド数とスレッド予算（BLAS の環境変数は numpy の import 前に設定する）
+_max_workers = int(os.getenv("MAX_WORKERS", "4"))
+_thread_budget = ThreadBudget.from_env(workers=_max_workers)
+_thread_budget.export_env()
+
 import numpy as np
 from flask import Flask, jsonify, request
 
@@ -104,6 +114,12 @@ def _normalize_request(payload: Dict[str, Any]) -> Dict[str, Any]:
         if close_now is None and closes.size:
             close_now = float(closes[-1])
 
+        # バー開始時刻（最新バー）。Orchestrator の冪等なバー取り込みに使用
+        bar_time = payload.get("bar_time")
+        times_list = ohlcv.get("time") or []
+        if bar_time is None and isinstance(times_list, list) and times_list:
+            bar_time = times_list[-1]
+
         return {
             "symbol": symbol,
             "timeframe": timeframe,
@@ -114,6 +130,7 @@ def _normalize_request(payload: Dict[str, Any]) -> Dict[str, Any]:
             "atr": float(atr) if atr else 0.001,
             "close": float(close_now) if close_now is not None else 0.0,
             "prices": _prices_to_csv_latest_to_past([float(x) for x in closes_list]),
+            "bar_time": bar_time,
         }
 
     # B) フラット形式（互換）
@@ -140,6 +157,7 @@ def _normalize_request(payload: Dict[str, Any]) -> Dict[str, Any]:
         "atr": atr,
         "close": close,
         "prices": prices_str,
+        "bar_time": payload.get("bar_time", payload.get("time")),
     }
 
 
@@ -149,6 +167,11 @@ def _make_server() -> SevenModuleInferenceServer:
 
     # 環境変数で制御（まずは最小限）
     lm_studio_url = os.getenv("LM_STUDIO_URL", "http://localhost:1234")
+    # LM Studio の (connect, read) タイムアウト（秒）
+    lm_timeout = {
+        "connect": float(os.getenv("LM_STUDIO_CONNECT_TIMEOUT", "3")),
+        "read": float(os.getenv("LM_STUDIO_READ_TIMEOUT", "30")),
+    }
     strategy = os.getenv("STRATEGY", "full")
     preset = os.getenv("PRESET", "antigravity_pullback")
 
@@ -179,11 +202,28 @@ def _make_server() -> SevenModuleInferenceServer:
 
     max_position = int(os.getenv("MAX_POSITION", "2"))
 
+    # 同一モデルへの同時推論をまとめる（AG_BATCH_MAX_WAIT_MS=0 で無効）
+    batch_max_size = int(os.getenv("AG_BATCH_MAX_SIZE", "16"))
+    batch_max_wait_ms = float(os.getenv("AG_BATCH_MAX_WAIT_MS", "0"))
+
+    # 推論精度（int8 で Linear/KAN 層を動的量子化。GPU のない環境向け）
+    model_precision = (os.getenv("MODEL_PRECISION") or "fp32").strip().lower()
+
+    # Orchestrator 状態のスナップショット（再起動直後から履歴/VPIN を復元。未指定で無効）
+    snapshot_dir = os.getenv("AG_SNAPSHOT_DIR") or None
+    snapshot_interval_sec = float(os.getenv("AG_SNAPSHOT_INTERVAL_SEC", "60"))
+
     # file-based の data_dirs が必須なので、HTTP用途ではダミーを1つ用意
     os.makedirs("./_http_dummy", exist_ok=True)
     return _Server(
         data_dirs=[{"id": "HTTP", "data_dir": "./_http_dummy"}],
         lm_studio_url=lm_studio_url,
+        lm_timeout=lm_timeout,
+        llm_mode=os.getenv("LLM_ADVISORY_MODE", "sync"),
+        llm_wait_budget_ms=float(os.getenv("LLM_ADVISORY_WAIT_MS", "50")),
+        # LLM 応答キャッシュ（SQLite。未指定で無効）
+        llm_cache_path=os.getenv("LLM_CACHE_PATH") or None,
+        llm_cache_ttl_sec=float(os.getenv("LLM_CACHE_TTL_SEC", "900")),
         strategy=strategy,
         preset_name=preset,
         atr_threshold_fx=atr_fx,
@@ -196,6 +236,11 @@ def _make_server() -> SevenModuleInferenceServer:
         kan_model_paths=kan_model_paths,
         daily_data_path=daily_data_path,
         max_position=max_position,
+        batch_max_size=batch_max_size,
+        batch_max_wait_ms=batch_max_wait_ms,
+        model_precision=model_precision,
+        snapshot_dir=snapshot_dir,
+        snapshot_interval_sec=snapshot_interval_sec,
     )
 
 
@@ -205,7 +250,7 @@ _engine_lock = threading.Lock()
 _engine: Optional[SevenModuleInferenceServer] = None
 _engine_error: Optional[str] = None
 
-_executor = ThreadPoolExecutor(max_workers=int(os.getenv("MAX_WORKERS", "4")))
+_executor = ThreadPoolExecutor(max_workers=_max_workers)
 _request_timeout_sec = float(os.getenv("REQUEST_TIMEOUT_SEC", "3.0"))
 
 _request_count = 0
@@ -220,12 +265,29 @@ def _get_engine() -> Optional[SevenModuleInferenceServer]:
             return _engine
         try:
             _engine = _make_server()
+            # BLAS のスレッド数を設定する。torch は最初の Orchestrator 生成時に読み込まれるため、
+            # torch のスレッド数はその時点で設定する
+            _thread_budget.apply()
+            if getattr(_engine.module_analyzer, "use_antigravity", False):
+                from antigravity.core.orchestrator import on_torch_loaded
+                on_torch_loaded(_thread_budget.apply_torch)
         except Exception as e:
             _engine_error = str(e)
             _engine = None
         return _engine
 
 
+@atexit.register
+def _snapshot_on_exit() -> None:
+    # 停止時に Orchestrator 状態を保存（AG_SNAPSHOT_DIR 指定時のみ有効）
+    if _engine is None:
+        return
+    try:
+        _engine.module_analyzer.snapshot_orchestrators()
+    except Exception:
+        pass
+
+
 def _safe_response(
     *,
     signal: int = 0,
@@ -263,6 +325,17 @@ def health() -> Tuple[Any, int]:
                 "requests_handled": _request_count,
                 "engine_status": engine_status,
                 "engine_error": _engine_error,
+                "thread_budget": _thread_budget.effective(),
+                "llm_advisor": (
+                    engine.llm_advisor.metrics()
+                    if engine is not None and getattr(engine, "llm_advisor", None) is not None
+                    else None
+                ),
+                "llm_cache": (
+                    engine.llm_cache.metrics()
+                    if engine is not None and getattr(engine, "llm_cache", None) is not None
+                    else None
+                ),
             }
         ),
         200,
@@ -274,11 +347,7 @@ def _run_engine(data: Dict[str, Any]) -> Tuple[int, float, str, str]:
     if engine is None:
         return 0, 0.0, "engine unavailable (fallback)", "fallback"
 
-    # ★NEW: プリセットが指定されていればengineに適用
-    req_preset = (data.get('preset') or '').strip()
-    if req_preset and hasattr(engine, 'module_analyzer') and hasattr(engine.module_analyzer, 'set_preset'):
-        engine.module_analyzer.set_preset(req_preset)
-
+    # プリセット指定（data['preset']）は process_request がこのリクエストの分析にだけ使う
     fut = _executor.submit(engine.process_request, "HTTP", data)
     try:
         signal, confidence, reason = fut.result(timeout=_request_timeout_sec)
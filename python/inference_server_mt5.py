@@ -51,6 +51,8 @@ except ImportError:
     logger = logging.getLogger("MT5InferenceServer")
     logger.log_signal = lambda *args, **kwargs: None  # ダミー
 
+from symbol_profiles import default_profiles
+
 # シグナル分析モジュール（サブモジュールから）
 try:
     from modules import (
@@ -188,7 +190,8 @@ class MT5DataProvider:
         シンボル名をOANDAフォーマットに変換
         例: USDJPY -> USD/JPY, JP225 -> JP225_JPY
         """
-        symbol = symbol.upper().replace('.MT4', '').replace('.MT5', '')
+        # 接尾辞（.mt4 など）の除去と別名（US100 → NQ100）は共有の銘柄プロファイルで解決済み
+        symbol = default_profiles().get(symbol).symbol
         
         # FX通貨ペア（6文字）
         if len(symbol) == 6 and symbol.isalpha():
@@ -0,0 +1,164 @@
+"""
+LLM アドバイザーの非同期実行（クリティカルパス外での LLM 判断とレイトバインディング）
+
+従来の process_request は analyze_with_llm（数秒かかることが多い）を待ってから
+シグナルを統合していたため、LLM のレイテンシがそのままリクエストのレイテンシになっていた。
+
+- LLM 判断は (symbol, timeframe, preset, bar_time) ごとにバックグラウンドで1回だけ実行する
+  （キーの最後の要素がバー、それより前が系列。失敗した判断は保持せず次のリクエストでやり直す）
+- リクエストは wait_budget 秒だけ結果を待ち、間に合わなければ LLM なし（0, 0.0）で統合する
+- 同じバーの次のリクエストでは、完了済みの結果をそのまま使う（レイトバインディング）
+- 新しいバーが来たら、同じ系列の古いバーの未開始タスクは取り消す
+
+metrics(): LLM が間に合った割合（in_time / late_bound / missed）、未使用のまま捨てた件数など
+
+Usage:
+    advisor = LLMAdvisor(server.analyze_with_llm, wait_budget_sec=0.05)
+    opinion, outcome = advisor.advise((symbol, tf, preset, bar_time), data, breakdown)
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Hashable, Tuple
+
+from common.logger import get_inference_logger
+
+
+logger = get_inference_logger()
+
+MODES = ("sync", "async")
+NO_OPINION = (0, 0.0, "LLM pending - using 7-module only")
+
+Opinion = Tuple[int, float, str]
+
+
+class _Entry:
+    __slots__ = ('future', 'used')
+
+    def __init__(self, future: Future):
+        self.future = future
+        self.used = False
+
+
+class LLMAdvisor:
+    """
+    LLM 判断をバー単位でバックグラウンド実行し、待ち時間の上限付きで結果を引き当てる
+    """
+
+    def __init__(
+        self,
+        advise: Callable[[Dict, Dict], Opinion],
+        wait_budget_sec: float = 0.05,
+        max_workers: int = 1,
+        max_entries: int = 256,
+    ):
+        """
+        Args:
+            advise: (data, module_breakdown) -> (signal, confidence, reason)
+            wait_budget_sec: リクエストが LLM の結果を待つ上限（秒）
+            max_workers: LLM 呼び出しの同時実行数（LM Studio は通常1本ずつ処理する）
+            max_entries: 保持するバー数の上限（古いものから捨てる）
+        """
+        self.advise_fn = advise
+        self.wait_budget_sec = max(0.0, float(wait_budget_sec))
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="llm-advisor")
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._latest_bar: Dict[Hashable, Hashable] = {}
+        self._counts = {'in_time': 0, 'late_bound': 0, 'missed': 0, 'cancelled': 0, 'unused': 0, 'errors': 0}
+        self._llm_time_total = 0.0
+        self._llm_time_n = 0
+
+    def _run(self, data: Dict, breakdown: Dict) -> Opinion:
+        t0 = time.monotonic()
+        try:
+            return self.advise_fn(data, breakdown)
+        finally:
+            elapsed = time.monotonic() - t0
+            with self._lock:
+                self._llm_time_total += elapsed
+                self._llm_time_n += 1
+
+    def _discard(self, entry: _Entry) -> None:
+        """保持対象から外す（未開始なら取り消し、完了済みで未使用なら unused に数える）"""
+        if entry.future.cancel():
+            self._counts['cancelled'] += 1
+        elif entry.future.done() and not entry.used:
+            self._counts['unused'] += 1
+
+    def _get_or_submit(self, key: Tuple, data: Dict, breakdown: Dict) -> Tuple[_Entry, bool]:
+        """(エントリ, 既存だったか)。key は (symbol, timeframe, preset, bar_time)"""
+        series, bar = key[:-1], key[-1]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry, True
+            # 新しいバー: 同じ系列（銘柄・時間足・プリセット）の古いバーは不要
+            previous = self._latest_bar.get(series)
+            if previous is not None and previous != bar:
+                old = self._entries.pop(series + (previous,), None)
+                if old is not None:
+                    self._discard(old)
+            self._latest_bar[series] = bar
+            entry = _Entry(self._executor.submit(self._run, data, breakdown))
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._discard(evicted)
+            return entry, False
+
+    def advise(self, key: Tuple, data: Dict, breakdown: Dict) -> Tuple[Opinion, str]:
+        """
+        LLM 判断を引き当てる。
+
+        Returns:
+            (opinion, outcome)。outcome は in_time（予算内に完了）/ late_bound（前のリクエストで
+            開始した結果を使用）/ missed（間に合わず LLM なし）/ errors（失敗したエントリは捨て、
+            同じバーの次のリクエストで再実行する）
+        """
+        entry, existed = self._get_or_submit(key, data, breakdown)
+        try:
+            opinion = entry.future.result(timeout=self.wait_budget_sec)
+            outcome = 'late_bound' if existed else 'in_time'
+        except FutureTimeoutError:
+            opinion, outcome = NO_OPINION, 'missed'
+        except Exception as e:
+            logger.warning(f"LLM advisory error - using 7-module only: {e}")
+            opinion, outcome = (0, 0.0, "LLM error - using 7-module only"), 'errors'
+        with self._lock:
+            if outcome in ('in_time', 'late_bound'):
+                entry.used = True
+            elif outcome == 'errors' and self._entries.get(key) is entry:
+                del self._entries[key]
+            self._counts[outcome] += 1
+        return opinion, outcome
+
+    def metrics(self) -> Dict[str, float]:
+        with self._lock:
+            counts = dict(self._counts)
+            llm_n, llm_total = self._llm_time_n, self._llm_time_total
+            pending = sum(1 for e in self._entries.values() if not e.future.done())
+        answered = counts['in_time'] + counts['late_bound'] + counts['missed']
+        return {
+            **counts,
+            'pending': pending,
+            'hit_rate': (counts['in_time'] + counts['late_bound']) / answered if answered else 0.0,
+            'llm_mean_ms': llm_total / llm_n * 1000.0 if llm_n else 0.0,
+            'wait_budget_ms': self.wait_budget_sec * 1000.0,
+        }
+
+    def log_metrics(self) -> None:
+        m = self.metrics()
+        logger.info(
+            f"[LLM_ADVISOR] hit_rate={m['hit_rate']:.0%} in_time={m['in_time']} late_bound={m['late_bound']} "
+            f"missed={m['missed']} unused={m['unused']} cancelled={m['cancelled']} errors={m['errors']} "
+            f"pending={m['pending']} llm_mean={m['llm_mean_ms']:.0f}ms budget={m['wait_budget_ms']:.0f}ms"
+        )
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,186 @@
+"""
+LM Studio クライアントのレイテンシ比較（ローカルのスタブサーバー）
+
+LM Studio 互換のスタブ（/v1/models, /v1/chat/completions。応答遅延は --delay-ms）を
+起動し、以下の方式で chat() を --requests 回呼び出す。
+- legacy : 従来方式（毎回 requests.get(/v1/models) + requests.post。セッションなし）
+- pooled : LMStudioClient（モデルIDキャッシュ + keep-alive セッション）
+- async  : AsyncLMStudioClient を --concurrency 並列で実行
+
+各方式の p50 / p95 レイテンシ、スループット、サーバー側で受け付けた TCP 接続数と
+/v1/models の呼び出し回数を報告する。
+
+Usage:
+    python lm_client_benchmark.py --requests 200 --delay-ms 5 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List
+
+import requests
+
+from ai_research.lm_client import AsyncLMStudioClient, LMStudioClient
+
+
+class StubLMServer:
+    """LM Studio 互換のスタブ（keep-alive 対応。接続数とエンドポイント別の呼び出し数を数える）"""
+
+    def __init__(self, delay_ms: float = 0.0, model_id: str = "stub-model"):
+        self.delay = delay_ms / 1000.0
+        self.model_id = model_id
+        self.counts: Dict[str, int] = {"connections": 0, "models": 0, "chat": 0}
+        self._lock = threading.Lock()
+        stub = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # ヘッダと本文を1回の送信にまとめる（分割送信だと Nagle + 遅延 ACK で約40ms 待つ）
+            wbufsize = 64 * 1024
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.counts["connections"] += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, payload: Dict[str, Any]):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.counts["models"] += 1
+                self._send(200, {"data": [{"id": "text-embedding-x"}, {"id": stub.model_id}]})
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                with stub._lock:
+                    stub.counts["chat"] += 1
+                if request.get("model") != stub.model_id:
+                    self._send(404, {"error": f"model not found: {request.get('model')}"})
+                    return
+                time.sleep(stub.delay)
+                content = f"BUY 確信度: 0.7 ({request['messages'][-1]['content'][:20]})"
+                self._send(200, {"choices": [{"message": {"content": content}}]})
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts = {key: 0 for key in self.counts}
+
+
+def legacy_chat(base_url: str, prompt: str) -> str:
+    """従来の LMStudioClient.chat と同じ通信パターン"""
+    model_id = "local-model"
+    models_response = requests.get(f"{base_url}/v1/models", timeout=10)
+    if models_response.status_code == 200:
+        for model in models_response.json().get("data", []):
+            if "embed" not in str(model.get("id", "")).lower():
+                model_id = model["id"]
+                break
+    payload = {"model": model_id, "messages": [{"role": "user", "content": prompt}],
+               "temperature": 0.2, "max_tokens": 200}
+    response = requests.post(f"{base_url}/v1/chat/completions", json=payload, timeout=30)
+    return response.json()["choices"][0]["message"]["content"]
+
+
+def _summary(latencies: List[float], elapsed: float, counts: Dict[str, int]) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    return {
+        "p50_ms": latencies[len(latencies) // 2] * 1000.0,
+        "p95_ms": latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000.0,
+        "req_per_s": len(latencies) / elapsed,
+        **counts,
+    }
+
+
+def _run_sync(stub: StubLMServer, call: Callable[[str], str], requests_n: int) -> Dict[str, float]:
+    stub.reset_counts()
+    latencies = []
+    t0 = time.perf_counter()
+    for i in range(requests_n):
+        t = time.perf_counter()
+        call(f"prompt {i}")
+        latencies.append(time.perf_counter() - t)
+    return _summary(latencies, time.perf_counter() - t0, dict(stub.counts))
+
+
+def _run_async(stub: StubLMServer, requests_n: int, concurrency: int) -> Dict[str, float]:
+    stub.reset_counts()
+
+    async def main():
+        client = AsyncLMStudioClient(stub.url, pool_size=concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one(i):
+            async with semaphore:
+                t = time.perf_counter()
+                await client.chat(f"prompt {i}", temperature=0.2, max_tokens=200)
+                latencies.append(time.perf_counter() - t)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests_n)))
+        elapsed = time.perf_counter() - t0
+        await client.close()
+        return latencies, elapsed
+
+    latencies, elapsed = asyncio.run(main())
+    return _summary(latencies, elapsed, dict(stub.counts))
+
+
+def run(requests_n: int = 200, delay_ms: float = 5.0, concurrency: int = 8) -> Dict[str, Dict[str, float]]:
+    results = {}
+    with StubLMServer(delay_ms=delay_ms) as stub:
+        results["legacy"] = _run_sync(stub, lambda p: legacy_chat(stub.url, p), requests_n)
+        client = LMStudioClient(stub.url)
+        results["pooled"] = _run_sync(
+            stub, lambda p: client.chat(p, temperature=0.2, max_tokens=200), requests_n
+        )
+        client.close()
+        results[f"async x{concurrency}"] = _run_async(stub, requests_n, concurrency)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LM Studio client benchmark (local stub server)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--delay-ms", type=float, default=5.0, help="Stub completion latency")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    results = run(args.requests, args.delay_ms, args.concurrency)
+    print(f"requests={args.requests} stub_delay={args.delay_ms}ms")
+    print(f"{'mode':>10} {'p50 ms':>8} {'p95 ms':>8} {'req/s':>8} {'conns':>6} {'models':>7}")
+    for mode, r in results.items():
+        print(
+            f"{mode:>10} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['req_per_s']:>8.1f} "
+            f"{r['connections']:>6} {r['models']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
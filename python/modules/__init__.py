@@ -20,33 +20,58 @@ Integrates detection modules with Ubuntu's enhanced implementations:
 12. Volatility Breakout - Larry Williams式ブレイクアウト
 """
 
-# Core modules (implemented)
-from modules.candle_patterns_module import CandlePatternsModule
-from modules.chart_patterns_module import ChartPatternsModule
-from modules.false_breakout_module import FalseBreakoutModule
-from modules.wave_structure_module import WaveStructureModule
-from modules.structural_module import StructuralModule
-from modules.technical_module import TechnicalModule
-from modules.trend_module import TrendModule
-from modules.volatility_module import VolatilityModule
-from modules.pullback_module import PullbackModule, PullbackEMAReference, PullbackType
+import importlib
 
-# ★NEW: 金融工学モジュール（クオンツ戦略）
-from modules.momentum_module import MomentumModule
-from modules.mean_reversion_module import MeanReversionModule
-from modules.volatility_breakout_module import VolatilityBreakoutModule
+# 各クラスは初回アクセス時にサブモジュールを読み込む（PEP 562）。
+# プリセットで無効なモジュールの import コストを起動時に払わないため。
+_LAZY_IMPORTS = {
+    # Core modules (implemented)
+    'CandlePatternsModule': 'modules.candle_patterns_module',
+    'ChartPatternsModule': 'modules.chart_patterns_module',
+    'FalseBreakoutModule': 'modules.false_breakout_module',
+    'WaveStructureModule': 'modules.wave_structure_module',
+    'StructuralModule': 'modules.structural_module',
+    'TechnicalModule': 'modules.technical_module',
+    'TrendModule': 'modules.trend_module',
+    'VolatilityModule': 'modules.volatility_module',
+    'PullbackModule': 'modules.pullback_module',
+    'PullbackEMAReference': 'modules.pullback_module',
+    'PullbackType': 'modules.pullback_module',
 
-# Ubuntu candle pattern detectors (for advanced usage)
-from modules.base_detector import BaseCandleDetector, CandleData, PatternResult
-from modules.pin_bar import PinBarDetector
-from modules.engulfing import EngulfingDetector
-from modules.doji import DojiDetector
+    # ★NEW: 金融工学モジュール（クオンツ戦略）
+    'MomentumModule': 'modules.momentum_module',
+    'MeanReversionModule': 'modules.mean_reversion_module',
+    'VolatilityBreakoutModule': 'modules.volatility_breakout_module',
 
-# Ubuntu chart pattern detectors (for advanced usage)
-from modules.base_chart_pattern import BaseChartPattern, ChartPatternResult, PatternType
-from modules.double_top_bottom import DoubleTopBottomDetector
-from modules.head_shoulders import HeadShouldersDetector
-from modules.triangles import TriangleDetector
+    # Ubuntu candle pattern detectors (for advanced usage)
+    'BaseCandleDetector': 'modules.base_detector',
+    'CandleData': 'modules.base_detector',
+    'PatternResult': 'modules.base_detector',
+    'PinBarDetector': 'modules.pin_bar',
+    'EngulfingDetector': 'modules.engulfing',
+    'DojiDetector': 'modules.doji',
+
+    # Ubuntu chart pattern detectors (for advanced usage)
+    'BaseChartPattern': 'modules.base_chart_pattern',
+    'ChartPatternResult': 'modules.base_chart_pattern',
+    'PatternType': 'modules.base_chart_pattern',
+    'DoubleTopBottomDetector': 'modules.double_top_bottom',
+    'HeadShouldersDetector': 'modules.head_shoulders',
+    'TriangleDetector': 'modules.triangles',
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
 
 __all__ = [
     # Main modules for signal engine (9 core + 3 quantitative)
@@ -0,0 +1,235 @@
+"""
+ターミナル単位のリクエストディスパッチャ（ファイルブリッジ用）
+
+従来の run() はリクエストを全ターミナル横断で1件ずつ処理していたため、
+1件の遅いリクエスト（LLM 呼び出しで最大 30 秒）が他ターミナルの応答をすべて遅らせていた。
+
+- ターミナル（dir_key + mt4_id）ごとに FIFO キューを持ち、同じターミナルの
+  リクエストは到着順に1件ずつ処理する（状態の更新順序を保つ）
+- 異なるターミナルのリクエストはワーカープールで並行に処理する
+- 1件処理するごとにワーカーを手放すため、ターミナル間はラウンドロビンになる
+- 期限（deadline）: 開始時点で期限切れなら処理せず WAIT を返す。
+  処理中に期限を過ぎた場合は期限時点で WAIT を返し、遅れて出た結果は破棄する
+- process が例外を出したリクエストには WAIT（reason は "error: ..."）を返す
+- shutdown() 後はワーカーに再投入せず、キューに残ったリクエストには WAIT を返す
+- ターミナルごとのキュー待ち時間・処理時間・期限切れ件数を metrics() で取得できる
+
+Usage:
+    dispatcher = TerminalDispatcher(process, respond, max_workers=4, deadline_sec=45)
+    dispatcher.submit(BridgeRequest(key, mt4_id, data, data_path))
+    dispatcher.metrics()
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from common.logger import get_inference_logger
+
+
+logger = get_inference_logger()
+
+# metrics のパーセンタイル計算に使う直近サンプル数（ターミナルごと）
+METRIC_SAMPLES = 256
+
+
+@dataclass
+class BridgeRequest:
+    """ファイルブリッジの1リクエスト（パース済み）"""
+    key: str                  # ターミナルの一意キー（dir_key__mt4_id）
+    mt4_id: str
+    data: Dict[str, Any]
+    data_path: Path
+    enqueued_at: float = field(default_factory=time.monotonic)
+    deadline: Optional[float] = None  # time.monotonic() 基準。None は期限なし
+    responded: bool = False
+
+
+class _TerminalState:
+    """ターミナルごとのキューと統計"""
+
+    def __init__(self):
+        self.queue: Deque[BridgeRequest] = deque()
+        self.running = False
+        self.completed = 0
+        self.expired = 0      # 開始前に期限切れ（処理せず WAIT）
+        self.late = 0         # 処理中に期限切れ（WAIT を返し結果は破棄）
+        self.errors = 0
+        self.queue_wait: Deque[float] = deque(maxlen=METRIC_SAMPLES)
+        self.process_time: Deque[float] = deque(maxlen=METRIC_SAMPLES)
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class TerminalDispatcher:
+    """
+    ターミナル単位で順序を保ちつつ、ターミナル間を並行処理するディスパッチャ
+    """
+
+    def __init__(
+        self,
+        process: Callable[[BridgeRequest], Tuple[int, float, str]],
+        respond: Callable[[BridgeRequest, int, float, str], None],
+        max_workers: int = 4,
+        deadline_sec: float = 0.0,
+    ):
+        """
+        Args:
+            process: リクエストを処理して (signal, confidence, reason) を返す
+            respond: レスポンスを書き込む
+            max_workers: 同時に処理するターミナル数の上限
+            deadline_sec: キュー投入からの期限（秒）。0 以下で期限なし
+        """
+        self.process = process
+        self.respond = respond
+        self.max_workers = max(1, int(max_workers))
+        self.deadline_sec = float(deadline_sec or 0.0)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bridge")
+        self._lock = threading.Lock()
+        self._terminals: Dict[str, _TerminalState] = {}
+        self._closed = False
+
+    def submit(self, request: BridgeRequest) -> None:
+        """リクエストをターミナルのキューに積む（ターミナルが処理中でなければワーカーに渡す）"""
+        if request.deadline is None and self.deadline_sec > 0:
+            request.deadline = request.enqueued_at + self.deadline_sec
+        with self._lock:
+            if not self._closed:
+                state = self._terminals.setdefault(request.key, _TerminalState())
+                state.queue.append(request)
+                if not state.running:
+                    state.running = True
+                    self._executor.submit(self._drain, request.key)
+                return
+        self._respond_once(request, 0, 0.0, "server shutting down")
+
+    def _drain(self, key: str) -> None:
+        """キュー先頭の1件を処理し、残りがあれば再投入する（ターミナル間のラウンドロビン）"""
+        with self._lock:
+            state = self._terminals[key]
+            request = state.queue.popleft()
+        try:
+            self._execute(state, request)
+        finally:
+            with self._lock:
+                if state.queue and not self._closed:
+                    # shutdown() と同じロックの中で再投入する（停止後の submit は RuntimeError になる）
+                    self._executor.submit(self._drain, key)
+                    return
+                remaining = list(state.queue)
+                state.queue.clear()
+                state.running = False
+            for pending in remaining:
+                logger.warning(f"[DISPATCH:{pending.mt4_id}] dispatcher shut down before processing - WAIT")
+                self._respond_once(pending, 0, 0.0, "server shutting down")
+
+    def _execute(self, state: _TerminalState, request: BridgeRequest) -> None:
+        started = time.monotonic()
+        wait = started - request.enqueued_at
+        with self._lock:
+            state.queue_wait.append(wait)
+
+        if request.deadline is not None and started >= request.deadline:
+            with self._lock:
+                state.expired += 1
+            logger.warning(f"[DISPATCH:{request.mt4_id}] deadline exceeded in queue ({wait:.1f}s) - WAIT")
+            self._respond_once(request, 0, 0.0, f"deadline exceeded (queued {wait:.1f}s)")
+            return
+
+        timer = None
+        if request.deadline is not None:
+            timer = threading.Timer(request.deadline - started, self._on_deadline, args=(state, request))
+            timer.daemon = True
+            timer.start()
+        try:
+            signal, confidence, reason = self.process(request)
+        except Exception as e:
+            with self._lock:
+                state.errors += 1
+            logger.error(f"[DISPATCH:{request.mt4_id}] process error: {e}")
+            self._respond_once(request, 0, 0.0, f"error: {e}")
+            return
+        finally:
+            if timer is not None:
+                timer.cancel()
+            elapsed = time.monotonic() - started
+            with self._lock:
+                state.process_time.append(elapsed)
+
+        if self._respond_once(request, signal, confidence, reason):
+            with self._lock:
+                state.completed += 1
+        else:
+            logger.warning(
+                f"[DISPATCH:{request.mt4_id}] result discarded (finished {elapsed:.1f}s after start, past deadline)"
+            )
+
+    def _on_deadline(self, state: _TerminalState, request: BridgeRequest) -> None:
+        """処理中に期限を過ぎた: WAIT を先に返す（遅れた結果は _respond_once で破棄される）"""
+        if self._respond_once(request, 0, 0.0, f"deadline exceeded ({self.deadline_sec:g}s)"):
+            with self._lock:
+                state.late += 1
+            logger.warning(f"[DISPATCH:{request.mt4_id}] deadline exceeded while processing - WAIT")
+
+    def _respond_once(self, request: BridgeRequest, signal: int, confidence: float, reason: str) -> bool:
+        """1リクエストにつきレスポンスは1回だけ書く。書いた場合 True"""
+        with self._lock:
+            if request.responded:
+                return False
+            request.responded = True
+        self.respond(request, signal, confidence, reason)
+        return True
+
+    def pending(self) -> int:
+        """キュー待ち + 処理中のターミナル数"""
+        with self._lock:
+            return sum(1 for s in self._terminals.values() if s.running)
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """ターミナルごとの統計（キュー待ち・処理時間はミリ秒、直近 METRIC_SAMPLES 件）"""
+        with self._lock:
+            snapshot = {
+                key: (list(s.queue_wait), list(s.process_time), s.completed, s.expired, s.late, s.errors,
+                      len(s.queue))
+                for key, s in self._terminals.items()
+            }
+        result = {}
+        for key, (waits, times, completed, expired, late, errors, depth) in snapshot.items():
+            result[key] = {
+                'completed': completed,
+                'expired': expired,
+                'late': late,
+                'errors': errors,
+                'queue_depth': depth,
+                'queue_wait_p50_ms': _percentile(waits, 0.50) * 1000.0,
+                'queue_wait_p95_ms': _percentile(waits, 0.95) * 1000.0,
+                'queue_wait_max_ms': max(waits, default=0.0) * 1000.0,
+                'process_p50_ms': _percentile(times, 0.50) * 1000.0,
+                'process_max_ms': max(times, default=0.0) * 1000.0,
+            }
+        return result
+
+    def log_metrics(self) -> None:
+        for key, m in self.metrics().items():
+            logger.info(
+                f"[DISPATCH] {key} done={m['completed']} expired={m['expired']} late={m['late']} "
+                f"errors={m['errors']} depth={m['queue_depth']} "
+                f"wait p50/p95/max={m['queue_wait_p50_ms']:.0f}/{m['queue_wait_p95_ms']:.0f}/"
+                f"{m['queue_wait_max_ms']:.0f}ms process p50/max={m['process_p50_ms']:.0f}/"
+                f"{m['process_max_ms']:.0f}ms"
+            )
+
+    def shutdown(self, wait: bool = True) -> None:
+        """新規の受け付けを止める。処理中のリクエストは完了させ、キューに残ったものには WAIT を返す"""
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=wait)
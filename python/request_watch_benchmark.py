@@ -0,0 +1,132 @@
+"""
+リクエスト検出方式のレイテンシ比較（ファイルブリッジ）
+
+SevenModuleInferenceServer.run() を監視方式ごとに子プロセスで起動し、
+request_BENCH.csv を書いてから response_BENCH.csv が現れるまでの時間
+（request-to-response レイテンシ）と、待機中の CPU 時間を計測する。
+process_request はスタブ（即座に WAIT を返す）なので、差は検出方式のみによる。
+
+Usage:
+    python request_watch_benchmark.py --requests 50 --modes polling,auto
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+
+PYTHON_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _run_child(mode: str, requests: int, poll_interval: float, gap_ms: float) -> Dict[str, Any]:
+    """子プロセス側: スタブサーバーを起動し、リクエストを1件ずつ送って応答時間を測る"""
+    from inference_server_7module import SevenModuleInferenceServer
+
+    class _BenchServer(SevenModuleInferenceServer):
+        def __init__(self, data_dir: Path):
+            # モデル・LLM は初期化しない（run() のファイル処理部分だけを使う）
+            self.data_dirs = [{'id': 'BENCH', 'data_dir': str(data_dir), '_dir_key': str(data_dir).lower()}]
+            self.data_dir = data_dir
+            self.status_files = []
+            self.request_mtimes = {}
+            self.request_count = 0
+
+        def process_request(self, mt4_id, data):
+            return 0, 0.5, "benchmark"
+
+    data_dir = Path(tempfile.mkdtemp(prefix="request_watch_"))
+    server = _BenchServer(data_dir)
+    threading.Thread(
+        target=server.run,
+        kwargs={'poll_interval': poll_interval, 'watch_backend': mode},
+        daemon=True,
+    ).start()
+    time.sleep(0.3)
+
+    request_file = data_dir / "request_BENCH.csv"
+    response_file = data_dir / "response_BENCH.csv"
+    latencies: List[float] = []
+    rng = random.Random(0)
+    for i in range(requests):
+        if response_file.exists():
+            response_file.unlink()
+        time.sleep(rng.uniform(0.5, 1.5) * gap_ms / 1000.0)  # ポーリング周期に対する位相をばらす
+        t0 = time.perf_counter()
+        with open(request_file, "w", encoding="utf-8") as f:
+            f.write(f"symbol;timeframe;ema12;ema25;atr;seq\nUSDJPY;M15;150.1;150.0;0.1;{i}\n")
+        while not response_file.exists():
+            time.sleep(0.0005)
+            if time.perf_counter() - t0 > 10.0:
+                raise RuntimeError("no response within 10s")
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+
+    # 待機中の CPU 時間（リクエストなし）
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    time.sleep(2.0)
+    idle_cpu = (time.process_time() - cpu0) / (time.perf_counter() - wall0) * 1000.0
+
+    import request_watcher
+    backend = mode if mode != "auto" else (
+        "inotify" if request_watcher.inotify_available()
+        else "watchdog" if request_watcher.WATCHDOG_AVAILABLE else "polling"
+    )
+    latencies.sort()
+    return {
+        "mode": mode,
+        "backend": backend,
+        "requests": len(latencies),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[max(0, int(len(latencies) * 0.95) - 1)],
+        "max_ms": latencies[-1],
+        "idle_cpu_ms_per_s": idle_cpu,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request watcher latency benchmark")
+    parser.add_argument("--modes", default="polling,auto", help="Comma-separated watch backends")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--gap-ms", type=float, default=100.0, help="Mean gap between requests")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_run_child(args.child, args.requests, args.poll_interval, args.gap_ms)))
+        return
+
+    env = dict(os.environ)
+    # 統一ロガーの出力先（既定は Windows パス）を一時ディレクトリに逃がす
+    env.setdefault("MT4_FILES_PATH", os.path.join(tempfile.gettempdir(), "request_watch_logs"))
+    results = []
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        cmd = [
+            sys.executable, os.path.abspath(__file__), "--child", mode,
+            "--requests", str(args.requests), "--poll-interval", str(args.poll_interval),
+            "--gap-ms", str(args.gap_ms),
+        ]
+        out = subprocess.run(cmd, capture_output=True, text=True, cwd=PYTHON_DIR, env=env)
+        if out.returncode != 0:
+            print(f"[WARN] mode={mode} failed: {out.stderr.strip()[-300:]}")
+            continue
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"poll_interval={args.poll_interval}s requests={args.requests}")
+    print(f"{'mode':>8} {'backend':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'idle CPU ms/s':>14}")
+    for r in results:
+        print(
+            f"{r['mode']:>8} {r['backend']:>8} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+            f"{r['max_ms']:>8.2f} {r['idle_cpu_ms_per_s']:>14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
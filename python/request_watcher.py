@@ -0,0 +1,360 @@
+"""
+リクエストファイル監視（ファイルブリッジ用）
+
+MT4 EA は data ディレクトリに request*.csv を書き込み、推論サーバーが
+response*.csv を返す。従来は poll_interval ごとに全ディレクトリを glob + stat していたため、
+最大 poll_interval 分の遅延と、待機中の CPU 消費があった。
+
+バックエンド:
+- inotify  : Linux。IN_CLOSE_WRITE / IN_MOVED_TO で書き込み完了したファイルだけを通知（ctypes）
+- watchdog : watchdog パッケージがあれば使用（Windows の ReadDirectoryChangesW 等）。
+             modified は書き込み途中にも届くため、サイズと mtime が settle_sec 変わらなくなってから通知する
+- polling  : 従来どおり poll_interval ごとに全ディレクトリを走査
+
+イベント型のバックエンドでも、取りこぼし（キューあふれ等）に備えて
+rescan_interval ごとに全走査を要求する。存在しないディレクトリは監視せず、
+全走査のたびに監視の追加を試みる（削除されたディレクトリの再作成にも追従する）。
+
+Usage:
+    watcher = create_request_watcher(dirs, backend="auto", poll_interval=0.5)
+    while True:
+        changed = watcher.wait()
+        if changed is None:
+            ...  # 全ディレクトリを走査
+        else:
+            ...  # changed の (dir, file) だけ処理
+"""
+
+import abc
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import queue
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from common.logger import get_inference_logger
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+
+
+logger = get_inference_logger()
+
+BACKENDS = ("auto", "inotify", "watchdog", "polling")
+REQUEST_PATTERN = "request*.csv"
+# watchdog の modified を書き込み完了とみなすまでの静止時間（秒）
+SETTLE_SEC = 0.05
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class PollingRequestWatcher:
+    """従来方式: poll_interval ごとに全走査を要求する"""
+
+    backend = "polling"
+
+    def __init__(self, dirs: Sequence[Path], poll_interval: float = 0.5):
+        self.dirs = [Path(d) for d in dirs]
+        self.poll_interval = poll_interval
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[List[Path]]:
+        """poll_interval 待って None（全走査）を返す"""
+        time.sleep(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+        return None
+
+    def close(self):
+        pass
+
+
+class _EventRequestWatcher(abc.ABC):
+    """イベント型バックエンドの共通部分（定期的な全走査の要求・監視ディレクトリの追加）"""
+
+    def __init__(self, dirs: Sequence[Path], rescan_interval: float = 30.0, pattern: str = REQUEST_PATTERN):
+        self.dirs = [Path(d) for d in dirs]
+        self.rescan_interval = rescan_interval
+        self.pattern = pattern
+        self._next_rescan = time.monotonic() + rescan_interval
+        self._watched: Dict[Path, object] = {}
+
+    def _matches(self, name: str) -> bool:
+        return fnmatch.fnmatch(name.lower(), self.pattern)
+
+    def _sync_watches(self) -> None:
+        """監視していないディレクトリのうち、存在するものに監視を追加する"""
+        for d in self.dirs:
+            if d in self._watched or not d.is_dir():
+                continue
+            try:
+                self._watched[d] = self._add_watch(d)
+                logger.info(f"Request watcher ({self.backend}): watching {d}")
+            except OSError as e:
+                logger.warning(f"Request watcher ({self.backend}): cannot watch {d} ({e}); relying on rescans")
+
+    @property
+    def missing(self) -> List[Path]:
+        """監視できていないディレクトリ（全走査でのみ拾う）"""
+        return [d for d in self.dirs if d not in self._watched]
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[List[Path]]:
+        """
+        リクエストファイルの書き込み完了を待つ。
+
+        Returns:
+            変更されたリクエストファイルのリスト（タイムアウト時は空リスト）。
+            全走査が必要な場合（定期走査・イベント取りこぼし）は None。
+        """
+        now = time.monotonic()
+        if now >= self._next_rescan:
+            self._next_rescan = now + self.rescan_interval
+            return self._rescan()
+        remaining = self._next_rescan - now
+        changed = self._wait_events(remaining if timeout is None else min(timeout, remaining))
+        if changed is None:
+            self._next_rescan = time.monotonic() + self.rescan_interval
+            return self._rescan()
+        # 同じファイルへの連続イベントは1つにまとめる（順序は維持）
+        return list(dict.fromkeys(changed))
+
+    def _rescan(self) -> None:
+        """全走査の前に、後から作られた（再作成された）ディレクトリの監視を追加する"""
+        self._sync_watches()
+        return None
+
+    @abc.abstractmethod
+    def _add_watch(self, directory: Path) -> object:
+        """ディレクトリの監視を追加して識別子を返す（失敗時は OSError）"""
+
+    @abc.abstractmethod
+    def _wait_events(self, timeout: float) -> Optional[List[Path]]:
+        """
+        timeout 秒までイベントを待ち、書き込み完了したリクエストファイルを返す。
+        全走査が必要な場合は None。
+        """
+
+
+class InotifyRequestWatcher(_EventRequestWatcher):
+    """Linux inotify による監視（ctypes で libc を直接呼ぶ）"""
+
+    backend = "inotify"
+
+    def __init__(self, dirs: Sequence[Path], rescan_interval: float = 30.0, pattern: str = REQUEST_PATTERN):
+        super().__init__(dirs, rescan_interval, pattern)
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._libc = libc
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._wds: Dict[int, Path] = {}
+        self._sync_watches()
+
+    def _add_watch(self, directory: Path) -> int:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(directory)), IN_CLOSE_WRITE | IN_MOVED_TO)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed: {directory}")
+        self._wds[wd] = directory
+        return wd
+
+    def _wait_events(self, timeout: float) -> Optional[List[Path]]:
+        readable, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+        if not readable:
+            return []
+        try:
+            buf = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        changed: List[Path] = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buf):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buf, offset)
+            offset += _EVENT_HEADER.size
+            name = buf[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            if mask & IN_IGNORED:
+                # ディレクトリの削除・アンマウント: 監視は外れる（全走査で再作成されていれば追加し直す）
+                directory = self._wds.pop(wd, None)
+                if directory is not None:
+                    self._watched.pop(directory, None)
+                return None
+            if mask & IN_Q_OVERFLOW:
+                # イベントの取りこぼし: 全走査に戻す
+                return None
+            directory = self._wds.get(wd)
+            if directory is not None and name and self._matches(name):
+                changed.append(directory / name)
+        return changed
+
+    def close(self):
+        if getattr(self, "_fd", -1) >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class _SettleTracker:
+    """書き込み途中かもしれないファイルを、サイズと mtime が settle_sec 変わらなくなるまで保留する"""
+
+    def __init__(self, settle_sec: float = SETTLE_SEC):
+        self.settle_sec = settle_sec
+        self._pending: Dict[Path, Tuple[Optional[Tuple[int, int]], float]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._pending)
+
+    @staticmethod
+    def _signature(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def touch(self, path: Path, now: float) -> None:
+        """変更イベント: 静止時間の計測をやり直す"""
+        self._pending[path] = (self._signature(path), now)
+
+    def discard(self, path: Path) -> None:
+        self._pending.pop(path, None)
+
+    def settled(self, now: float) -> List[Path]:
+        """静止時間を過ぎても変わっていないファイルを返す（消えたファイルは捨てる）"""
+        ready = []
+        for path, (sig, since) in list(self._pending.items()):
+            if now - since < self.settle_sec:
+                continue
+            current = self._signature(path)
+            if current is None:
+                del self._pending[path]
+            elif current == sig:
+                del self._pending[path]
+                ready.append(path)
+            else:
+                self._pending[path] = (current, now)
+        return ready
+
+
+class WatchdogRequestWatcher(_EventRequestWatcher):
+    """watchdog パッケージによる監視（OS ごとのネイティブ API）"""
+
+    backend = "watchdog"
+
+    def __init__(self, dirs: Sequence[Path], rescan_interval: float = 30.0, pattern: str = REQUEST_PATTERN,
+                 settle_sec: float = SETTLE_SEC):
+        super().__init__(dirs, rescan_interval, pattern)
+        # (パス, 書き込み完了か)。modified は書き込み途中にも届く（Windows）
+        self._events: "queue.Queue[Tuple[Path, bool]]" = queue.Queue()
+        self._unsettled = _SettleTracker(settle_sec)
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                # created は内容の書き込み前に届くため使わない（続く modified/closed で処理する）
+                if event.is_directory or event.event_type not in ("modified", "moved", "closed"):
+                    return
+                path = Path(getattr(event, "dest_path", "") or event.src_path)
+                if watcher._matches(path.name):
+                    watcher._events.put((path, event.event_type != "modified"))
+
+        self._handler = _Handler()
+        self._observer = Observer()
+        self._observer.start()
+        self._sync_watches()
+
+    def _add_watch(self, directory: Path) -> object:
+        return self._observer.schedule(self._handler, str(directory), recursive=False)
+
+    def _rescan(self) -> None:
+        # 削除されたディレクトリの監視は observer 側で止まるため、消えたものは外して追加し直す
+        for d in [d for d in self._watched if not d.is_dir()]:
+            try:
+                self._observer.unschedule(self._watched.pop(d))
+            except (KeyError, OSError):
+                pass
+        return super()._rescan()
+
+    def _wait_events(self, timeout: float) -> Optional[List[Path]]:
+        deadline = time.monotonic() + max(0.0, timeout)
+        while True:
+            wait = deadline - time.monotonic()
+            if self._unsettled:
+                wait = min(wait, self._unsettled.settle_sec)
+            items = []
+            try:
+                items.append(self._events.get(timeout=max(0.0, wait)))
+                while True:
+                    items.append(self._events.get_nowait())
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            changed = []
+            for path, complete in items:
+                if complete:
+                    self._unsettled.discard(path)
+                    changed.append(path)
+                else:
+                    self._unsettled.touch(path, now)
+            changed.extend(self._unsettled.settled(now))
+            if changed or now >= deadline:
+                return changed
+
+    def close(self):
+        self._observer.stop()
+        self._observer.join(timeout=2.0)
+
+
+def inotify_available() -> bool:
+    """Linux で libc に inotify がある場合 True"""
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+        return hasattr(libc, "inotify_init1")
+    except OSError:
+        return False
+
+
+def create_request_watcher(
+    dirs: Sequence[Path],
+    backend: str = "auto",
+    poll_interval: float = 0.5,
+    rescan_interval: float = 30.0,
+):
+    """
+    監視バックエンドを作成する。
+
+    auto は inotify → watchdog → polling の順に使えるものを選ぶ。
+    イベント型バックエンドの初期化に失敗した場合は polling にフォールバックする。
+    存在しないディレクトリはフォールバックの理由にせず、全走査で拾いつつ作成後に監視を追加する。
+    """
+    backend = (backend or "auto").strip().lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"backend must be one of {BACKENDS}, got {backend!r}")
+
+    candidates = []
+    if backend in ("auto", "inotify") and inotify_available():
+        candidates.append(InotifyRequestWatcher)
+    if backend in ("auto", "watchdog") and WATCHDOG_AVAILABLE:
+        candidates.append(WatchdogRequestWatcher)
+    for cls in candidates:
+        try:
+            return cls(dirs, rescan_interval=rescan_interval)
+        except Exception as e:
+            logger.warning(f"Request watcher '{cls.backend}' unavailable ({e}); trying next backend")
+    if backend not in ("auto", "polling"):
+        logger.warning(f"Request watcher '{backend}' unavailable; falling back to polling")
+    return PollingRequestWatcher(dirs, poll_interval=poll_interval)
@@ -0,0 +1,158 @@
+"""
+server_status.txt のハートビート書き込み（バックグラウンド・変更時のみ・アトミック置換）
+
+従来の update_status はリクエストを1件処理するたびに、全データディレクトリの
+server_status.txt を開いて書き直していた。OneDrive などの同期フォルダでは
+1回の推論ごとにディレクトリ数ぶんの同期が走る。
+
+- update() は状態をメモリに置くだけ（ファイルには触れない）
+- バックグラウンドスレッドが interval_sec ごとに、内容（status / リクエスト数）が
+  変わったディレクトリだけ書き込む。変化がなくても keepalive_sec ごとに時刻を更新する
+- 書き込みは同じディレクトリの一時ファイル + os.replace（読み手が途中の内容を見ない）
+- 書き込みに失敗したディレクトリは backoff_sec（失敗が続くと倍々、上限 max_backoff_sec）の間スキップする
+
+Usage:
+    heartbeat = StatusHeartbeat(status_files)
+    heartbeat.start(interval_sec=5.0)
+    heartbeat.update("running", request_count)
+    heartbeat.stop()   # 未書き込みの状態を書き出してから止める
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from common.logger import get_inference_logger
+
+
+logger = get_inference_logger()
+
+
+class _DirState:
+    __slots__ = ('written', 'last_write', 'retry_at', 'failures')
+
+    def __init__(self):
+        self.written: Optional[Tuple[str, int]] = None
+        self.last_write = 0.0
+        self.retry_at = 0.0
+        self.failures = 0
+
+
+class StatusHeartbeat:
+    """server_status.txt を間引いて書き込むハートビート"""
+
+    def __init__(
+        self,
+        status_files: Iterable[Path],
+        interval_sec: float = 5.0,
+        keepalive_sec: float = 60.0,
+        backoff_sec: float = 30.0,
+        max_backoff_sec: float = 300.0,
+    ):
+        # 同じパスが複数定義されていても書き込みは1回
+        self.status_files = list(dict.fromkeys(Path(p) for p in status_files))
+        self.interval_sec = float(interval_sec)
+        self.keepalive_sec = float(keepalive_sec)
+        self.backoff_sec = float(backoff_sec)
+        self.max_backoff_sec = float(max_backoff_sec)
+        self._state: Tuple[str, int] = ("starting", 0)
+        self._dirs: Dict[Path, _DirState] = {p: _DirState() for p in self.status_files}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.writes = 0
+        self.failures = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def update(self, status: str, request_count: int) -> None:
+        """現在の状態を設定する（書き込みは次のハートビートで行う）"""
+        with self._lock:
+            self._state = (status, int(request_count))
+
+    def start(self, interval_sec: Optional[float] = None, keepalive_sec: Optional[float] = None) -> None:
+        if interval_sec is not None:
+            self.interval_sec = float(interval_sec)
+        if keepalive_sec is not None:
+            self.keepalive_sec = float(keepalive_sec)
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="status-heartbeat", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """スレッドを止め、未書き込みの状態を（バックオフ中のディレクトリも含めて）書き出す"""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            self._wake.set()
+            thread.join()
+        self.flush(force=True)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.interval_sec)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Status heartbeat error: {e}")
+
+    def flush(self, force: bool = False, now: Optional[float] = None) -> int:
+        """内容が変わった（または keepalive を過ぎた）ディレクトリに書き込む。書き込んだ数を返す
+
+        force: バックオフ中のディレクトリにも書き込む（停止時用）
+        now: keepalive / バックオフの判定に使う時刻（time.monotonic() 基準。None で現在時刻）
+        """
+        with self._lock:
+            state = self._state
+        payload = None
+        written = 0
+        with self._write_lock:
+            if now is None:
+                now = time.monotonic()
+            for path, d in self._dirs.items():
+                keepalive_due = self.keepalive_sec > 0 and now - d.last_write >= self.keepalive_sec
+                if d.written == state and not keepalive_due:
+                    continue
+                if not force and now < d.retry_at:
+                    continue
+                if payload is None:
+                    payload = f"{state[0]}|{datetime.now().isoformat()}|{state[1]}"
+                if self._write(path, d, payload, now):
+                    d.written = state
+                    written += 1
+        return written
+
+    def _write(self, path: Path, d: _DirState, payload: str, now: float) -> bool:
+        tmp = path.with_name(f".{path.name}.tmp")
+        try:
+            with open(tmp, 'w') as f:
+                f.write(payload)
+            os.replace(tmp, path)
+        except Exception as e:
+            backoff = min(self.max_backoff_sec, self.backoff_sec * (2 ** d.failures))
+            d.failures += 1
+            d.retry_at = now + backoff
+            self.failures += 1
+            logger.warning(f"Failed to write status file {path}: {e} (retry in {backoff:g}s)")
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+            return False
+        d.last_write = now
+        d.failures = 0
+        d.retry_at = 0.0
+        self.writes += 1
+        return True
@@ -0,0 +1,312 @@
+"""
+銘柄プロファイル（正規化・pip サイズ・指数判定・ATR 閾値・モデルパス）の事前計算テーブル
+
+従来はリクエストごとに、シンボルの正規化・指数判定（キーワード走査）・pip サイズの判定・
+銘柄別 ATR 閾値の前方一致走査・時間足の表記ゆれを含むモデルパスの探索を繰り返していた。
+起動時（および設定の再読み込み時）に SymbolProfile を一度だけ作っておき、
+リクエスト経路では dict を1回引くだけにする。
+
+- 既知の銘柄（プリセット・設定の ATR 上書き・モデルパスのキー・別名）は起動時に作る
+- 未知の銘柄は初回に作ってメモ化する（上限 MAX_MEMO 件）
+- テーブルは作り直したら丸ごと差し替える（SymbolProfile 自体は不変）
+
+Usage:
+    table = SymbolProfileTable(symbol_atr_thresholds={'USDJPY': 8.0})
+    profile = table.get('US100.cash')   # symbol='NQ100', is_index=True, pip_size=1.0
+    profile.transformer_path('M15')
+"""
+
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from strategy_presets import SYMBOL_ATR_THRESHOLDS, get_atr_threshold, is_index_symbol
+
+
+# ロジック側の別名（MT5 の 'US100' などを内部基準の 'NQ100' に寄せる）
+SYMBOL_ALIASES = {
+    "US100": "NQ100",
+    "NAS100": "NQ100",
+}
+DEFAULT_MODEL_KEYS = ("default", "*", "DEFAULT")
+MAX_MEMO = 1024
+
+
+def normalize_symbol(symbol: str) -> str:
+    """銘柄判定・閾値参照など“ロジック側”で使う正規化。
+
+    - MT4の 'JP225.mt4' のような接尾辞を落とす
+    - MT5の 'US100' を内部基準の 'NQ100' に寄せる
+    """
+    s = (symbol or "").strip().upper()
+    if '.' in s:
+        s = s.split('.', 1)[0].strip()
+    return SYMBOL_ALIASES.get(s, s)
+
+
+def symbol_candidates(symbol: str) -> List[str]:
+    """モデルパス参照用の候補（そのまま → 接尾辞なし → 別名）"""
+    raw = (symbol or "").strip().upper()
+    candidates: List[str] = []
+    if raw:
+        candidates.append(raw)
+
+    # 'JP225.mt4' のようなケースに対応
+    if raw and '.' in raw:
+        base = raw.split('.', 1)[0].strip()
+        if base and base not in candidates:
+            candidates.append(base)
+
+    for c in list(candidates):
+        if c in SYMBOL_ALIASES:
+            a = SYMBOL_ALIASES[c]
+            if a not in candidates:
+                candidates.append(a)
+    return candidates
+
+
+def timeframe_variants(timeframe: str) -> List[str]:
+    tf = (timeframe or "").strip().upper()
+    if not tf:
+        return []
+    variants = [tf]
+
+    # M15 <-> 15 の相互運用
+    if tf.startswith('M') and tf[1:].isdigit():
+        n = tf[1:]
+        if n not in variants:
+            variants.append(n)
+    elif tf.isdigit():
+        m = f"M{tf}"
+        if m not in variants:
+            variants.append(m)
+
+    return variants
+
+
+def _mapping_value(mapping: Mapping[str, Any], key: str) -> Optional[str]:
+    val = mapping.get(key)
+    if isinstance(val, str) and val.strip():
+        return val.strip()
+    return None
+
+
+def select_model_path(mapping: Dict[str, Any], symbol: str, timeframe: str,
+                      default_path: Optional[str]) -> Optional[str]:
+    """SYMBOL_TF → SYMBOL → default → default_path の順にモデルパスを選ぶ"""
+    if not isinstance(mapping, dict):
+        return default_path
+
+    candidates = symbol_candidates(symbol)
+
+    # 1) SYMBOL_TF
+    for sym in candidates:
+        for tf in timeframe_variants(timeframe):
+            val = _mapping_value(mapping, f"{sym}_{tf}")
+            if val:
+                return val
+
+    return _symbol_model_path(mapping, candidates, default_path)
+
+
+def _symbol_model_path(mapping: Dict[str, Any], candidates: List[str],
+                       default_path: Optional[str]) -> Optional[str]:
+    # 2) SYMBOL
+    for sym in candidates:
+        val = _mapping_value(mapping, sym)
+        if val:
+            return val
+
+    # 3) default
+    for k in DEFAULT_MODEL_KEYS:
+        val = _mapping_value(mapping, k)
+        if val:
+            return val
+
+    return default_path
+
+
+def pip_size_for(symbol: str, is_index: bool) -> float:
+    if is_index:
+        return 1.0
+    if 'JPY' in symbol:
+        return 0.01
+    return 0.0001
+
+
+@dataclass(frozen=True)
+class SymbolProfile:
+    """1銘柄分の事前計算結果（不変）"""
+
+    key: str                      # 大文字・前後空白除去（'US100.CASH'）
+    symbol: str                   # ロジック用（'NQ100'）
+    candidates: Tuple[str, ...]   # モデルパス参照用
+    is_index: bool
+    pip_size: float
+    atr_threshold: float
+    atr_source: str
+    # 時間足（大文字）-> モデルパス。載っていない時間足は *_fallback
+    transformer_paths: Mapping[str, Optional[str]]
+    kan_paths: Mapping[str, Optional[str]]
+    transformer_fallback: Optional[str]
+    kan_fallback: Optional[str]
+
+    def transformer_path(self, timeframe: str) -> Optional[str]:
+        return self.transformer_paths.get((timeframe or "").strip().upper(), self.transformer_fallback)
+
+    def kan_path(self, timeframe: str) -> Optional[str]:
+        return self.kan_paths.get((timeframe or "").strip().upper(), self.kan_fallback)
+
+
+class SymbolProfileTable:
+    """SymbolProfile の参照テーブル（設定が変わったら作り直して差し替える）"""
+
+    def __init__(
+        self,
+        symbol_atr_thresholds: Optional[Dict[str, Any]] = None,
+        atr_threshold_fx: float = 7.0,
+        atr_threshold_index: float = 70.0,
+        transformer_model_paths: Optional[Dict[str, Any]] = None,
+        kan_model_paths: Optional[Dict[str, Any]] = None,
+        transformer_default_path: Optional[str] = None,
+        kan_default_path: Optional[str] = None,
+        symbols: Iterable[str] = (),
+    ):
+        self.atr_threshold_fx = float(atr_threshold_fx)
+        self.atr_threshold_index = float(atr_threshold_index)
+        self.atr_overrides = self._normalize_thresholds(symbol_atr_thresholds)
+        self._transformer_paths = transformer_model_paths if isinstance(transformer_model_paths, dict) else {}
+        self._kan_paths = kan_model_paths if isinstance(kan_model_paths, dict) else {}
+        self._transformer_default = transformer_default_path
+        self._kan_default = kan_default_path
+        self._profiles: Dict[str, SymbolProfile] = {}
+
+        known = set(SYMBOL_ATR_THRESHOLDS) | set(SYMBOL_ALIASES) | set(self.atr_overrides)
+        for mapping in (self._transformer_paths, self._kan_paths):
+            for k in mapping:
+                k = str(k).strip().upper()
+                if k and k not in DEFAULT_MODEL_KEYS:
+                    known.add(k.rsplit('_', 1)[0] if '_' in k else k)
+        known.update(str(s).strip().upper() for s in symbols)
+        for s in sorted(known):
+            if s:
+                self._profiles[s] = self._build(s)
+        self.prebuilt = len(self._profiles)
+
+    @staticmethod
+    def _normalize_thresholds(thresholds: Optional[Dict[str, Any]]) -> Dict[str, float]:
+        norm: Dict[str, float] = {}
+        if not isinstance(thresholds, dict):
+            return norm
+        for k, v in thresholds.items():
+            if k is None:
+                continue
+            kk = str(k).strip().upper()
+            if not kk:
+                continue
+            try:
+                norm[kk] = float(v)
+            except Exception:
+                continue
+        return norm
+
+    def _resolve_atr_threshold(self, sym: str, is_index: bool) -> Tuple[float, str]:
+        if not sym:
+            return (self.atr_threshold_index if is_index else self.atr_threshold_fx), "default(no_symbol)"
+
+        # 1) configの銘柄別上書き（最優先）
+        if sym in self.atr_overrides:
+            return self.atr_overrides[sym], f"config_exact:{sym}"
+
+        best_key = None
+        best_val = None
+        best_kind = None
+        for key, val in self.atr_overrides.items():
+            if sym.startswith(key):
+                kind = "config_prefix"
+            elif key in sym:
+                kind = "config_contains"
+            else:
+                continue
+
+            if best_key is None or len(key) > len(best_key):
+                best_key = key
+                best_val = val
+                best_kind = kind
+
+        if best_key is not None:
+            return float(best_val), f"{best_kind}:{best_key}"
+
+        # 2) 既存プリセット（strategy_presets）フォールバック
+        try:
+            return float(get_atr_threshold(sym)), "preset_get_atr_threshold"
+        except Exception:
+            pass
+
+        # 3) 最終フォールバック（引数デフォルト）
+        return (self.atr_threshold_index if is_index else self.atr_threshold_fx), "default(param)"
+
+    def _timeframe_paths(self, mapping: Dict[str, Any], candidates: List[str],
+                         default_path: Optional[str]) -> Tuple[Mapping[str, Optional[str]], Optional[str]]:
+        """SYMBOL_TF キーに現れる時間足だけ個別に解決し、それ以外は共通のフォールバックにする"""
+        timeframes = set()
+        for k in mapping:
+            k = str(k).strip().upper()
+            for sym in candidates:
+                if k.startswith(sym + "_") and len(k) > len(sym) + 1:
+                    timeframes.update(timeframe_variants(k[len(sym) + 1:]))
+        paths = {tf: select_model_path(mapping, candidates[0] if candidates else "", tf, default_path)
+                 for tf in timeframes}
+        return MappingProxyType(paths), _symbol_model_path(mapping, candidates, default_path)
+
+    def _build(self, key: str) -> SymbolProfile:
+        symbol = normalize_symbol(key)
+        is_index = is_index_symbol(symbol)
+        candidates = symbol_candidates(key)
+        atr_threshold, atr_source = self._resolve_atr_threshold(symbol, is_index)
+        transformer_paths, transformer_fallback = self._timeframe_paths(
+            self._transformer_paths, candidates, self._transformer_default
+        )
+        kan_paths, kan_fallback = self._timeframe_paths(self._kan_paths, candidates, self._kan_default)
+        return SymbolProfile(
+            key=key,
+            symbol=symbol,
+            candidates=tuple(candidates),
+            is_index=is_index,
+            pip_size=pip_size_for(symbol, is_index),
+            atr_threshold=atr_threshold,
+            atr_source=atr_source,
+            transformer_paths=transformer_paths,
+            kan_paths=kan_paths,
+            transformer_fallback=transformer_fallback,
+            kan_fallback=kan_fallback,
+        )
+
+    def get(self, symbol: str) -> SymbolProfile:
+        """シンボル（生の表記のまま）のプロファイル。未知の銘柄は作ってメモ化する"""
+        profile = self._profiles.get(symbol)
+        if profile is not None:
+            return profile
+        key = (symbol or "").strip().upper()
+        profile = self._profiles.get(key)
+        if profile is None:
+            profile = self._build(key)
+        if len(self._profiles) < self.prebuilt + MAX_MEMO:
+            self._profiles[key] = profile
+            if isinstance(symbol, str):
+                self._profiles[symbol] = profile
+        return profile
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+
+_default_table: Optional[SymbolProfileTable] = None
+
+
+def default_profiles() -> SymbolProfileTable:
+    """プリセットの既定値だけで作った共有テーブル（設定を持たないサーバー用）"""
+    global _default_table
+    if _default_table is None:
+        _default_table = SymbolProfileTable()
+    return _default_table
@@ -0,0 +1,195 @@
+"""
+スレッド予算マネージャ
+
+HTTP サーバーは MAX_WORKERS 本のリクエストスレッドで推論する。各スレッドの
+torch 演算（intra-op）や NumPy の BLAS がそれぞれコア数分のスレッドを起動すると、
+負荷時に CPU が過剰に割り当てられてテールレイテンシが悪化する。
+
+1つの予算（AG_THREAD_BUDGET。既定はコア数）を同時実行数で割り、
+torch / BLAS のスレッド数を一元的に設定する。
+
+- cpu  : 1推論あたり intra = budget // (workers * models_per_request)
+- cuda : 演算は GPU 側なので torch の CPU スレッドは 1。BLAS のみ予算を配分
+
+Usage:
+    budget = ThreadBudget.from_env(workers=4)
+    budget.export_env()   # numpy/torch の import 前に BLAS 環境変数を設定
+    ...
+    budget.apply()        # BLAS（と読み込み済みなら torch）のスレッド数を設定
+    on_torch_loaded(budget.apply_torch)   # torch は遅延読み込みのため、読み込み時に設定
+    budget.effective()    # /health 用の実効値（applied は blas / torch ごと）
+"""
+
+import os
+import sys
+from typing import Any, Dict, Optional
+
+try:
+    from threadpoolctl import threadpool_info, threadpool_limits
+    THREADPOOLCTL_AVAILABLE = True
+except ImportError:
+    THREADPOOLCTL_AVAILABLE = False
+
+
+BACKENDS = ("auto", "cpu", "cuda")
+
+# BLAS / OpenMP 実装ごとのスレッド数環境変数（ライブラリ読み込み時にのみ参照される）
+BLAS_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+class ThreadBudget:
+    """
+    CPU スレッド予算を torch / BLAS / リクエストワーカーに配分する
+    """
+
+    def __init__(
+        self,
+        total: Optional[int] = None,
+        workers: int = 4,
+        backend: str = "auto",
+        models_per_request: int = 1,
+        interop: int = 1,
+    ):
+        """
+        Args:
+            total: スレッド予算（None でコア数）
+            workers: 同時に推論するリクエストスレッド数（MAX_WORKERS）
+            backend: 実行バックエンド（auto / cpu / cuda）
+            models_per_request: 1リクエストで並行実行するモデル数（ensemble は 2）
+            interop: torch の inter-op スレッド数
+        """
+        backend = (backend or "auto").strip().lower()
+        if backend not in BACKENDS:
+            raise ValueError(f"backend must be one of {BACKENDS}, got {backend!r}")
+        self.total = max(1, int(total or os.cpu_count() or 1))
+        self.workers = max(1, int(workers))
+        self.backend = backend
+        self.models_per_request = max(1, int(models_per_request))
+        self.interop = max(1, int(interop))
+        self._applied_backend: Optional[str] = None
+        self._applied = {"blas": False, "torch": False}
+
+    @classmethod
+    def from_env(cls, workers: int) -> "ThreadBudget":
+        """
+        環境変数から予算を構築する。
+
+        - AG_THREAD_BUDGET: スレッド予算（既定: コア数）
+        - AG_EXEC_BACKEND: auto / cpu / cuda（既定: auto）
+        - AG_INTEROP_THREADS: torch inter-op スレッド数（既定: 1）
+        - MODEL_TYPE=ensemble かつ USE_ANTIGRAVITY 有効時は1リクエスト2モデルとして配分
+        """
+        total = os.getenv("AG_THREAD_BUDGET")
+        ensemble = (
+            os.getenv("USE_ANTIGRAVITY", "0").lower() in ("1", "true", "yes")
+            and os.getenv("MODEL_TYPE", "ensemble").strip().lower() == "ensemble"
+        )
+        return cls(
+            total=int(total) if total else None,
+            workers=workers,
+            backend=os.getenv("AG_EXEC_BACKEND", "auto"),
+            models_per_request=2 if ensemble else 1,
+            interop=int(os.getenv("AG_INTEROP_THREADS", "1")),
+        )
+
+    @property
+    def concurrency(self) -> int:
+        """同時に走る推論の最大数"""
+        return self.workers * self.models_per_request
+
+    def resolve_backend(self) -> str:
+        """auto の場合、torch が読み込み済みで GPU が使えれば cuda、それ以外は cpu"""
+        if self.backend != "auto":
+            return self.backend
+        if (os.getenv("MODEL_PRECISION") or "fp32").strip().lower() == "int8":
+            return "cpu"  # int8 動的量子化は CPU でのみ実行される
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            return "cuda"
+        return "cpu"
+
+    def blas_threads(self) -> int:
+        """リクエストスレッドあたりの BLAS スレッド数"""
+        return max(1, self.total // self.workers)
+
+    def intra_op_threads(self, backend: Optional[str] = None) -> int:
+        """推論1本あたりの torch intra-op スレッド数"""
+        if (backend or self.resolve_backend()) == "cuda":
+            return 1
+        return max(1, self.total // self.concurrency)
+
+    def export_env(self) -> None:
+        """
+        BLAS のスレッド数を環境変数に設定する。
+        numpy / torch の import 前に呼ぶ必要がある。明示的に設定済みの値は上書きしない。
+        """
+        n = str(self.blas_threads())
+        for name in BLAS_ENV_VARS:
+            os.environ.setdefault(name, n)
+
+    def apply(self) -> Dict[str, Any]:
+        """
+        BLAS と（読み込み済みなら）torch にスレッド数を設定し、実効値を返す。
+
+        torch が未読み込みの場合は torch を import せず、apply_torch() を
+        torch の読み込み時に呼ぶ（AntigravityOrchestrator の on_torch_loaded）。
+        """
+        torch = sys.modules.get("torch")
+        if torch is not None:
+            self.apply_torch(torch)
+        else:
+            self._applied_backend = self.resolve_backend()
+        if THREADPOOLCTL_AVAILABLE:
+            threadpool_limits(limits=self.blas_threads(), user_api="blas")
+            self._applied["blas"] = True
+        return self.effective()
+
+    def apply_torch(self, torch: Any = None) -> None:
+        """
+        torch の intra-op / inter-op スレッド数を設定する（auto はこの時点の torch で判定する）。
+
+        inter-op スレッド数は最初の並列処理より前にしか変更できないため、失敗は無視する。
+        """
+        torch = torch if torch is not None else sys.modules.get("torch")
+        if torch is None:
+            return
+        backend = self.resolve_backend()
+        torch.set_num_threads(self.intra_op_threads(backend))
+        try:
+            torch.set_num_interop_threads(self.interop)
+        except RuntimeError:
+            pass
+        self._applied_backend = backend
+        self._applied["torch"] = True
+
+    def effective(self) -> Dict[str, Any]:
+        """/health に載せる設定値と実効値"""
+        backend = self._applied_backend or self.resolve_backend()
+        info: Dict[str, Any] = {
+            "budget": self.total,
+            "workers": self.workers,
+            "models_per_request": self.models_per_request,
+            "backend": backend,
+            "applied": dict(self._applied),
+            "intra_op_threads": self.intra_op_threads(backend),
+            "blas_threads": self.blas_threads(),
+            "env": {name: os.environ.get(name) for name in BLAS_ENV_VARS},
+        }
+        torch = sys.modules.get("torch")
+        if torch is not None:
+            info["torch"] = {
+                "num_threads": torch.get_num_threads(),
+                "num_interop_threads": torch.get_num_interop_threads(),
+            }
+        if THREADPOOLCTL_AVAILABLE:
+            info["blas_pools"] = [
+                {"api": p.get("internal_api"), "num_threads": p.get("num_threads")}
+                for p in threadpool_info()
+            ]
+        return info
@@ -0,0 +1,146 @@
+"""
+スレッド予算スイープ
+
+ワーカー数（MAX_WORKERS）と推論1本あたりの intra-op スレッド数の組み合わせごとに
+子プロセスを起動し、同時推論のレイテンシ（p50 / p95）とスループットを計測する。
+torch / BLAS のスレッド数はプロセス単位でしか確実に設定できないため、
+組み合わせごとにプロセスを分けている。
+
+ワークロードは Antigravity の TransformerPredictor（読み込めない場合は
+同程度の numpy 行列演算）に batch=1 のシーケンスを流す。
+
+Usage:
+    python thread_budget_sweep.py --budget 8 --workers 1,2,4,8 --requests 200
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+
+def _make_workload(seq_len: int) -> Callable[[], Any]:
+    """batch=1 推論1回分の関数を返す"""
+    import numpy as np
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+    try:
+        from antigravity.forecasting.models import TransformerPredictor
+        model = TransformerPredictor(input_dim=5, device="cpu")
+        X = np.random.default_rng(0).normal(size=(1, seq_len, 5)).astype(np.float32)
+        return lambda: model.predict(X)
+    except ImportError:
+        a = np.random.default_rng(0).normal(size=(256, 256))
+        return lambda: a @ a
+
+
+def _run_child(workers: int, intra: int, requests: int, seq_len: int) -> Dict[str, Any]:
+    """子プロセス側: workers 本のスレッドで合計 requests 回推論する"""
+    from thread_budget import ThreadBudget
+
+    budget = ThreadBudget(total=workers * intra, workers=workers, backend="cpu")
+    budget.export_env()
+    predict = _make_workload(seq_len)
+    settings = budget.apply()
+
+    for _ in range(5):
+        predict()
+
+    latencies: List[float] = []
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            t0 = time.perf_counter()
+            predict()
+            dt = (time.perf_counter() - t0) * 1000.0
+            with lock:
+                latencies.append(dt)
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    return {
+        "workers": workers,
+        "intra": intra,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+        "throughput_rps": len(latencies) / elapsed,
+        "torch_threads": settings.get("torch", {}).get("num_threads"),
+    }
+
+
+def sweep(budget: int, workers_list: List[int], requests: int, seq_len: int) -> List[Dict[str, Any]]:
+    """予算内の (workers, intra) の組み合わせをそれぞれ子プロセスで計測する"""
+    results = []
+    for workers in workers_list:
+        for intra in sorted({1, max(1, budget // workers), budget}):
+            if workers * intra > budget * 2:
+                continue  # 予算の2倍を超える過剰割り当ては比較対象外
+            cmd = [
+                sys.executable, os.path.abspath(__file__), "--child",
+                "--workers", str(workers), "--intra", str(intra),
+                "--requests", str(requests), "--seq-len", str(seq_len),
+            ]
+            out = subprocess.run(cmd, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            if out.returncode != 0:
+                print(f"[WARN] workers={workers} intra={intra} failed: {out.stderr.strip()[-200:]}")
+                continue
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thread budget sweep (workers x intra-op threads)")
+    parser.add_argument("--budget", type=int, default=os.cpu_count() or 1, help="CPU thread budget")
+    parser.add_argument("--workers", default="1,2,4,8", help="Comma-separated MAX_WORKERS values")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per configuration")
+    parser.add_argument("--seq-len", type=int, default=20)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--intra", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_run_child(int(args.workers), args.intra, args.requests, args.seq_len)))
+        return
+
+    workers_list = [int(w) for w in args.workers.split(",") if w.strip()]
+    results = sweep(args.budget, workers_list, args.requests, args.seq_len)
+    if not results:
+        print("No results.")
+        return
+
+    print(f"budget={args.budget} requests={args.requests}")
+    print(f"{'workers':>7} {'intra':>5} {'p50 ms':>8} {'p95 ms':>8} {'req/s':>8}")
+    for r in sorted(results, key=lambda r: (r["workers"], r["intra"])):
+        print(f"{r['workers']:>7} {r['intra']:>5} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['throughput_rps']:>8.1f}")
+
+    # スループットが最大の9割以上の組み合わせのうち、p95 が最小のものを推奨する
+    max_rps = max(r["throughput_rps"] for r in results)
+    best = min((r for r in results if r["throughput_rps"] >= 0.9 * max_rps), key=lambda r: r["p95_ms"])
+    print(
+        f"\nRecommended: MAX_WORKERS={best['workers']} "
+        f"AG_THREAD_BUDGET={best['workers'] * best['intra']} "
+        f"(intra-op {best['intra']}/request, p95 {best['p95_ms']:.2f} ms, {best['throughput_rps']:.1f} req/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+"""
+トレード履歴（ログ学習用）の追記型ストア
+
+従来は trade_history.json に全件を json.dump(indent=2) で毎リクエスト書き直していたため、
+1推論あたりの I/O が履歴件数に比例し、ファイルも無制限に増えていた。
+
+- trade_history.jsonl に1行1イベント（signal / result）で追記する
+- 追記はメモリ上のキューに積むだけで、バックグラウンドスレッドが flush_interval ごとに
+  まとめて書き込む（リクエストあたりの永続化コストは一定）
+- retention_days より古い行は定期的なコンパクション（一時ファイル + os.replace）で削除する
+- 起動時は行の timestamp で二分探索し、lookback_days 分だけを読み込む
+- 旧形式の trade_history.json があれば初回起動時に JSONL へ移行する
+- 勝率は (symbol, signal, ema_bullish) × 日 の集計を結果記録時に更新し、
+  get_win_rate は日数分の合計で求める（期間の境界日だけ時刻で絞り込む）
+
+Usage:
+    history = TradeHistory(data_dir / "trade_history.jsonl")
+    trade_id = history.add_signal(symbol, timeframe, signal, conf, reason, market_data)
+    history.update_result(trade_id, "win", 12.3)
+    history.close()
+"""
+
+import atexit
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+from common.logger import get_inference_logger
+
+
+logger = get_inference_logger()
+
+DEFAULT_LOOKBACK_DAYS = 30
+DEFAULT_RETENTION_DAYS = 90
+DEFAULT_FLUSH_INTERVAL_SEC = 1.0
+# retention_days をこの日数超えた行が出てからコンパクションする（毎回の全書き換えを避ける）
+COMPACTION_SLACK_DAYS = 1
+SIGNAL_NAMES = {1: 'BUY', -1: 'SELL', 0: 'WAIT'}
+
+
+def _ema_bullish(market_data: Optional[Dict]) -> bool:
+    md = market_data or {}
+    try:
+        return float(md.get('ema12') or 0) > float(md.get('ema25') or 0)
+    except (TypeError, ValueError):
+        return False
+
+
+class _DayBucket:
+    """1日分の結果集計。entries は (timestamp, win) の時刻順（境界日の絞り込み用）"""
+
+    __slots__ = ('wins', 'total', 'entries')
+
+    def __init__(self):
+        self.wins = 0
+        self.total = 0
+        self.entries: List[Tuple[str, bool]] = []
+
+
+def _line_timestamp(line: bytes) -> Optional[str]:
+    try:
+        return json.loads(line).get('timestamp')
+    except (ValueError, AttributeError):
+        return None
+
+
+def _seek_first_at_or_after(f, cutoff: str) -> int:
+    """
+    timestamp 昇順の JSONL で、timestamp >= cutoff となる最初の行の先頭オフセットを返す。
+    ISO 8601 文字列は辞書順 = 時刻順なので、パースせずに比較する。
+    """
+    f.seek(0, os.SEEK_END)
+    lo, hi = 0, f.tell()
+    while lo < hi:
+        mid = (lo + hi) // 2
+        # mid 以降で最初に始まる行
+        f.seek(mid - 1 if mid else 0)
+        if mid:
+            f.readline()
+        line = f.readline()
+        ts = _line_timestamp(line) if line else None
+        if line and ts is not None and ts < cutoff:
+            lo = f.tell()
+        else:
+            hi = mid
+    if lo:
+        f.seek(lo - 1)
+        f.readline()
+        return f.tell()
+    return 0
+
+
+class TradeHistory:
+    """トレード履歴管理（ログ学習用）"""
+
+    def __init__(
+        self,
+        history_file: Path,
+        lookback_days: int = DEFAULT_LOOKBACK_DAYS,
+        retention_days: int = DEFAULT_RETENTION_DAYS,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL_SEC,
+    ):
+        """
+        Args:
+            history_file: 履歴ファイル（.jsonl に置き換えて使う。旧 .json は移行元）
+            lookback_days: メモリに保持する期間（get_win_rate の参照範囲の上限）
+            retention_days: ファイルに残す期間
+            flush_interval: バックグラウンド書き込みの間隔（秒）
+        """
+        history_file = Path(history_file)
+        self.legacy_file = history_file.with_suffix('.json')
+        self.history_file = history_file.with_suffix('.jsonl')
+        self.lookback_days = lookback_days
+        self.retention_days = max(retention_days, lookback_days)
+        self.flush_interval = flush_interval
+
+        self.trades: Deque[Dict] = deque()
+        self._by_id: Dict[int, Dict] = {}
+        # (symbol, signal, ema_bullish) -> 日付 (YYYY-MM-DD) -> 結果集計
+        self._stats: Dict[Tuple[str, int, bool], Dict[str, _DayBucket]] = {}
+        self._last_id = 0
+        self._pending: List[str] = []
+        # _lock: メモリ上の履歴とキュー / _io_lock: ファイルの追記とコンパクション
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._oldest_ts: Optional[str] = None
+
+        self._migrate_legacy()
+        self._compact_if_needed()
+        self._load_history()
+
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="trade-history-flush", daemon=True)
+        self._flusher.start()
+        # close() で登録を外す（登録したままだと閉じたインスタンスも解放されない）
+        atexit.register(self.close)
+
+    # ------------------------------------------------------------------
+    # 読み込み / 移行
+    # ------------------------------------------------------------------
+
+    def _migrate_legacy(self):
+        """旧形式（JSON 配列）を JSONL に変換し、元ファイルは .migrated に退避する"""
+        if self.history_file.exists() or not self.legacy_file.exists():
+            return
+        try:
+            with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                trades = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to migrate history {self.legacy_file}: {e}")
+            return
+
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+        trades = sorted(
+            (t for t in trades if isinstance(t, dict) and str(t.get('timestamp', '')) >= cutoff),
+            key=lambda t: t['timestamp'],
+        )
+        lines = []
+        for trade_id, trade in enumerate(trades, start=1):
+            record = {'type': 'signal', 'id': trade_id, **trade}
+            lines.append(json.dumps(record, ensure_ascii=False))
+        self._atomic_write(lines)
+        os.replace(self.legacy_file, self.legacy_file.with_suffix('.json.migrated'))
+        logger.info(f"Migrated {len(lines)} trades from {self.legacy_file.name} to {self.history_file.name}")
+
+    def _load_history(self):
+        """lookback_days 分だけ読み込む（行は時刻順に追記されているので二分探索で開始位置を決める）"""
+        if not self.history_file.exists():
+            return
+        cutoff = (datetime.now() - timedelta(days=self.lookback_days)).isoformat()
+        try:
+            with open(self.history_file, 'rb') as f:
+                self._oldest_ts = _line_timestamp(f.readline())
+                f.seek(_seek_first_at_or_after(f, cutoff))
+                for line in f:
+                    self._apply(line, cutoff)
+                # 過去のレコードも含めて ID を重複させない
+                self._last_id = max(self._last_id, self._max_id_tail(f))
+        except Exception as e:
+            logger.error(f"Failed to load history: {e}")
+        logger.info(f"Loaded {len(self.trades)} trades from history (last {self.lookback_days} days)")
+
+    def _max_id_tail(self, f) -> int:
+        """末尾のレコードの ID（ID は単調増加）"""
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        f.seek(max(0, end - 64 * 1024))
+        last = 0
+        for line in f:
+            try:
+                last = max(last, int(json.loads(line).get('id', 0)))
+            except (ValueError, TypeError, AttributeError):
+                continue
+        return last
+
+    def _apply(self, line: bytes, cutoff: str):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return  # クラッシュ時の書きかけ行
+        if not isinstance(record, dict) or record.get('timestamp', '') < cutoff:
+            return
+        kind = record.pop('type', 'signal')
+        trade_id = record.get('id')
+        if kind == 'signal':
+            self.trades.append(record)
+            self._by_id[trade_id] = record
+            self._last_id = max(self._last_id, int(trade_id or 0))
+            self._stats_add(record)
+        elif kind == 'result' and trade_id in self._by_id:
+            self._set_result(self._by_id[trade_id], record.get('result'), record.get('pips'))
+
+    # ------------------------------------------------------------------
+    # 勝率集計
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _stats_key(trade: Dict) -> Tuple[str, int, bool]:
+        return trade.get('symbol'), trade.get('signal'), _ema_bullish(trade.get('market_data'))
+
+    def _stats_add(self, trade: Dict):
+        if trade.get('result') is None:
+            return
+        ts = trade['timestamp']
+        bucket = self._stats.setdefault(self._stats_key(trade), {}).setdefault(ts[:10], _DayBucket())
+        win = trade['result'] == 'win'
+        bucket.wins += win
+        bucket.total += 1
+        bisect.insort(bucket.entries, (ts, win))
+
+    def _stats_remove(self, trade: Dict):
+        if trade.get('result') is None:
+            return
+        days = self._stats.get(self._stats_key(trade))
+        bucket = days.get(trade['timestamp'][:10]) if days else None
+        if bucket is None:
+            return
+        entry = (trade['timestamp'], trade['result'] == 'win')
+        i = bisect.bisect_left(bucket.entries, entry)
+        if i < len(bucket.entries) and bucket.entries[i] == entry:
+            del bucket.entries[i]
+            bucket.wins -= entry[1]
+            bucket.total -= 1
+        if not bucket.total:
+            del days[trade['timestamp'][:10]]
+
+    def _set_result(self, trade: Dict, result: Optional[str], pips: Optional[float]):
+        self._stats_remove(trade)
+        trade['result'] = result
+        trade['pips'] = pips
+        self._stats_add(trade)
+
+    # ------------------------------------------------------------------
+    # 書き込み
+    # ------------------------------------------------------------------
+
+    def _next_id(self) -> int:
+        # マイクロ秒の時刻ベースで単調増加（再起動をまたいでも衝突しない）
+        self._last_id = max(int(time.time() * 1e6), self._last_id + 1)
+        return self._last_id
+
+    def _trim(self):
+        """lookback_days より古いレコードをメモリから外す（追記順 = 時刻順）"""
+        cutoff = (datetime.now() - timedelta(days=self.lookback_days)).isoformat()
+        while self.trades and self.trades[0]['timestamp'] < cutoff:
+            trade = self.trades.popleft()
+            self._by_id.pop(trade.get('id'), None)
+            self._stats_remove(trade)
+
+    def add_signal(self, symbol: str, timeframe: str, signal: int,
+                   confidence: float, reason: str, market_data: Dict,
+                   module_breakdown: Dict = None) -> int:
+        """シグナル発生を記録し、trade_id を返す（書き込みはバックグラウンド）"""
+        with self._lock:
+            trade = {
+                'id': self._next_id(),
+                'timestamp': datetime.now().isoformat(),
+                'symbol': symbol,
+                'timeframe': timeframe,
+                'signal': signal,
+                'signal_name': SIGNAL_NAMES[signal],
+                'confidence': confidence,
+                'reason': reason,
+                'market_data': market_data,
+                'module_breakdown': module_breakdown,
+                'result': None,
+                'pips': None
+            }
+            self._pending.append(json.dumps({'type': 'signal', **trade}, ensure_ascii=False))
+            self.trades.append(trade)
+            self._by_id[trade['id']] = trade
+            self._trim()
+            return trade['id']
+
+    def update_result(self, trade_id: int, result: str, pips: float) -> bool:
+        """トレード結果（'win' / 'loss'）を記録する。メモリ上にない（期間外・不明）場合 False"""
+        with self._lock:
+            trade = self._by_id.get(trade_id)
+            if trade is None:
+                return False
+            self._set_result(trade, result, pips)
+            record = {'type': 'result', 'id': trade_id, 'timestamp': datetime.now().isoformat(),
+                      'result': result, 'pips': pips}
+            self._pending.append(json.dumps(record, ensure_ascii=False))
+            return True
+
+    def flush(self):
+        """キューに溜まった行をまとめて追記する"""
+        with self._lock:
+            lines, self._pending = self._pending, []
+        if not lines:
+            return
+        with self._io_lock:
+            try:
+                with open(self.history_file, 'a', encoding='utf-8') as f:
+                    f.write('\n'.join(lines) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                if self._oldest_ts is None:
+                    self._oldest_ts = json.loads(lines[0]).get('timestamp')
+            except Exception as e:
+                logger.error(f"Failed to save history: {e}")
+                with self._lock:
+                    self._pending[:0] = lines
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+            self._compact_if_needed()
+
+    def close(self):
+        """バックグラウンド書き込みを止め、残りを書き出す"""
+        atexit.unregister(self.close)
+        self._stop.set()
+        if self._flusher.is_alive() and self._flusher is not threading.current_thread():
+            self._flusher.join(timeout=5.0)
+        self.flush()
+
+    # ------------------------------------------------------------------
+    # コンパクション
+    # ------------------------------------------------------------------
+
+    def _atomic_write(self, lines: List[str]):
+        self.history_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=str(self.history_file.parent), prefix=self.history_file.name + '.', suffix='.tmp'
+        )
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(''.join(line + '\n' for line in lines))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.history_file)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _compact_if_needed(self):
+        """retention_days より古い行を削除する（先頭行が retention + 猶予を超えたときだけ）"""
+        now = datetime.now()
+        threshold = (now - timedelta(days=self.retention_days + COMPACTION_SLACK_DAYS)).isoformat()
+        with self._io_lock:
+            if not self.history_file.exists():
+                return
+            if self._oldest_ts is None:
+                with open(self.history_file, 'rb') as f:
+                    self._oldest_ts = _line_timestamp(f.readline())
+            if self._oldest_ts is None or self._oldest_ts >= threshold:
+                return
+            cutoff = (now - timedelta(days=self.retention_days)).isoformat()
+            try:
+                with open(self.history_file, 'rb') as f:
+                    f.seek(_seek_first_at_or_after(f, cutoff))
+                    kept = [line.decode('utf-8').rstrip('\n') for line in f if line.strip()]
+                self._atomic_write(kept)
+                self._oldest_ts = _line_timestamp(kept[0].encode('utf-8')) if kept else None
+                logger.info(f"Compacted {self.history_file.name}: kept {len(kept)} lines (last {self.retention_days} days)")
+            except Exception as e:
+                logger.error(f"Failed to compact history: {e}")
+
+    # ------------------------------------------------------------------
+    # 参照
+    # ------------------------------------------------------------------
+
+    def get_win_rate(self, symbol: str, signal: int,
+                     ema_bullish: bool, lookback_days: int = 30) -> Tuple[float, int]:
+        """
+        勝率を計算（メモリ上の lookback_days 分が対象。O(日数)）
+
+        Raises:
+            ValueError: lookback_days がコンストラクタの lookback_days（メモリに読み込んだ期間）を超える場合
+        """
+        if lookback_days > self.lookback_days:
+            raise ValueError(
+                f"lookback_days={lookback_days} exceeds the loaded window ({self.lookback_days} days); "
+                f"construct TradeHistory with lookback_days>={lookback_days}"
+            )
+        cutoff = (datetime.now() - timedelta(days=lookback_days)).isoformat()
+        cutoff_day = cutoff[:10]
+        wins = 0
+        total = 0
+
+        with self._lock:
+            for day, bucket in self._stats.get((symbol, signal, ema_bullish), {}).items():
+                if day > cutoff_day:
+                    wins += bucket.wins
+                    total += bucket.total
+                elif day == cutoff_day:
+                    # 境界日は cutoff 以降の結果だけ
+                    start = bisect.bisect_left(bucket.entries, (cutoff,))
+                    for _ts, win in bucket.entries[start:]:
+                        wins += win
+                        total += 1
+
+        win_rate = wins / total if total > 0 else 0.5
+        return win_rate, total